@@ -5,7 +5,7 @@ import os
 from fastapi import FastAPI, Request, HTTPException, Response, Depends, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
-from core.services import redis
+from core.services import metrics, redis
 try:
     import sentry
 except Exception:
@@ -17,6 +17,7 @@ from datetime import datetime, timezone
 from core.utils.config import config, EnvMode
 import asyncio
 from core.utils.logger import logger, structlog
+from core.utils.auth_utils import verify_metrics_access
 import time
 
 from pydantic import BaseModel
@@ -73,10 +74,32 @@ async def lifespan(app: FastAPI):
         composio_api.initialize(db)
         triggers_api.initialize(db)
         
+        if os.getenv("COMPOSIO_API_KEY"):
+            from core.composio_integration.toolkit_catalog import toolkit_catalog
+            toolkit_catalog.start_background_refresh()
+
+        from core.sandbox.lifecycle import sandbox_lifecycle
+        sandbox_lifecycle.start_background_sweep()
+        
         yield
         
         logger.debug("Cleaning up agent resources")
+        if os.getenv("COMPOSIO_API_KEY"):
+            from core.composio_integration.toolkit_catalog import toolkit_catalog
+            await toolkit_catalog.stop_background_refresh()
+
+        from core.sandbox.lifecycle import sandbox_lifecycle
+        await sandbox_lifecycle.stop_background_sweep()
         await core_api.cleanup()
+
+        from core.services.document_extraction import extraction_service
+        extraction_service.shutdown()
+
+        from core.sandbox.service_client import close_service_clients
+        await close_service_clients()
+
+        from core.websocket.counter_socket import counter_manager
+        await counter_manager.close()
         
         try:
             logger.debug("Closing Redis connection")
@@ -266,6 +289,13 @@ async def health_docker_check():
 app.include_router(api_router, prefix="/api")
 
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_metrics_access)])
+async def metrics_endpoint():
+    # Reads every process's samples from disk in multiprocess mode
+    body, content_type = await asyncio.to_thread(metrics.render)
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Agent run admission with skewed tenants: FIFO vs the fair admission queue.
+
+Simulates a pool of worker slots (virtual time, no real runs) fed by:
+
+    heavy   a few accounts that fire large bursts of trigger runs
+    light   many accounts submitting a handful of interactive runs each
+            spread over the simulation window
+
+and schedules the same arrivals twice:
+
+    fifo    one shared queue in arrival order (run_agent_background.send)
+    fair    core.services.run_admission.AdmissionQueue on an in-memory Redis,
+            i.e. the exact production dequeue decisions
+
+Reports run wait time (enqueue to admission) per tenant class. With
+--same-priority every run is interactive, which isolates the per-account
+fair queuing from the priority classes.
+
+Usage:
+    python -m benchmarks.admission_fairness [--slots N] [--heavy N] [--burst N]
+                                            [--light N] [--same-priority]
+
+Examples:
+    # Default: 16 slots, 2 heavy accounts x 300 runs, 200 light accounts
+    python -m benchmarks.admission_fairness
+
+    # Heavy tenants compete at the same priority as everyone else
+    python -m benchmarks.admission_fairness --same-priority
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+from collections import deque
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+os.environ.setdefault("LOGGING_LEVEL", "ERROR")
+
+from core.services import run_admission  # noqa: E402
+from core.services.run_admission import AdmissionQueue, Priority  # noqa: E402
+
+
+class MemoryRedis:
+    """In-memory stand-in for the Redis commands the admission queue uses. The
+    enqueue and dequeue scripts run as Python ports of the same steps."""
+
+    def __init__(self):
+        self.values, self.lists, self.hashes, self.zsets = {}, {}, {}, {}
+
+    async def get_client(self):
+        return self
+
+    def register_script(self, source):
+        port = {
+            run_admission.ENQUEUE_SCRIPT: self._enqueue,
+            run_admission.DEQUEUE_SCRIPT: self._dequeue,
+        }[source]
+
+        async def script(keys=(), args=()):
+            return await port(list(keys), *args)
+
+        return script
+
+    async def _enqueue(self, keys, priority, account, raw):
+        queue_key, ready_key, jobs_key, depth_key, vclock_key, finish_key, seq_key = keys
+        seq = int(self.values.get(seq_key, 0)) + 1
+        self.values[seq_key] = seq
+        entry = f"{account}:{seq:015d}"
+        await self.zadd(queue_key, {entry: 0})
+        await self.hset(jobs_key, entry, raw)
+        await self.hincrby(depth_key, str(priority), 1)
+        if await self.zscore(ready_key, account) is None:
+            vclock = float(await self.get(vclock_key) or 0)
+            finish = float(await self.zscore(finish_key, account) or 0)
+            await self.zadd(ready_key, {account: max(vclock, finish)})
+
+    async def _dequeue(self, keys, now, default_weight, wait_samples):
+        jobs_key, depth_key, weights_key, running_key, claims_key = keys[:5]
+        for priority, base in enumerate(range(5, len(keys), 5)):
+            ready_key, queue_key, vclock_key, finish_key, waits_key = keys[base:base + 5]
+            while head := await self.zrange(ready_key, 0, 0, withscores=True):
+                account, start = head[0]
+                entries = sorted(e for e in self.zsets.get(queue_key, {}) if e.startswith(f"{account}:"))[:2]
+                raw = await self.hget(jobs_key, entries[0]) if entries else None
+                if entries:
+                    await self.zrem(queue_key, entries[0])
+                    await self.hincrby(depth_key, str(priority), -1)
+                if len(entries) < 2:
+                    await self.zrem(ready_key, account)
+                if raw is None:
+                    continue
+                weight = float(await self.hget(weights_key, account) or default_weight)
+                finish = start + 1.0 / max(weight, 0.01)
+                await self.set(vclock_key, str(start))
+                finishes = self.zsets.setdefault(finish_key, {})
+                finishes[account] = finish
+                for member in [m for m, f in finishes.items() if f <= start]:
+                    del finishes[member]
+                if len(entries) == 2:
+                    await self.zadd(ready_key, {account: finish})
+                job = json.loads(raw)
+                await self.lpush(waits_key, f"{max(0.0, now - job['enqueued_at']):.3f}")
+                await self.ltrim(waits_key, 0, wait_samples - 1)
+                await self.zadd(running_key, {job["job_id"]: now})
+                await self.hset(claims_key, job["job_id"], entries[0])
+                return raw
+        return None
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def rpush(self, key, value):
+        self.lists.setdefault(key, deque()).append(value)
+
+    async def lpush(self, key, value):
+        self.lists.setdefault(key, deque()).appendleft(value)
+
+    async def lpop(self, key):
+        items = self.lists.get(key)
+        return items.popleft() if items else None
+
+    async def llen(self, key):
+        return len(self.lists.get(key, ()))
+
+    async def ltrim(self, key, start, end):
+        self.lists[key] = deque(list(self.lists.get(key, ()))[start:end + 1])
+
+    async def lrange(self, key, start, end):
+        items = list(self.lists.get(key, ()))
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    async def hincrby(self, key, field, amount):
+        table = self.hashes.setdefault(key, {})
+        table[field] = str(int(table.get(field, 0)) + amount)
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    async def zrange(self, key, start, end, withscores=False):
+        items = sorted((s, m) for m, s in self.zsets.get(key, {}).items())[start:end + 1]
+        return [(m, s) for s, m in items] if withscores else [m for _, m in items]
+
+    async def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+
+def make_arrivals(heavy: int, burst: int, light: int, window: float, same_priority: bool, seed: int):
+    """(time, account, tenant class, priority) for every run, sorted by time."""
+    rng = random.Random(seed)
+    arrivals = []
+    for h in range(heavy):
+        # Bursts land at the start of the window, e.g. a trigger fan-out
+        start = rng.uniform(0, window * 0.1)
+        for _ in range(burst):
+            priority = Priority.INTERACTIVE if same_priority else Priority.TRIGGER
+            arrivals.append((start + rng.uniform(0, 5), f"heavy-{h}", "heavy", priority))
+    for a in range(light):
+        for _ in range(rng.randint(1, 3)):
+            arrivals.append((rng.uniform(0, window), f"light-{a}", "light", Priority.INTERACTIVE))
+    arrivals.sort(key=lambda item: item[0])
+    durations = [rng.lognormvariate(4.0, 0.6) for _ in arrivals]  # median ~55s
+    return arrivals, durations
+
+
+async def simulate(arrivals, durations, slots: int, policy: str):
+    now = [0.0]
+    waits = {"heavy": [], "light": []}
+    running = []  # completion times
+    pending = deque(enumerate(arrivals))
+
+    if policy == "fair":
+        run_admission.redis = MemoryRedis()
+        queue = AdmissionQueue(clock=lambda: now[0])
+    else:
+        fifo = deque()
+
+    while pending or running or (policy == "fifo" and fifo) or (policy == "fair" and await queue.depth()):
+        next_arrival = pending[0][1][0] if pending else float("inf")
+        next_done = running[0] if running else float("inf")
+        now[0] = min(next_arrival, next_done)
+
+        while running and running[0] <= now[0]:
+            heapq.heappop(running)
+        while pending and pending[0][1][0] <= now[0]:
+            index, (at, account, tenant, priority) = pending.popleft()
+            job = {"index": index, "tenant": tenant}
+            if policy == "fair":
+                await queue.enqueue(account, job, priority=priority)
+            else:
+                fifo.append((at, job))
+
+        while len(running) < slots:
+            if policy == "fair":
+                admitted = await queue.dequeue()
+                if admitted is None:
+                    break
+                enqueued_at, job = admitted.enqueued_at, admitted.payload
+            else:
+                if not fifo:
+                    break
+                enqueued_at, job = fifo.popleft()
+            waits[job["tenant"]].append(now[0] - enqueued_at)
+            heapq.heappush(running, now[0] + durations[job["index"]])
+
+    return waits, now[0]
+
+
+def _summary(values):
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50={statistics.median(ordered):7.1f}s  p95={p95:7.1f}s  max={ordered[-1]:7.1f}s"
+
+
+def main(slots: int, heavy: int, burst: int, light: int, window: float, same_priority: bool, seed: int) -> None:
+    arrivals, durations = make_arrivals(heavy, burst, light, window, same_priority, seed)
+    print(f"Runs: {len(arrivals)} ({heavy * burst} heavy from {heavy} accounts, "
+          f"{len(arrivals) - heavy * burst} light from {light} accounts), {slots} slots, "
+          f"{'same priority' if same_priority else 'heavy runs are triggers'}")
+    for policy in ("fifo", "fair"):
+        waits, makespan = asyncio.run(simulate(arrivals, durations, slots, policy))
+        print(f"{policy:<5} light {_summary(waits['light'])}")
+        print(f"{'':<5} heavy {_summary(waits['heavy'])}  makespan={makespan:7.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate agent run admission with skewed tenants")
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--heavy", type=int, default=2)
+    parser.add_argument("--burst", type=int, default=300)
+    parser.add_argument("--light", type=int, default=200)
+    parser.add_argument("--window", type=float, default=1800.0, help="Seconds over which light runs arrive")
+    parser.add_argument("--same-priority", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    main(args.slots, args.heavy, args.burst, args.light, args.window, args.same_priority, args.seed)
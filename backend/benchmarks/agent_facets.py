@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Agent list benchmark: in-Python tool filtering vs the tool facet columns.
+
+Seeds N synthetic agents (each with an active version carrying a random tool
+configuration) for an existing account in a local Supabase instance, then
+times one page of the agent list for tool-based filters and sorts:
+
+    legacy   previous behaviour: load every agent of the account and its
+             current version, filter and sort in Python, slice the page
+    facets   AgentService: one query on agents.tools_count / has_mcp_tools /
+             has_agentpress_tools / tool_names, configs loaded for the page
+
+Both paths are checked to return the same page; the seeded agents are
+deleted at the end (versions cascade).
+
+Requires a local Supabase started with the migrations applied and an existing
+Basejump account to own the seeded rows.
+
+Usage:
+    python -m benchmarks.agent_facets --account-id <uuid>
+
+Examples:
+    # Default run with 5k agents
+    python -m benchmarks.agent_facets --account-id ...
+
+    # Fewer agents, 20 timed iterations per query
+    python -m benchmarks.agent_facets --account-id ... --agents 1000 --iterations 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.agent_service import AgentFilters, AgentService
+from core.services.supabase import DBConnection
+from core.utils.pagination import PaginationParams
+
+BATCH_SIZE = 500
+AGENTPRESS_TOOLS = ["sb_shell_tool", "sb_files_tool", "web_search_tool", "browser_tool", "sb_vision_tool",
+                    "data_providers_tool", "sb_presentation_tool", "sb_image_edit_tool"]
+MCP_SERVERS = ["Slack", "Google Drive", "Notion", "GitHub", "Linear", "Gmail"]
+
+QUERIES = [
+    ("tools_count sort", AgentFilters(sort_by="tools_count")),
+    ("has_mcp_tools", AgentFilters(has_mcp_tools=True)),
+    ("no agentpress", AgentFilters(has_agentpress_tools=False)),
+    ("tool name", AgentFilters(tools=["mcp:Notion", "agentpress:browser_tool"])),
+]
+
+
+def _tool_config(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "agentpress": {tool: rng.random() < 0.4 for tool in AGENTPRESS_TOOLS},
+        "mcp": [{"name": name, "qualifiedName": name.lower(), "config": {}, "enabledTools": []}
+                for name in rng.sample(MCP_SERVERS, rng.choice([0, 0, 1, 2]))],
+        "custom_mcp": [],
+    }
+
+
+async def _seed(client, account_id: str, agents: int) -> List[str]:
+    rng = random.Random(42)
+    created_at = datetime.now(timezone.utc) - timedelta(seconds=agents)
+    agent_ids = []
+    for offset in range(0, agents, BATCH_SIZE):
+        rows, versions = [], []
+        for i in range(offset, min(agents, offset + BATCH_SIZE)):
+            agent_id, version_id = str(uuid.uuid4()), str(uuid.uuid4())
+            agent_ids.append(agent_id)
+            rows.append({"agent_id": agent_id, "account_id": account_id, "name": f"bench-agent-{i}",
+                         "description": "benchmark", "is_default": False, "metadata": {"benchmark": True},
+                         # Distinct timestamps keep created_at ordering deterministic
+                         "created_at": (created_at + timedelta(seconds=i)).isoformat()})
+            versions.append({"version_id": version_id, "agent_id": agent_id, "version_number": 1,
+                             "version_name": "v1", "is_active": True,
+                             "config": {"system_prompt": "bench", "tools": _tool_config(rng), "triggers": []}})
+        await client.table('agents').insert(rows).execute()
+        await client.table('agent_versions').insert(versions).execute()
+        # Pointing agents at their version is what fills the facet columns
+        for row, version in zip(rows, versions):
+            row["current_version_id"] = version["version_id"]
+        await client.table('agents').upsert(rows).execute()
+    return agent_ids
+
+
+def _legacy_facets(agent, filters: AgentFilters):
+    configured_mcps = agent.get('configured_mcps') or []
+    agentpress_tools = agent.get('agentpress_tools') or {}
+    enabled = [name for name, data in agentpress_tools.items() if isinstance(data, dict) and data.get('enabled', False)]
+    names = {f"mcp:{m['name']}" for m in configured_mcps if isinstance(m, dict) and 'name' in m}
+    names |= {f"agentpress:{name}" for name in enabled}
+    if filters.has_mcp_tools is not None and filters.has_mcp_tools != bool(configured_mcps):
+        return None
+    if filters.has_agentpress_tools is not None and filters.has_agentpress_tools != bool(enabled):
+        return None
+    if filters.tools and not any(tool in names for tool in filters.tools):
+        return None
+    return len(configured_mcps) + len(enabled)
+
+
+async def _legacy_page(service: AgentService, account_id: str, params: PaginationParams, filters: AgentFilters):
+    """Previous behaviour: every agent and version of the account, filtered in Python."""
+    rows = []
+    while True:
+        # Paged so every agent is read even past the PostgREST max-rows cap
+        page = await service.db.table('agents').select('*').eq('account_id', account_id) \
+            .order('created_at', desc=True).range(len(rows), len(rows) + 999).execute()
+        rows.extend(page.data or [])
+        if len(page.data or []) < 1000:
+            break
+    version_map = await service._load_agent_versions_batch(rows)
+    agents = await service._load_agents_with_configs(rows, version_map)
+    counted = [(agent, _legacy_facets(agent, filters)) for agent in agents]
+    matching = [(agent, count) for agent, count in counted if count is not None]
+    if filters.sort_by == "tools_count":
+        matching.sort(key=lambda item: item[1], reverse=True)
+    offset = (params.page - 1) * params.page_size
+    return [agent for agent, _ in matching[offset:offset + params.page_size]], len(matching)
+
+
+async def _time(label: str, iterations: int, fn) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<30} p50={statistics.median(samples):9.2f}ms  max={max(samples):9.2f}ms")
+    return samples
+
+
+async def main(account_id: str, agents: int, iterations: int, page_size: int) -> None:
+    db = DBConnection()
+    await db.initialize()
+    client = await db.client
+    service = AgentService(client)
+
+    print(f"Seeding {agents} agents...")
+    started = time.perf_counter()
+    agent_ids = await _seed(client, account_id, agents)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s (includes facet trigger cost)")
+
+    try:
+        params = PaginationParams(page=2, page_size=page_size)
+        for label, filters in QUERIES:
+            legacy_rows, legacy_total = await _legacy_page(service, account_id, params, filters)
+            faceted = await service.get_agents_paginated(account_id, params, filters)
+            same = legacy_total == faceted.pagination.total_items
+            if filters.sort_by != "tools_count":
+                # Ties in tools_count may be ordered differently, so only totals are compared there
+                same = same and [a['agent_id'] for a in legacy_rows] == [a['agent_id'] for a in faceted.data]
+            print(f"{label}: {legacy_total} matching, results match: {same}")
+            await _time(f"  legacy  {label}", iterations, lambda: _legacy_page(service, account_id, params, filters))
+            await _time(f"  facets  {label}", iterations, lambda: service.get_agents_paginated(account_id, params, filters))
+    finally:
+        for offset in range(0, len(agent_ids), 100):
+            await client.table('agents').delete().in_('agent_id', agent_ids[offset:offset + 100]).execute()
+        await DBConnection.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tool-filtered agent list pages")
+    parser.add_argument("--account-id", required=True, help="Existing basejump account id")
+    parser.add_argument("--agents", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.account_id, args.agents, args.iterations, args.page_size))
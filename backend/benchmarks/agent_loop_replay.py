@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+"""
+End-to-end replay of the agent loop: AgentRunner.run -> ThreadManager.run_thread
+-> ResponseProcessor.process_streaming_response, with everything outside the
+process faked so the numbers only move when the loop itself changes.
+
+Recorded conversations (benchmarks/recordings/*.json) hold the model, the user
+message and, per LLM call, the streamed chunks as [offset_ms, text] (XML tool
+calls are part of the text) or [offset_ms, {"index", "id"?, "name"?,
+"arguments"}] (a native tool call delta), offsets counted from the start of
+the call. The replay runs the real agent loop
+(tool registration, system prompt, context compression, stream parsing, tool
+execution, message persistence, checkpoints) against:
+
+    ScriptedLLM     make_llm_api_call, streaming litellm chunks of the
+                    recorded turns at their recorded offsets (scaled by
+                    --time-scale; 0 streams without waiting)
+    MemorySupabase  the Supabase query builder over in-memory tables, one
+                    round trip per execute(), optional --db-latency-ms
+    MemoryRedis     the Redis commands the loop uses, optional
+                    --redis-latency-ms
+    MemorySandbox   the sandbox filesystem and process API
+
+Every recording is replayed once to warm imports and Redis caches (as on a
+long-lived worker), then --repeat times. Reported per recording:
+
+    ttft_ms                run start to the first streamed assistant chunk
+    ttft_overhead_ms       the same minus the recorded first-chunk offset
+    setup_ms               run start to the first LLM call
+    iteration_overhead_ms  per LLM call: time not spent waiting on the
+                           recorded stream (parsing, tool execution, saving
+                           messages, building the next request)
+    db_round_trips         Supabase requests, by table and operation
+    redis_ops              Redis commands, by command
+    peak_rss_mb            peak RSS of the process after the recording
+                           (a high-water mark: it only grows across recordings)
+
+Timings are medians over the repeats. The JSON report (--output) has sorted
+keys so reports of two commits can be diffed directly, or compared with
+--baseline.
+
+Usage:
+    python -m benchmarks.agent_loop_replay [RECORDING ...] [--repeat N]
+                                           [--time-scale X] [--db-latency-ms N]
+                                           [--redis-latency-ms N] [--output FILE]
+                                           [--baseline FILE]
+
+Examples:
+    # All recordings at recorded speed
+    python -m benchmarks.agent_loop_replay
+
+    # Loop overhead only, 10 runs, saved for the next commit to compare against
+    python -m benchmarks.agent_loop_replay --time-scale 0 --repeat 10 --output before.json
+    python -m benchmarks.agent_loop_replay --time-scale 0 --repeat 10 --baseline before.json
+
+    # One recording with a 5ms database
+    python -m benchmarks.agent_loop_replay landing_page --db-latency-ms 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+os.environ.setdefault("LOGGING_LEVEL", "ERROR")
+
+from litellm.types.utils import Delta, ModelResponseStream, StreamingChoices, Usage  # noqa: E402
+
+import core.agentpress.thread_manager as thread_manager_module  # noqa: E402
+import core.sandbox.tool_base as tool_base  # noqa: E402
+import core.utils.cache as cache  # noqa: E402
+from core.run import run_agent  # noqa: E402
+from core.services import redis  # noqa: E402
+from core.services.llm import LLMError  # noqa: E402
+from core.services.supabase import DBConnection  # noqa: E402
+from core.utils.config import config  # noqa: E402
+
+RECORDINGS_DIR = Path(__file__).parent / "recordings"
+THREAD_ID = "00000000-0000-4000-8000-000000000001"
+PROJECT_ID = "00000000-0000-4000-8000-000000000002"
+ACCOUNT_ID = "00000000-0000-4000-8000-000000000003"
+SANDBOX_ID = "bench-sandbox"
+
+_PRIMARY_KEYS = {"messages": "message_id", "threads": "thread_id", "projects": "project_id"}
+
+
+class MemorySupabase:
+    """The subset of the async Supabase client the agent loop uses, over dicts.
+
+    Rows go in and come out JSON round-tripped, like through PostgREST.
+    """
+
+    def __init__(self, tables: Dict[str, List[dict]], latency: float = 0.0):
+        self.tables = {name: [json.loads(json.dumps(row)) for row in rows] for name, rows in tables.items()}
+        self.latency = latency
+        self.round_trips = Counter()
+        self._ids = 0
+        self._clock = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def table(self, name: str) -> "_Query":
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> "_Query":
+        return _Query(self, name, operation="rpc")
+
+    def _new_row(self, table: str, values: dict) -> dict:
+        self._ids += 1
+        self._clock += timedelta(milliseconds=1)
+        row = {"created_at": self._clock.isoformat(), "updated_at": self._clock.isoformat()}
+        row[_PRIMARY_KEYS.get(table, "id")] = str(uuid.UUID(int=self._ids))
+        row.update(json.loads(json.dumps(values)))
+        return row
+
+
+class _Query:
+    def __init__(self, db: MemorySupabase, table: str, operation: str = "select"):
+        self.db = db
+        self.table = table
+        self.operation = operation
+        self.values: Any = None
+        self.filters = []
+        self.ordering = []
+        self.bounds = (0, None)
+        self.single_row = False
+
+    def select(self, *columns, **kwargs):
+        return self
+
+    def insert(self, values, **kwargs):
+        self.operation, self.values = "insert", values
+        return self
+
+    def upsert(self, values, **kwargs):
+        self.operation, self.values = "upsert", values
+        return self
+
+    def update(self, values, **kwargs):
+        self.operation, self.values = "update", values
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    def _filter(self, column, predicate):
+        self.filters.append(lambda row: predicate(row.get(column)))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def in_(self, column, values):
+        return self._filter(column, lambda v: v in values)
+
+    def is_(self, column, value):
+        return self._filter(column, lambda v: v is None if value in (None, "null") else v == value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def order(self, column, desc=False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self.bounds = (self.bounds[0], self.bounds[0] + count)
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.bounds = (start, end + 1)
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    maybe_single = single
+
+    def _matching(self) -> List[dict]:
+        return [row for row in self.db.tables.setdefault(self.table, [])
+                if all(check(row) for check in self.filters)]
+
+    def _run(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.operation == "rpc":
+            return None
+        if self.operation in ("insert", "upsert"):
+            values = self.values if isinstance(self.values, list) else [self.values]
+            created = [self.db._new_row(self.table, value) for value in values]
+            rows.extend(created)
+            return created
+        matching = self._matching()
+        if self.operation == "update":
+            for row in matching:
+                row.update(json.loads(json.dumps(self.values)))
+            return matching
+        if self.operation == "delete":
+            self.db.tables[self.table] = [row for row in rows if row not in matching]
+            return matching
+        for column, desc in reversed(self.ordering):
+            matching.sort(key=lambda row: row.get(column) or "", reverse=desc)
+        start, end = self.bounds
+        return matching[start:end]
+
+    async def execute(self):
+        self.db.round_trips[f"{self.table}.{self.operation}"] += 1
+        if self.db.latency:
+            await asyncio.sleep(self.db.latency)
+        data = json.loads(json.dumps(self._run()))
+        if self.single_row:
+            data = data[0] if data else None
+        return SimpleNamespace(data=data, count=None)
+
+
+class MemoryRedis:
+    """In-memory stand-in for the Redis client; counts every command."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.values: Dict[str, Any] = {}
+        self.ops = Counter()
+
+    async def _op(self, name: str) -> None:
+        self.ops[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get(self, key):
+        await self._op("get")
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False, **kwargs):
+        await self._op("set")
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def delete(self, *keys):
+        await self._op("delete")
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    async def expire(self, key, seconds):
+        await self._op("expire")
+        return key in self.values
+
+    async def publish(self, channel, message):
+        await self._op("publish")
+        return 0
+
+    async def rpush(self, key, *values):
+        await self._op("rpush")
+        self.values.setdefault(key, []).extend(values)
+        return len(self.values[key])
+
+    async def lrange(self, key, start, end):
+        await self._op("lrange")
+        values = self.values.get(key, [])
+        return values[start:None if end == -1 else end + 1]
+
+    async def zadd(self, key, mapping, **kwargs):
+        await self._op("zadd")
+        self.values.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def keys(self, pattern):
+        await self._op("keys")
+        return [key for key in self.values if pattern == "*" or key.startswith(pattern.rstrip("*"))]
+
+
+class MemorySandbox:
+    """A sandbox whose filesystem is a dict; counts filesystem and process calls."""
+
+    def __init__(self, files: Optional[Dict[str, str]] = None):
+        self.id = SANDBOX_ID
+        self.files = {f"/workspace/{path}": content.encode() for path, content in (files or {}).items()}
+        self.ops = Counter()
+        self.fs = SimpleNamespace(
+            get_file_info=self._get_file_info, list_files=self._list_files, download_file=self._download_file,
+            upload_file=self._upload_file, create_folder=self._noop("create_folder"),
+            set_file_permissions=self._noop("set_file_permissions"), delete_file=self._delete_file,
+        )
+        self.process = SimpleNamespace(exec=self._exec)
+
+    def _noop(self, name):
+        async def call(*args, **kwargs):
+            self.ops[name] += 1
+        return call
+
+    async def _get_file_info(self, path):
+        self.ops["get_file_info"] += 1
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        return SimpleNamespace(name=path.rsplit("/", 1)[-1], is_dir=False, size=len(self.files[path]))
+
+    async def _list_files(self, path):
+        self.ops["list_files"] += 1
+        prefix = path.rstrip("/") + "/"
+        return [SimpleNamespace(name=name[len(prefix):], is_dir=False, size=len(data))
+                for name, data in self.files.items() if name.startswith(prefix) and "/" not in name[len(prefix):]]
+
+    async def _download_file(self, path):
+        self.ops["download_file"] += 1
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        return self.files[path]
+
+    async def _upload_file(self, data, path):
+        self.ops["upload_file"] += 1
+        self.files[path] = data
+
+    async def _delete_file(self, path):
+        self.ops["delete_file"] += 1
+        self.files.pop(path, None)
+
+    async def _exec(self, command, *args, **kwargs):
+        self.ops["exec"] += 1
+        return SimpleNamespace(exit_code=0, result="")
+
+    async def get_preview_link(self, port):
+        self.ops["get_preview_link"] += 1
+        return SimpleNamespace(url=f"https://{port}-{SANDBOX_ID}.example", token="bench")
+
+
+class NullTrace:
+    """Langfuse trace/generation/span stand-in."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+
+@dataclass
+class LLMCall:
+    started: float
+    prompt_messages: int
+    first_chunk: Optional[float] = None
+    last_chunk: Optional[float] = None
+    # Recorded offset of the last chunk consumed, seconds (already scaled)
+    scripted: float = 0.0
+
+
+@dataclass
+class ScriptedLLM:
+    """make_llm_api_call replaying a recording's turns, one per call, at their recorded offsets."""
+
+    turns: List[dict]
+    model: str
+    time_scale: float = 1.0
+    calls: List[LLMCall] = field(default_factory=list)
+
+    async def __call__(self, messages, model_name, **kwargs):
+        if len(self.calls) >= len(self.turns):
+            raise LLMError(f"Recording has no turn for LLM call {len(self.calls) + 1}")
+        call = LLMCall(started=time.perf_counter(), prompt_messages=len(messages))
+        self.calls.append(call)
+        return self._stream(call, self.turns[len(self.calls) - 1])
+
+    def _chunk(self, recorded, finish_reason=None, usage=None) -> ModelResponseStream:
+        if isinstance(recorded, dict):
+            delta = Delta(content=None, tool_calls=[{
+                "index": recorded.get("index", 0), "id": recorded.get("id"), "type": "function",
+                "function": {"name": recorded.get("name"), "arguments": recorded.get("arguments", "")},
+            }])
+        else:
+            delta = Delta(content=recorded)
+        extra = {"usage": Usage(**usage)} if usage else {}
+        return ModelResponseStream(
+            model=self.model, choices=[StreamingChoices(delta=delta, finish_reason=finish_reason)], **extra,
+        )
+
+    async def _stream(self, call: LLMCall, turn: dict):
+        chunks = turn["chunks"]
+        for n, (offset_ms, recorded) in enumerate(chunks):
+            due = call.started + offset_ms / 1000 * self.time_scale
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            last = n == len(chunks) - 1
+            chunk = self._chunk(recorded, turn.get("finish_reason", "stop") if last else None,
+                                turn.get("usage") if last else None)
+            call.last_chunk = time.perf_counter()
+            call.first_chunk = call.first_chunk or call.last_chunk
+            call.scripted = offset_ms / 1000 * self.time_scale
+            yield chunk
+
+
+def load_recording(name_or_path: str) -> dict:
+    path = Path(name_or_path)
+    if not path.suffix:
+        path = RECORDINGS_DIR / f"{name_or_path}.json"
+    with open(path) as f:
+        return json.load(f)
+
+
+def seed_tables(recording: dict) -> Dict[str, List[dict]]:
+    user_message = {"role": "user", "content": recording["user_message"]}
+    return {
+        "threads": [{"thread_id": THREAD_ID, "project_id": PROJECT_ID, "account_id": ACCOUNT_ID}],
+        "projects": [{"project_id": PROJECT_ID, "account_id": ACCOUNT_ID, "name": recording["name"],
+                      "sandbox": {"id": SANDBOX_ID, "pass": "bench", "sandbox_url": None, "vnc_preview": None}}],
+        "messages": [{"message_id": str(uuid.uuid4()), "thread_id": THREAD_ID, "type": "user",
+                      "is_llm_message": True, "content": user_message, "metadata": {},
+                      "created_at": "2025-01-01T00:00:00+00:00"}],
+    }
+
+
+@contextlib.contextmanager
+def fake_services(db: MemorySupabase, memory_redis: MemoryRedis, sandbox: MemorySandbox, llm: ScriptedLLM):
+    async def db_client(self):
+        return db
+
+    async def redis_client():
+        return memory_redis
+
+    async def get_or_start_sandbox(sandbox_id):
+        return sandbox
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(DBConnection, "client", property(db_client)))
+        stack.enter_context(mock.patch.object(redis, "get_client", redis_client))
+        stack.enter_context(mock.patch.object(cache, "get_client", redis_client))
+        stack.enter_context(mock.patch.object(tool_base, "get_or_start_sandbox", get_or_start_sandbox))
+        stack.enter_context(mock.patch.object(thread_manager_module, "make_llm_api_call", llm))
+        # Tools that validate API keys in __init__ need something to validate
+        for key in ("TAVILY_API_KEY", "FIRECRAWL_API_KEY", "SERPER_API_KEY"):
+            if not getattr(config, key, None):
+                stack.enter_context(mock.patch.object(config, key, "bench"))
+        yield
+
+
+async def replay(recording: dict, memory_redis: MemoryRedis, time_scale: float = 1.0,
+                 db_latency: float = 0.0) -> Dict[str, Any]:
+    """Run the agent loop once over `recording`; returns the measurements of the run."""
+    db = MemorySupabase(seed_tables(recording), latency=db_latency)
+    sandbox = MemorySandbox(recording.get("files"))
+    llm = ScriptedLLM(recording["turns"], recording["model"], time_scale)
+    memory_redis.ops.clear()
+    errors = []
+    first_token = None
+    responses = 0
+
+    with fake_services(db, memory_redis, sandbox, llm):
+        started = time.perf_counter()
+        async for chunk in run_agent(THREAD_ID, PROJECT_ID, model_name=recording["model"], trace=NullTrace(),
+                                     agent_run_id=f"bench-{uuid.uuid4()}"):
+            responses += 1
+            if first_token is None and chunk.get("type") == "assistant":
+                first_token = time.perf_counter()
+            content = chunk.get("content")
+            if chunk.get("type") == "status" and (chunk.get("status") == "error" or '"status_type": "error"' in str(content)):
+                errors.append(chunk.get("message") or content)
+        finished = time.perf_counter()
+
+    calls = llm.calls
+    overheads = []
+    for n, call in enumerate(calls):
+        # Until the next call starts (or the run ends), minus the recorded stream
+        until = calls[n + 1].started if n + 1 < len(calls) else finished
+        overheads.append((until - call.started - call.scripted) * 1000)
+    first_offset = recording["turns"][0]["chunks"][0][0] * time_scale if recording["turns"] else 0
+    ttft = (first_token - started) * 1000 if first_token else None
+    return {
+        "errors": errors,
+        "llm_calls": len(calls),
+        "responses": responses,
+        "prompt_messages": [call.prompt_messages for call in calls],
+        "messages_saved": sum(1 for row in db.tables["messages"] if row["thread_id"] == THREAD_ID) - 1,
+        "wall_ms": (finished - started) * 1000,
+        "setup_ms": (calls[0].started - started) * 1000 if calls else None,
+        "ttft_ms": ttft,
+        "ttft_overhead_ms": ttft - first_offset if ttft is not None else None,
+        "iteration_overhead_ms": statistics.mean(overheads) if overheads else None,
+        "db_round_trips": dict(db.round_trips),
+        "redis_ops": dict(memory_redis.ops),
+        "sandbox_ops": dict(sandbox.ops),
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _median(runs: List[dict], key: str) -> Optional[float]:
+    values = [run[key] for run in runs if run[key] is not None]
+    return round(statistics.median(values), 2) if values else None
+
+
+def _counts(counter: dict) -> dict:
+    return {"total": sum(counter.values()), "by_operation": dict(sorted(counter.items()))}
+
+
+async def replay_recording(recording: dict, repeat: int, time_scale: float, db_latency: float,
+                           redis_latency: float) -> Dict[str, Any]:
+    """Warm-up replay, then `repeat` measured replays; one report entry."""
+    memory_redis = MemoryRedis(latency=redis_latency)
+    await replay(recording, memory_redis, time_scale, db_latency)
+    runs = [await replay(recording, memory_redis, time_scale, db_latency) for _ in range(repeat)]
+    last = runs[-1]
+    llm_calls = last["llm_calls"]
+    return {
+        "turns": len(recording["turns"]),
+        "llm_calls": llm_calls,
+        "responses": last["responses"],
+        "errors": sorted({str(error) for run in runs for error in run["errors"]}),
+        "prompt_messages": last["prompt_messages"],
+        "messages_saved": last["messages_saved"],
+        "wall_ms": _median(runs, "wall_ms"),
+        "setup_ms": _median(runs, "setup_ms"),
+        "ttft_ms": _median(runs, "ttft_ms"),
+        "ttft_overhead_ms": _median(runs, "ttft_overhead_ms"),
+        "iteration_overhead_ms": _median(runs, "iteration_overhead_ms"),
+        "db_round_trips": {**_counts(last["db_round_trips"]),
+                           "per_llm_call": round(sum(last["db_round_trips"].values()) / max(llm_calls, 1), 2)},
+        "redis_ops": _counts(last["redis_ops"]),
+        "sandbox_ops": _counts(last["sandbox_ops"]),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=backend_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(recordings: List[dict], repeat: int = 5, time_scale: float = 1.0, db_latency: float = 0.0,
+              redis_latency: float = 0.0) -> Dict[str, Any]:
+    results = {}
+    for recording in recordings:
+        results[recording["name"]] = await replay_recording(recording, repeat, time_scale, db_latency, redis_latency)
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {"repeat": repeat, "time_scale": time_scale, "db_latency_ms": db_latency * 1000,
+                     "redis_latency_ms": redis_latency * 1000},
+        "recordings": results,
+    }
+
+
+SUMMARY_METRICS = [
+    ("wall_ms", "wall"), ("ttft_ms", "ttft"), ("ttft_overhead_ms", "ttft ovh"), ("setup_ms", "setup"),
+    ("iteration_overhead_ms", "iter ovh"), ("db_round_trips.total", "db"), ("redis_ops.total", "redis"),
+    ("peak_rss_mb", "rss MB"),
+]
+
+
+def _metric(result: dict, path: str):
+    for key in path.split("."):
+        result = (result or {}).get(key)
+    return result
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    print(f"{'recording':<18} {'calls':>5} " + " ".join(f"{label:>9}" for _, label in SUMMARY_METRICS))
+    for name, result in report["recordings"].items():
+        values = [_metric(result, path) for path, _ in SUMMARY_METRICS]
+        print(f"{name:<18} {result['llm_calls']:>5} " + " ".join(
+            f"{'-' if v is None else round(v, 1):>9}" for v in values))
+        old = (baseline or {}).get("recordings", {}).get(name)
+        if old:
+            deltas = []
+            for path, _ in SUMMARY_METRICS:
+                before, after = _metric(old, path), _metric(result, path)
+                if before is None or after is None:
+                    deltas.append(f"{'-':>9}")
+                else:
+                    deltas.append(f"{after - before:>+9.1f}")
+            print(f"{'  vs ' + str(baseline.get('commit')):<18} {'':>5} " + " ".join(deltas))
+        for error in result["errors"]:
+            print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded conversations through the agent loop")
+    parser.add_argument("recordings", nargs="*", help="Recording names or JSON paths (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Measured replays per recording")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiplier for recorded chunk offsets; 0 streams without waiting")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Added per Supabase request")
+    parser.add_argument("--redis-latency-ms", type=float, default=0.0, help="Added per Redis command")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    names = args.recordings or sorted(path.stem for path in RECORDINGS_DIR.glob("*.json"))
+    report = asyncio.run(run([load_recording(name) for name in names], args.repeat, args.time_scale,
+                             args.db_latency_ms / 1000, args.redis_latency_ms / 1000))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Context compression and cache breakpoint planning on long synthetic threads.
+
+Builds a synthetic thread of N messages (user/assistant/tool, mixed sizes)
+and compares the previous implementations with core.agentpress.token_budget:
+
+    omit    drop middle messages until the thread fits half its size
+              legacy: remove 10 messages, token_counter() the whole list, repeat
+              planner: per-message costs once, binary search over prefix sums
+    cache   Anthropic caching strategy over successive turns (2 messages/turn)
+              legacy: merge messages into "[Conversation Chunk k]" blocks
+              planner: cache_control on messages at stable token boundaries
+            and reports, per turn, how much of the prompt could be read from the
+            previous turn's cache (longest cached prefix that is unchanged).
+
+Usage:
+    python -m benchmarks.context_budget [--messages N] [--turns N]
+
+Examples:
+    # Default: 1000-message thread, 25 turns
+    python -m benchmarks.context_budget
+
+    # Longer simulation
+    python -m benchmarks.context_budget --messages 2000 --turns 50
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+os.environ.setdefault("LOGGING_LEVEL", "ERROR")
+
+from litellm.utils import token_counter
+
+from core.agentpress import token_budget
+from core.agentpress.context_manager import ContextManager
+from core.agentpress.prompt_caching import (
+    add_cache_control,
+    apply_anthropic_caching_strategy,
+    calculate_optimal_cache_threshold,
+    get_message_token_count,
+)
+
+MODEL = "anthropic/claude-sonnet-4-20250514"
+CONTEXT_WINDOW = 200_000
+SYSTEM_PROMPT = {"role": "system", "content": "You are a helpful agent. " * 600}
+
+
+def make_thread(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    messages = []
+    for i in range(n):
+        kind = i % 3
+        words = " ".join(f"w{rng.randint(0, 4999)}" for _ in range(rng.choice([5, 20, 50, 100])))
+        if kind == 0:
+            messages.append({"role": "user", "content": f"[{i}] {words}", "message_id": f"m{i}"})
+        elif kind == 1:
+            messages.append({"role": "assistant", "content": f"[{i}] {words}", "message_id": f"m{i}"})
+        else:
+            messages.append({"role": "user", "content": json.dumps({"tool_execution": {"result": words}}), "message_id": f"m{i}"})
+    return messages
+
+
+# ---------------------------------------------------------------------------
+# Previous implementations
+# ---------------------------------------------------------------------------
+
+def legacy_omit(messages: list, max_tokens: int) -> list:
+    result = messages
+    current = token_counter(model=MODEL, messages=result)
+    safety_limit = 500
+    while current > max_tokens and safety_limit > 0 and len(result) > 10:
+        safety_limit -= 1
+        if len(result) > 20:
+            start = len(result) // 2 - 5
+            result = result[:start] + result[start + 10:]
+        else:
+            result = result[min(10, len(result) // 2):]
+        current = token_counter(model=MODEL, messages=result)
+    return result
+
+
+def legacy_cache(messages: list) -> list:
+    threshold = calculate_optimal_cache_threshold(
+        CONTEXT_WINDOW, len(messages), sum(get_message_token_count(m, MODEL) for m in messages))
+    prepared = [add_cache_control(SYSTEM_PROMPT)]
+    max_blocks, created, chunk, chunk_tokens = 3, 0, [], 0
+    for i, message in enumerate(messages):
+        tokens = get_message_token_count(message, MODEL)
+        if chunk_tokens + tokens > threshold and chunk:
+            if created < max_blocks:
+                text = legacy_format(chunk)
+                prepared.append({"role": "user", "content": [{
+                    "type": "text", "text": f"[Conversation Chunk {created + 1}]\n{text}",
+                    "cache_control": {"type": "ephemeral"}}]})
+                created += 1
+                chunk, chunk_tokens = [], 0
+            else:
+                prepared.extend(chunk)
+                prepared.extend(messages[i:])
+                return prepared
+        chunk.append(message)
+        chunk_tokens += tokens
+    prepared.extend(chunk)
+    return prepared
+
+
+def legacy_format(messages: list) -> str:
+    return "\n\n".join(f"{m['role'].title()}: {str(m['content']).strip()}" for m in messages)
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def _strip(message: dict) -> str:
+    content = message["content"]
+    if isinstance(content, list):
+        content = [{k: v for k, v in block.items() if k != "cache_control"} for block in content]
+        if len(content) == 1 and content[0].get("type") == "text":
+            content = content[0]["text"]
+    return json.dumps({**message, "content": content}, sort_keys=True)
+
+
+def _breakpoints(prepared: list) -> list:
+    return [i for i, m in enumerate(prepared)
+            if isinstance(m["content"], list) and any("cache_control" in b for b in m["content"])]
+
+
+def cached_read_tokens(previous: list, current: list) -> int:
+    """Tokens of the longest previously cached prefix that is unchanged this turn."""
+    best = 0
+    for position in _breakpoints(previous):
+        if len(current) > position and all(_strip(a) == _strip(b) for a, b in zip(previous[:position + 1], current[:position + 1])):
+            best = max(best, token_budget.count_tokens(previous[:position + 1], MODEL))
+    return best
+
+
+def bench_omit(thread: list) -> None:
+    limit = token_counter(model=MODEL, messages=thread) // 2
+    manager = ContextManager()
+
+    started = time.perf_counter()
+    legacy = legacy_omit(thread, limit)
+    legacy_s = time.perf_counter() - started
+
+    token_budget._token_costs.clear()
+    started = time.perf_counter()
+    planned = manager.compress_messages_by_omitting_messages(thread, MODEL, max_tokens=limit)
+    cold_s = time.perf_counter() - started
+    started = time.perf_counter()
+    manager.compress_messages_by_omitting_messages(thread, MODEL, max_tokens=limit)
+    warm_s = time.perf_counter() - started
+
+    print(f"omit   legacy  {legacy_s * 1000:8.1f}ms  kept={len(legacy)}")
+    print(f"omit   planner {cold_s * 1000:8.1f}ms  kept={len(planned)}  (warm turn {warm_s * 1000:.1f}ms)")
+
+
+def bench_cache(thread: list, turns: int) -> None:
+    start = len(thread) - 2 * turns
+    for label, strategy in (("legacy", legacy_cache), ("planner", None)):
+        token_budget._token_costs.clear()
+        timings, read_ratio, previous = [], [], None
+        for n in range(start, len(thread) + 1, 2):
+            messages = thread[:n]
+            started = time.perf_counter()
+            if strategy is None:
+                prepared = apply_anthropic_caching_strategy(SYSTEM_PROMPT, messages, MODEL, context_window_tokens=CONTEXT_WINDOW)
+            else:
+                prepared = strategy(messages)
+            timings.append((time.perf_counter() - started) * 1000)
+            if previous is not None:
+                total = token_budget.count_tokens(prepared, MODEL)
+                read_ratio.append(cached_read_tokens(previous, prepared) / total)
+            previous = prepared
+        print(f"cache  {label:<7} p50={statistics.median(timings):7.1f}ms/turn  "
+              f"cache read={statistics.mean(read_ratio) * 100:5.1f}% of prompt  "
+              f"breakpoints={len(_breakpoints(previous))}")
+
+
+def main(messages: int, turns: int) -> None:
+    thread = make_thread(messages)
+    print(f"Thread: {messages} messages, {token_counter(model=MODEL, messages=thread)} tokens")
+    bench_omit(thread)
+    bench_cache(thread, turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark context budget planning")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=25)
+    args = parser.parse_args()
+
+    main(args.messages, args.turns)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Concurrent request latency while a large PDF is being extracted.
+
+Generates an N-page PDF (reportlab), then extracts it while a stream of small
+simulated requests (a few ms of async work each) runs on the same event loop.
+Reports extraction time and request latency percentiles for:
+
+    inline   previous behaviour: PyPDF2 on the event loop
+    pool     core.services.document_extraction process pool, page batches
+
+Usage:
+    python -m benchmarks.document_extraction [--pages N] [--rps N]
+
+Examples:
+    # Default: 500-page PDF, 200 requests/s
+    python -m benchmarks.document_extraction
+
+    # Heavier pages
+    python -m benchmarks.document_extraction --pages 500 --lines 60
+"""
+
+import argparse
+import asyncio
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.services.document_extraction import DocumentExtractionService
+
+
+def make_pdf(pages: int, lines: int) -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(pages):
+        for line in range(lines):
+            pdf.drawString(40, 800 - line * 12, f"Page {page + 1} line {line + 1}: lorem ipsum dolor sit amet consectetur")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def extract_inline(data: bytes) -> str:
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return '\n\n'.join(page.extract_text() for page in reader.pages)
+
+
+async def _requests(stop: asyncio.Event, rps: int, latencies: list) -> None:
+    """Fire requests on a fixed schedule; latency counts from the scheduled start."""
+
+    async def one_request(scheduled: float):
+        await asyncio.sleep(0.002)
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+
+    tasks = []
+    started = time.perf_counter()
+    i = 0
+    while not stop.is_set():
+        scheduled = started + i / rps
+        tasks.append(asyncio.create_task(one_request(scheduled)))
+        i += 1
+        await asyncio.sleep(max(0.0, started + i / rps - time.perf_counter()))
+    await asyncio.gather(*tasks)
+
+
+def _report(label: str, elapsed: float, chars: int, latencies: list) -> None:
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if len(latencies) >= 100 else latencies[-1]
+    print(f"{label:<7} extract={elapsed:6.2f}s chars={chars:>9}  requests={len(latencies):>5}  "
+          f"p50={p50:7.1f}ms  p99={p99:8.1f}ms  max={latencies[-1]:8.1f}ms")
+
+
+async def _run(label: str, extract, rps: int) -> None:
+    stop = asyncio.Event()
+    latencies: list = []
+    load = asyncio.create_task(_requests(stop, rps, latencies))
+    await asyncio.sleep(0.2)
+    started = time.perf_counter()
+    text = await extract()
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.2)
+    stop.set()
+    await load
+    _report(label, elapsed, len(text), latencies)
+
+
+async def main(pages: int, lines: int, rps: int) -> None:
+    print(f"Generating {pages}-page PDF...")
+    data = make_pdf(pages, lines)
+    print(f"PDF size: {len(data) / 1024 / 1024:.1f} MiB")
+
+    async def inline():
+        return extract_inline(data)
+
+    service = DocumentExtractionService(time_limit=300)
+    # Warm the pool so process spawn time is not counted
+    await service.run(len, b"")
+
+    async def pooled():
+        return await service.extract_text(data, "bench.pdf", "application/pdf")
+
+    try:
+        await _run("inline", inline, rps)
+        await _run("pool", pooled, rps)
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark request latency during PDF extraction")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=30, help="Text lines per page")
+    parser.add_argument("--rps", type=int, default=200, help="Simulated requests per second")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.pages, args.lines, args.rps))
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Finance summary benchmark: full-scan aggregation vs materialized balances.
+
+Seeds a throwaway finance account with N transactions in a local Supabase
+instance, then times the legacy path (page through every transaction and sum
+in Python) against the materialized read of finance_accounts.current_balance
+and the on-demand reconcile RPC. The seeded finance account is deleted at the
+end (transactions cascade).
+
+Requires a local Supabase started with the migrations applied and an existing
+Basejump account / auth user pair to own the seeded rows.
+
+Usage:
+    python -m benchmarks.finance_balances --account-id <uuid> --user-id <uuid>
+
+Examples:
+    # Default run with 100k transactions
+    python -m benchmarks.finance_balances --account-id ... --user-id ...
+
+    # Smaller run, 20 timed iterations per path
+    python -m benchmarks.finance_balances --account-id ... --user-id ... --transactions 10000 --iterations 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.services.supabase import DBConnection
+from core.finance import _load_finance_accounts, _to_float
+
+PAGE_SIZE = 1000
+
+
+async def _seed(client, account_id: str, user_id: str, transactions: int) -> str:
+    account = await client.table('finance_accounts').insert({
+        "account_id": account_id,
+        "created_by": user_id,
+        "name": "Benchmark",
+        "account_type": "OTHER",
+        "currency": "BRL",
+        "opening_balance": 1000,
+    }).execute()
+    finance_account_id = account.data[0]['id']
+
+    rng = random.Random(42)
+    for offset in range(0, transactions, PAGE_SIZE):
+        batch = [
+            {
+                "account_id": account_id,
+                "finance_account_id": finance_account_id,
+                "created_by": user_id,
+                "type": rng.choice(('INCOME', 'EXPENSE')),
+                "amount": round(rng.uniform(1, 500), 2),
+                "description": f"bench-{offset + i}",
+            }
+            for i in range(min(PAGE_SIZE, transactions - offset))
+        ]
+        await client.table('finance_transactions').insert(batch).execute()
+    return finance_account_id
+
+
+async def _legacy_balances(client, account_id: str) -> Dict[str, float]:
+    """Previous behaviour: read every transaction row and sum in Python."""
+    totals: Dict[str, float] = {}
+    accounts = await client.table('finance_accounts').select('*').eq('account_id', account_id).execute()
+    for acc in accounts.data or []:
+        totals[acc['id']] = _to_float(acc.get('opening_balance'))
+
+    start = 0
+    while True:
+        page = await client.table('finance_transactions') \
+            .select('finance_account_id, type, amount') \
+            .eq('account_id', account_id) \
+            .order('id') \
+            .range(start, start + PAGE_SIZE - 1) \
+            .execute()
+        rows = page.data or []
+        for row in rows:
+            amount = _to_float(row.get('amount'))
+            fa_id = row.get('finance_account_id')
+            totals[fa_id] = totals.get(fa_id, 0.0) + (amount if row.get('type') == 'INCOME' else -amount)
+        if len(rows) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+    return totals
+
+
+async def _time(label: str, iterations: int, fn) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<22} p50={statistics.median(samples):9.2f}ms  max={max(samples):9.2f}ms")
+    return samples
+
+
+async def main(account_id: str, user_id: str, transactions: int, iterations: int) -> None:
+    db = DBConnection()
+    await db.initialize()
+    client = await db.client
+
+    print(f"Seeding {transactions} transactions...")
+    started = time.perf_counter()
+    finance_account_id = await _seed(client, account_id, user_id, transactions)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s (includes balance trigger cost)")
+
+    try:
+        legacy = await _legacy_balances(client, account_id)
+        materialized = {a.id: a.balance for a in await _load_finance_accounts(client, account_id, user_id)}
+        mismatched = [k for k in legacy if abs(legacy[k] - materialized.get(k, 0.0)) > 0.005]
+        print(f"Balances match: {not mismatched}")
+
+        await _time("legacy full scan", iterations, lambda: _legacy_balances(client, account_id))
+        await _time("materialized read", iterations, lambda: _load_finance_accounts(client, account_id, user_id))
+        await _time("reconcile rpc", max(1, iterations // 5), lambda: client.rpc(
+            'finance_reconcile_account_balances', {'p_account_id': account_id}
+        ).execute())
+    finally:
+        await client.table('finance_accounts').delete().eq('id', finance_account_id).execute()
+        await DBConnection.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark finance summary balance reads")
+    parser.add_argument("--account-id", required=True, help="Existing basejump account id")
+    parser.add_argument("--user-id", required=True, help="Existing auth user id (member of the account)")
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.account_id, args.user_id, args.transactions, args.iterations))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Logging overhead benchmark for the agent loop hot path.
+
+Replays a synthetic agent turn (LLM params debug line, one event per streamed
+chunk, per-tool execution logs with arguments and results) under three
+configurations and reports time per turn and the worst event-loop stall seen
+by a 1ms ticker task:
+
+    off       logging filtered out below CRITICAL
+    legacy    previous setup: CallsiteParameterAdder on every event, JSON
+              rendered and written synchronously, eager f-strings
+    pipeline  core.utils.logger: sampling, lazy values, callsite only for
+              warnings, rendering and I/O on the writer thread
+
+Output goes to /dev/null so the numbers measure logging cost, not the terminal.
+
+Usage:
+    python -m benchmarks.logging_overhead [--turns N] [--chunks N] [--tools N]
+
+Examples:
+    # Default: 50 turns of 2000 chunks and 5 tool calls
+    python -m benchmarks.logging_overhead
+
+    # Longer streams
+    python -m benchmarks.logging_overhead --turns 20 --chunks 10000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import structlog
+
+from core.utils.logger import LogSampler, QueueLogger, QueueLogWriter, caller_processors, lazy, DEFAULT_SAMPLING
+
+PARAMS = {
+    "model": "anthropic/claude-sonnet-4",
+    "messages": [{"role": "user", "content": "x" * 2000} for _ in range(40)],
+    "tools": [{"type": "function", "function": {"name": f"tool_{i}", "parameters": {}}} for i in range(60)],
+    "temperature": 0,
+    "stream": True,
+}
+TOOL_ARGS = {"path": "/workspace/src/app.py", "content": "print('hello')\n" * 200}
+TOOL_RESULT = {"success": True, "output": "ok\n" * 500}
+
+
+def _legacy_logger(stream, level):
+    return structlog.wrap_logger(
+        structlog.PrintLogger(stream),
+        processors=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.dict_tracebacks,
+            structlog.processors.CallsiteParameterAdder(
+                {
+                    structlog.processors.CallsiteParameter.FILENAME,
+                    structlog.processors.CallsiteParameter.FUNC_NAME,
+                    structlog.processors.CallsiteParameter.LINENO,
+                }
+            ),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.contextvars.merge_contextvars,
+            structlog.processors.JSONRenderer(),
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+    )
+
+
+def _pipeline_logger(stream, level):
+    writer = QueueLogWriter(structlog.processors.JSONRenderer(), stream=stream)
+    log = structlog.wrap_logger(
+        QueueLogger(writer),
+        processors=caller_processors(LogSampler(DEFAULT_SAMPLING)),
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+    )
+    return log, writer
+
+
+async def _legacy_turn(log, chunks: int, tools: int) -> None:
+    log.info(f"Making LLM API call to model: {PARAMS['model']} with {len(PARAMS['messages'])} messages")
+    log.debug(f"Complete LiteLLM parameters: {PARAMS}")
+    for i in range(chunks):
+        log.debug(f"Processing chunk #{i}, type=ModelResponseStream")
+        if i % 64 == 0:
+            await asyncio.sleep(0)
+    for _ in range(tools):
+        log.debug(f"🔧 EXECUTING TOOL: edit_file")
+        log.debug(f"📝 RAW ARGUMENTS VALUE: {TOOL_ARGS}")
+        log.debug(f"📤 Result: {TOOL_RESULT}")
+        await asyncio.sleep(0)
+    log.info(f"Stream complete. Total chunks: {chunks}")
+
+
+async def _pipeline_turn(log, chunks: int, tools: int) -> None:
+    stream_log = log.bind(logger="agentpress.stream")
+    tool_log = log.bind(logger="agentpress.tools")
+    log.info(f"Making LLM API call to model: {PARAMS['model']} with {len(PARAMS['messages'])} messages")
+    log.debug("LiteLLM parameters: %s", lazy(lambda: {k: v for k, v in PARAMS.items() if k not in ("messages", "tools")}))
+    for i in range(chunks):
+        stream_log.debug("Processing chunk #%s, type=%s", i, "ModelResponseStream")
+        if i % 64 == 0:
+            await asyncio.sleep(0)
+    for _ in range(tools):
+        tool_log.debug("🔧 EXECUTING TOOL: %s", "edit_file")
+        tool_log.debug("📝 RAW ARGUMENTS VALUE: %s", TOOL_ARGS)
+        tool_log.debug("📤 Result: %s", TOOL_RESULT)
+        await asyncio.sleep(0)
+    log.info(f"Stream complete. Total chunks: {chunks}")
+
+
+async def _measure(label: str, turn, log, turns: int, chunks: int, tools: int) -> None:
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, time.perf_counter() - started - 0.001)
+
+    tick_task = asyncio.create_task(ticker())
+    samples = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        await turn(log, chunks, tools)
+        samples.append((time.perf_counter() - started) * 1000)
+    running = False
+    await tick_task
+    print(f"{label:<10} per turn p50={statistics.median(samples):8.2f}ms  "
+          f"max={max(samples):8.2f}ms  worst loop stall={max_lag * 1000:7.2f}ms")
+
+
+async def main(turns: int, chunks: int, tools: int) -> None:
+    with open(os.devnull, "w") as devnull:
+        print(f"{turns} turns, {chunks} chunks, {tools} tool calls per turn")
+        await _measure("off", _legacy_turn, _legacy_logger(devnull, logging.CRITICAL), turns, chunks, tools)
+        await _measure("legacy", _legacy_turn, _legacy_logger(devnull, logging.DEBUG), turns, chunks, tools)
+
+        log, writer = _pipeline_logger(devnull, logging.DEBUG)
+        await _measure("pipeline", _pipeline_turn, log, turns, chunks, tools)
+        started = time.perf_counter()
+        writer.flush()
+        print(f"pipeline writer drained in {(time.perf_counter() - started) * 1000:.2f}ms, dropped={writer.dropped}")
+        writer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark logging overhead on the agent loop hot path")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--tools", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.turns, args.chunks, args.tools))
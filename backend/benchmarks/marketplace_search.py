@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Marketplace page latency: ILIKE + OFFSET + COUNT vs indexed search RPC.
+
+Seeds N public templates (names, descriptions and tags drawn from a small
+vocabulary, spread over a few hundred creators) for an existing account in a
+local Supabase instance, then times marketplace pages:
+
+    legacy   previous behaviour: name ILIKE, ORDER BY + OFFSET, a separate
+             COUNT query and a basejump.accounts lookup for creator names
+    indexed  TemplateService.search_public_templates: search_vector / trigram
+             indexes, keyset pagination, total in the same call and creator
+             names from CreatorNameCache
+
+Pages measured: the first page of the default listing, a deep page (offset
+vs keyset), a word search and a partial-word search.
+
+Requires a local Supabase started with the migrations applied and an existing
+Basejump account; the seeded creator accounts and templates are deleted at
+the end.
+
+Usage:
+    python -m benchmarks.marketplace_search --account-id <uuid>
+
+Examples:
+    # Default run with 50k templates, 200 timed requests per page
+    python -m benchmarks.marketplace_search --account-id ...
+
+    # Smaller catalogue, fewer requests
+    python -m benchmarks.marketplace_search --account-id ... --templates 5000 --requests 50
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.services.supabase import DBConnection
+from core.templates.template_service import TemplateService
+from core.utils.query_utils import batch_query_in
+
+BATCH_SIZE = 1000
+CREATORS = 200
+PAGE_SIZE = 20
+DEEP_PAGE = 100
+WORDS = ["research", "sales", "support", "marketing", "finance", "legal", "coding", "slack", "notion",
+         "email", "calendar", "writer", "analyst", "recruiter", "assistant", "planner", "scraper", "reports"]
+TAGS = ["productivity", "engineering", "sales", "marketing", "research", "automation", "finance", "hr"]
+
+
+def _row(rng: random.Random, i: int, creator_id: str, published_at: datetime):
+    name = " ".join(rng.sample(WORDS, 2)).title() + f" {i}"
+    return {
+        "template_id": str(uuid.uuid4()), "creator_id": creator_id, "name": name,
+        "description": " ".join(rng.choices(WORDS, k=12)),
+        "config": {"system_prompt": "bench", "tools": {"agentpress": {}, "mcp": [], "custom_mcp": []},
+                   "metadata": {"benchmark": True}},
+        "tags": rng.sample(TAGS, rng.randint(1, 3)), "is_public": True, "is_kortix_team": False,
+        "download_count": int(rng.paretovariate(1.2)), "icon_name": "brain",
+        "icon_color": "#000000", "icon_background": "#F3F4F6",
+        "marketplace_published_at": (published_at + timedelta(seconds=i)).isoformat(),
+        "metadata": {"benchmark": True},
+    }
+
+
+async def _seed(client, account_id: str, templates: int) -> List[str]:
+    rng = random.Random(42)
+    owner = await client.schema('basejump').from_('accounts').select('primary_owner_user_id') \
+        .eq('id', account_id).single().execute()
+    creators = [str(uuid.uuid4()) for _ in range(CREATORS)]
+    await client.schema('basejump').from_('accounts').insert([
+        {"id": creator_id, "name": f"bench creator {n}", "slug": f"bench-creator-{creator_id[:8]}",
+         "personal_account": False, "primary_owner_user_id": owner.data['primary_owner_user_id']}
+        for n, creator_id in enumerate(creators)
+    ]).execute()
+    published_at = datetime.now(timezone.utc) - timedelta(seconds=templates)
+    for offset in range(0, templates, BATCH_SIZE):
+        rows = [_row(rng, i, rng.choice(creators), published_at) for i in range(offset, min(templates, offset + BATCH_SIZE))]
+        await client.table('agent_templates').insert(rows).execute()
+    return creators
+
+
+async def _legacy_page(client, page: int, search: str = None):
+    """Previous behaviour of the marketplace endpoint."""
+    query = client.table('agent_templates').select('*').eq('is_public', True)
+    count_query = client.table('agent_templates').select('*', count='exact').eq('is_public', True)
+    if search:
+        query = query.ilike("name", f"%{search}%")
+        count_query = count_query.ilike("name", f"%{search}%")
+    offset = (page - 1) * PAGE_SIZE
+    result = await query.order('download_count', desc=True).order('marketplace_published_at', desc=True) \
+        .limit(PAGE_SIZE).offset(offset).execute()
+    await batch_query_in(client=client, table_name='accounts', select_fields='id, name, slug', in_field='id',
+                         in_values=list({t['creator_id'] for t in result.data}), schema='basejump')
+    await count_query.limit(1).execute()
+    return result.data
+
+
+async def _time(label: str, requests: int, fn) -> None:
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<34} p50={statistics.median(samples):8.2f}ms  p99={p99:8.2f}ms")
+
+
+async def main(account_id: str, templates: int, requests: int) -> None:
+    db = DBConnection()
+    await db.initialize()
+    client = await db.client
+    service = TemplateService(db)
+
+    print(f"Seeding {templates} templates...")
+    started = time.perf_counter()
+    creators = await _seed(client, account_id, templates)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    try:
+        await client.rpc('search_marketplace_templates', {'p_limit': 1}).execute()
+
+        # Keyset position of the deep page, as a client paging with next_cursor would have
+        deep = await service.search_public_templates(limit=PAGE_SIZE, offset=(DEEP_PAGE - 2) * PAGE_SIZE, with_total=False)
+        after = deep.next_after
+
+        print(f"\n{requests} requests per page, {PAGE_SIZE} templates per page")
+        await _time("legacy   first page", requests, lambda: _legacy_page(client, 1))
+        await _time("indexed  first page", requests, lambda: service.search_public_templates(limit=PAGE_SIZE))
+        await _time(f"legacy   page {DEEP_PAGE} (offset)", requests, lambda: _legacy_page(client, DEEP_PAGE))
+        await _time(f"indexed  page {DEEP_PAGE} (keyset)", requests,
+                    lambda: service.search_public_templates(limit=PAGE_SIZE, after=after, with_total=False))
+        await _time("legacy   search 'notion'", requests, lambda: _legacy_page(client, 1, "notion"))
+        await _time("indexed  search 'notion'", requests,
+                    lambda: service.search_public_templates(search="notion", sort_by="relevance", limit=PAGE_SIZE))
+        await _time("legacy   search 'recrui'", requests, lambda: _legacy_page(client, 1, "recrui"))
+        await _time("indexed  search 'recrui'", requests,
+                    lambda: service.search_public_templates(search="recrui", sort_by="relevance", limit=PAGE_SIZE))
+    finally:
+        # Templates cascade with their creator accounts
+        for offset in range(0, len(creators), 50):
+            await client.schema('basejump').from_('accounts').delete().in_('id', creators[offset:offset + 50]).execute()
+        await DBConnection.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark marketplace template pages")
+    parser.add_argument("--account-id", required=True, help="Existing basejump account whose owner owns the seeded creators")
+    parser.add_argument("--templates", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.account_id, args.templates, args.requests))
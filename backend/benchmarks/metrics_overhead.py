@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+CPU cost of the Prometheus metrics (core.services.metrics) on the agent loop.
+
+Replays the recordings of benchmarks.agent_loop_replay at --time-scale 0 (the
+scripted LLM streams without waiting, so a pass is all loop CPU) and charges
+it with what recording costs, from unit costs measured in the same process:
+
+    observations   histogram observations a pass records inside the loop
+                   (time to first token and stream duration per LLM call,
+                   prompt assembly, context compression, tool execution)
+    chunks         the stream wrapper on every streamed LLM chunk
+    responses      Redis publish lag tracking, per response the worker
+                   streams (outside the replayed loop)
+    db requests    the Supabase request counter (the replay has no HTTP
+                   client to hook)
+
+The total of these over the CPU of a pass with recording off is checked
+against the 1% budget. As a cross-check the passes also run alternately with
+recording on and off; that difference is reported with the run-to-run spread
+of the passes, which at this scale is larger than the cost itself.
+
+Each mode runs in its own process:
+
+    process       samples in process memory (METRICS_ENABLED with one process)
+    multiprocess  PROMETHEUS_MULTIPROC_DIR set, samples written to mmap'd
+                  files as under gunicorn and dramatiq
+
+The loop CPU here leaves out decoding provider HTTP responses, which a real
+run also spends, so the reported share is an upper bound.
+
+Usage:
+    python -m benchmarks.metrics_overhead [RECORDING ...] [--rounds N]
+                                          [--mode {process,multiprocess}]
+
+Examples:
+    # Both modes, 20 alternating rounds over all recordings
+    python -m benchmarks.metrics_overhead
+
+    # Longer, multiprocess mode only
+    python -m benchmarks.metrics_overhead --rounds 50 --mode multiprocess
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+os.environ.setdefault("LOGGING_LEVEL", "ERROR")
+
+from benchmarks.agent_loop_replay import RECORDINGS_DIR, MemoryRedis, load_recording, replay  # noqa: E402
+from core.services import metrics  # noqa: E402
+from prometheus_client import REGISTRY  # noqa: E402
+
+BUDGET = 0.01
+UNIT_ITERATIONS = 20000
+# Unit costs are the best of this many measurements, as with timeit
+UNIT_REPEAT = 7
+
+
+LOOP_HISTOGRAMS = ("suna_llm_time_to_first_token_seconds", "suna_llm_stream_duration_seconds",
+                   "suna_prompt_assembly_seconds", "suna_context_compression_seconds",
+                   "suna_tool_execution_seconds")
+
+
+def _loop_observations() -> float:
+    return sum(sample.value for family in REGISTRY.collect() if family.name in LOOP_HISTOGRAMS
+               for sample in family.samples if sample.name.endswith("_count"))
+
+
+async def _replay_all(recordings: List[dict], memory_redis: MemoryRedis) -> dict:
+    totals = {"responses": 0, "db_round_trips": 0, "llm_calls": 0}
+    for recording in recordings:
+        result = await replay(recording, memory_redis, time_scale=0)
+        if result["errors"]:
+            raise RuntimeError(f"{recording['name']}: {result['errors']}")
+        totals["responses"] += result["responses"]
+        totals["db_round_trips"] += sum(result["db_round_trips"].values())
+        totals["llm_calls"] += result["llm_calls"]
+    return totals
+
+
+def _observe_us() -> float:
+    started = time.process_time()
+    for _ in range(UNIT_ITERATIONS):
+        metrics.observe_tool_execution("benchmark", "success", 0.3)
+    return (time.process_time() - started) / UNIT_ITERATIONS * 1e6
+
+
+async def _chunk_us() -> float:
+    async def stream():
+        for n in range(UNIT_ITERATIONS):
+            yield n
+
+    async def consume(wrap: bool) -> float:
+        started = time.process_time()
+        async for _ in (metrics.timed_stream(stream(), "benchmark", time.monotonic()) if wrap else stream()):
+            pass
+        return time.process_time() - started
+
+    wrapped, plain = await consume(True), await consume(False)
+    return max(wrapped - plain, 0) / UNIT_ITERATIONS * 1e6
+
+
+async def _publish_lag_us() -> float:
+    loop = asyncio.get_running_loop()
+
+    async def produce(track: bool) -> float:
+        started = time.process_time()
+        for _ in range(UNIT_ITERATIONS):
+            stored, published = loop.create_future(), loop.create_future()
+            if track:
+                metrics.track_publish_lag(time.monotonic(), stored, published)
+            stored.set_result(None)
+            published.set_result(None)
+            await asyncio.sleep(0)
+        return time.process_time() - started
+
+    tracked, untracked = await produce(True), await produce(False)
+    return max(tracked - untracked, 0) / UNIT_ITERATIONS * 1e6
+
+
+async def _db_call_us() -> float:
+    calls = metrics.start_run()
+    started = time.process_time()
+    for _ in range(UNIT_ITERATIONS):
+        await metrics._count_db_call(None)
+    elapsed = time.process_time() - started
+    metrics.finish_run(calls, "completed")
+    return elapsed / UNIT_ITERATIONS * 1e6
+
+
+async def measure(names: List[str], rounds: int) -> dict:
+    recordings = [load_recording(name) for name in names]
+    memory_redis = MemoryRedis()
+    # Warm imports, caches and the label children of every metric
+    await _replay_all(recordings, memory_redis)
+    observed = _loop_observations()
+    totals = await _replay_all(recordings, memory_redis)
+    totals["observations"] = _loop_observations() - observed
+    totals["chunks"] = sum(len(turn["chunks"]) for recording in recordings for turn in recording["turns"])
+
+    cpu = {True: [], False: []}
+    for n in range(rounds):
+        for on in ((True, False) if n % 2 == 0 else (False, True)):
+            metrics.enabled = on
+            gc.collect()
+            started = time.process_time()
+            await _replay_all(recordings, memory_redis)
+            cpu[on].append(time.process_time() - started)
+    metrics.enabled = True
+
+    off, on = statistics.median(cpu[False]), statistics.median(cpu[True])
+    quartiles = statistics.quantiles(cpu[False], n=4)
+    unit_us = {
+        "observation": min(_observe_us() for _ in range(UNIT_REPEAT)),
+        "chunk": min([await _chunk_us() for _ in range(UNIT_REPEAT)]),
+        "response": min([await _publish_lag_us() for _ in range(UNIT_REPEAT)]),
+        "db_request": min([await _db_call_us() for _ in range(UNIT_REPEAT)]),
+    }
+    cost_us = {
+        "observation": totals["observations"] * unit_us["observation"],
+        "chunk": totals["chunks"] * unit_us["chunk"],
+        "response": totals["responses"] * unit_us["response"],
+        "db_request": totals["db_round_trips"] * unit_us["db_request"],
+    }
+    return {
+        **totals,
+        "cpu_off_ms": off * 1000,
+        "cpu_on_ms": on * 1000,
+        "measured_overhead": (on - off) / off,
+        "spread": (quartiles[2] - quartiles[0]) / off,
+        "unit_us": unit_us,
+        "cost_us": cost_us,
+        "overhead": sum(cost_us.values()) / 1e6 / off,
+    }
+
+
+def run_mode(mode: str, names: List[str], rounds: int) -> dict:
+    """Run `measure` in a fresh interpreter, with a multiprocess directory for that mode."""
+    env = {**os.environ}
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    with tempfile.TemporaryDirectory() as multiproc_dir:
+        if mode == "multiprocess":
+            env["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.metrics_overhead", *names, "--rounds", str(rounds), "--child"],
+            cwd=backend_dir, env=env, check=True, capture_output=True, text=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_result(mode: str, result: dict) -> None:
+    print(f"{mode:<13} per pass: {result['llm_calls']} LLM calls, {result['cpu_off_ms']:.2f}ms CPU "
+          f"with recording off")
+    counts = {"observation": result["observations"], "chunk": result["chunks"],
+              "response": result["responses"], "db_request": result["db_round_trips"]}
+    for unit, count in counts.items():
+        print(f"{'':<13} {count:>6.0f} x {unit:<12} {result['unit_us'][unit]:6.2f}us "
+              f"= {result['cost_us'][unit] / 1000:6.3f}ms")
+    verdict = "ok" if result["overhead"] < BUDGET else f"over the {BUDGET:.0%} budget"
+    print(f"{'':<13} total {result['overhead']:.2%} of CPU ({verdict})")
+    print(f"{'':<13} on vs off {result['measured_overhead']:+.2%} (spread of passes {result['spread']:.2%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the CPU cost of the Prometheus metrics")
+    parser.add_argument("recordings", nargs="*", help="Recording names or JSON paths (default: all)")
+    parser.add_argument("--rounds", type=int, default=20, help="Passes over the recordings per setting")
+    parser.add_argument("--mode", choices=("process", "multiprocess"), help="Default: both")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    names = args.recordings or sorted(path.stem for path in RECORDINGS_DIR.glob("*.json"))
+    if args.child:
+        print(json.dumps(asyncio.run(measure(names, args.rounds))))
+    else:
+        print(f"{len(names)} recordings, {args.rounds} rounds, time scale 0")
+        for mode in ([args.mode] if args.mode else ["process", "multiprocess"]):
+            print_result(mode, run_mode(mode, names, args.rounds))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Native-only tool calling vs XML + native: prompt size and per-chunk CPU.
+
+Builds the static system prompt from the real tool set (ToolManager) with and
+without the XML tool calling format, then feeds the same synthetic stream
+through ResponseProcessor.process_streaming_response in both modes:
+
+    xml+native   XML chunk extraction on every content delta, XML schemas
+                 and sample response in the prompt (previous behaviour for
+                 every model)
+    native-only  ModelCapability.NATIVE_TOOLS_ONLY models: no XML in the
+                 prompt or the stream parser
+
+The stream is a text reply followed by one large native tool call (e.g. a
+create_file) whose arguments arrive in small fragments. Also compares how the
+tool call arguments are assembled: re-parsing everything received so far on
+every delta (previous behaviour) vs StreamedToolArguments.
+
+Prompt tokens are estimated as chars / 4.
+
+Usage:
+    python -m benchmarks.native_tool_calls [--text-chars N] [--args-chars N]
+                                           [--fragment N] [--runs N]
+
+Examples:
+    # Default: 6k chars of text, 20k chars of tool arguments in 8 char deltas
+    python -m benchmarks.native_tool_calls
+
+    # A long reply with a huge file write
+    python -m benchmarks.native_tool_calls --text-chars 20000 --args-chars 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+os.environ.setdefault("LOGGING_LEVEL", "ERROR")
+
+from core.agentpress.response_processor import (  # noqa: E402
+    ProcessorConfig, ResponseProcessor, StreamedToolArguments,
+)
+from core.agentpress.thread_manager import ThreadManager  # noqa: E402
+from core.agentpress.tool import ToolResult  # noqa: E402
+from core.run import PromptManager, ToolManager  # noqa: E402
+from core.utils.config import config  # noqa: E402
+from core.utils.json_helpers import safe_json_parse  # noqa: E402
+
+MODEL = "openai/gpt-5-mini"
+
+
+def build_registry():
+    # Tools that validate API keys in __init__ need something to validate
+    for key in ("TAVILY_API_KEY", "FIRECRAWL_API_KEY", "SERPER_API_KEY"):
+        if not getattr(config, key, None):
+            setattr(config, key, "bench")
+    thread_manager = ThreadManager()
+    ToolManager(thread_manager, "bench-project", "bench-thread").register_all_tools()
+    return thread_manager.tool_registry
+
+
+def _delta(content=None, tool_call=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=[tool_call] if tool_call else None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+def make_stream(text_chars: int, args_chars: int, fragment: int):
+    sentence = "Here is the next step of the plan, with <b>markup</b> and code like f(x) < 3. "
+    text = (sentence * (text_chars // len(sentence) + 1))[:text_chars]
+    arguments = json.dumps({
+        "file_path": "src/app/page.tsx",
+        "file_contents": ('export const x = {"a": [1, 2]};\n' * (args_chars // 32 + 1))[:args_chars],
+    })
+    chunks = [_delta(content=text[i:i + fragment * 2]) for i in range(0, len(text), fragment * 2)]
+    pieces = [arguments[i:i + fragment] for i in range(0, len(arguments), fragment)]
+    for i, piece in enumerate(pieces):
+        chunks.append(_delta(tool_call=SimpleNamespace(
+            index=0, id="call-1" if i == 0 else None, type="function",
+            function=SimpleNamespace(name="create_file" if i == 0 else None, arguments=piece),
+        )))
+    chunks.append(_delta(finish_reason="tool_calls"))
+    return chunks, pieces
+
+
+async def _replay(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _add_message(thread_id, type, content, is_llm_message=False, metadata=None, **kwargs):
+    return {"message_id": "m", "thread_id": thread_id, "type": type, "content": content,
+            "metadata": metadata or {}, "is_llm_message": is_llm_message}
+
+
+async def process(registry, chunks, xml_tool_calling: bool) -> float:
+    trace = SimpleNamespace(event=lambda **kwargs: None)
+    processor = ResponseProcessor(registry, _add_message, trace=trace)
+
+    async def execute(tool_call):
+        return ToolResult(success=True, output="ok")
+
+    processor._execute_tool = execute
+    processor_config = ProcessorConfig(
+        xml_tool_calling=xml_tool_calling, native_tool_calling=True, execute_tools=True,
+        execute_on_stream=True, tool_execution_strategy="parallel", xml_adding_strategy="user_message",
+        max_xml_tool_calls=1 if xml_tool_calling else 0,
+    )
+    started = time.process_time()
+    async for _ in processor.process_streaming_response(_replay(chunks), "bench-thread", [], MODEL, processor_config):
+        pass
+    return time.process_time() - started
+
+
+def reparse_every_delta(pieces):
+    arguments = ""
+    for piece in pieces:
+        arguments += piece
+        safe_json_parse(arguments)
+
+
+def incremental(pieces):
+    streamed = StreamedToolArguments()
+    for piece in pieces:
+        streamed.feed(piece)
+    assert streamed.complete
+
+
+def _timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.process_time()
+        fn()
+        timings.append(time.process_time() - started)
+    return statistics.median(timings)
+
+
+def main(text_chars: int, args_chars: int, fragment: int, runs: int) -> None:
+    registry = build_registry()
+    print(f"Tools: {len(registry.tools)} functions")
+    sizes = {}
+    for label, xml in (("xml+native", True), ("native-only", False)):
+        prompt, _ = PromptManager._compile_static_prompt(MODEL, None, None, registry, xml, xml, True)
+        sizes[label] = len(prompt)
+        print(f"{label:<12} static prompt {len(prompt):>8,} chars  ~{len(prompt) // 4:>7,} tokens")
+    print(f"{'':<12} native-only saves {1 - sizes['native-only'] / sizes['xml+native']:.0%} of the prompt")
+
+    chunks, pieces = make_stream(text_chars, args_chars, fragment)
+    print(f"\nStream: {len(chunks)} chunks ({text_chars:,} chars of text, {len(pieces)} argument deltas)")
+    for label, xml in (("xml+native", True), ("native-only", False)):
+        timings = [asyncio.run(process(registry, chunks, xml)) for _ in range(runs)]
+        cpu = statistics.median(timings)
+        print(f"{label:<12} stream CPU {cpu * 1000:8.2f}ms  per chunk {cpu / len(chunks) * 1e6:7.2f}us")
+
+    print("\nArgument assembly:")
+    for label, fn in (("reparse", reparse_every_delta), ("incremental", incremental)):
+        cpu = _timed(lambda: fn(pieces), runs)
+        print(f"{label:<12} {cpu * 1000:8.2f}ms  per delta {cpu / len(pieces) * 1e6:7.2f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark native-only tool calling")
+    parser.add_argument("--text-chars", type=int, default=6000)
+    parser.add_argument("--args-chars", type=int, default=20000)
+    parser.add_argument("--fragment", type=int, default=8, help="Characters per streamed delta")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    main(args.text_chars, args.args_chars, args.fragment, args.runs)
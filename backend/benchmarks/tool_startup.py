@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Agent startup cost: tool registration up to the first LLM call.
+
+Runs ToolManager.register_all_tools() for a fresh ThreadManager, then builds
+everything the first LLM call needs from the registry (OpenAPI schemas, XML
+usage examples, function table). Compares:
+
+    eager   previous behaviour: every tool instantiated at registration and
+            its schemas discovered with inspect.getmembers
+    lazy    class-level schemas, tools constructed on first use
+
+Usage:
+    python -m benchmarks.tool_startup [--runs N]
+
+Examples:
+    # Default: 200 agent startups per mode
+    python -m benchmarks.tool_startup
+
+    # More runs for steadier percentiles
+    python -m benchmarks.tool_startup --runs 1000
+"""
+
+import argparse
+import inspect
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+# Registration logs at debug level; keep them out of the timings
+os.environ.setdefault("LOGGING_LEVEL", "WARNING")
+
+from core.agentpress.thread_manager import ThreadManager
+from core.agentpress.tool import SchemaType, Tool
+from core.agentpress.tool_registry import ToolRegistry
+from core.run import ToolManager
+from core.utils.config import config
+
+lazy_register_tool = ToolRegistry.register_tool
+class_register_schemas = Tool._register_schemas
+
+
+def eager_register_schemas(self):
+    # What Tool.__init__ used to run for every instance
+    for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
+        if hasattr(method, 'tool_schemas'):
+            self._schemas[name] = method.tool_schemas
+
+
+def eager_register_tool(self, tool_class, function_names=None, **kwargs):
+    tool_instance = tool_class(**kwargs)
+    for func_name, schema_list in tool_instance.get_schemas().items():
+        if function_names is None or func_name in function_names:
+            for schema in schema_list:
+                if schema.schema_type == SchemaType.OPENAPI:
+                    self.tools[func_name] = {"instance": tool_instance, "schema": schema}
+
+
+def startup() -> ThreadManager:
+    thread_manager = ThreadManager()
+    ToolManager(thread_manager, "bench-project", "bench-thread").register_all_tools()
+    registry = thread_manager.tool_registry
+    registry.get_openapi_schemas()
+    registry.get_usage_examples()
+    registry.get_available_functions()
+    return thread_manager
+
+
+def measure(label: str, runs: int) -> None:
+    startup()  # warm imports and class-level caches
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        thread_manager = startup()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    registry = thread_manager.tool_registry
+    instances = {id(info['instance']) for info in registry.tools.values() if 'instance' in info}
+    print(f"{label:<6} functions={len(registry.tools):>3} instantiated={len(instances):>2}  "
+          f"p50={statistics.median(timings):6.2f}ms  p95={timings[int(len(timings) * 0.95) - 1]:6.2f}ms")
+
+
+def main(runs: int) -> None:
+    # Tools that validate API keys in __init__ need something to validate
+    for key in ("TAVILY_API_KEY", "FIRECRAWL_API_KEY", "SERPER_API_KEY"):
+        if not getattr(config, key, None):
+            setattr(config, key, "bench")
+
+    ToolRegistry.register_tool = eager_register_tool
+    Tool._register_schemas = eager_register_schemas
+    try:
+        measure("eager", runs)
+    finally:
+        ToolRegistry.register_tool = lazy_register_tool
+        Tool._register_schemas = class_register_schemas
+    measure("lazy", runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark agent tool registration")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    main(args.runs)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Web search tool scraping: client per URL vs the pooled ScrapeService.
+
+Starts a local fake Firecrawl (/v1/scrape) and Tavily (/search) server with a
+fixed per-request latency and replays an agent's research session: N URLs,
+a share of them repeated (the same URL again, with a fragment or a tracking
+parameter), scraped in scrape_webpage calls of --batch URLs, plus web
+searches of which the same share are repeats. Scenarios:
+
+    legacy   previous behaviour: a new httpx.AsyncClient per URL, every URL
+             and every search sent upstream
+    pooled   core.services.web_scrape.ScrapeService on an in-memory Redis,
+             cold cache
+    warm     the same session again on the warm cache (e.g. another thread
+             of the same research)
+
+Reports wall time, upstream requests and TCP connections opened. The fake
+server speaks plain HTTP/1.1, so the HTTP/2 multiplexing a TLS upstream
+allows is not part of the numbers; pooling is.
+
+Usage:
+    python -m benchmarks.web_scrape [--urls N] [--duplicates FRACTION] [--batch N]
+
+Examples:
+    # Default: 50 URLs with 30% duplicates, 10 URLs per scrape call
+    python -m benchmarks.web_scrape
+
+    # Slower upstream
+    python -m benchmarks.web_scrape --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+os.environ.setdefault("LOGGING_LEVEL", "ERROR")
+
+import core.services.web_scrape as web_scrape  # noqa: E402
+from core.services.web_scrape import ScrapeService  # noqa: E402
+
+
+class MemoryRedis:
+    """In-memory stand-in for the Redis commands the scrape cache uses."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        self.values[key] = value
+
+
+class FakeUpstream:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = {"scrape": 0, "search": 0}
+        self.connections = set()
+        app = FastAPI()
+
+        @app.post("/v1/scrape")
+        async def scrape(request: Request):
+            body = await request.json()
+            self._count("scrape", request)
+            await asyncio.sleep(self.latency)
+            return {"success": True, "data": {"markdown": f"# {body['url']}\n\n" + "lorem ipsum " * 2000,
+                                              "metadata": {"title": body["url"]}}}
+
+        @app.post("/search")
+        async def search(request: Request):
+            body = await request.json()
+            self._count("search", request)
+            await asyncio.sleep(self.latency)
+            return {"query": body["query"], "answer": "42",
+                    "results": [{"url": f"https://example.com/{n}", "content": "..."} for n in range(10)]}
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+
+    def _count(self, kind: str, request: Request) -> None:
+        self.requests[kind] += 1
+        self.connections.add(request.client.port)
+
+    def reset(self) -> None:
+        self.requests = {"scrape": 0, "search": 0}
+        self.connections = set()
+
+
+class FakeTavily:
+    """AsyncTavilyClient.search against the fake server (a client per call, like the SDK)."""
+
+    def __init__(self, url: str):
+        self.url = url
+
+    async def search(self, query: str, **params):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"{self.url}/search", json={"query": query, **params})
+            return response.json()
+
+
+async def legacy_scrape(firecrawl_url: str, url: str) -> dict:
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{firecrawl_url}/v1/scrape", json={"url": url, "formats": ["markdown"]},
+                                     headers={"Authorization": "Bearer bench"}, timeout=30)
+        response.raise_for_status()
+        return response.json()["data"]
+
+
+def make_session(urls: int, duplicates: float, seed: int = 7):
+    rng = random.Random(seed)
+    unique = max(1, round(urls * (1 - duplicates)))
+    distinct = [f"https://site{n % 8}.example/articles/{n}" for n in range(unique)]
+    variants = ["{}", "{}#section-2", "{}?utm_source=newsletter", "{}/"]
+    scrape_urls = distinct + [rng.choice(variants).format(rng.choice(distinct)) for _ in range(urls - unique)]
+    rng.shuffle(scrape_urls)
+    queries = [f"topic {n} latest research" for n in range(max(1, round(urls / 5 * (1 - duplicates))))]
+    searches = queries + [rng.choice(queries).upper() for _ in range(max(0, urls // 5 - len(queries)))]
+    return scrape_urls, searches
+
+
+async def run_session(scrape_urls, searches, batch: int, scrape, search) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(search(query) for query in searches))
+    for offset in range(0, len(scrape_urls), batch):
+        # One scrape_webpage call: its URLs concurrently
+        await asyncio.gather(*(scrape(url) for url in scrape_urls[offset:offset + batch]))
+    return time.perf_counter() - started
+
+
+async def main(urls: int, duplicates: float, batch: int, latency: float) -> None:
+    upstream = FakeUpstream(latency)
+    server = asyncio.create_task(upstream.server.serve())
+    while not upstream.server.started:
+        await asyncio.sleep(0.01)
+
+    scrape_urls, searches = make_session(urls, duplicates)
+    tavily = FakeTavily(upstream.url)
+    web_scrape.redis = MemoryRedis()
+    service = ScrapeService(firecrawl_url=upstream.url, firecrawl_api_key="bench")
+
+    print(f"{len(scrape_urls)} URLs ({len(set(scrape_urls))} distinct strings), {len(searches)} searches, "
+          f"{batch} URLs per call, {latency * 1000:.0f}ms upstream latency\n")
+    print(f"{'scenario':<8} {'wall':>9} {'scrapes':>8} {'searches':>9} {'connections':>12}")
+    try:
+        for label, scrape, search in [
+            ("legacy", lambda url: legacy_scrape(upstream.url, url), lambda q: tavily.search(query=q, max_results=10)),
+            ("pooled", service.scrape, lambda q: service.search(tavily, q, max_results=10)),
+            ("warm", service.scrape, lambda q: service.search(tavily, q, max_results=10)),
+        ]:
+            upstream.reset()
+            elapsed = await run_session(scrape_urls, searches, batch, scrape, search)
+            print(f"{label:<8} {elapsed * 1000:>7.0f}ms {upstream.requests['scrape']:>8} "
+                  f"{upstream.requests['search']:>9} {len(upstream.connections):>12}")
+    finally:
+        await service.close()
+        upstream.server.should_exit = True
+        await server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark web search tool scraping")
+    parser.add_argument("--urls", type=int, default=50)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Share of repeated URLs and searches")
+    parser.add_argument("--batch", type=int, default=10, help="URLs per scrape_webpage call")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per upstream request")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.urls, args.duplicates, args.batch, args.latency))
@@ -730,7 +730,8 @@ async def generate_agent_icon(
         from .core_utils import generate_agent_icon_and_colors
         
         result = await generate_agent_icon_and_colors(
-            name=request.name
+            name=request.name,
+            account_id=user_id
         )
         
         response = AgentIconGenerationResponse(
@@ -8,13 +8,14 @@ from typing import Optional, List, Tuple, Dict
 from fastapi import APIRouter, HTTPException, Depends, Request, Body, File, UploadFile, Form
 from fastapi.responses import StreamingResponse
 
-from core.utils.auth_utils import verify_and_get_user_id_from_jwt, get_user_id_from_stream_auth, verify_and_authorize_thread_access
+from core.utils.auth_utils import verify_and_get_user_id_from_jwt, get_user_id_from_stream_auth, verify_and_authorize_thread_access, verify_admin_api_key
 from core.utils.logger import logger, structlog
 # Billing removed - model validation now done through model_manager
 from core.utils.config import config, EnvMode
 from core.services import redis
 from core.sandbox.sandbox import create_sandbox, delete_sandbox
-from run_agent_background import run_agent_background
+from core.services.run_admission import admission_queue
+from run_agent_background import submit_agent_run, MAX_CONCURRENT_RUNS
 from core.ai_models import model_manager
 
 from .api_models import AgentStartRequest, AgentVersionResponse, AgentResponse, ThreadAgentResponse, InitiateAgentResponse
@@ -190,7 +191,8 @@ async def start_agent(
 
     request_id = structlog.contextvars.get_contextvars().get('request_id')
 
-    run_agent_background.send(
+    await submit_agent_run(
+        account_id=account_id,
         agent_run_id=agent_run_id, thread_id=thread_id, instance_id=utils.instance_id,
         project_id=project_id,
         model_name=model_name,  # Already resolved above
@@ -200,6 +202,26 @@ async def start_agent(
 
     return {"agent_run_id": agent_run_id, "status": "running"}
 
+@router.get("/agent-runs/admission")
+async def get_admission_metrics(_: bool = Depends(verify_admin_api_key)):
+    """Queue depth, wait times and running count of the agent run admission queue."""
+    metrics = await admission_queue.metrics()
+    metrics["max_concurrent_runs_per_worker"] = MAX_CONCURRENT_RUNS
+    return metrics
+
+@router.put("/agent-runs/admission/weights/{account_id}")
+async def set_admission_weight(
+    account_id: str,
+    weight: float = Body(..., embed=True),
+    _: bool = Depends(verify_admin_api_key)
+):
+    """Set an account's share of agent run admissions (default 1)."""
+    try:
+        await admission_queue.set_weight(account_id, weight)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"account_id": account_id, "weight": weight}
+
 @router.post("/agent-run/{agent_run_id}/stop")
 async def stop_agent(agent_run_id: str, user_id: str = Depends(verify_and_get_user_id_from_jwt)):
     """Stop a running agent."""
@@ -745,7 +767,7 @@ async def initiate_agent_with_files(
         logger.debug(f"Created new thread: {thread_id}")
 
         # Trigger Background Naming Task
-        asyncio.create_task(generate_and_update_project_name(project_id=project_id, prompt=prompt))
+        asyncio.create_task(generate_and_update_project_name(project_id=project_id, prompt=prompt, account_id=account_id))
 
         # 4. Upload Files to Sandbox (if any)
         message_content = prompt
@@ -844,7 +866,8 @@ async def initiate_agent_with_files(
         request_id = structlog.contextvars.get_contextvars().get('request_id')
 
         # Run agent in background
-        run_agent_background.send(
+        await submit_agent_run(
+            account_id=account_id,
             agent_run_id=agent_run_id, thread_id=thread_id, instance_id=utils.instance_id,
             project_id=project_id,
             model_name=model_name,  # Already resolved above
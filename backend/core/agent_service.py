@@ -1,5 +1,6 @@
+import math
 from typing import List, Dict, Any, Optional
-from core.utils.pagination import PaginationService, PaginationParams, PaginatedResponse
+from core.utils.pagination import PaginationService, PaginationParams, PaginatedResponse, PaginationMeta
 from core.utils.logger import logger
 from .agent_loader import AgentLoader
 from core.utils.query_utils import batch_query_in
@@ -59,21 +60,18 @@ class AgentService:
         filters: AgentFilters
     ) -> PaginatedResponse[Dict[str, Any]]:
         """Get only agents (not templates) with pagination"""
-        base_query = self._build_base_query(user_id, filters)
-        count_query = self._build_count_query(user_id, filters)
-        
-        needs_post_processing = (
+        uses_tool_facets = (
             filters.has_mcp_tools is not None or 
             filters.has_agentpress_tools is not None or 
             len(filters.tools) > 0 or
             filters.sort_by == "tools_count"
         )
         
-        if needs_post_processing:
-            return await self._get_agents_with_complex_filtering(
-                user_id, pagination_params, filters, base_query
-            )
+        if uses_tool_facets:
+            return await self._get_agents_by_tool_facets(user_id, pagination_params, filters)
         else:
+            base_query = self._build_base_query(user_id, filters)
+            count_query = self._build_count_query(user_id, filters)
             return await self._get_agents_database_paginated(
                 base_query, count_query, pagination_params, filters
             )
@@ -128,9 +126,7 @@ class AgentService:
             logger.error(f"Error fetching templates for user {user_id}: {e}", exc_info=True)
             raise
 
-    def _build_base_query(self, user_id: str, filters: AgentFilters):
-        query = self.db.table('agents').select('*').eq("account_id", user_id)
-        
+    def _apply_common_filters(self, query, filters: AgentFilters):
         if filters.search:
             search_term = f"%{filters.search}%"
             query = query.or_(f"name.ilike.{search_term},description.ilike.{search_term}")
@@ -138,24 +134,21 @@ class AgentService:
         if filters.has_default is not None:
             query = query.eq("is_default", filters.has_default)
         
-        if filters.sort_by != "tools_count":
-            sort_column = filters.sort_by if filters.sort_by in ["name", "created_at", "updated_at"] else "created_at"
-            query = query.order(sort_column, desc=(filters.sort_order == "desc"))
-        
         return query
 
-    def _build_count_query(self, user_id: str, filters: AgentFilters):
-        query = self.db.table('agents').select('*', count='exact').eq("account_id", user_id)
+    def _build_base_query(self, user_id: str, filters: AgentFilters):
+        query = self.db.table('agents').select('*').eq("account_id", user_id)
+        query = self._apply_common_filters(query, filters)
         
-        if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.or_(f"name.ilike.{search_term},description.ilike.{search_term}")
+        sort_column = filters.sort_by if filters.sort_by in ["name", "created_at", "updated_at"] else "created_at"
+        query = query.order(sort_column, desc=(filters.sort_order == "desc"))
         
-        if filters.has_default is not None:
-            query = query.eq("is_default", filters.has_default)
-            
         return query
 
+    def _build_count_query(self, user_id: str, filters: AgentFilters):
+        query = self.db.table('agents').select('*', count='exact').eq("account_id", user_id)
+        return self._apply_common_filters(query, filters)
+
     async def _get_agents_database_paginated(
         self, 
         base_query, 
@@ -180,49 +173,71 @@ class AgentService:
             pagination=paginated_result.pagination
         )
 
-    async def _get_agents_with_complex_filtering(
+    async def _get_agents_by_tool_facets(
         self,
         user_id: str,
-        pagination_params: PaginationParams, 
-        filters: AgentFilters,
-        base_query
+        pagination_params: PaginationParams,
+        filters: AgentFilters
     ) -> PaginatedResponse[Dict[str, Any]]:
-        all_agents_result = await base_query.execute()
-        all_agents = all_agents_result.data or []
+        """Filter, sort and page agents on the tool facet columns in one query.
+
+        The facets (tools_count, has_mcp_tools, has_agentpress_tools and
+        tool_names) are kept in sync with the current version by database
+        triggers, so only the requested page is read and only its versions
+        are loaded. AgentPress entries count as enabled as the loader reads
+        them (true, or {"enabled": true}). A Suna default agent without a
+        version is listed with the in-code Suna config but filtered as having
+        no tools, since the triggers only see stored versions.
+        """
+        query = self.db.table('agents').select('*', count='exact').eq("account_id", user_id)
+        query = self._apply_common_filters(query, filters)
         
-        if not all_agents:
-            return PaginatedResponse(
-                data=[],
-                pagination=PaginationService.PaginationMeta(
-                    current_page=pagination_params.page,
-                    page_size=pagination_params.page_size,
-                    total_items=0,
-                    total_pages=0,
-                    has_next=False,
-                    has_previous=False
-                )
-            )
+        if filters.has_mcp_tools is not None:
+            query = query.eq("has_mcp_tools", filters.has_mcp_tools)
         
-        version_map = await self._load_agent_versions_batch(all_agents)
+        if filters.has_agentpress_tools is not None:
+            query = query.eq("has_agentpress_tools", filters.has_agentpress_tools)
         
-        filtered_agents = []
-        for agent_data in all_agents:
-            if await self._passes_complex_filters(agent_data, version_map, filters):
-                filtered_agents.append(agent_data)
+        if filters.tools:
+            query = query.ov("tool_names", self._postgres_text_array(filters.tools))
         
+        descending = filters.sort_order == "desc"
         if filters.sort_by == "tools_count":
-            filtered_agents = await self._sort_by_tools_count(filtered_agents, version_map)
-        elif filters.sort_order == "desc":
-            filtered_agents.reverse()
+            query = query.order("tools_count", desc=descending).order("created_at", desc=True)
+        else:
+            sort_column = filters.sort_by if filters.sort_by in ["name", "created_at", "updated_at"] else "created_at"
+            query = query.order(sort_column, desc=descending)
         
-        # Transform with configs loaded
-        agent_responses = await self._load_agents_with_configs(filtered_agents, version_map)
+        offset = (pagination_params.page - 1) * pagination_params.page_size
+        result = await query.range(offset, offset + pagination_params.page_size - 1).execute()
+        page_rows = result.data or []
+        total_items = result.count or 0
         
-        return await PaginationService.paginate_filtered_dataset(
-            all_items=agent_responses,
-            params=pagination_params
+        version_map = await self._load_agent_versions_batch(page_rows)
+        agent_responses = await self._load_agents_with_configs(page_rows, version_map)
+        
+        total_pages = math.ceil(total_items / pagination_params.page_size) if total_items else 0
+        return PaginatedResponse(
+            data=agent_responses,
+            pagination=PaginationMeta(
+                current_page=pagination_params.page,
+                page_size=pagination_params.page_size,
+                total_items=total_items,
+                total_pages=total_pages,
+                has_next=pagination_params.page < total_pages,
+                has_previous=pagination_params.page > 1
+            )
         )
 
+    @staticmethod
+    def _postgres_text_array(values: List[str]) -> str:
+        """Array literal with every element quoted, so names may contain commas or spaces."""
+        quoted = []
+        for value in values:
+            escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+            quoted.append(f'"{escaped}"')
+        return "{" + ",".join(quoted) + "}"
+
     async def _load_agent_versions_batch(self, agents: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         version_map = {}
         version_ids = list({agent['current_version_id'] for agent in agents if agent.get('current_version_id')})
@@ -262,84 +277,6 @@ class AgentService:
         
         return version_map
 
-    async def _passes_complex_filters(
-        self, 
-        agent_row: Dict[str, Any], 
-        version_map: Dict[str, Dict[str, Any]], 
-        filters: AgentFilters
-    ) -> bool:
-        # Load agent with config
-        agent = self.loader._row_to_agent_data(agent_row)
-        version_data = version_map.get(agent.agent_id)
-        
-        if version_data:
-            self.loader._apply_version_config(agent, version_data)
-        elif agent.is_suna_default:
-            self.loader._load_suna_config(agent)
-        else:
-            # No config available, use empty defaults for filtering
-            agent.configured_mcps = []
-            agent.agentpress_tools = {}
-        
-        configured_mcps = agent.configured_mcps or []
-        agentpress_tools = agent.agentpress_tools or {}
-        
-        if filters.has_mcp_tools is not None:
-            has_mcp = bool(configured_mcps and len(configured_mcps) > 0)
-            if filters.has_mcp_tools != has_mcp:
-                return False
-        
-        if filters.has_agentpress_tools is not None:
-            has_enabled_tools = any(
-                tool_data and isinstance(tool_data, dict) and tool_data.get('enabled', False)
-                for tool_data in agentpress_tools.values()
-            )
-            if filters.has_agentpress_tools != has_enabled_tools:
-                return False
-        
-        if filters.tools:
-            agent_tools = set()
-
-            for mcp in configured_mcps:
-                if isinstance(mcp, dict) and 'name' in mcp:
-                    agent_tools.add(f"mcp:{mcp['name']}")
-            
-            for tool_name, tool_data in agentpress_tools.items():
-                if tool_data and isinstance(tool_data, dict) and tool_data.get('enabled', False):
-                    agent_tools.add(f"agentpress:{tool_name}")
-            
-            if not any(tool in agent_tools for tool in filters.tools):
-                return False
-        
-        return True
-
-    async def _sort_by_tools_count(
-        self, 
-        agents: List[Dict[str, Any]], 
-        version_map: Dict[str, Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
-        def get_tools_count(agent_row):
-            agent = self.loader._row_to_agent_data(agent_row)
-            version_data = version_map.get(agent.agent_id)
-            
-            if version_data:
-                self.loader._apply_version_config(agent, version_data)
-            elif agent.is_suna_default:
-                self.loader._load_suna_config(agent)
-            
-            configured_mcps = agent.configured_mcps or []
-            agentpress_tools = agent.agentpress_tools or {}
-            
-            mcp_count = len(configured_mcps) if configured_mcps else 0
-            agentpress_count = sum(
-                1 for tool_data in agentpress_tools.values()
-                if tool_data and isinstance(tool_data, dict) and tool_data.get('enabled', False)
-            ) if agentpress_tools else 0
-            
-            return mcp_count + agentpress_count
-        
-        return sorted(agents, key=get_tools_count, reverse=True)
-    
     async def _load_agents_with_configs(
         self,
         agent_rows: List[Dict[str, Any]],
@@ -8,7 +8,7 @@ reaching the context window limitations of LLM models.
 import json
 from typing import List, Dict, Any, Optional, Union
 
-from litellm.utils import token_counter
+from core.agentpress.token_budget import TokenBudget, count_tokens, message_tokens
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
 from core.ai_models import model_manager
@@ -96,7 +96,7 @@ class ContextManager:
         This allows prompt caching (applied later) to produce cache hits on identical compressed content.
         """
         if uncompressed_total_token_count is None:
-            uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
+            uncompressed_total_token_count = count_tokens(messages, llm_model)
 
         max_tokens_value = max_tokens or (100 * 1000)
 
@@ -107,7 +107,7 @@ class ContextManager:
                     continue  # Skip non-dict messages
                 if self.is_tool_result_message(msg):  # Only compress ToolResult messages
                     _i += 1  # Count the number of ToolResult messages
-                    msg_token_count = token_counter(messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = message_tokens(msg, llm_model)  # Count the number of tokens in the message
                     if msg_token_count > token_threshold:  # If the message is too long
                         if _i > 1:  # If this is not the most recent ToolResult message
                             message_id = msg.get('message_id')  # Get the message_id
@@ -126,7 +126,7 @@ class ContextManager:
         This allows prompt caching (applied later) to produce cache hits on identical compressed content.
         """
         if uncompressed_total_token_count is None:
-            uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
+            uncompressed_total_token_count = count_tokens(messages, llm_model)
 
         max_tokens_value = max_tokens or (100 * 1000)
 
@@ -137,7 +137,7 @@ class ContextManager:
                     continue  # Skip non-dict messages
                 if msg.get('role') == 'user':  # Only compress User messages
                     _i += 1  # Count the number of User messages
-                    msg_token_count = token_counter(messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = message_tokens(msg, llm_model)  # Count the number of tokens in the message
                     if msg_token_count > token_threshold:  # If the message is too long
                         if _i > 1:  # If this is not the most recent User message
                             message_id = msg.get('message_id')  # Get the message_id
@@ -156,7 +156,7 @@ class ContextManager:
         This allows prompt caching (applied later) to produce cache hits on identical compressed content.
         """
         if uncompressed_total_token_count is None:
-            uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
+            uncompressed_total_token_count = count_tokens(messages, llm_model)
 
         max_tokens_value = max_tokens or (100 * 1000)
         
@@ -167,7 +167,7 @@ class ContextManager:
                     continue  # Skip non-dict messages
                 if msg.get('role') == 'assistant':  # Only compress Assistant messages
                     _i += 1  # Count the number of Assistant messages
-                    msg_token_count = token_counter(messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = message_tokens(msg, llm_model)  # Count the number of tokens in the message
                     if msg_token_count > token_threshold:  # If the message is too long
                         if _i > 1:  # If this is not the most recent Assistant message
                             message_id = msg.get('message_id')  # Get the message_id
@@ -239,10 +239,7 @@ class ContextManager:
         else:
             print("no actual_total_tokens")
             # Count conversation + system prompt WITHOUT caching
-            if system_prompt:
-                uncompressed_total_token_count = token_counter(model=llm_model, messages=[system_prompt] + result)
-            else:
-                uncompressed_total_token_count = token_counter(model=llm_model, messages=result)
+            uncompressed_total_token_count = count_tokens(result, llm_model, system_prompt)
             logger.info(f"Initial token count (no caching): {uncompressed_total_token_count}")
 
         # Apply compression
@@ -250,11 +247,8 @@ class ContextManager:
         result = self.compress_user_messages(result, llm_model, max_tokens, token_threshold, uncompressed_total_token_count)
         result = self.compress_assistant_messages(result, llm_model, max_tokens, token_threshold, uncompressed_total_token_count)
 
-        # Recalculate WITHOUT caching overhead
-        if system_prompt:
-            compressed_total = token_counter(model=llm_model, messages=[system_prompt] + result)
-        else:
-            compressed_total = token_counter(model=llm_model, messages=result)
+        # Recalculate WITHOUT caching overhead (only messages changed by compression are re-tokenized)
+        compressed_total = count_tokens(result, llm_model, system_prompt)
         
         logger.info(f"Context compression: {uncompressed_total_token_count} -> {compressed_total} token")
 
@@ -290,7 +284,7 @@ class ContextManager:
             messages: List of messages to compress
             llm_model: Model name for token counting
             max_tokens: Maximum allowed tokens
-            removal_batch_size: Number of messages to remove per iteration
+            removal_batch_size: Unused; the window is sized exactly instead of in batches
             min_messages_to_keep: Minimum number of messages to preserve
         """
         if not messages:
@@ -299,58 +293,21 @@ class ContextManager:
         result = messages
         result = self.remove_meta_messages(result)
 
-        # Early exit if no compression needed
-        if system_prompt:
-            initial_token_count = token_counter(model=llm_model, messages=[system_prompt] + result)
-        else:
-            initial_token_count = token_counter(model=llm_model, messages=result)
+        # Count each message once; the omission window is found by binary search over prefix sums
+        budget = TokenBudget(result, llm_model, system_prompt)
+        initial_token_count = budget.total
         
         max_allowed_tokens = max_tokens or (100 * 1000)
         
         if initial_token_count <= max_allowed_tokens:
             return result
 
-        # Separate system message (assumed to be first) from conversation messages
-        system_message = system_prompt
-        conversation_messages = result
-        
-        safety_limit = 500
-        current_token_count = initial_token_count
-        
-        while current_token_count > max_allowed_tokens and safety_limit > 0:
-            safety_limit -= 1
-            
-            if len(conversation_messages) <= min_messages_to_keep:
-                logger.warning(f"Cannot compress further: only {len(conversation_messages)} messages remain (min: {min_messages_to_keep})")
-                break
+        start, end = budget.omission_window(max_allowed_tokens, min_messages_to_keep)
+        final_messages = result[:start] + result[end:]
+        final_token_count = initial_token_count - budget.range_tokens(start, end)
 
-            # Calculate removal strategy based on current message count
-            if len(conversation_messages) > (removal_batch_size * 2):
-                # Remove from middle, keeping recent and early context
-                middle_start = len(conversation_messages) // 2 - (removal_batch_size // 2)
-                middle_end = middle_start + removal_batch_size
-                conversation_messages = conversation_messages[:middle_start] + conversation_messages[middle_end:]
-            else:
-                # Remove from earlier messages, preserving recent context
-                messages_to_remove = min(removal_batch_size, len(conversation_messages) // 2)
-                if messages_to_remove > 0:
-                    conversation_messages = conversation_messages[messages_to_remove:]
-                else:
-                    # Can't remove any more messages
-                    break
-
-            # Recalculate token count
-            messages_to_count = ([system_message] + conversation_messages) if system_message else conversation_messages
-            current_token_count = token_counter(model=llm_model, messages=messages_to_count)
-
-        # Prepare final result - return only conversation messages (matches compress_messages pattern)
-        final_messages = conversation_messages
-        
-        # Log with system prompt included for accurate token reporting
-        if system_message:
-            final_token_count = token_counter(model=llm_model, messages=[system_message] + final_messages)
-        else:
-            final_token_count = token_counter(model=llm_model, messages=final_messages)
+        if final_token_count > max_allowed_tokens:
+            logger.warning(f"Cannot compress further: only {len(final_messages)} messages remain (min: {min_messages_to_keep})")
         
         logger.info(f"Context compression (omit): {initial_token_count} -> {final_token_count} tokens ({len(messages)} -> {len(final_messages)} messages)")
             
@@ -17,14 +17,15 @@ Dynamic Thresholds (scales with conversation length):
 - Enforces bounds: min 1024 tokens, max 15% of context
 
 Technical Features:
-- Accurate token counting using LiteLLM's model-specific tokenizers
+- Accurate token counting using LiteLLM's model-specific tokenizers, counted
+  once per message and planned with prefix sums (see token_budget)
 - Strategic 4-block distribution with automatic cache management
-- Fixed-size chunks prevent cache invalidation
+- Breakpoints on fixed token boundaries stay on the same messages across turns
 - Cost-benefit analysis for optimal caching strategy
 
 Cache Strategy:
 1. Block 1: System prompt (cached if ≥1024 tokens)
-2. Blocks 2-4: Adaptive conversation chunks with automatic management
+2. Blocks 2-4: cache_control on the messages at the newest chunk boundaries
 3. Early aggressive caching for quick wins
 4. Late conservative caching to preserve blocks
 
@@ -35,6 +36,7 @@ Based on Anthropic documentation and mathematical optimization (Sept 2025).
 """
 
 from typing import Dict, Any, List, Optional
+from core.agentpress.token_budget import MAX_CACHE_BREAKPOINTS, MIN_CACHEABLE_TOKENS, TokenBudget, stable_chunk_size
 from core.utils.logger import logger
 
 
@@ -194,6 +196,12 @@ def add_cache_control(message: Dict[str, Any]) -> Dict[str, Any]:
     if isinstance(content, list):
         if content and isinstance(content[0], dict) and 'cache_control' in content[0]:
             return message
+        # System prompt split into a static prefix and a volatile tail: cache the prefix only
+        if role == 'system' and len(content) > 1 and all(isinstance(item, dict) and item.get('type') == 'text' for item in content):
+            return {
+                "role": role,
+                "content": [{**content[0], "cache_control": {"type": "ephemeral"}}] + content[1:]
+            }
         # Convert existing list format to cached format
         text_content = ""
         for item in content:
@@ -260,28 +268,32 @@ def apply_anthropic_caching_strategy(
             logger.warning(f"Failed to get context window from registry: {e}")
             context_window_tokens = 200_000  # Safe default
     
+    # Filter out any existing system messages from conversation
+    system_msgs_in_conversation = [msg for msg in conversation_messages if msg.get('role') == 'system']
+    if system_msgs_in_conversation:
+        original_count = len(conversation_messages)
+        conversation_messages = [msg for msg in conversation_messages if msg.get('role') != 'system']
+        logger.info(f"🔧 Filtered out {original_count - len(conversation_messages)} system messages to prevent duplication")
+
+    # Count every message once; all chunking decisions below use the prefix sums
+    budget = TokenBudget(conversation_messages, model_name)
+    total_conversation_tokens = budget.conversation_tokens
+
     # Calculate mathematically optimized cache threshold
     if cache_threshold_tokens is None:
         cache_threshold_tokens = calculate_optimal_cache_threshold(
             context_window_tokens, 
             len(conversation_messages),
-            get_messages_token_count(conversation_messages, model_name) if conversation_messages else 0
+            total_conversation_tokens
         )
     
-    logger.info(f"📊 Applying single cache breakpoint strategy for {len(conversation_messages)} messages")
-    
-    # Filter out any existing system messages from conversation
-    system_msgs_in_conversation = [msg for msg in conversation_messages if msg.get('role') == 'system']
-    if system_msgs_in_conversation:
-        original_count = len(conversation_messages)
-        conversation_messages = [msg for msg in conversation_messages if msg.get('role') != 'system']
-        logger.info(f"🔧 Filtered out {original_count - len(conversation_messages)} system messages to prevent duplication")
+    logger.info(f"📊 Applying token-boundary cache breakpoint strategy for {len(conversation_messages)} messages")
     
     prepared_messages = []
     
     # Block 1: System prompt (cache if ≥1024 tokens)
     system_tokens = get_message_token_count(working_system_prompt, model_name)
-    if system_tokens >= 1024:  # Anthropic's minimum cacheable size
+    if system_tokens >= MIN_CACHEABLE_TOKENS:  # Anthropic's minimum cacheable size
         cached_system = add_cache_control(working_system_prompt)
         prepared_messages.append(cached_system)
         logger.info(f"🔥 Block 1: Cached system prompt ({system_tokens} tokens)")
@@ -296,179 +308,96 @@ def apply_anthropic_caching_strategy(
         logger.debug("No conversation messages to add")
         return prepared_messages
     
-    total_conversation_tokens = get_messages_token_count(conversation_messages, model_name)
     logger.info(f"📊 Processing {len(conversation_messages)} messages ({total_conversation_tokens} tokens)")
     
     # Check if we have enough tokens to start caching
-    if total_conversation_tokens < 1024:  # Below minimum cacheable size
+    if total_conversation_tokens < MIN_CACHEABLE_TOKENS:  # Below minimum cacheable size
         prepared_messages.extend(conversation_messages)
         logger.debug(f"Conversation too small for caching: {total_conversation_tokens} tokens")
         return prepared_messages
     
     # Token-based chunked caching strategy
-    max_conversation_blocks = 4 - blocks_used  # Reserve blocks used by system prompt
+    max_conversation_blocks = MAX_CACHE_BREAKPOINTS - blocks_used  # Reserve blocks used by system prompt
     
     # Calculate optimal chunk size to avoid context overflow
     # Reserve ~20% of context window for new messages and outputs
     max_cacheable_tokens = int(context_window_tokens * 0.8)
     
     if total_conversation_tokens <= max_cacheable_tokens:
-        # Conversation fits within cache limits - use chunked approach
-        chunks_created = create_conversation_chunks(
-            conversation_messages, 
-            cache_threshold_tokens, 
-            max_conversation_blocks,
-            prepared_messages,
-            model_name
-        )
-        blocks_used += chunks_created
-        logger.info(f"✅ Created {chunks_created} conversation cache blocks")
+        # Conversation fits within cache limits - mark messages on stable chunk boundaries
+        chunk_tokens = stable_chunk_size(cache_threshold_tokens)
+        breakpoints = budget.cache_breakpoints(chunk_tokens, max_conversation_blocks, eligible=can_hold_cache_control)
+        marked = set(breakpoints)
+        for i, message in enumerate(conversation_messages):
+            prepared_messages.append(add_message_cache_breakpoint(message) if i in marked else message)
+        blocks_used += len(breakpoints)
+        logger.info(f"✅ Created {len(breakpoints)} conversation cache blocks (chunk {chunk_tokens} tokens, messages {breakpoints})")
     else:
         # Conversation too large - need summarization or truncation
         logger.warning(f"Conversation ({total_conversation_tokens} tokens) exceeds cache limit ({max_cacheable_tokens})")
         # For now, add recent messages only (could implement summarization here)
         recent_token_limit = min(cache_threshold_tokens * 2, max_cacheable_tokens)
-        recent_messages = get_recent_messages_within_token_limit(conversation_messages, recent_token_limit, model_name)
-        prepared_messages.extend(recent_messages)
-        logger.info(f"Added {len(recent_messages)} recent messages ({get_messages_token_count(recent_messages, model_name)} tokens)")
+        start = budget.recent_start(recent_token_limit)
+        prepared_messages.extend(conversation_messages[start:])
+        logger.info(f"Added {len(conversation_messages) - start} recent messages ({budget.range_tokens(start, len(conversation_messages))} tokens)")
     
-    logger.info(f"🎯 Total cache blocks used: {blocks_used}/4")
+    logger.info(f"🎯 Total cache blocks used: {blocks_used}/{MAX_CACHE_BREAKPOINTS}")
     
     # Log final structure
-    cache_count = sum(1 for msg in prepared_messages 
-                     if isinstance(msg.get('content'), list) and 
-                     msg['content'] and 
-                     isinstance(msg['content'][0], dict) and 
-                     'cache_control' in msg['content'][0])
+    cache_count = count_cache_breakpoints(prepared_messages)
     
     logger.info(f"✅ Final structure: {cache_count} cache breakpoints, {len(prepared_messages)} total blocks")
     return prepared_messages
 
-def create_conversation_chunks(
-    messages: List[Dict[str, Any]], 
-    chunk_threshold_tokens: int,
-    max_blocks: int,
-    prepared_messages: List[Dict[str, Any]],
-    model: str = "claude-3-5-sonnet-20240620"
-) -> int:
-    """
-    Create conversation cache chunks based on token thresholds.
-    Final messages are NEVER cached to prevent cache invalidation.
-    Returns number of cache blocks created.
+def can_hold_cache_control(message: Dict[str, Any]) -> bool:
+    """Whether a conversation message can carry a cache_control breakpoint."""
+    if not isinstance(message, dict) or message.get('role') not in ('user', 'assistant'):
+        return False
+    content = message.get('content')
+    if isinstance(content, str):
+        return bool(content)
+    return isinstance(content, list) and bool(content) and isinstance(content[-1], dict)
+
+def add_message_cache_breakpoint(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of message with cache_control on its last content block.
+
+    Unlike add_cache_control, the role, other fields and content blocks are
+    preserved, so the cached prefix is byte-identical on the next turn.
     """
-    if not messages or max_blocks <= 0:
-        return 0
-    
-    chunks_created = 0
-    current_chunk = []
-    current_chunk_tokens = 0
-    
-    for i, message in enumerate(messages):
-        message_tokens = get_message_token_count(message, model)
-        
-        # Check if adding this message would exceed threshold
-        if current_chunk_tokens + message_tokens > chunk_threshold_tokens and current_chunk:
-            # Create cache block for current chunk
-            if chunks_created < max_blocks:  # No need to reserve blocks since final messages are never cached
-                chunk_text = format_conversation_for_cache(current_chunk)
-                cache_block = {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"[Conversation Chunk {chunks_created + 1}]\n{chunk_text}",
-                            "cache_control": {"type": "ephemeral"}
-                        }
-                    ]
-                }
-                prepared_messages.append(cache_block)
-                chunks_created += 1
-                logger.info(f"🔥 Block {chunks_created + 1}: Cached chunk ({current_chunk_tokens} tokens, {len(current_chunk)} messages)")
-                
-                # Reset for next chunk
-                current_chunk = []
-                current_chunk_tokens = 0
-            else:
-                # Hit max blocks - add remaining messages individually
-                prepared_messages.extend(current_chunk)
-                prepared_messages.extend(messages[i:])
-                logger.debug(f"Hit max blocks limit, added {len(messages) - i + len(current_chunk)} remaining messages uncached")
-                return chunks_created
-        
-        current_chunk.append(message)
-        current_chunk_tokens += message_tokens
-    
-    # Handle final chunk - NEVER cache the final messages as it breaks caching logic
-    if current_chunk:
-        # Always add final chunk uncached to prevent cache invalidation
-        prepared_messages.extend(current_chunk)
-    
-    return chunks_created
+    content = message['content']
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]
+    else:
+        blocks = list(content[:-1]) + [{**content[-1], "cache_control": {"type": "ephemeral"}}]
+    return {**message, "content": blocks}
 
 def get_recent_messages_within_token_limit(messages: List[Dict[str, Any]], token_limit: int, model: str = "claude-3-5-sonnet-20240620") -> List[Dict[str, Any]]:
     """Get the most recent messages that fit within the token limit."""
     if not messages:
         return []
-    
-    recent_messages = []
-    total_tokens = 0
-    
-    # Start from the end and work backwards
-    for message in reversed(messages):
-        message_tokens = get_message_token_count(message, model)
-        if total_tokens + message_tokens <= token_limit:
-            recent_messages.insert(0, message)  # Insert at beginning to maintain order
-            total_tokens += message_tokens
-        else:
-            break
-    
-    return recent_messages
+    return messages[TokenBudget(messages, model).recent_start(token_limit):]
 
-def format_conversation_for_cache(messages: List[Dict[str, Any]]) -> str:
-    """Format conversation messages into a single text block for caching."""
-    formatted_parts = []
-    
-    for msg in messages:
-        role = msg.get('role', 'unknown')
-        content = msg.get('content', '')
-        
-        # Handle different content formats
-        if isinstance(content, list):
-            # Extract text from list format
-            text_content = ""
-            for item in content:
-                if isinstance(item, dict) and item.get('type') == 'text':
-                    text_content += item.get('text', '')
-                elif not isinstance(item, dict) or 'cache_control' not in item:
-                    text_content += str(item)
-        else:
-            text_content = str(content)
-        
-        # Clean up and format
-        text_content = text_content.strip()
-        if text_content:
-            role_indicator = "User" if role == "user" else "Assistant" if role == "assistant" else role.title()
-            formatted_parts.append(f"{role_indicator}: {text_content}")
-    
-    return "\n\n".join(formatted_parts)
+def count_cache_breakpoints(messages: List[Dict[str, Any]]) -> int:
+    """Count messages carrying cache_control on any content block."""
+    return sum(
+        1 for msg in messages
+        if isinstance(msg.get('content'), list)
+        and any(isinstance(block, dict) and 'cache_control' in block for block in msg['content'])
+    )
 
 def validate_cache_blocks(messages: List[Dict[str, Any]], model_name: str, max_blocks: int = 4) -> List[Dict[str, Any]]:
     """
     Validate cache block count stays within Anthropic's 4-block limit.
-    With our 2-block strategy, this should never be an issue.
+    The caching strategy places at most 4, so this should never be an issue.
     """
     if not is_anthropic_model(model_name):
         return messages
     
-    cache_count = sum(1 for msg in messages 
-                     if isinstance(msg.get('content'), list) and 
-                     msg['content'] and 
-                     isinstance(msg['content'][0], dict) and 
-                     'cache_control' in msg['content'][0])
+    cache_count = count_cache_breakpoints(messages)
     
     if cache_count <= max_blocks:
         logger.debug(f"✅ Cache validation passed: {cache_count}/{max_blocks} blocks")
         return messages
     
     logger.warning(f"⚠️ Cache validation failed: {cache_count}/{max_blocks} blocks")
-    return messages  # With 2-block strategy, this shouldn't happen
+    return messages  # The caching strategy never exceeds the limit
@@ -12,26 +12,100 @@ import json
 import re
 import uuid
 import asyncio
+import time
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple, Union, Callable, Literal
 from dataclasses import dataclass
-from core.utils.logger import logger
+from core.utils.logger import logger, get_logger
 from core.agentpress.tool import ToolResult
 from core.agentpress.tool_registry import ToolRegistry
 from core.agentpress.xml_tool_parser import XMLToolParser
 from core.agentpress.error_processor import ErrorProcessor
+from core.services import metrics
 from core.utils.json_helpers import (
     ensure_dict, ensure_list, safe_json_parse, 
     to_json_string, format_for_yield
 )
 from litellm import token_counter
 
+# Per-chunk and per-tool events are sampled (see DEFAULT_SAMPLING in core.utils.logger)
+stream_logger = get_logger("agentpress.stream")
+tool_logger = get_logger("agentpress.tools")
+
 # Type alias for XML result adding strategy
 XmlAddingStrategy = Literal["user_message", "assistant_message", "inline_edit"]
 
 # Type alias for tool execution strategy
 ToolExecutionStrategy = Literal["sequential", "parallel"]
 
+# Characters that change JSON nesting or string state
+_JSON_STRUCTURE = re.compile(r'[\[\]{}"\\]')
+
+
+class StreamedToolArguments:
+    """Arguments of one native tool call, assembled from streamed fragments.
+
+    Nesting and string state are tracked over each new fragment only, so
+    whether the arguments are complete is known without joining and
+    re-parsing everything received so far on every delta. The text is joined
+    and parsed once, when the top-level value closes.
+    """
+
+    __slots__ = ("parts", "depth", "in_string", "escape_pending", "started", "value")
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.depth = 0
+        self.in_string = False
+        self.escape_pending = False
+        self.started = False
+        self.value: Any = None
+
+    @property
+    def text(self) -> str:
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    @property
+    def complete(self) -> bool:
+        return self.value is not None
+
+    def feed(self, fragment: str) -> bool:
+        """Add a fragment; returns True once the arguments parse as JSON."""
+        if not fragment or self.complete:
+            return self.complete
+        self.parts.append(fragment)
+
+        escaped_at = 0 if self.escape_pending else -1
+        self.escape_pending = False
+        for match in _JSON_STRUCTURE.finditer(fragment):
+            index, char = match.start(), match.group()
+            if index == escaped_at:
+                continue
+            if self.in_string:
+                if char == "\\":
+                    escaped_at = index + 1
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            else:
+                self.depth -= 1
+        if escaped_at == len(fragment):
+            self.escape_pending = True
+
+        if self.started and self.depth <= 0 and not self.in_string:
+            try:
+                self.value = json.loads(self.text)
+            except json.JSONDecodeError:
+                pass
+        return self.complete
+
+
 @dataclass
 class ToolExecutionContext:
     """Context for a tool execution including call details, result, and display info."""
@@ -141,17 +215,18 @@ class ResponseProcessor:
             return None
         chunk_str = str(chunk)
         partial_chunks = entry.setdefault("partial_chunks", [])
-        if not partial_chunks or partial_chunks[-1] != chunk_str:
-            partial_chunks.append(chunk_str)
-        combined = "".join(partial_chunks)
-        try:
-            parsed = json.loads(combined)
-            entry["partial_chunks"] = []
-            entry.pop("partial_json", None)
-            return parsed
-        except json.JSONDecodeError:
-            entry["partial_json"] = combined
+        if partial_chunks and partial_chunks[-1] == chunk_str:
             return None
+        # Only the last fragment is kept, to drop repeated deliveries
+        entry["partial_chunks"] = [chunk_str]
+        streamed = entry.get("streamed_arguments")
+        if streamed is None:
+            streamed = entry["streamed_arguments"] = StreamedToolArguments()
+        if streamed.feed(chunk_str):
+            entry["partial_chunks"] = []
+            entry.pop("streamed_arguments", None)
+            return streamed.value
+        return None
 
     def _parse_tool_input_data(self, input_data: Any, entry: Dict[str, Any]) -> Optional[Any]:
         """Parse tool input data emitted by Anthropic models."""
@@ -266,7 +341,7 @@ class ResponseProcessor:
                     if parsed_input is not None:
                         entry["arguments"] = parsed_input
                         entry["partial_chunks"] = []
-                        entry.pop("partial_json", None)
+                        entry.pop("streamed_arguments", None)
 
                 delta_info = block.get("delta")
                 if isinstance(delta_info, dict) and delta_info.get("partial_json"):
@@ -449,6 +524,8 @@ class ResponseProcessor:
         continuous_state = continuous_state or {}
         accumulated_content = continuous_state.get('accumulated_content', "")
         tool_calls_buffer = {}
+        native_arguments: Dict[int, StreamedToolArguments] = {}  # tool call index -> streamed arguments
+        scheduled_native_indices = set()
         current_xml_content = accumulated_content   # equal to accumulated_content if auto-continuing, else blank
         xml_chunks_buffer = []
         pending_tool_executions = []
@@ -543,19 +620,16 @@ class ResponseProcessor:
 
                 # Log info about chunks periodically for debugging
                 if chunk_count == 1 or (chunk_count % 1000 == 0) or hasattr(chunk, 'usage'):
-                    logger.debug(f"Processing chunk #{chunk_count}, type={type(chunk).__name__}")
+                    stream_logger.debug("Processing chunk #%s, type=%s", chunk_count, type(chunk).__name__)
                 
                 # Store the complete LiteLLM response chunk when we get usage data
                 if hasattr(chunk, 'usage') and chunk.usage and final_llm_response is None:
-                    logger.info(f"🔍 STORING COMPLETE LiteLLM RESPONSE CHUNK AS RECEIVED")
                     final_llm_response = chunk  # Store the entire chunk object as-is
-                    logger.info(f"🔍 STORED MODEL: {getattr(chunk, 'model', 'NO_MODEL')}")
-                    logger.info(f"🔍 STORED USAGE: {chunk.usage}")
-                    logger.info(f"🔍 STORED RESPONSE TYPE: {type(chunk)}")
+                    stream_logger.debug("Stored usage chunk: model=%s usage=%s", getattr(chunk, 'model', 'NO_MODEL'), chunk.usage)
 
                 if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'finish_reason') and chunk.choices[0].finish_reason:
                     finish_reason = chunk.choices[0].finish_reason
-                    logger.debug(f"Detected finish_reason: {finish_reason}")
+                    stream_logger.debug("Detected finish_reason: %s", finish_reason)
 
                 if hasattr(chunk, 'choices') and chunk.choices:
                     delta = chunk.choices[0].delta if hasattr(chunk.choices[0], 'delta') else None
@@ -590,7 +664,8 @@ class ResponseProcessor:
 
                     if chunk_text:
                         accumulated_content += chunk_text
-                        current_xml_content += chunk_text
+                        if config.xml_tool_calling:
+                            current_xml_content += chunk_text
 
                         if not (config.max_xml_tool_calls > 0 and xml_tool_call_count >= config.max_xml_tool_calls):
                             # Yield ONLY content chunk (don't save)
@@ -746,6 +821,7 @@ class ResponseProcessor:
                                     "id": None,
                                     "function": {"name": None, "arguments": ""}
                                 }
+                                native_arguments[idx] = StreamedToolArguments()
 
                             # Update buffer with chunk data
                             if hasattr(tool_call_chunk, 'id') and tool_call_chunk.id:
@@ -754,25 +830,23 @@ class ResponseProcessor:
                                 if hasattr(tool_call_chunk.function, 'name') and tool_call_chunk.function.name:
                                     tool_calls_buffer[idx]["function"]["name"] = tool_call_chunk.function.name
                                 if hasattr(tool_call_chunk.function, 'arguments') and tool_call_chunk.function.arguments:
-                                    tool_calls_buffer[idx]["function"]["arguments"] += tool_call_chunk.function.arguments
-
-                            # Check if tool call is complete
-                            has_complete_tool_call = False
-                            if (tool_calls_buffer.get(idx) and
-                                tool_calls_buffer[idx]['id'] and
-                                tool_calls_buffer[idx]['function']['name'] and
-                                tool_calls_buffer[idx]['function']['arguments']):
-                                try:
-                                    safe_json_parse(tool_calls_buffer[idx]['function']['arguments'])
-                                    has_complete_tool_call = True
-                                except json.JSONDecodeError: pass
-
+                                    arguments_chunk = tool_call_chunk.function.arguments
+                                    if not isinstance(arguments_chunk, str):
+                                        arguments_chunk = to_json_string(arguments_chunk)
+                                    native_arguments[idx].feed(arguments_chunk)
+
+                            # A call is complete once its arguments close; run it only once
+                            current_tool = tool_calls_buffer[idx]
+                            has_complete_tool_call = bool(
+                                current_tool['id'] and current_tool['function']['name']
+                                and native_arguments[idx].complete and idx not in scheduled_native_indices
+                            )
 
                             if has_complete_tool_call and config.execute_tools and config.execute_on_stream:
-                                current_tool = tool_calls_buffer[idx]
+                                scheduled_native_indices.add(idx)
                                 tool_call_data = {
                                     "function_name": current_tool['function']['name'],
-                                    "arguments": safe_json_parse(current_tool['function']['arguments']),
+                                    "arguments": native_arguments[idx].value,
                                     "id": current_tool['id']
                                 }
                                 current_assistant_id = last_assistant_message_object['message_id'] if last_assistant_message_object else None
@@ -897,6 +971,8 @@ class ResponseProcessor:
                 # ... (Extract complete_native_tool_calls logic) ...
                 # Update complete_native_tool_calls from buffer (initialized earlier)
                 if config.native_tool_calling:
+                    for idx, streamed_arguments in native_arguments.items():
+                        tool_calls_buffer[idx]['function']['arguments'] = streamed_arguments.text
                     for idx, tc_buf in tool_calls_buffer.items():
                         if tc_buf['id'] and tc_buf['function']['name'] and tc_buf['function']['arguments']:
                             try:
@@ -1002,7 +1078,7 @@ class ResponseProcessor:
                 # Or execute now if not streamed
                 elif final_tool_calls_to_process and not config.execute_on_stream:
                     logger.info(f"🔄 STREAMING: Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream")
-                    logger.debug(f"📋 Final tool calls to process: {final_tool_calls_to_process}")
+                    tool_logger.debug("📋 Final tool calls to process: %s", final_tool_calls_to_process)
                     logger.debug(f"⚙️ Config: execute_on_stream={config.execute_on_stream}, strategy={config.tool_execution_strategy}")
                     self.trace.event(name="executing_tools_after_stream", level="DEFAULT", status_message=(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream"))
 
@@ -1159,13 +1235,11 @@ class ResponseProcessor:
                             logger.info("✅ Using complete LiteLLM response for llm_response_end (normal completion)")
                             
                             # Log the complete response object for debugging
-                            logger.info(f"🔍 COMPLETE RESPONSE OBJECT: {final_llm_response}")
-                            logger.info(f"🔍 RESPONSE OBJECT TYPE: {type(final_llm_response)}")
-                            logger.info(f"🔍 RESPONSE OBJECT DICT: {final_llm_response.__dict__ if hasattr(final_llm_response, '__dict__') else 'NO_DICT'}")
+                            logger.debug("🔍 COMPLETE RESPONSE OBJECT: %s", final_llm_response)
                             
                             # Serialize the complete response object as-is
                             llm_end_content = self._serialize_model_response(final_llm_response)
-                            logger.info(f"🔍 SERIALIZED CONTENT: {llm_end_content}")
+                            logger.debug("🔍 SERIALIZED CONTENT: %s", llm_end_content)
                             
                             # Add streaming flag and response timing if available
                             llm_end_content["streaming"] = True
@@ -1189,7 +1263,7 @@ class ResponseProcessor:
                                 
                             # DEBUG: Log the actual response usage
                             logger.info(f"🔍 RESPONSE PROCESSOR COMPLETE USAGE (normal): {llm_end_content.get('usage', 'NO_USAGE')}")
-                            logger.info(f"🔍 FINAL LLM END CONTENT: {llm_end_content}")
+                            logger.debug("🔍 FINAL LLM END CONTENT: %s", llm_end_content)
                             
                             await self.add_message(
                                 thread_id=thread_id,
@@ -1452,7 +1526,7 @@ class ResponseProcessor:
        # --- Execute Tools and Yield Results ---
             tool_calls_to_execute = [item['tool_call'] for item in all_tool_data]
             logger.debug(f"🔧 NON-STREAMING: Extracted {len(tool_calls_to_execute)} tool calls to execute")
-            logger.debug(f"📋 Tool calls data: {tool_calls_to_execute}")
+            tool_logger.debug("📋 Tool calls data: %s", tool_calls_to_execute)
 
             if config.execute_tools and tool_calls_to_execute:
                 logger.debug(f"🚀 NON-STREAMING: Executing {len(tool_calls_to_execute)} tools with strategy: {config.tool_execution_strategy}")
@@ -1615,8 +1689,7 @@ class ResponseProcessor:
                     
                     # Find the earliest occurrence of any registered tool function name
                     # Check for available function names
-                    available_functions = self.tool_registry.get_available_functions()
-                    for func_name in available_functions.keys():
+                    for func_name in self.tool_registry.get_function_names():
                         # Convert function name to potential tag name (underscore to dash)
                         tag_name = func_name.replace('_', '-')
                         start_pattern = f'<{tag_name}'
@@ -1749,17 +1822,18 @@ class ResponseProcessor:
         """Execute a single tool call and return the result."""
         span = self.trace.span(name=f"execute_tool.{tool_call['function_name']}", input=tool_call["arguments"])
         function_name = "unknown"
+        started = time.monotonic()
         try:
             function_name = tool_call["function_name"]
             arguments = tool_call["arguments"]
 
-            logger.debug(f"🔧 EXECUTING TOOL: {function_name}")
+            tool_logger.debug("🔧 EXECUTING TOOL: %s", function_name)
             # logger.debug(f"📝 RAW ARGUMENTS TYPE: {type(arguments)}")
-            logger.debug(f"📝 RAW ARGUMENTS VALUE: {arguments}")
+            tool_logger.debug("📝 RAW ARGUMENTS VALUE: %s", arguments)
             self.trace.event(name="executing_tool", level="DEFAULT", status_message=(f"Executing tool: {function_name} with arguments: {arguments}"))
 
             # Get available functions from tool registry
-            logger.debug(f"🔍 Looking up tool function: {function_name}")
+            tool_logger.debug("🔍 Looking up tool function: %s", function_name)
             available_functions = self.tool_registry.get_available_functions()
             # logger.debug(f"📋 Available functions: {list(available_functions.keys())}")
 
@@ -1769,14 +1843,16 @@ class ResponseProcessor:
                 logger.error(f"❌ Tool function '{function_name}' not found in registry")
                 # logger.error(f"❌ Available functions: {list(available_functions.keys())}")
                 span.end(status_message="tool_not_found", level="ERROR")
+                # Not a registered name: keep the model's invented names out of the labels
+                metrics.observe_tool_execution("unknown", "not_found", time.monotonic() - started)
                 return ToolResult(success=False, output=f"Tool function '{function_name}' not found. Available: {list(available_functions.keys())}")
 
-            logger.debug(f"✅ Found tool function for '{function_name}'")
+            tool_logger.debug("✅ Found tool function for '%s'", function_name)
             # logger.debug(f"🔧 Tool function type: {type(tool_fn)}")
 
             # Handle arguments - if it's a string, try to parse it, otherwise pass as-is
             if isinstance(arguments, str):
-                logger.debug(f"🔄 Parsing string arguments for {function_name}")
+                tool_logger.debug("🔄 Parsing string arguments for %s", function_name)
                 try:
                     parsed_args = safe_json_parse(arguments)
                     if isinstance(parsed_args, dict):
@@ -1806,9 +1882,9 @@ class ResponseProcessor:
                     # logger.debug(f"🔄 Passing non-dict arguments as single parameter")
                     result = await tool_fn(arguments)
 
-            logger.debug(f"✅ Tool execution completed successfully")
+            tool_logger.debug("✅ Tool execution completed successfully")
             # logger.debug(f"📤 Result type: {type(result)}")
-            logger.debug(f"📤 Result: {result}")
+            tool_logger.debug("📤 Result: %s", result)
 
             # Validate result is a ToolResult object
             if not isinstance(result, ToolResult):
@@ -1822,6 +1898,8 @@ class ResponseProcessor:
                     result = ToolResult(success=False, output=f"Tool returned invalid result type: {type(result)}")
 
             span.end(status_message="tool_executed", output=str(result))
+            metrics.observe_tool_execution(function_name, "success" if result.success else "failure",
+                                           time.monotonic() - started)
             return result
 
         except Exception as e:
@@ -1833,6 +1911,7 @@ class ResponseProcessor:
             # Don't use exc_info=True with structlog - causes concatenation errors
             logger.error(f"❌ Full traceback: {traceback.format_exc()}")
             span.end(status_message="critical_error", output=error_str, level="ERROR")
+            metrics.observe_tool_execution(function_name, "error", time.monotonic() - started)
             return ToolResult(success=False, output=f"Critical error executing tool: {error_str}")
 
     async def _execute_tools(
@@ -1855,7 +1934,7 @@ class ResponseProcessor:
             List of tuples containing the original tool call and its result
         """
         logger.debug(f"🎯 MAIN EXECUTE_TOOLS: Executing {len(tool_calls)} tools with strategy: {execution_strategy}")
-        logger.debug(f"📋 Tool calls received: {tool_calls}")
+        tool_logger.debug("📋 Tool calls received: %s", tool_calls)
 
         # Validate tool_calls structure
         if not isinstance(tool_calls, list):
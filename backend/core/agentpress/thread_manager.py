@@ -3,6 +3,7 @@ Simplified conversation thread management system for AgentPress.
 """
 
 import json
+import time
 from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal, cast
 from core.services.llm import make_llm_api_call, LLMError
 from core.agentpress.prompt_caching import apply_anthropic_caching_strategy, validate_cache_blocks
@@ -12,6 +13,7 @@ from core.agentpress.context_manager import ContextManager
 from core.agentpress.response_processor import ResponseProcessor, ProcessorConfig
 from core.agentpress.error_processor import ErrorProcessor
 from core.services.supabase import DBConnection
+from core.services import metrics
 from core.utils.logger import logger
 from datetime import datetime, timezone
 # Billing removed - usage tracking removed
@@ -223,8 +225,13 @@ class ThreadManager:
         native_max_auto_continues: int = 25,
         max_xml_tool_calls: int = 0,
         generation: Optional[Any] = None,
+        auto_continue_state: Optional[Dict[str, Any]] = None,
     ) -> Union[Dict[str, Any], AsyncGenerator]:
-        """Run a conversation thread with LLM integration and tool execution."""
+        """Run a conversation thread with LLM integration and tool execution.
+
+        auto_continue_state, when given, is used (and updated) in place of a
+        fresh one, e.g. to resume an interrupted run from its checkpoint.
+        """
         logger.debug(f"🚀 Starting thread execution for {thread_id} with model {llm_model}")
 
         # Ensure we have a valid ProcessorConfig object
@@ -239,11 +246,12 @@ class ThreadManager:
         if max_xml_tool_calls > 0 and not config.max_xml_tool_calls:
             config.max_xml_tool_calls = max_xml_tool_calls
 
-        auto_continue_state = {
-            'count': 0,
-            'active': True,
-            'continuous_state': {'accumulated_content': '', 'thread_run_id': None}
-        }
+        if auto_continue_state is None:
+            auto_continue_state = {
+                'count': 0,
+                'active': True,
+                'continuous_state': {'accumulated_content': '', 'thread_run_id': None}
+            }
 
         # Single execution if auto-continue is disabled
         if native_max_auto_continues == 0:
@@ -303,9 +311,11 @@ class ThreadManager:
             if ENABLE_CONTEXT_MANAGER:
                 logger.debug(f"Context manager enabled, compressing {len(messages)} messages")
                 context_manager = ContextManager()
+                compression_started = time.monotonic()
                 compressed_messages = context_manager.compress_messages(
                     messages, llm_model, max_tokens=llm_max_tokens
                 )
+                metrics.observe_context_compression(llm_model, time.monotonic() - compression_started)
                 logger.debug(f"Context compression completed: {len(messages)} -> {len(compressed_messages)} messages")
                 messages = compressed_messages
             else:
@@ -339,6 +349,7 @@ class ThreadManager:
                     logger.warning(f"Failed to update Langfuse generation: {e}")
 
             # Make LLM call
+            llm_started = time.monotonic()
             try:
                 llm_response = await make_llm_api_call(
                     prepared_messages, llm_model,
@@ -362,6 +373,7 @@ class ThreadManager:
             #     config = ProcessorConfig()  # Fallback
                 
             if stream and hasattr(llm_response, '__aiter__'):
+                llm_response = metrics.timed_stream(llm_response, llm_model, llm_started)
                 return self.response_processor.process_streaming_response(
                     cast(AsyncGenerator, llm_response), thread_id, prepared_messages,
                     llm_model, config, True,
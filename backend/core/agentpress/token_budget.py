@@ -0,0 +1,184 @@
+"""
+Token budget planning over a thread's message list.
+
+Context compression and prompt caching both need to know how many tokens a
+slice of the conversation costs. Instead of re-tokenizing the list for every
+decision, TokenBudget counts each message once (memoized by content, so
+messages carried over from the previous turn are free), builds prefix sums,
+and answers every budget question with O(1) range sums and binary search:
+
+- omission_window: the smallest middle window to drop so the rest fits
+- recent_start: the oldest message of the newest suffix that fits a limit
+- cache_breakpoints: up to 4 Anthropic cache_control positions that stay on
+  the same messages from turn to turn as the thread grows
+"""
+
+import hashlib
+import json
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from litellm.utils import token_counter
+
+MIN_CACHEABLE_TOKENS = 1024  # Anthropic's minimum cacheable prefix
+MAX_CACHE_BREAKPOINTS = 4    # Anthropic's limit per request
+TOKEN_COST_CACHE_SIZE = 20_000
+
+_token_costs: "OrderedDict[Tuple[Optional[str], str], int]" = OrderedDict()
+_list_overheads: Dict[Optional[str], int] = {}
+
+
+def _fingerprint(message: Any) -> str:
+    try:
+        payload = json.dumps(message, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        payload = repr(message)
+    return hashlib.sha1(payload.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def list_overhead(model: Optional[str]) -> int:
+    """Tokens token_counter adds once per message list (reply priming)."""
+    overhead = _list_overheads.get(model)
+    if overhead is None:
+        overhead = _list_overheads[model] = token_counter(model=model, messages=[])
+    return overhead
+
+
+def message_tokens(message: Dict[str, Any], model: Optional[str]) -> int:
+    """Tokens a message adds to a list, memoized by model and content.
+
+    Summing these and adding list_overhead() gives the same total as
+    token_counter() on the whole list.
+    """
+    key = (model, _fingerprint(message))
+    cost = _token_costs.get(key)
+    if cost is not None:
+        _token_costs.move_to_end(key)
+        return cost
+    cost = max(0, token_counter(model=model, messages=[message]) - list_overhead(model))
+    _token_costs[key] = cost
+    if len(_token_costs) > TOKEN_COST_CACHE_SIZE:
+        _token_costs.popitem(last=False)
+    return cost
+
+
+def count_tokens(messages: List[Dict[str, Any]], model: Optional[str], system_prompt: Optional[Dict[str, Any]] = None) -> int:
+    """Drop-in for token_counter(model, messages=[system_prompt] + messages) using memoized costs."""
+    total = list_overhead(model) + sum(message_tokens(msg, model) for msg in messages)
+    if system_prompt:
+        total += message_tokens(system_prompt, model)
+    return total
+
+
+def stable_chunk_size(threshold_tokens: int) -> int:
+    """Round a cache threshold down to MIN_CACHEABLE_TOKENS * 2**k.
+
+    The boundaries for a chunk size are a subset of the boundaries for any
+    smaller power-of-two chunk, so when the threshold grows with the thread
+    the breakpoints that remain still sit on previously cached prefixes.
+    """
+    multiple = max(1, threshold_tokens // MIN_CACHEABLE_TOKENS)
+    return MIN_CACHEABLE_TOKENS << (multiple.bit_length() - 1)
+
+
+class TokenBudget:
+    """Prefix sums of per-message token costs for one message list.
+
+    Attributes:
+        messages: The conversation messages, in order
+        costs: Token cost of each message
+        prefix: prefix[i] is the cost of messages[:i] (len(messages) + 1 entries)
+        fixed_tokens: Cost outside the messages (list overhead, system prompt)
+    """
+
+    def __init__(self, messages: List[Dict[str, Any]], model: Optional[str], system_prompt: Optional[Dict[str, Any]] = None):
+        self.messages = messages
+        self.model = model
+        self.costs = [message_tokens(msg, model) for msg in messages]
+        self.prefix = [0, *accumulate(self.costs)]
+        self.fixed_tokens = list_overhead(model) + (message_tokens(system_prompt, model) if system_prompt else 0)
+
+    @property
+    def conversation_tokens(self) -> int:
+        return self.prefix[-1]
+
+    @property
+    def total(self) -> int:
+        return self.fixed_tokens + self.prefix[-1]
+
+    def range_tokens(self, start: int, end: int) -> int:
+        """Cost of messages[start:end]."""
+        return self.prefix[end] - self.prefix[start]
+
+    def omission_window(self, max_tokens: int, min_messages_to_keep: int = 10) -> Tuple[int, int]:
+        """Smallest middle window [start, end) to drop so the rest fits max_tokens.
+
+        The window is centred on the middle of the list so early context and
+        recent turns are both kept. Tool results right after the window are
+        dropped with it rather than left without their tool call. If even
+        keeping only min_messages_to_keep messages does not fit, the newest
+        min_messages_to_keep are kept.
+        """
+        n = len(self.messages)
+        excess = self.total - max_tokens
+        if excess <= 0 or n <= min_messages_to_keep:
+            return n // 2, n // 2
+
+        def window(k: int) -> Tuple[int, int]:
+            start = (n - k) // 2
+            return start, start + k
+
+        # window(k + 1) contains window(k), so dropped tokens grow with k
+        lo, hi = 1, n - min_messages_to_keep
+        if self.range_tokens(*window(hi)) < excess:
+            return 0, hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.range_tokens(*window(mid)) >= excess:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        start, end = window(lo)
+        while end < n - min_messages_to_keep and isinstance(self.messages[end], dict) and self.messages[end].get('role') == 'tool':
+            end += 1
+        return start, end
+
+    def recent_start(self, token_limit: int) -> int:
+        """Index of the oldest message such that messages[index:] fits token_limit."""
+        return bisect_left(self.prefix, self.prefix[-1] - token_limit, 0, len(self.messages))
+
+    def cache_breakpoints(
+        self,
+        chunk_tokens: int,
+        max_breakpoints: int,
+        eligible: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> List[int]:
+        """Indices of the messages that should carry cache_control.
+
+        Boundary j is the first message at which the running total reaches
+        j * chunk_tokens; a boundary that lands on an ineligible message moves
+        back to the nearest eligible one. Both depend only on earlier
+        messages, so as the thread grows each boundary stays on the same
+        message and the prefix cached on the previous turn is read back. The
+        newest max_breakpoints boundaries are used, and the final message is
+        never one of them.
+        """
+        n = len(self.messages)
+        if n < 2 or max_breakpoints <= 0 or chunk_tokens <= 0:
+            return []
+
+        breakpoints: List[int] = []
+        boundary = self.prefix[n - 1] // chunk_tokens
+        while boundary >= 1 and len(breakpoints) < max_breakpoints:
+            index = bisect_left(self.prefix, boundary * chunk_tokens, 1, n) - 1
+            while index >= 0 and eligible is not None and not eligible(self.messages[index]):
+                index -= 1
+            if index < 0:
+                break
+            if not breakpoints or index < breakpoints[-1]:
+                breakpoints.append(index)
+            boundary -= 1
+        return sorted(breakpoints)
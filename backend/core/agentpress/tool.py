@@ -7,9 +7,10 @@ This module defines the base classes and decorators for creating tools in AgentP
 - Result containers for standardized tool outputs
 """
 
-from typing import Dict, Any, Union, Optional, List
+from typing import Dict, Any, Union, Optional, List, Mapping, Tuple
 from dataclasses import dataclass, field
 from abc import ABC
+from types import MappingProxyType
 import json
 import inspect
 from enum import Enum
@@ -49,25 +50,51 @@ class Tool(ABC):
     
     Attributes:
         _schemas (Dict[str, List[ToolSchema]]): Registered schemas for tool methods
+        _class_schemas (Mapping[str, Tuple[ToolSchema, ...]]): Schemas collected
+            once per subclass at class creation, shared by all instances
         
     Methods:
+        get_class_schemas: Get the schemas declared on the class, without instantiating
         get_schemas: Get all registered tool schemas
+        flush: Persist buffered state at the end of a run
         success_response: Create a successful result
         fail_response: Create a failed result
     """
+
+    _class_schemas: Mapping[str, Tuple[ToolSchema, ...]] = MappingProxyType({})
+
+    def __init_subclass__(cls, **kwargs):
+        """Collect decorated methods across the MRO when the subclass is defined."""
+        super().__init_subclass__(**kwargs)
+        schemas: Dict[str, Tuple[ToolSchema, ...]] = {}
+        # dir() is sorted, matching the order inspect.getmembers produced
+        for name in dir(cls):
+            attr = inspect.getattr_static(cls, name, None)
+            if isinstance(attr, classmethod):
+                attr = attr.__func__
+            if inspect.isfunction(attr) and getattr(attr, 'tool_schemas', None):
+                schemas[name] = tuple(attr.tool_schemas)
+        cls._class_schemas = MappingProxyType(schemas)
+
+    @classmethod
+    def get_class_schemas(cls) -> Mapping[str, Tuple[ToolSchema, ...]]:
+        """Get the schemas declared on this class.
+
+        Returns:
+            Read-only mapping of method names to their schema definitions
+        """
+        return cls._class_schemas
     
     def __init__(self):
-        """Initialize tool with empty schema registry."""
+        """Initialize tool with the schemas collected for its class."""
         self._schemas: Dict[str, List[ToolSchema]] = {}
         # logger.debug(f"Initializing tool class: {self.__class__.__name__}")
         self._register_schemas()
 
     def _register_schemas(self):
         """Register schemas from all decorated methods."""
-        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
-            if hasattr(method, 'tool_schemas'):
-                self._schemas[name] = method.tool_schemas
-                # logger.debug(f"Registered schemas for method '{name}' in {self.__class__.__name__}")
+        for name, schemas in self._class_schemas.items():
+            self._schemas[name] = list(schemas)
 
     def get_schemas(self) -> Dict[str, List[ToolSchema]]:
         """Get all registered tool schemas.
@@ -77,6 +104,10 @@ class Tool(ABC):
         """
         return self._schemas
 
+    async def flush(self) -> None:
+        """Persist any state the tool buffers in memory. Called when the agent run ends."""
+        pass
+
     def success_response(self, data: Union[Dict[str, Any], str]) -> ToolResult:
         """Create a successful tool result.
         
@@ -4,11 +4,86 @@ from core.utils.logger import logger
 import json
 
 
+class _LazyTool:
+    """Defers constructing a registered tool until one of its functions is used.
+
+    One holder is shared by every function registered from the same
+    register_tool call, so the tool is still instantiated at most once.
+    """
+
+    __slots__ = ("tool_class", "kwargs", "instance")
+
+    def __init__(self, tool_class: Type[Tool], kwargs: Dict[str, Any]):
+        self.tool_class = tool_class
+        self.kwargs = kwargs
+        self.instance: Optional[Tool] = None
+
+    def get(self) -> Tool:
+        if self.instance is None:
+            # logger.debug(f"Instantiating tool on first use: {self.tool_class.__name__}")
+            self.instance = self.tool_class(**self.kwargs)
+        return self.instance
+
+
+class _LazyToolFunction:
+    """Callable stand-in for a tool function whose tool is not constructed yet."""
+
+    __slots__ = ("loader", "name")
+
+    def __init__(self, loader: _LazyTool, name: str):
+        self.loader = loader
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        return getattr(self.loader.get(), self.name)(*args, **kwargs)
+
+
+class _ToolTable(dict):
+    """Dict of registered functions that counts mutations.
+
+    Callers (MCP and credential profile setup) still write entries directly,
+    so the version lets the registry notice those writes and rebuild its
+    derived function table only when something actually changed.
+    """
+
+    version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+
 class ToolRegistry:
     """Registry for managing and accessing tools.
     
     Maintains a collection of tool instances and their schemas, allowing for
     selective registration of tool functions and easy access to tool capabilities.
+    Tools are registered from their class-level schemas and only instantiated
+    the first time one of their functions is looked up or called.
     
     Attributes:
         tools (Dict[str, Dict[str, Any]]): OpenAPI-style tools and schemas
@@ -16,12 +91,16 @@ class ToolRegistry:
     Methods:
         register_tool: Register a tool with optional function filtering
         get_tool: Get a specific tool by name
+        get_tool_instance: Get (creating if needed) the tool behind a function
+        flush_tools: Flush buffered state of the tools used so far
         get_openapi_schemas: Get OpenAPI schemas for function calling
     """
     
     def __init__(self):
         """Initialize a new ToolRegistry instance."""
-        self.tools = {}
+        self.tools = _ToolTable()
+        self._functions: Dict[str, Callable] = {}
+        self._functions_version = -1
         logger.debug("Initialized new ToolRegistry instance")
     
     def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
@@ -35,10 +114,17 @@ class ToolRegistry:
         Notes:
             - If function_names is None, all functions are registered
             - Handles OpenAPI schema registration
+            - Tools that build their schemas per instance (overriding get_schemas)
+              are instantiated immediately; all others on first use
         """
         # logger.debug(f"Registering tool class: {tool_class.__name__}")
-        tool_instance = tool_class(**kwargs)
-        schemas = tool_instance.get_schemas()
+        if tool_class.get_schemas is Tool.get_schemas:
+            loader = _LazyTool(tool_class, kwargs)
+            schemas = tool_class.get_class_schemas()
+        else:
+            loader = None
+            tool_instance = tool_class(**kwargs)
+            schemas = tool_instance.get_schemas()
         
         # logger.debug(f"Available schemas for {tool_class.__name__}: {list(schemas.keys())}")
         
@@ -48,41 +134,106 @@ class ToolRegistry:
             if function_names is None or func_name in function_names:
                 for schema in schema_list:
                     if schema.schema_type == SchemaType.OPENAPI:
-                        self.tools[func_name] = {
-                            "instance": tool_instance,
-                            "schema": schema
-                        }
+                        if loader is not None:
+                            self.tools[func_name] = {"loader": loader, "schema": schema}
+                        else:
+                            self.tools[func_name] = {
+                                "instance": tool_instance,
+                                "schema": schema
+                            }
                         registered_openapi += 1
                         # logger.debug(f"Registered OpenAPI function {func_name} from {tool_class.__name__}")
         
         # logger.debug(f"Tool registration complete for {tool_class.__name__}: {registered_openapi} OpenAPI functions")
 
+    def get_tool_instance(self, tool_name: str) -> Optional[Tool]:
+        """Get the tool instance that implements a function, creating it if needed.
+
+        Args:
+            tool_name: Name of the tool function
+
+        Returns:
+            The tool instance, or None if the function is not registered
+        """
+        tool_info = self.tools.get(tool_name)
+        if not tool_info:
+            return None
+        if 'instance' in tool_info:
+            return tool_info['instance']
+        return tool_info['loader'].get()
+
+    async def flush_tools(self) -> None:
+        """Call flush() on every tool instantiated so far, e.g. at the end of a run.
+
+        Tools that were never used are not constructed just to be flushed.
+        One tool failing does not keep the others from persisting; the
+        failures are raised together once all of them were flushed.
+        """
+        instances = {}
+        for tool_info in self.tools.values():
+            instance = tool_info.get('instance')
+            if instance is None and 'loader' in tool_info:
+                instance = tool_info['loader'].instance
+            if isinstance(instance, Tool):
+                instances[id(instance)] = instance
+        failed = []
+        for instance in instances.values():
+            try:
+                await instance.flush()
+            except Exception as e:
+                logger.error(f"Error flushing tool {instance.__class__.__name__}: {e}")
+                failed.append(f"{instance.__class__.__name__}: {e}")
+        if failed:
+            raise RuntimeError(f"Failed to persist tool state ({'; '.join(failed)})")
+
+    def get_function_names(self) -> List[str]:
+        """Get the names of all registered functions without touching the tools."""
+        return list(self.tools.keys())
+
     def get_available_functions(self) -> Dict[str, Callable]:
         """Get all available tool functions.
         
+        The mapping is cached and rebuilt only after the registry changes.
+        Functions of tools that have not been constructed yet are returned as
+        callables that construct the tool on first call.
+        
         Returns:
             Dict mapping function names to their implementations
         """
+        if self._functions_version == self.tools.version:
+            return self._functions
+
         available_functions = {}
         
         # Get OpenAPI tool functions
         for tool_name, tool_info in self.tools.items():
-            tool_instance = tool_info['instance']
             function_name = tool_name
-            function = getattr(tool_instance, function_name)
+            if 'instance' in tool_info:
+                function = getattr(tool_info['instance'], function_name)
+            elif tool_info['loader'].instance is not None:
+                function = getattr(tool_info['loader'].instance, function_name)
+            else:
+                function = _LazyToolFunction(tool_info['loader'], function_name)
             available_functions[function_name] = function
             
         # logger.debug(f"Retrieved {len(available_functions)} available functions")
+        self._functions = available_functions
+        self._functions_version = self.tools.version
         return available_functions
 
     def get_tool(self, tool_name: str) -> Dict[str, Any]:
-        """Get a specific tool by name.
-        
+        """Get the registry entry of a tool function by name.
+
+        The entry is not resolved: lazily registered tools have a 'loader'
+        instead of an 'instance' until first used. Use get_tool_instance()
+        to get the tool itself.
+
         Args:
             tool_name: Name of the tool function
-            
+
         Returns:
-            Dict containing tool instance and schema, or empty dict if not found
+            Dict with the function's 'schema' and either its tool 'instance'
+            or a 'loader', or empty dict if not found
         """
         tool = self.tools.get(tool_name, {})
         if not tool:
@@ -21,6 +21,9 @@ class ModelCapability(Enum):
     WEB_SEARCH = "web_search"
     THINKING = "thinking"
     STRUCTURED_OUTPUT = "structured_output"
+    # Tool calls come reliably through the native tools API, so the XML
+    # tool calling format is left out of the prompt and the stream parser
+    NATIVE_TOOLS_ONLY = "native_tools_only"
 
 
 @dataclass
@@ -72,6 +75,12 @@ class Model:
     metadata: Dict[str, Any] = field(default_factory=dict)
     priority: int = 0
     recommended: bool = False
+    # Models in the same group serve the same model through different
+    # endpoints; the LLM router moves calls between them
+    deployment_group: Optional[str] = None
+    # Configuration setting holding the API key the model is called with; a
+    # model only takes calls of its group while that setting is set
+    api_key_setting: Optional[str] = None
     
     # NEW: Centralized model configuration
     config: Optional[ModelConfig] = None
@@ -98,6 +107,10 @@ class Model:
     def supports_vision(self) -> bool:
         return ModelCapability.VISION in self.capabilities
 
+    @property
+    def native_tools_only(self) -> bool:
+        return self.supports_functions and ModelCapability.NATIVE_TOOLS_ONLY in self.capabilities
+
     def get_litellm_params(self, **override_params) -> Dict[str, Any]:
         """Get complete LiteLLM parameters for this model, including all configuration."""
         # Import config here to avoid circular imports
@@ -20,6 +20,9 @@ class ModelManager:
             
         return model_id
     
+    def get_equivalent_models(self, model_id: str) -> List[Model]:
+        return self.registry.get_equivalents(model_id)
+
     def validate_model(self, model_id: str) -> Tuple[bool, str]:
         model = self.get_model(model_id)
         
@@ -37,6 +37,7 @@ class ModelRegistry:
                 capabilities=[
                     ModelCapability.CHAT,
                     ModelCapability.FUNCTION_CALLING,
+                    ModelCapability.NATIVE_TOOLS_ONLY,
                     ModelCapability.VISION,
                     ModelCapability.THINKING,
                 ],
@@ -47,6 +48,8 @@ class ModelRegistry:
                 priority=101,
                 recommended=False,
                 enabled=True,
+                deployment_group="claude-sonnet-4.5",
+                api_key_setting="ANTHROPIC_API_KEY",
                 config=ModelConfig(
                     extra_headers={"anthropic-beta": "context-1m-2025-08-07"},
                 ),
@@ -72,6 +75,7 @@ class ModelRegistry:
                 capabilities=[
                     ModelCapability.CHAT,
                     ModelCapability.FUNCTION_CALLING,
+                    ModelCapability.NATIVE_TOOLS_ONLY,
                     ModelCapability.VISION,
                     ModelCapability.THINKING,
                 ],
@@ -81,7 +85,9 @@ class ModelRegistry:
                 ),
                 priority=102,  # Higher priority due to better pricing
                 recommended=True,  # Recommend due to cost savings
-                enabled=True,
+                enabled=bool(config.AI302_API_KEY),
+                deployment_group="claude-sonnet-4.5",
+                api_key_setting="AI302_API_KEY",
                 config=ModelConfig(
                     api_base="https://api.302.ai/cc",  # 302.AI discounted endpoint
                     extra_headers={
@@ -110,6 +116,7 @@ class ModelRegistry:
                 capabilities=[
                     ModelCapability.CHAT,
                     ModelCapability.FUNCTION_CALLING,
+                    ModelCapability.NATIVE_TOOLS_ONLY,
                     ModelCapability.VISION,
                     ModelCapability.THINKING,
                 ],
@@ -237,6 +244,7 @@ class ModelRegistry:
                 capabilities=[
                     ModelCapability.CHAT,
                     ModelCapability.FUNCTION_CALLING,
+                    ModelCapability.NATIVE_TOOLS_ONLY,
                     ModelCapability.VISION,
                     ModelCapability.STRUCTURED_OUTPUT,
                     ModelCapability.THINKING,
@@ -260,6 +268,7 @@ class ModelRegistry:
                 capabilities=[
                     ModelCapability.CHAT,
                     ModelCapability.FUNCTION_CALLING,
+                    ModelCapability.NATIVE_TOOLS_ONLY,
                     ModelCapability.STRUCTURED_OUTPUT,
                 ],
                 pricing=ModelPricing(
@@ -359,6 +368,8 @@ class ModelRegistry:
                 ),
                 priority=93,
                 enabled=True,
+                deployment_group="glm-4.6",
+                api_key_setting="ZAI_API_KEY",
                 config=ModelConfig(api_base="https://api.z.ai/api/coding/paas/v4"),
             )
         )
@@ -385,6 +396,8 @@ class ModelRegistry:
                 ),
                 priority=92,  # Slightly lower priority than OpenAI version
                 enabled=True,
+                deployment_group="glm-4.6",
+                api_key_setting="ZAI_API_KEY",
                 config=ModelConfig(
                     api_base="https://api.z.ai/api/anthropic",
                 ),
@@ -493,6 +506,24 @@ class ModelRegistry:
         model = self.get(model_id)
         return model.id if model else None
 
+    def get_equivalents(self, model_id: str) -> List[Model]:
+        """Other enabled deployments of the same model that can take its calls:
+        their API key is configured, and they have every capability of it and
+        at least its context window (prompts are compressed to the window of
+        the model they are built for)."""
+        model = self.get(model_id)
+        if not model or not model.deployment_group:
+            return []
+        equivalents = [
+            m for m in self.get_all(enabled_only=True)
+            if m.id != model.id
+            and m.deployment_group == model.deployment_group
+            and m.api_key_setting and getattr(config, m.api_key_setting, None)
+            and all(cap in m.capabilities for cap in model.capabilities)
+            and m.context_window >= model.context_window
+        ]
+        return sorted(equivalents, key=lambda m: -m.priority)
+
     def get_aliases(self, model_id: str) -> List[str]:
         model = self.get(model_id)
         return model.aliases if model else []
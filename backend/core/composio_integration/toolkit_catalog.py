@@ -0,0 +1,387 @@
+"""
+Local snapshot of the Composio toolkit catalog.
+
+The Composio SDK is synchronous, so every call goes through asyncio.to_thread.
+The full toolkit list, the per-category membership and the icons are fetched
+in the background, shared between processes through Redis and served from
+memory. Icons looked up one by one are cached in Redis next to the catalog.
+Services built with their own Composio API key get a catalog of their own,
+fetched with that key and cached under a key-specific Redis key. Search uses a trigram inverted index over name, description and tags
+and keeps the previous substring-match semantics.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from core.utils.logger import logger
+from .client import ComposioClient
+from .toolkit_service import POPULAR_CATEGORIES, ToolkitInfo, parse_toolkit_item
+
+CATALOG_CACHE_KEY = "composio:toolkit-catalog:v1"
+ICONS_CACHE_KEY = "composio:toolkit-icons:v1"
+CATALOG_CACHE_TTL = 6 * 3600
+CATALOG_REFRESH_INTERVAL = 30 * 60
+CATALOG_PAGE_LIMIT = 500
+DETAILS_TTL = 15 * 60
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _search_fields(toolkit: ToolkitInfo) -> List[str]:
+    fields = [toolkit.name.lower()]
+    if toolkit.description:
+        fields.append(toolkit.description.lower())
+    fields.extend(tag.lower() for tag in toolkit.tags)
+    return fields
+
+
+class _TTLCache:
+    """Small in-process TTL map for per-toolkit lookups (details, tools, icons)."""
+
+    def __init__(self, ttl: int, max_entries: int = 1000):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: Dict[str, tuple] = {}
+
+    def get(self, key: str) -> tuple:
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] < self._ttl:
+            return True, entry[1]
+        return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        if len(self._entries) >= self._max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            self._entries.pop(oldest, None)
+        self._entries[key] = (time.monotonic(), value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class ToolkitCatalog:
+    def __init__(self, refresh_interval: int = CATALOG_REFRESH_INTERVAL, api_key: Optional[str] = None):
+        self.refresh_interval = refresh_interval
+        self.api_key = api_key
+        suffix = f":{hashlib.sha256(api_key.encode()).hexdigest()[:16]}" if api_key else ""
+        self.cache_key = CATALOG_CACHE_KEY + suffix
+        self.icons_key = ICONS_CACHE_KEY + suffix
+        self._client = None
+        self._toolkits: List[ToolkitInfo] = []
+        self._by_slug: Dict[str, ToolkitInfo] = {}
+        self._fields: Dict[str, List[str]] = {}
+        self._trigram_index: Dict[str, Set[str]] = {}
+        self._categories: Dict[str, List[str]] = {}
+        self._icons: Dict[str, Optional[str]] = {}
+        self._loaded_at: float = 0.0
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
+        self._lookups = _TTLCache(DETAILS_TTL)
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self.api_key:
+                from composio_client import Composio
+                self._client = Composio(api_key=self.api_key)
+            else:
+                self._client = ComposioClient.get_client()
+        return self._client
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self._loaded_at >= self.refresh_interval
+
+    async def call_sdk(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking SDK call off the event loop."""
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Snapshot management
+    # ------------------------------------------------------------------
+
+    def _apply_snapshot(self, toolkits: List[ToolkitInfo], categories: Dict[str, List[str]],
+                        icons: Dict[str, Optional[str]], loaded_at: float) -> None:
+        by_slug: Dict[str, ToolkitInfo] = {}
+        fields: Dict[str, List[str]] = {}
+        index: Dict[str, Set[str]] = {}
+        for toolkit in toolkits:
+            by_slug[toolkit.slug] = toolkit
+            toolkit_fields = _search_fields(toolkit)
+            fields[toolkit.slug] = toolkit_fields
+            for field in toolkit_fields:
+                for gram in _trigrams(field):
+                    index.setdefault(gram, set()).add(toolkit.slug)
+
+        merged_icons = {t.slug: t.logo for t in toolkits if t.logo}
+        merged_icons.update({k: v for k, v in icons.items() if v})
+
+        self._toolkits = toolkits
+        self._by_slug = by_slug
+        self._fields = fields
+        self._trigram_index = index
+        self._categories = categories
+        self._icons = {**self._icons, **merged_icons}
+        self._loaded_at = loaded_at
+
+    def _snapshot_payload(self) -> str:
+        return json.dumps({
+            "ts": self._loaded_at,
+            "toolkits": [t.model_dump() for t in self._toolkits],
+            "categories": self._categories,
+            "icons": self._icons,
+        })
+
+    async def _load_from_redis(self) -> bool:
+        try:
+            from core.services import redis as redis_service
+            redis_client = await redis_service.get_client()
+            cached_json = await redis_client.get(self.cache_key)
+            if not cached_json:
+                return False
+            data = json.loads(cached_json)
+            if data.get("ts", 0) <= self._loaded_at:
+                return False
+            self._apply_snapshot(
+                [ToolkitInfo(**t) for t in data.get("toolkits", [])],
+                data.get("categories", {}),
+                data.get("icons", {}),
+                data["ts"],
+            )
+            logger.debug(f"Loaded Composio toolkit catalog from Redis ({len(self._toolkits)} toolkits)")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load Composio toolkit catalog from Redis: {e}")
+            return False
+
+    async def _save_to_redis(self) -> None:
+        try:
+            from core.services import redis as redis_service
+            redis_client = await redis_service.get_client()
+            await redis_client.set(self.cache_key, self._snapshot_payload(), ex=CATALOG_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not store Composio toolkit catalog in Redis: {e}")
+
+    async def _load_icon_from_redis(self, slug: str) -> Optional[str]:
+        try:
+            from core.services import redis as redis_service
+            redis_client = await redis_service.get_client()
+            return await redis_client.hget(self.icons_key, slug)
+        except Exception as e:
+            logger.warning(f"Could not load Composio toolkit icon from Redis: {e}")
+            return None
+
+    async def _save_icon_to_redis(self, slug: str, logo: str) -> None:
+        try:
+            from core.services import redis as redis_service
+            redis_client = await redis_service.get_client()
+            pipe = redis_client.pipeline()
+            pipe.hset(self.icons_key, slug, logo)
+            pipe.expire(self.icons_key, CATALOG_CACHE_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not store Composio toolkit icon in Redis: {e}")
+
+    async def _fetch_toolkits(self, category: Optional[str] = None) -> List[ToolkitInfo]:
+        toolkits: List[ToolkitInfo] = []
+        params: Dict[str, Any] = {"limit": CATALOG_PAGE_LIMIT, "managed_by": "composio"}
+        if category:
+            params["category"] = category
+
+        seen_cursors: Set[str] = set()
+        while True:
+            response = await self.call_sdk(self.client.toolkits.list, **params)
+            response_data = response.__dict__ if hasattr(response, '__dict__') else response
+            for item in response_data.get('items', []):
+                toolkit = parse_toolkit_item(item)
+                if toolkit:
+                    toolkits.append(toolkit)
+
+            next_cursor = response_data.get("next_cursor")
+            if not next_cursor or next_cursor in seen_cursors:
+                break
+            seen_cursors.add(next_cursor)
+            params["cursor"] = next_cursor
+        return toolkits
+
+    async def refresh(self, force: bool = False) -> None:
+        """Rebuild the snapshot from the SDK unless a fresher one is in Redis."""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+
+        started_at = self._loaded_at
+        async with self._refresh_lock:
+            if self._loaded_at != started_at and not force:
+                return
+            if not force and await self._load_from_redis() and not self.is_stale:
+                return
+
+            started = time.time()
+            toolkits = await self._fetch_toolkits()
+            category_results = await asyncio.gather(
+                *(self._fetch_toolkits(cat["id"]) for cat in POPULAR_CATEGORIES),
+                return_exceptions=True,
+            )
+            categories: Dict[str, List[str]] = {}
+            for cat, result in zip(POPULAR_CATEGORIES, category_results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed to fetch Composio category {cat['id']}: {result}")
+                    categories[cat["id"]] = self._categories.get(cat["id"], [])
+                else:
+                    categories[cat["id"]] = [t.slug for t in result]
+
+            self._apply_snapshot(toolkits, categories, {}, time.time())
+            await self._save_to_redis()
+            logger.debug(f"Refreshed Composio toolkit catalog: {len(toolkits)} toolkits in {time.time() - started:.2f}s")
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._safe_refresh())
+
+    async def _safe_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Composio toolkit catalog refresh failed: {e}", exc_info=True)
+
+    async def ensure_loaded(self) -> None:
+        """Serve stale data while revalidating; only block when nothing is loaded."""
+        if not self._toolkits:
+            if not await self._load_from_redis():
+                await self.refresh()
+                return
+        if self.is_stale:
+            self._schedule_refresh()
+
+    def start_background_refresh(self) -> None:
+        if self._background_task and not self._background_task.done():
+            return
+        self._background_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_background_refresh(self) -> None:
+        for task in (self._background_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._background_task = None
+        self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self._safe_refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    async def _category_slugs(self, category: str) -> List[str]:
+        if category not in self._categories:
+            # Categories outside the popular list are fetched once and memoized
+            self._categories[category] = [t.slug for t in await self._fetch_toolkits(category)]
+        return self._categories[category]
+
+    def _page(self, items: List[ToolkitInfo], limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+        try:
+            offset = max(int(cursor), 0) if cursor else 0
+        except ValueError:
+            offset = 0
+        page = items[offset:offset + limit]
+        next_offset = offset + len(page)
+        return {
+            "items": page,
+            "total_items": len(items),
+            "total_pages": max(1, -(-len(items) // limit)) if limit else 1,
+            "current_page": (offset // limit) + 1 if limit else 1,
+            "next_cursor": str(next_offset) if next_offset < len(items) else None,
+        }
+
+    def _resolve(self, slugs: Iterable[str]) -> List[ToolkitInfo]:
+        return [self._by_slug[slug] for slug in slugs if slug in self._by_slug]
+
+    async def list_toolkits(self, limit: int = 500, cursor: Optional[str] = None, category: Optional[str] = None) -> Dict[str, Any]:
+        await self.ensure_loaded()
+        items = self._resolve(await self._category_slugs(category)) if category else self._toolkits
+        return self._page(items, limit, cursor)
+
+    def _match(self, query: str) -> Set[str]:
+        if len(query) < 3:
+            return {slug for slug, fields in self._fields.items() if any(query in f for f in fields)}
+
+        candidates: Optional[Set[str]] = None
+        for gram in sorted(_trigrams(query), key=lambda g: len(self._trigram_index.get(g, ()))):
+            postings = self._trigram_index.get(gram)
+            if not postings:
+                return set()
+            candidates = set(postings) if candidates is None else candidates & postings
+            if not candidates:
+                return set()
+        return {slug for slug in candidates or () if any(query in f for f in self._fields[slug])}
+
+    async def search_toolkits(self, query: str, category: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        await self.ensure_loaded()
+        matches = self._match(query.lower())
+        pool = self._resolve(await self._category_slugs(category)) if category else self._toolkits
+        filtered = [t for t in pool if t.slug in matches]
+        return {
+            "items": filtered[:limit],
+            "total_items": len(filtered),
+            "total_pages": 1,
+            "current_page": 1,
+            "next_cursor": None,
+        }
+
+    async def get_toolkit(self, slug: str) -> Optional[ToolkitInfo]:
+        await self.ensure_loaded()
+        return self._by_slug.get(slug)
+
+    async def get_icon(self, slug: str, loader: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        if slug in self._icons:
+            return self._icons[slug]
+        await self.ensure_loaded()
+        if slug in self._icons:
+            return self._icons[slug]
+        logo = await self._load_icon_from_redis(slug)
+        if logo:
+            self._icons[slug] = logo
+            return logo
+        logo = await loader()
+        if logo:
+            self._icons[slug] = logo
+            await self._save_icon_to_redis(slug, logo)
+        return logo
+
+    async def cached(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Memoize per-toolkit lookups (details, tool pages) for DETAILS_TTL seconds."""
+        hit, value = self._lookups.get(key)
+        if hit:
+            return value
+        value = await loader()
+        if value is not None:
+            self._lookups.set(key, value)
+        return value
+
+
+toolkit_catalog = ToolkitCatalog()
+_keyed_catalogs: Dict[str, ToolkitCatalog] = {}
+
+
+def catalog_for(api_key: Optional[str] = None) -> ToolkitCatalog:
+    """The catalog fetched with `api_key`; the shared one for the default key."""
+    if not api_key or api_key == os.getenv("COMPOSIO_API_KEY"):
+        return toolkit_catalog
+    catalog = _keyed_catalogs.get(api_key)
+    if catalog is None:
+        catalog = _keyed_catalogs[api_key] = ToolkitCatalog(api_key=api_key)
+    return catalog
@@ -73,23 +73,83 @@ class ToolsListResponse(BaseModel):
     total_pages: int = 1
 
 
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    if isinstance(obj, dict):
+        return obj
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    if hasattr(obj, '_asdict'):
+        return obj._asdict()
+    return obj or {}
+
+
+def parse_toolkit_item(item: Any) -> Optional[ToolkitInfo]:
+    """Map a raw SDK toolkit item to ToolkitInfo, or None when it is not offered.
+
+    Only toolkits that have OAUTH2 both as an auth scheme and as a Composio
+    managed scheme are listed.
+    """
+    toolkit_data = _as_dict(item)
+
+    auth_schemes = toolkit_data.get("auth_schemes", [])
+    composio_managed_auth_schemes = toolkit_data.get("composio_managed_auth_schemes", [])
+
+    if "OAUTH2" not in auth_schemes or "OAUTH2" not in composio_managed_auth_schemes:
+        return None
+
+    meta = toolkit_data.get("meta", {})
+    if hasattr(meta, '__dict__'):
+        meta = meta.__dict__
+    if not isinstance(meta, dict):
+        meta = {}
+
+    logo_url = meta.get("logo") or toolkit_data.get("logo")
+
+    tags = []
+    categories = []
+    for cat in meta.get("categories", []) or []:
+        cat_dict = _as_dict(cat)
+        tags.append(cat_dict.get("name", ""))
+        categories.append(cat_dict.get("id", ""))
+
+    description = meta.get("description") or toolkit_data.get("description")
+
+    return ToolkitInfo(
+        slug=toolkit_data.get("slug", ""),
+        name=toolkit_data.get("name", ""),
+        description=description,
+        logo=logo_url,
+        tags=tags,
+        auth_schemes=auth_schemes,
+        categories=categories
+    )
+
+
+POPULAR_CATEGORIES = [
+    {"id": "popular", "name": "Popular"},
+    {"id": "productivity", "name": "Productivity"},
+    {"id": "crm", "name": "CRM"},
+    {"id": "marketing", "name": "Marketing"},
+    {"id": "analytics", "name": "Analytics"},
+    {"id": "communication", "name": "Communication"},
+    {"id": "project-management", "name": "Project Management"},
+    {"id": "scheduling", "name": "Scheduling"},
+]
+
+
 class ToolkitService:
     def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
         self.client = ComposioClient.get_client(api_key)
+
+    @property
+    def catalog(self):
+        from .toolkit_catalog import catalog_for
+        return catalog_for(self.api_key)
     
     async def list_categories(self) -> List[CategoryInfo]:
         try:
             logger.debug("Fetching Composio categories")
-            popular_categories = [
-                {"id": "popular", "name": "Popular"},
-                {"id": "productivity", "name": "Productivity"},
-                {"id": "crm", "name": "CRM"},
-                {"id": "marketing", "name": "Marketing"},
-                {"id": "analytics", "name": "Analytics"},
-                {"id": "communication", "name": "Communication"},
-                {"id": "project-management", "name": "Project Management"},
-                {"id": "scheduling", "name": "Scheduling"},
-            ]
 
             special_apps=[
                 "googlesuper",
@@ -97,7 +157,7 @@ class ToolkitService:
                 "docusign"
             ]
             
-            categories = [CategoryInfo(**cat) for cat in popular_categories]
+            categories = [CategoryInfo(**cat) for cat in POPULAR_CATEGORIES]
             logger.debug(f"Successfully fetched {len(categories)} categories")
             return categories
             
@@ -108,95 +168,8 @@ class ToolkitService:
     async def list_toolkits(self, limit: int = 500, cursor: Optional[str] = None, category: Optional[str] = None) -> Dict[str, Any]:
         try:
             logger.debug(f"Fetching toolkits with limit: {limit}, cursor: {cursor}, category: {category}")
-            params = {
-                "limit": limit,
-                "managed_by": "composio"
-            }
-            
-            if cursor:
-                params["cursor"] = cursor
-            if category:
-                params["category"] = category
-            
-            toolkits_response = self.client.toolkits.list(**params)
-            
-            if hasattr(toolkits_response, '__dict__'):
-                response_data = toolkits_response.__dict__
-            else:
-                response_data = toolkits_response
-            
-            items = response_data.get('items', [])
-            
-            toolkits = []
-            for item in items:
-                if hasattr(item, '__dict__'):
-                    toolkit_data = item.__dict__
-                elif hasattr(item, '_asdict'):
-                    toolkit_data = item._asdict()
-                else:
-                    toolkit_data = item
-                
-                auth_schemes = toolkit_data.get("auth_schemes", [])
-                composio_managed_auth_schemes = toolkit_data.get("composio_managed_auth_schemes", [])
-
-                if "OAUTH2" not in auth_schemes or "OAUTH2" not in composio_managed_auth_schemes:
-                    continue
-                
-                logo_url = None
-                meta = toolkit_data.get("meta", {})
-                if isinstance(meta, dict):
-                    logo_url = meta.get("logo")
-                elif hasattr(meta, '__dict__'):
-                    logo_url = meta.__dict__.get("logo")
-                
-                if not logo_url:
-                    logo_url = toolkit_data.get("logo")
-                
-                tags = []
-                categories = []
-                if isinstance(meta, dict) and "categories" in meta:
-                    category_list = meta.get("categories", [])
-                    for cat in category_list:
-                        if isinstance(cat, dict):
-                            cat_name = cat.get("name", "")
-                            cat_id = cat.get("id", "")
-                            tags.append(cat_name)
-                            categories.append(cat_id)
-                        elif hasattr(cat, '__dict__'):
-                            cat_name = cat.__dict__.get("name", "")
-                            cat_id = cat.__dict__.get("id", "")
-                            tags.append(cat_name)
-                            categories.append(cat_id)
-                
-                description = None
-                if isinstance(meta, dict):
-                    description = meta.get("description")
-                elif hasattr(meta, '__dict__'):
-                    description = meta.__dict__.get("description")
-                
-                if not description:
-                    description = toolkit_data.get("description")
-                
-                toolkit = ToolkitInfo(
-                    slug=toolkit_data.get("slug", ""),
-                    name=toolkit_data.get("name", ""),
-                    description=description,
-                    logo=logo_url,
-                    tags=tags,
-                    auth_schemes=auth_schemes,
-                    categories=categories
-                )
-                toolkits.append(toolkit)
-            
-            result = {
-                "items": toolkits,
-                "total_items": response_data.get("total_items", len(toolkits)),
-                "total_pages": response_data.get("total_pages", 1),
-                "current_page": response_data.get("current_page", 1),
-                "next_cursor": response_data.get("next_cursor")
-            }
-            
-            logger.debug(f"Successfully fetched {len(toolkits)} toolkits with OAUTH2 in both auth schemes" + (f" for category {category}" if category else ""))
+            result = await self.catalog.list_toolkits(limit=limit, cursor=cursor, category=category)
+            logger.debug(f"Served {len(result['items'])} toolkits from catalog" + (f" for category {category}" if category else ""))
             return result
             
         except Exception as e:
@@ -205,40 +178,16 @@ class ToolkitService:
     
     async def get_toolkit_by_slug(self, slug: str) -> Optional[ToolkitInfo]:
         try:
-            toolkits_response = await self.list_toolkits()
-            toolkits = toolkits_response.get("items", [])
-            for toolkit in toolkits:
-                if toolkit.slug == slug:
-                    return toolkit
-            return None
+            return await self.catalog.get_toolkit(slug)
         except Exception as e:
             logger.error(f"Failed to get toolkit {slug}: {e}", exc_info=True)
             raise
     
     async def search_toolkits(self, query: str, category: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
         try:
-            all_toolkits_response = await self.list_toolkits(limit=500, cursor=cursor, category=category)
-            toolkits = all_toolkits_response.get("items", [])
-            query_lower = query.lower()
-            
-            filtered_toolkits = [
-                toolkit for toolkit in toolkits
-                if query_lower in toolkit.name.lower() 
-                or (toolkit.description and query_lower in toolkit.description.lower())
-                or any(query_lower in tag.lower() for tag in toolkit.tags)
-            ]
-            
-            limited_results = filtered_toolkits[:limit]
-            
-            result = {
-                "items": limited_results,
-                "total_items": len(filtered_toolkits),
-                "total_pages": 1,
-                "current_page": 1,
-                "next_cursor": None
-            }
+            result = await self.catalog.search_toolkits(query, category=category, limit=limit)
             
-            logger.debug(f"Found {len(filtered_toolkits)} toolkits with OAUTH2 in both auth schemes matching query: {query}" + (f" in category {category}" if category else ""))
+            logger.debug(f"Found {result['total_items']} toolkits with OAUTH2 in both auth schemes matching query: {query}" + (f" in category {category}" if category else ""))
             return result
             
         except Exception as e:
@@ -246,9 +195,12 @@ class ToolkitService:
             raise
     
     async def get_toolkit_icon(self, toolkit_slug: str) -> Optional[str]:
+        return await self.catalog.get_icon(toolkit_slug, lambda: self._fetch_toolkit_icon(toolkit_slug))
+
+    async def _fetch_toolkit_icon(self, toolkit_slug: str) -> Optional[str]:
         try:
             # logger.debug(f"Fetching toolkit icon for: {toolkit_slug}")
-            toolkit_response = self.client.toolkits.retrieve(toolkit_slug)
+            toolkit_response = await self.catalog.call_sdk(self.client.toolkits.retrieve, toolkit_slug)
             
             if hasattr(toolkit_response, 'model_dump'):
                 toolkit_dict = toolkit_response.model_dump()
@@ -273,9 +225,15 @@ class ToolkitService:
             return None
 
     async def get_detailed_toolkit_info(self, toolkit_slug: str) -> Optional[DetailedToolkitInfo]:
+        return await self.catalog.cached(
+            f"details:{toolkit_slug}",
+            lambda: self._fetch_detailed_toolkit_info(toolkit_slug)
+        )
+
+    async def _fetch_detailed_toolkit_info(self, toolkit_slug: str) -> Optional[DetailedToolkitInfo]:
         try:
             logger.debug(f"Fetching detailed toolkit info for: {toolkit_slug}")
-            toolkit_response = self.client.toolkits.retrieve(toolkit_slug)
+            toolkit_response = await self.catalog.call_sdk(self.client.toolkits.retrieve, toolkit_slug)
             
             if hasattr(toolkit_response, 'model_dump'):
                 toolkit_dict = toolkit_response.model_dump()
@@ -417,71 +375,10 @@ class ToolkitService:
 
     async def get_toolkit_tools(self, toolkit_slug: str, limit: int = 50, cursor: Optional[str] = None) -> ToolsListResponse:
         try:
-            logger.debug(f"Fetching tools for toolkit: {toolkit_slug}")
-            
-            params = {
-                "limit": limit,
-                "toolkit_slug": toolkit_slug
-            }
-            
-            if cursor:
-                params["cursor"] = cursor
-            
-            tools_response = self.client.tools.list(**params)
-            
-            if hasattr(tools_response, '__dict__'):
-                response_data = tools_response.__dict__
-            else:
-                response_data = tools_response
-            
-            items = response_data.get('items', [])
-            
-            tools = []
-            for item in items:
-                if hasattr(item, '__dict__'):
-                    tool_data = item.__dict__
-                elif hasattr(item, '_asdict'):
-                    tool_data = item._asdict()
-                else:
-                    tool_data = item
-                
-                input_params_raw = tool_data.get("input_parameters", {})
-                output_params_raw = tool_data.get("output_parameters", {})
-                
-                input_parameters = ParameterSchema()
-                if isinstance(input_params_raw, dict):
-                    input_parameters.properties = input_params_raw.get("properties", input_params_raw)
-                    input_parameters.required = input_params_raw.get("required")
-                
-                output_parameters = ParameterSchema()  
-                if isinstance(output_params_raw, dict):
-                    output_parameters.properties = output_params_raw.get("properties", output_params_raw)
-                    output_parameters.required = output_params_raw.get("required")
-                
-                tool = ToolInfo(
-                    slug=tool_data.get("slug", ""),
-                    name=tool_data.get("name", ""),
-                    description=tool_data.get("description", ""),
-                    version=tool_data.get("version", "1.0.0"),
-                    input_parameters=input_parameters,
-                    output_parameters=output_parameters,
-                    scopes=tool_data.get("scopes", []),
-                    tags=tool_data.get("tags", []),
-                    no_auth=tool_data.get("no_auth", False)
-                )
-                tools.append(tool)
-            
-            result = ToolsListResponse(
-                items=tools,
-                total_items=response_data.get("total_items", len(tools)),
-                total_pages=response_data.get("total_pages", 1),
-                current_page=response_data.get("current_page", 1),
-                next_cursor=response_data.get("next_cursor")
+            return await self.catalog.cached(
+                f"tools:{toolkit_slug}:{limit}:{cursor or ''}",
+                lambda: self._fetch_toolkit_tools(toolkit_slug, limit, cursor)
             )
-            
-            logger.debug(f"Successfully fetched {len(tools)} tools for toolkit {toolkit_slug}")
-            return result
-            
         except Exception as e:
             logger.error(f"Failed to get tools for toolkit {toolkit_slug}: {e}", exc_info=True)
             return ToolsListResponse(
@@ -489,4 +386,70 @@ class ToolkitService:
                 total_items=0,
                 current_page=1,
                 total_pages=1
-            ) 
+            )
+
+    async def _fetch_toolkit_tools(self, toolkit_slug: str, limit: int, cursor: Optional[str]) -> ToolsListResponse:
+        logger.debug(f"Fetching tools for toolkit: {toolkit_slug}")
+        
+        params = {
+            "limit": limit,
+            "toolkit_slug": toolkit_slug
+        }
+        
+        if cursor:
+            params["cursor"] = cursor
+        
+        tools_response = await self.catalog.call_sdk(self.client.tools.list, **params)
+        
+        if hasattr(tools_response, '__dict__'):
+            response_data = tools_response.__dict__
+        else:
+            response_data = tools_response
+        
+        items = response_data.get('items', [])
+        
+        tools = []
+        for item in items:
+            if hasattr(item, '__dict__'):
+                tool_data = item.__dict__
+            elif hasattr(item, '_asdict'):
+                tool_data = item._asdict()
+            else:
+                tool_data = item
+            
+            input_params_raw = tool_data.get("input_parameters", {})
+            output_params_raw = tool_data.get("output_parameters", {})
+            
+            input_parameters = ParameterSchema()
+            if isinstance(input_params_raw, dict):
+                input_parameters.properties = input_params_raw.get("properties", input_params_raw)
+                input_parameters.required = input_params_raw.get("required")
+            
+            output_parameters = ParameterSchema()  
+            if isinstance(output_params_raw, dict):
+                output_parameters.properties = output_params_raw.get("properties", output_params_raw)
+                output_parameters.required = output_params_raw.get("required")
+            
+            tool = ToolInfo(
+                slug=tool_data.get("slug", ""),
+                name=tool_data.get("name", ""),
+                description=tool_data.get("description", ""),
+                version=tool_data.get("version", "1.0.0"),
+                input_parameters=input_parameters,
+                output_parameters=output_parameters,
+                scopes=tool_data.get("scopes", []),
+                tags=tool_data.get("tags", []),
+                no_auth=tool_data.get("no_auth", False)
+            )
+            tools.append(tool)
+        
+        result = ToolsListResponse(
+            items=tools,
+            total_items=response_data.get("total_items", len(tools)),
+            total_pages=response_data.get("total_pages", 1),
+            current_page=response_data.get("current_page", 1),
+            next_cursor=response_data.get("next_cursor")
+        )
+        
+        logger.debug(f"Successfully fetched {len(tools)} tools for toolkit {toolkit_slug}")
+        return result
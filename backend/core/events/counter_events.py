@@ -1,24 +1,20 @@
 """Event handlers for counter updates."""
 
-from typing import Optional
 from core.websocket.counter_socket import counter_manager
 from core.services.counter_service import counter_service
 from core.utils.logger import logger
-import asyncio
-from collections import defaultdict
 import time
 
 
 class CounterEventManager:
-    """Manages counter update events with rate limiting."""
+    """Emits counter update events to WebSocket clients.
 
-    def __init__(self):
-        # Rate limiting: track last update time per session
-        self._last_update = defaultdict(float)
-        self._min_update_interval = 0.1  # 100ms minimum between updates
+    Updates are published to every API instance; bursts are coalesced per
+    session by the connection manager (see core.websocket.counter_socket).
+    """
 
     async def emit_context_used(
-        self, session_id: str, used: int, total: int, force: bool = False
+        self, session_id: str, used: int, total: int
     ):
         """
         Emit context_used event to WebSocket clients.
@@ -27,18 +23,8 @@ class CounterEventManager:
             session_id: The session/thread ID
             used: Tokens used
             total: Total tokens available
-            force: Skip rate limiting if True
         """
         try:
-            # Rate limiting check
-            if not force:
-                now = time.time()
-                last = self._last_update.get(session_id, 0)
-                if now - last < self._min_update_interval:
-                    logger.debug(f"Rate limited context update for {session_id}")
-                    return
-                self._last_update[session_id] = now
-
             # Update counter service
             context_data = await counter_service.update_context_usage(
                 session_id, used, total
@@ -52,7 +38,7 @@ class CounterEventManager:
                 "timestamp": time.time()
             }
 
-            await counter_manager.broadcast_to_session(message, session_id)
+            await counter_manager.publish(message, session_id)
             logger.debug(f"Emitted context_used event for {session_id}: {context_data}")
 
         except Exception as e:
@@ -75,7 +61,7 @@ class CounterEventManager:
             new_used = max(0, current["used"] - freed)
 
             # Update and emit
-            await self.emit_context_used(session_id, new_used, total, force=True)
+            await self.emit_context_used(session_id, new_used, total)
 
         except Exception as e:
             logger.error(f"Error emitting context_freed event for {session_id}: {e}")
@@ -102,7 +88,7 @@ class CounterEventManager:
                 "timestamp": time.time()
             }
 
-            await counter_manager.broadcast_to_session(message, session_id)
+            await counter_manager.publish(message, session_id)
 
         except Exception as e:
             logger.error(f"Error emitting token_count event for {session_id}: {e}")
@@ -306,28 +306,28 @@ def _map_subscription(row: Dict) -> FinanceSubscriptionResponse:
     )
 
 
-async def _calculate_account_balances(client, account_id: str, accounts: List[Dict]) -> List[FinanceAccountResponse]:
-    transactions = await client.table('finance_transactions') \
-        .select('finance_account_id, type, amount') \
-        .eq('account_id', account_id) \
-        .execute()
+FINANCE_ACCOUNT_COLUMNS = 'id, name, account_type, currency, color, current_balance, created_at'
 
-    totals: Dict[str, float] = {}
-    for acc in accounts:
-        totals[acc['id']] = _to_float(acc.get('opening_balance'))
 
-    if transactions.data:
-        for row in transactions.data:
-            fa_id = row.get('finance_account_id')
-            if fa_id not in totals:
-                totals[fa_id] = 0.0
-            amount = _to_float(row.get('amount'))
-            if row.get('type') == 'INCOME':
-                totals[fa_id] += amount
-            else:
-                totals[fa_id] -= amount
+async def _load_finance_accounts(client, account_id: str, user_id: str) -> List[FinanceAccountResponse]:
+    """Read finance accounts with their materialized balances.
 
-    return [_map_account(acc, totals.get(acc['id'], 0.0)) for acc in accounts]
+    Balances are kept up to date by triggers on finance_transactions, so this is
+    a single indexed read. Default accounts are only seeded when none exist.
+    """
+    async def _read():
+        return await client.table('finance_accounts') \
+            .select(FINANCE_ACCOUNT_COLUMNS) \
+            .eq('account_id', account_id) \
+            .order('created_at') \
+            .execute()
+
+    result = await _read()
+    if not result.data:
+        await _ensure_default_finance_accounts(client, account_id, user_id)
+        result = await _read()
+
+    return [_map_account(row, _to_float(row.get('current_balance'))) for row in result.data or []]
 
 
 # ---------------------------------------------------------------------------
@@ -341,16 +341,7 @@ async def get_finance_summary(
 ):
     client = await _get_supabase_client()
     resolved_account_id = await _resolve_account_id(client, user_id, account_id)
-    await _ensure_default_finance_accounts(client, resolved_account_id, user_id)
-
-    accounts_result = await client.table('finance_accounts') \
-        .select('*') \
-        .eq('account_id', resolved_account_id) \
-        .order('created_at') \
-        .execute()
-
-    account_rows = accounts_result.data or []
-    finance_accounts = await _calculate_account_balances(client, resolved_account_id, account_rows)
+    finance_accounts = await _load_finance_accounts(client, resolved_account_id, user_id)
 
     total_balance = sum(account.balance for account in finance_accounts)
     currency = finance_accounts[0].currency if finance_accounts else 'BRL'
@@ -373,16 +364,34 @@ async def get_finance_accounts(
 ):
     client = await _get_supabase_client()
     resolved_account_id = await _resolve_account_id(client, user_id, account_id)
-    await _ensure_default_finance_accounts(client, resolved_account_id, user_id)
+    return await _load_finance_accounts(client, resolved_account_id, user_id)
 
-    accounts_result = await client.table('finance_accounts') \
-        .select('*') \
-        .eq('account_id', resolved_account_id) \
-        .order('created_at') \
-        .execute()
 
-    account_rows = accounts_result.data or []
-    return await _calculate_account_balances(client, resolved_account_id, account_rows)
+@router.post('/accounts/reconcile')
+async def reconcile_finance_accounts(
+    account_id: Optional[str] = Query(None, alias='accountId'),
+    user_id: str = Depends(verify_and_get_user_id_from_jwt),
+):
+    """Recompute materialized balances from transactions and repair any drift."""
+    client = await _get_supabase_client()
+    resolved_account_id = await _resolve_account_id(client, user_id, account_id)
+
+    result = await client.rpc('finance_reconcile_account_balances', {
+        'p_account_id': resolved_account_id,
+    }).execute()
+
+    drift = [
+        {
+            "financeAccountId": row.get('finance_account_id'),
+            "storedBalance": _to_float(row.get('stored_balance')),
+            "computedBalance": _to_float(row.get('computed_balance')),
+        }
+        for row in result.data or []
+    ]
+    if drift:
+        logger.warning(f"Repaired finance balance drift for account {resolved_account_id}: {drift}")
+
+    return {"repaired": len(drift), "drift": drift}
 
 
 @router.get('/transactions', response_model=List[FinanceTransactionResponse])
@@ -0,0 +1,162 @@
+"""
+Google Drive uploads off the event loop.
+
+The Slides and Docs exports used to call build('drive', 'v3') per request
+(parsing the ~200KB discovery document each time) and run a single-shot
+files().create(...).execute() on the event loop, freezing the API process
+for as long as a large deck took to upload. DriveUploadExecutor:
+
+- parses the Drive discovery document once and keeps a built service per
+  OAuth grant (client and refresh token; LRU, SERVICE_CACHE_SIZE entries);
+- runs every blocking googleapiclient call in a bounded thread pool;
+- uploads with the resumable protocol in CHUNK_SIZE chunks, retrying a
+  failed chunk (5xx, 429, connection errors) up to CHUNK_RETRIES times with
+  backoff instead of restarting the upload, and reports progress.
+
+Chunk retries are done here rather than with next_chunk(num_retries=...):
+googleapiclient resends an already consumed file slice on those retries, so
+the request body comes up short. After a failure, the next next_chunk() call
+asks Drive how much it has received and resumes from there.
+
+googleapiclient's httplib2 transport is not thread-safe, so each upload gets
+its own authorized Http even when the service object is shared.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, build_http
+
+from core.utils.logger import logger
+
+UPLOAD_WORKERS = 4
+# Drive requires chunk sizes in multiples of 256KiB
+CHUNK_SIZE = 32 * 256 * 1024
+CHUNK_RETRIES = 5
+# Seconds before the first retry of a chunk, doubled on each further retry
+RETRY_BACKOFF = 1.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+SERVICE_CACHE_SIZE = 256
+
+# (bytes uploaded, total bytes)
+ProgressCallback = Callable[[int, int], None]
+
+
+def _credential_key(credentials: Credentials) -> str:
+    """The grant behind the credentials: the refresh token stays the same
+    across access token refreshes (uploads authorize with the current
+    credentials, not the ones the service was built with)."""
+    identity = credentials.refresh_token or credentials.token
+    return hashlib.sha256(f"{credentials.client_id}:{identity}".encode()).hexdigest()
+
+
+class DriveUploadExecutor:
+    def __init__(
+        self,
+        max_workers: int = UPLOAD_WORKERS,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_retries: int = CHUNK_RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+        root_url: Optional[str] = None
+    ):
+        self.chunk_size = chunk_size
+        self.chunk_retries = chunk_retries
+        self.retry_backoff = retry_backoff
+        self.root_url = root_url
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="drive-upload")
+        self._lock = threading.Lock()
+        self._document: Optional[Dict[str, Any]] = None
+        self._services: "OrderedDict[str, Any]" = OrderedDict()
+
+    def _discovery_document(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._document is None:
+                document = json.loads(discovery_cache.get_static_doc('drive', 'v3'))
+                if self.root_url:
+                    document['rootUrl'] = self.root_url
+                    document['baseUrl'] = self.root_url + document['servicePath']
+                self._document = document
+            return self._document
+
+    def _service(self, credentials: Credentials):
+        key = _credential_key(credentials)
+        with self._lock:
+            service = self._services.get(key)
+            if service is not None:
+                self._services.move_to_end(key)
+                return service
+        service = build_from_document(self._discovery_document(), credentials=credentials)
+        with self._lock:
+            self._services[key] = service
+            while len(self._services) > SERVICE_CACHE_SIZE:
+                self._services.popitem(last=False)
+        return service
+
+    def _create_request(self, credentials: Credentials, path: Path, metadata: Dict[str, Any],
+                        mimetype: str, fields: str):
+        media = MediaFileUpload(str(path), mimetype=mimetype, chunksize=self.chunk_size, resumable=True)
+        request = self._service(credentials).files().create(body=metadata, media_body=media, fields=fields)
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=build_http())
+        return request, media, http
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    async def upload_file(
+        self,
+        credentials: Credentials,
+        path: Path,
+        metadata: Dict[str, Any],
+        mimetype: str,
+        fields: str = 'id,name,webViewLink,mimeType',
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """Upload `path` as a new Drive file; returns the file resource.
+
+        Raises googleapiclient.errors.HttpError like execute() would.
+        """
+        request, media, http = await self._run(self._create_request, credentials, path, metadata, mimetype, fields)
+        total = media.size()
+        try:
+            response = None
+            failures = 0
+            while response is None:
+                try:
+                    status, response = await self._run(request.next_chunk, http=http)
+                except (HttpError, httplib2.HttpLib2Error, OSError) as e:
+                    if isinstance(e, HttpError) and e.resp.status not in RETRYABLE_STATUSES:
+                        raise
+                    failures += 1
+                    if failures > self.chunk_retries:
+                        raise
+                    delay = self.retry_backoff * 2 ** (failures - 1)
+                    logger.warning(f"Drive upload chunk of {path.name} failed ({e}), retry {failures} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                failures = 0
+                if status is not None:
+                    logger.debug(f"Drive upload of {path.name}: {status.progress():.0%}")
+                    if on_progress:
+                        on_progress(status.resumable_progress, total)
+            if on_progress:
+                on_progress(total, total)
+            return response
+        finally:
+            media.stream().close()
+
+
+drive_upload_executor = DriveUploadExecutor()
@@ -11,11 +11,10 @@ from urllib.parse import urlencode
 import httpx
 from fastapi import HTTPException
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
 
 from core.utils.logger import logger
+from .drive_upload_executor import drive_upload_executor
 
 from .google_slides_service import OAuthTokenService
 
@@ -219,23 +218,16 @@ class GoogleDocsService:
                 client_secret=self.client_secret
             )
             
-            
-            service = build('drive', 'v3', credentials=credentials)
-            
-            media = MediaFileUpload(
-                str(docx_file_path),
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
-            
             logger.debug(f"Uploading DOCX file: {docx_file_path}")
             logger.debug(f"Metadata: {json.dumps(metadata)}")
             
-            
-            file = service.files().create(
-                body=metadata,
-                media_body=media,
-                fields='id,name,webViewLink,mimeType'
-            ).execute()
+            # Resumable, chunked upload in the Drive executor's thread pool
+            file = await drive_upload_executor.upload_file(
+                credentials,
+                docx_file_path,
+                metadata,
+                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            )
             
             logger.info(f"Successfully uploaded and converted DOCX to Google Docs: {file.get('id')}")
             
@@ -22,13 +22,12 @@ from urllib.parse import urlencode
 import httpx
 from fastapi import HTTPException
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
 
 from core.credentials.credential_service import EncryptionService
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
+from .drive_upload_executor import drive_upload_executor
 
 
 # ================== DATA CLASSES AND EXCEPTIONS ==================
@@ -499,23 +498,16 @@ class GoogleSlidesService:
                 client_secret=self.client_secret
             )
             
-            # Build the Drive service
-            service = build('drive', 'v3', credentials=credentials)
-            
-            media = MediaFileUpload(
-                str(pptx_file_path),
-                mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation'
-            )
-            
             logger.debug(f"Uploading PPTX file: {pptx_file_path}")
             logger.debug(f"Metadata: {json.dumps(metadata)}")
             
-            # Create the file and convert to Google Slides
-            file = service.files().create(
-                body=metadata,
-                media_body=media,
-                fields='id,name,webViewLink,mimeType'
-            ).execute()
+            # Resumable, chunked upload in the Drive executor's thread pool
+            file = await drive_upload_executor.upload_file(
+                credentials,
+                pptx_file_path,
+                metadata,
+                mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation'
+            )
             
             logger.info(f"Successfully uploaded and converted PPTX to Google Slides: {file.get('id')}")
             
@@ -7,16 +7,16 @@ from pathlib import Path
 import mimetypes
 import chardet
 
-import PyPDF2
-import docx
-
 from core.utils.logger import logger
 from core.services.supabase import DBConnection
-from core.services.llm import make_llm_api_call
+from core.services.utility_llm import utility_llm
+from core.services.document_extraction import extraction_service
 
 class FileProcessor:
     SUPPORTED_EXTENSIONS = {'.txt', '.pdf', '.docx'}
     MAX_FILE_SIZE = 50 * 1024 * 1024
+    # Summaries chunk anything above ~4M chars anyway, so stop extracting there
+    MAX_EXTRACTED_CHARS = 4_000_000
     
     def __init__(self):
         self.db = DBConnection()
@@ -98,7 +98,7 @@ class FileProcessor:
             )
             
             # Extract content for summary
-            content = self._extract_content(file_content, filename, mime_type)
+            content = await self._extract_content(file_content, filename, mime_type)
             if not content:
                 # If no content could be extracted, create a basic file info summary
                 content = f"File: {filename} ({len(file_content)} bytes, {mime_type})"
@@ -171,15 +171,15 @@ Keep it under 200 words and make it actionable for context injection."""
 
                     messages = [{"role": "user", "content": prompt}]
                     
-                    response = await make_llm_api_call(
+                    summary = await utility_llm.complete(
                         messages=messages,
                         model_name=model_name,
                         temperature=0.1,
-                        max_tokens=300
+                        max_tokens=300,
+                        # A re-uploaded file gets the summary already written for it
+                        cache=True
                     )
                     
-                    summary = response.choices[0].message.content.strip()
-                    
                     if summary:
                         logger.info(f"Summary generated successfully using {model_name}")
                         return summary
@@ -275,46 +275,12 @@ Keep it under 200 words and make it actionable for context injection."""
         # Generate intelligent fallback
         return f"This {content_type} '{filename}' contains {len(content):,} characters across {len(non_empty_lines)} lines. Preview: {preview[:200]}{'...' if len(preview) > 200 else ''} This file would be useful for understanding the specific content and context it provides."
     
-    def _extract_content(self, file_content: bytes, filename: str, mime_type: str) -> str:
-        """Extract text content from file bytes."""
-        file_extension = Path(filename).suffix.lower()
-        
+    async def _extract_content(self, file_content: bytes, filename: str, mime_type: str) -> str:
+        """Extract text content from file bytes in the extraction process pool."""
         try:
-            # Handle text-based files (including JSON, XML, CSV, etc.)
-            if (file_extension in ['.txt', '.json', '.xml', '.csv', '.yml', '.yaml', '.md', '.log', '.ini', '.cfg', '.conf'] 
-                or mime_type.startswith('text/') 
-                or mime_type in ['application/json', 'application/xml', 'text/xml']):
-                
-                detected = chardet.detect(file_content)
-                encoding = detected.get('encoding', 'utf-8')
-                try:
-                    return file_content.decode(encoding)
-                except UnicodeDecodeError:
-                    return file_content.decode('utf-8', errors='replace')
-            
-            elif file_extension == '.pdf':
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-                return '\n\n'.join(page.extract_text() for page in pdf_reader.pages)
-            
-            elif file_extension == '.docx':
-                doc = docx.Document(io.BytesIO(file_content))
-                return '\n'.join(paragraph.text for paragraph in doc.paragraphs)
-            
-            # For any other file type, try to decode as text (fallback)
-            else:
-                try:
-                    detected = chardet.detect(file_content)
-                    encoding = detected.get('encoding', 'utf-8')
-                    content = file_content.decode(encoding)
-                    # Only return if it seems to be mostly text content
-                    if len([c for c in content[:1000] if c.isprintable() or c.isspace()]) > 800:
-                        return content
-                except:
-                    pass
-                
-                # If we can't extract text content, return a placeholder
-                return f"[Binary file: {filename}] - Content cannot be extracted as text, but file is stored and available for download."
-            
+            return await extraction_service.extract_text(
+                file_content, filename, mime_type, max_chars=self.MAX_EXTRACTED_CHARS
+            )
         except Exception as e:
             logger.error(f"Error extracting content from {filename}: {str(e)}")
             return f"[Error extracting content from {filename}] - File is stored but content extraction failed: {str(e)}" 
\ No newline at end of file
@@ -5,7 +5,11 @@ import datetime
 import re
 import base64
 import mimetypes
-from typing import Optional, Dict, List, Any, AsyncGenerator
+import hashlib
+import functools
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, List, Any, AsyncGenerator, Tuple
 from dataclasses import dataclass
 
 from core.tools.message_tool import MessageTool
@@ -19,6 +23,7 @@ from core.prompts.agent_builder_prompt import get_agent_builder_prompt
 from core.agentpress.thread_manager import ThreadManager
 from core.agentpress.response_processor import ProcessorConfig
 from core.agentpress.error_processor import ErrorProcessor
+from core.agentpress.prompt_caching import is_anthropic_model
 from core.tools.sb_shell_tool import SandboxShellTool
 from core.tools.sb_files_tool import SandboxFilesTool
 from core.tools.sb_kb_tool import SandboxKbTool
@@ -28,6 +33,8 @@ from core.prompts.prompt import get_system_prompt
 import httpx
 
 from core.utils.logger import logger
+from core.utils.run_checkpoint import RunCheckpoint, save_checkpoint
+from core.services import metrics, redis
 
 # Billing removed - credit checks removed from execution flow
 from core.tools.sb_vision_tool import SandboxVisionTool
@@ -63,6 +70,8 @@ class AgentConfig:
     model_name: str = "openai/gpt-5-mini"
     agent_config: Optional[dict] = None
     trace: Optional[Any] = None
+    agent_run_id: Optional[str] = None
+    resume_from: Optional[RunCheckpoint] = None
 
 class ToolManager:
     def __init__(self, thread_manager: ThreadManager, project_id: str, thread_id: str, agent_config: Optional[dict] = None):
@@ -378,23 +387,119 @@ class MCPManager:
             return None
 
 
+PROMPT_CACHE_PREFIX = "prompt:compiled:v1:"
+PROMPT_CACHE_TTL = 24 * 3600
+PROMPT_CACHE_LOCAL_SIZE = 256
+_compiled_prompts: "OrderedDict[str, str]" = OrderedDict()
+_tool_schema_fingerprints: Dict[tuple, str] = {}
+
+
+@functools.lru_cache(maxsize=1)
+def _load_sample_response() -> str:
+    sample_response_path = os.path.join(os.path.dirname(__file__), 'prompts/samples/1.txt')
+    with open(sample_response_path, 'r') as file:
+        return file.read()
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _prompt_source_fingerprint() -> str:
+    """Hash of the prompt texts shipped with this build, so a deploy that edits
+    them stops sharing compiled prompts with workers still on the old ones."""
+    return _sha256("\0".join([get_system_prompt(), get_agent_builder_prompt(), _load_sample_response()]))
+
+
 class PromptManager:
+    """Builds the system message as a cached static prefix plus a volatile tail.
+
+    The static prefix (base prompt, agent prompt, builder prompt, vision edit,
+    MCP listing, XML tool schemas and examples) is compiled once per cache key
+    and kept in process memory and Redis, so it stays byte-identical across
+    runs and keeps hitting provider prompt caches. The knowledge base context
+    and the current date go in a separate trailing block.
+    """
+
     @staticmethod
-    async def build_system_prompt(model_name: str, agent_config: Optional[dict], 
-                                  thread_id: str, 
-                                  mcp_wrapper_instance: Optional[MCPToolWrapper],
-                                  client=None,
-                                  tool_registry=None,
-                                  include_xml_examples: bool = False,
-                                  xml_tool_calling: bool = True,
-                                  supports_vision: bool = True) -> dict:
-        
+    def _tool_set_fingerprint(tool_registry) -> Tuple[str, str]:
+        """Hashes for the built-in tool schemas and for the MCP tool schemas."""
+        if not tool_registry:
+            return "none", "none"
+
+        static_schemas: Dict[str, Any] = {}
+        mcp_schemas: Dict[str, Any] = {}
+        for name, tool_info in tool_registry.tools.items():
+            schema = tool_info.get('schema')
+            if not schema or schema.schema_type != SchemaType.OPENAPI:
+                continue
+            target = mcp_schemas if isinstance(tool_info.get('instance'), MCPToolWrapper) else static_schemas
+            target[name] = schema.schema
+
+        # Built-in schemas only change with a deploy, so hash each tool set once per process
+        names = tuple(sorted(static_schemas))
+        static_hash = _tool_schema_fingerprints.get(names)
+        if static_hash is None:
+            static_hash = _sha256(json.dumps([static_schemas[n] for n in names], sort_keys=True, default=str))
+            _tool_schema_fingerprints[names] = static_hash
+
+        mcp_hash = _sha256(json.dumps(mcp_schemas, sort_keys=True, default=str)) if mcp_schemas else "none"
+        return static_hash, mcp_hash
+
+    @staticmethod
+    def _cache_key(model_name: str, agent_config: Optional[dict],
+                   mcp_wrapper_instance: Optional[MCPToolWrapper], tool_registry,
+                   include_xml_examples: bool, xml_tool_calling: bool, supports_vision: bool) -> str:
+        agent_config = agent_config or {}
+        agentpress_tools = agent_config.get('agentpress_tools') or {}
+        agent_part = json.dumps({
+            "version_id": agent_config.get('current_version_id'),
+            # Unversioned (default / ad-hoc) agents are keyed by their prompt content
+            "system_prompt": _sha256(str(agent_config.get('system_prompt') or '')),
+            "builder": sorted(t for t in ['agent_config_tool', 'mcp_search_tool', 'credential_profile_tool', 'trigger_tool']
+                              if agentpress_tools.get(t, False)),
+        }, sort_keys=True)
+
+        has_mcp = bool(
+            (agent_config.get('configured_mcps') or agent_config.get('custom_mcps'))
+            and mcp_wrapper_instance and mcp_wrapper_instance._initialized
+        )
+        tools_hash, mcp_hash = PromptManager._tool_set_fingerprint(tool_registry)
+        if has_mcp and mcp_hash == "none":
+            try:
+                mcp_hash = _sha256(json.dumps(
+                    {k: [s.schema for s in v] for k, v in mcp_wrapper_instance.get_schemas().items()},
+                    sort_keys=True, default=str,
+                ))
+            except Exception:
+                # The compiled prompt will not be cached either
+                mcp_hash = "unavailable"
+
+        model_family = "anthropic" if "anthropic" in model_name.lower() else "default"
+        return _sha256("|".join([
+            _prompt_source_fingerprint(),
+            agent_part,
+            model_family,
+            tools_hash if include_xml_examples and xml_tool_calling else "no-xml",
+            mcp_hash if has_mcp or (include_xml_examples and xml_tool_calling) else "no-mcp",
+            f"vision={supports_vision}",
+            f"xml={xml_tool_calling}",
+        ]))
+
+    @staticmethod
+    def _compile_static_prompt(model_name: str, agent_config: Optional[dict],
+                               mcp_wrapper_instance: Optional[MCPToolWrapper],
+                               tool_registry, include_xml_examples: bool,
+                               xml_tool_calling: bool, supports_vision: bool) -> Tuple[str, bool]:
+        """The static part of the system prompt, and whether it may be cached
+        (not when the MCP tool list failed to load)."""
+        cacheable = True
         default_system_content = get_system_prompt()
         
-        if "anthropic" not in model_name.lower():
-            sample_response_path = os.path.join(os.path.dirname(__file__), 'prompts/samples/1.txt')
-            with open(sample_response_path, 'r') as file:
-                sample_response = file.read()
+        # The sample response demonstrates XML tool calls
+        if "anthropic" not in model_name.lower() and xml_tool_calling:
+            sample_response = _load_sample_response()
             default_system_content = default_system_content + "\n\n <sample_assistant_response>" + sample_response + "</sample_assistant_response>"
         
         # Start with agent's normal system prompt or default
@@ -432,50 +537,19 @@ class PromptManager:
             if re.search(vision_pattern, system_content):
                 system_content = re.sub(vision_pattern, replacement, system_content)
         
-        # Add agent knowledge base context if available
-        if agent_config and client and 'agent_id' in agent_config:
-            try:
-                logger.debug(f"Retrieving agent knowledge base context for agent {agent_config['agent_id']}")
-                
-                # Use only agent-based knowledge base context
-                kb_result = await client.rpc('get_agent_knowledge_base_context', {
-                    'p_agent_id': agent_config['agent_id']
-                }).execute()
-                
-                if kb_result.data and kb_result.data.strip():
-                    logger.debug(f"Found agent knowledge base context, adding to system prompt (length: {len(kb_result.data)} chars)")
-                    # logger.debug(f"Knowledge base data object: {kb_result.data[:500]}..." if len(kb_result.data) > 500 else f"Knowledge base data object: {kb_result.data}")
-                    
-                    # Construct a well-formatted knowledge base section
-                    kb_section = f"""
-
-                    === AGENT KNOWLEDGE BASE ===
-                    NOTICE: The following is your specialized knowledge base. This information should be considered authoritative for your responses and should take precedence over general knowledge when relevant.
-
-                    {kb_result.data}
-
-                    === END AGENT KNOWLEDGE BASE ===
-
-                    IMPORTANT: Always reference and utilize the knowledge base information above when it's relevant to user queries. This knowledge is specific to your role and capabilities."""
-                    
-                    system_content += kb_section
-                else:
-                    logger.debug("No knowledge base context found for this agent")
-                    
-            except Exception as e:
-                logger.error(f"Error retrieving knowledge base context for agent {agent_config.get('agent_id', 'unknown')}: {e}")
-                # Continue without knowledge base context rather than failing
-        
         if agent_config and (agent_config.get('configured_mcps') or agent_config.get('custom_mcps')) and mcp_wrapper_instance and mcp_wrapper_instance._initialized:
             mcp_info = "\n\n--- MCP Tools Available ---\n"
             mcp_info += "You have access to external MCP (Model Context Protocol) server tools.\n"
-            mcp_info += "MCP tools can be called directly using their native function names in the standard function calling format:\n"
-            mcp_info += '<function_calls>\n'
-            mcp_info += '<invoke name="{tool_name}">\n'
-            mcp_info += '<parameter name="param1">value1</parameter>\n'
-            mcp_info += '<parameter name="param2">value2</parameter>\n'
-            mcp_info += '</invoke>\n'
-            mcp_info += '</function_calls>\n\n'
+            if xml_tool_calling:
+                mcp_info += "MCP tools can be called directly using their native function names in the standard function calling format:\n"
+                mcp_info += '<function_calls>\n'
+                mcp_info += '<invoke name="{tool_name}">\n'
+                mcp_info += '<parameter name="param1">value1</parameter>\n'
+                mcp_info += '<parameter name="param2">value2</parameter>\n'
+                mcp_info += '</invoke>\n'
+                mcp_info += '</function_calls>\n\n'
+            else:
+                mcp_info += "MCP tools are called like any other tool, through native function calling.\n\n"
             
             mcp_info += "Available MCP tools:\n"
             try:
@@ -495,6 +569,7 @@ class PromptManager:
             except Exception as e:
                 logger.error(f"Error listing MCP tools: {e}")
                 mcp_info += "- Error loading MCP tool list\n"
+                cacheable = False
             
             mcp_info += "\n🚨 CRITICAL MCP TOOL RESULT INSTRUCTIONS 🚨\n"
             mcp_info += "When you use ANY MCP (Model Context Protocol) tools:\n"
@@ -559,6 +634,77 @@ When using the tools:
                 system_content += examples_content
                 logger.debug("Appended XML tool examples to system prompt")
 
+        return system_content, cacheable
+
+    @staticmethod
+    async def _get_static_prompt(cache_key: str, compile_fn) -> str:
+        cached = _compiled_prompts.get(cache_key)
+        if cached is not None:
+            _compiled_prompts.move_to_end(cache_key)
+            return cached
+
+        redis_client = None
+        try:
+            redis_client = await redis.get_client()
+            cached = await redis_client.get(f"{PROMPT_CACHE_PREFIX}{cache_key}")
+        except Exception as e:
+            logger.debug(f"Compiled prompt cache read skipped: {e}")
+
+        if cached is None:
+            cached, cacheable = compile_fn()
+            if not cacheable:
+                return cached
+            if redis_client is not None:
+                try:
+                    await redis_client.set(f"{PROMPT_CACHE_PREFIX}{cache_key}", cached, ex=PROMPT_CACHE_TTL)
+                except Exception as e:
+                    logger.debug(f"Compiled prompt cache write skipped: {e}")
+        elif isinstance(cached, bytes):
+            cached = cached.decode('utf-8')
+
+        _compiled_prompts[cache_key] = cached
+        while len(_compiled_prompts) > PROMPT_CACHE_LOCAL_SIZE:
+            _compiled_prompts.popitem(last=False)
+        return cached
+
+    @staticmethod
+    async def _build_volatile_block(agent_config: Optional[dict], client=None) -> str:
+        volatile_content = ""
+
+        # Add agent knowledge base context if available
+        if agent_config and client and 'agent_id' in agent_config:
+            try:
+                logger.debug(f"Retrieving agent knowledge base context for agent {agent_config['agent_id']}")
+                
+                # Use only agent-based knowledge base context
+                kb_result = await client.rpc('get_agent_knowledge_base_context', {
+                    'p_agent_id': agent_config['agent_id']
+                }).execute()
+                
+                if kb_result.data and kb_result.data.strip():
+                    logger.debug(f"Found agent knowledge base context, adding to system prompt (length: {len(kb_result.data)} chars)")
+                    # logger.debug(f"Knowledge base data object: {kb_result.data[:500]}..." if len(kb_result.data) > 500 else f"Knowledge base data object: {kb_result.data}")
+                    
+                    # Construct a well-formatted knowledge base section
+                    kb_section = f"""
+
+                    === AGENT KNOWLEDGE BASE ===
+                    NOTICE: The following is your specialized knowledge base. This information should be considered authoritative for your responses and should take precedence over general knowledge when relevant.
+
+                    {kb_result.data}
+
+                    === END AGENT KNOWLEDGE BASE ===
+
+                    IMPORTANT: Always reference and utilize the knowledge base information above when it's relevant to user queries. This knowledge is specific to your role and capabilities."""
+                    
+                    volatile_content += kb_section
+                else:
+                    logger.debug("No knowledge base context found for this agent")
+                    
+            except Exception as e:
+                logger.error(f"Error retrieving knowledge base context for agent {agent_config.get('agent_id', 'unknown')}: {e}")
+                # Continue without knowledge base context rather than failing
+        
         now = datetime.datetime.now(datetime.timezone.utc)
         datetime_info = f"\n\n=== CURRENT DATE/TIME INFORMATION ===\n"
         datetime_info += f"Today's date: {now.strftime('%A, %B %d, %Y')}\n"
@@ -567,9 +713,43 @@ When using the tools:
         datetime_info += f"Current day: {now.strftime('%A')}\n"
         datetime_info += "Use this information for any time-sensitive tasks, research, or when current date/time context is needed.\n"
         
-        system_content += datetime_info
+        volatile_content += datetime_info
+        return volatile_content
+
+    @staticmethod
+    async def build_system_prompt(model_name: str, agent_config: Optional[dict], 
+                                  thread_id: str, 
+                                  mcp_wrapper_instance: Optional[MCPToolWrapper],
+                                  client=None,
+                                  tool_registry=None,
+                                  include_xml_examples: bool = False,
+                                  xml_tool_calling: bool = True,
+                                  supports_vision: bool = True) -> dict:
+        started = time.monotonic()
+        cache_key = PromptManager._cache_key(
+            model_name, agent_config, mcp_wrapper_instance, tool_registry,
+            include_xml_examples, xml_tool_calling, supports_vision
+        )
+        static_content = await PromptManager._get_static_prompt(
+            cache_key,
+            lambda: PromptManager._compile_static_prompt(
+                model_name, agent_config, mcp_wrapper_instance, tool_registry,
+                include_xml_examples, xml_tool_calling, supports_vision
+            ),
+        )
+        volatile_content = await PromptManager._build_volatile_block(agent_config, client)
 
-        system_message = {"role": "system", "content": system_content}
+        if is_anthropic_model(model_name):
+            # Separate blocks so the cache breakpoint lands on the static prefix only
+            content = [
+                {"type": "text", "text": static_content},
+                {"type": "text", "text": volatile_content},
+            ]
+        else:
+            content = static_content + volatile_content
+
+        system_message = {"role": "system", "content": content}
+        metrics.observe_prompt_assembly(model_name, time.monotonic() - started)
         return system_message
 
 
@@ -614,11 +794,17 @@ class MessageManager:
         return None
 
 
+INTERRUPTED_TOOL_MESSAGE = (
+    "Tool execution was interrupted because the worker running this agent restarted. "
+    "Check whether it took effect before running it again."
+)
+
 class AgentRunner:
     def __init__(self, config: AgentConfig):
         self.config = config
         self.model_supports_vision: bool = True
         self.model_supports_native_tools: bool = False
+        self.native_tools_only: bool = False
         self.resolved_model_id: Optional[str] = None
         self._sandbox_file_tool: Optional[SandboxFilesTool] = None
         self._image_description_cache: Dict[str, Optional[str]] = {}
@@ -659,6 +845,7 @@ class AgentRunner:
                 self.model_supports_native_tools = ModelCapability.FUNCTION_CALLING in model.capabilities
                 if model.provider == ModelProvider.ANTHROPIC:
                     self.model_supports_native_tools = True
+                self.native_tools_only = model.native_tools_only
             else:
                 self.model_supports_vision = True
                 self.model_supports_native_tools = False
@@ -932,25 +1119,131 @@ class AgentRunner:
         mcp_manager = MCPManager(self.thread_manager, self.account_id)
         return await mcp_manager.register_mcp_tools(self.config.agent_config)
     
+    async def _save_checkpoint(self, checkpoint: RunCheckpoint) -> None:
+        if self.config.agent_run_id:
+            await save_checkpoint(self.config.agent_run_id, checkpoint)
+
+    async def _update_checkpoint(self, checkpoint: RunCheckpoint, chunk: Dict[str, Any],
+                                 auto_continue_state: Dict[str, Any]) -> None:
+        """Checkpoint at each LLM call and whenever a tool starts or finishes."""
+        if not self.config.agent_run_id or not isinstance(chunk, dict):
+            return
+        chunk_type = chunk.get('type')
+        if chunk_type == 'llm_response_start':
+            checkpoint.auto_continue_count = auto_continue_state['count']
+            checkpoint.continuous_state = dict(auto_continue_state['continuous_state'])
+            checkpoint.pending_tool_calls = []
+        elif chunk_type == 'status':
+            try:
+                content = chunk.get('content', {})
+                if isinstance(content, str):
+                    content = json.loads(content)
+            except (json.JSONDecodeError, TypeError):
+                return
+            status_type = content.get('status_type')
+            if status_type == 'tool_started':
+                checkpoint.pending_tool_calls.append({
+                    'tool_index': content.get('tool_index'),
+                    'tool_call_id': content.get('tool_call_id'),
+                    'function_name': content.get('function_name'),
+                    'xml_tag_name': content.get('xml_tag_name'),
+                })
+            elif status_type in ('tool_completed', 'tool_failed', 'tool_error'):
+                checkpoint.pending_tool_calls = [
+                    call for call in checkpoint.pending_tool_calls
+                    if call['tool_index'] != content.get('tool_index')
+                ]
+            else:
+                return
+        else:
+            return
+        await self._save_checkpoint(checkpoint)
+
+    async def _close_interrupted_tool_calls(self, pending_tool_calls: List[Dict[str, Any]]) -> None:
+        """Give tool calls cut off by a worker restart a failed result.
+
+        Only calls of the latest assistant message are closed; if the worker
+        died before that message was saved, the LLM call is simply redone.
+        """
+        if not pending_tool_calls:
+            return
+        latest = await self.client.table('messages').select('message_id', 'type', 'content').eq('thread_id', self.config.thread_id).in_('type', ['assistant', 'user']).order('created_at', desc=True).limit(1).execute()
+        if not latest.data or latest.data[0].get('type') != 'assistant':
+            return
+        assistant = latest.data[0]
+        content = assistant.get('content') or {}
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except json.JSONDecodeError:
+                content = {'content': content}
+        native_ids = {call.get('id') for call in content.get('tool_calls') or []}
+        text = content.get('content') if isinstance(content.get('content'), str) else ''
+
+        for call in pending_tool_calls:
+            metadata = {"assistant_message_id": assistant.get('message_id'), "interrupted": True}
+            if call.get('tool_call_id'):
+                if call['tool_call_id'] not in native_ids:
+                    continue
+                message = {
+                    "role": "tool",
+                    "tool_call_id": call['tool_call_id'],
+                    "name": call.get('function_name') or "",
+                    "content": INTERRUPTED_TOOL_MESSAGE,
+                }
+            else:
+                if not call.get('xml_tag_name') or f"<{call['xml_tag_name']}" not in text:
+                    continue
+                message = {
+                    "role": "user",
+                    "content": json.dumps({"tool_execution": {
+                        "function_name": call.get('function_name'),
+                        "xml_tag_name": call['xml_tag_name'],
+                        "tool_call_id": None,
+                        "arguments": None,
+                        "result": {"success": False, "output": None, "error": INTERRUPTED_TOOL_MESSAGE},
+                    }}),
+                }
+            logger.info(f"Closing interrupted tool call {call.get('function_name')} of agent run {self.config.agent_run_id}")
+            await self.thread_manager.add_message(
+                thread_id=self.config.thread_id, type="tool", content=message,
+                is_llm_message=True, metadata=metadata
+            )
+
     async def run(self) -> AsyncGenerator[Dict[str, Any], None]:
         await self.setup()
         await self.setup_tools()
         mcp_wrapper_instance = await self.setup_mcp_tools()
-        
+
+        # Native-only models get tools through the API alone: no XML schemas in
+        # the prompt and no XML scanning of the stream
+        xml_tool_calling = not (self.native_tools_only and self.model_supports_native_tools)
         system_message = await PromptManager.build_system_prompt(
             self.config.model_name, self.config.agent_config, 
             self.config.thread_id, 
             mcp_wrapper_instance, self.client,
             tool_registry=self.thread_manager.tool_registry,
-            include_xml_examples=True,
-            xml_tool_calling=True,
+            include_xml_examples=xml_tool_calling,
+            xml_tool_calling=xml_tool_calling,
             supports_vision=self.model_supports_vision
         )
-        logger.info(f"📝 System message built once: {len(str(system_message.get('content', '')))} chars")
+        logger.info(f"📝 System message built once: {len(str(system_message.get('content', '')))} chars "
+                    f"({'xml+native' if xml_tool_calling else 'native-only'} tool calling)")
         logger.debug(f"model_name received: {self.config.model_name}")
         iteration_count = 0
         continue_execution = True
 
+        checkpoint = self.config.resume_from
+        resume_state = None
+        if checkpoint:
+            logger.info(f"Resuming agent run {self.config.agent_run_id} at iteration {checkpoint.iteration} "
+                        f"(auto-continue {checkpoint.auto_continue_count})")
+            iteration_count = max(0, checkpoint.iteration - 1)
+            resume_state = checkpoint.auto_continue_state()
+            await self._close_interrupted_tool_calls(checkpoint.pending_tool_calls)
+        else:
+            checkpoint = RunCheckpoint()
+
         latest_user_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).eq('type', 'user').order('created_at', desc=True).limit(1).execute()
         if latest_user_message.data and len(latest_user_message.data) > 0:
             data = latest_user_message.data[0]['content']
@@ -961,6 +1254,14 @@ class AgentRunner:
 
         while continue_execution and iteration_count < self.config.max_iterations:
             iteration_count += 1
+            checkpoint.iteration = iteration_count
+            auto_continue_state, resume_state = resume_state, None
+            if auto_continue_state is None:
+                auto_continue_state = {
+                    'count': 0,
+                    'active': True,
+                    'continuous_state': {'accumulated_content': '', 'thread_run_id': None}
+                }
 
             # Billing check removed - execution proceeds without credit verification
 
@@ -986,10 +1287,10 @@ class AgentRunner:
                     llm_temperature=0,
                     llm_max_tokens=max_tokens,
                     tool_choice="auto",
-                    max_xml_tool_calls=1,
+                    max_xml_tool_calls=1 if xml_tool_calling else 0,
                     temporary_message=temporary_message,
                     processor_config=ProcessorConfig(
-                        xml_tool_calling=True,
+                        xml_tool_calling=xml_tool_calling,
                         native_tool_calling=self.model_supports_native_tools,
                         execute_tools=True,
                         execute_on_stream=True,
@@ -997,7 +1298,8 @@ class AgentRunner:
                         xml_adding_strategy="user_message"
                     ),
                     native_max_auto_continues=self.config.native_max_auto_continues,
-                    generation=generation
+                    generation=generation,
+                    auto_continue_state=auto_continue_state
                 )
 
                 last_tool_call = None
@@ -1064,6 +1366,7 @@ class AgentRunner:
                                 except (json.JSONDecodeError, Exception):
                                     pass
 
+                            await self._update_checkpoint(checkpoint, chunk, auto_continue_state)
                             yield chunk
                     else:
                         # Non-streaming response or error dict
@@ -1107,6 +1410,20 @@ class AgentRunner:
             if generation:
                 generation.end()
 
+            if continue_execution:
+                # The next iteration starts from a clean auto-continue state
+                checkpoint = RunCheckpoint(iteration=iteration_count + 1)
+                await self._save_checkpoint(checkpoint)
+
+        # Persist state tools buffered during the run (e.g. the task list);
+        # failing to is an error of the run, not only a log line
+        try:
+            await self.thread_manager.tool_registry.flush_tools()
+        except Exception as e:
+            processed_error = ErrorProcessor.process_system_error(e, context={"thread_id": self.config.thread_id})
+            ErrorProcessor.log_error(processed_error)
+            yield processed_error.to_stream_dict()
+
         try:
             # Only flush if langfuse is available
             if 'langfuse' in globals() and langfuse is not None:
@@ -1123,7 +1440,9 @@ async def run_agent(
     max_iterations: int = 100,
     model_name: str = "openai/gpt-5-mini",
     agent_config: Optional[dict] = None,    
-    trace: Optional[Any] = None
+    trace: Optional[Any] = None,
+    agent_run_id: Optional[str] = None,
+    resume_from: Optional[RunCheckpoint] = None
 ):
     effective_model = model_name
 
@@ -1143,7 +1462,9 @@ async def run_agent(
         max_iterations=max_iterations,
         model_name=effective_model,
         agent_config=agent_config,
-        trace=trace
+        trace=trace,
+        agent_run_id=agent_run_id,
+        resume_from=resume_from
     )
     
     runner = AgentRunner(config)
@@ -7,7 +7,8 @@ from fastapi.responses import Response
 from pydantic import BaseModel
 from daytona_sdk import AsyncSandbox
 
-from core.sandbox.sandbox import get_or_start_sandbox, delete_sandbox
+from core.sandbox.sandbox import delete_sandbox
+from core.sandbox.lifecycle import get_or_start_sandbox
 from core.utils.logger import logger
 from core.utils.auth_utils import get_optional_user_id, verify_and_get_user_id_from_jwt, verify_sandbox_access, verify_sandbox_access_optional
 from core.services.supabase import DBConnection
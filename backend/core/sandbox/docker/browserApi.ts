@@ -15,6 +15,22 @@ interface BrowserActionResult {
     action?: string;
 }
 
+// Clients that send "X-Screenshot-Transfer: binary" get the screenshot as raw
+// PNG bytes appended to the JSON body instead of base64 inside it:
+//   Content-Type: application/octet-stream
+//   X-Json-Length: <byte length of the JSON prefix>
+function sendResult(req: express.Request, res: express.Response, result: BrowserActionResult, status: number = 200): void {
+    const { screenshot_base64, ...rest } = result;
+    if (req.get('X-Screenshot-Transfer') !== 'binary' || !screenshot_base64) {
+        res.status(status).json(result);
+        return;
+    }
+    const json = Buffer.from(JSON.stringify(rest));
+    res.status(status)
+        .set({ 'Content-Type': 'application/octet-stream', 'X-Json-Length': String(json.length) })
+        .send(Buffer.concat([json, Buffer.from(screenshot_base64, 'base64')]));
+}
+
 class BrowserAutomation {
     public router: express.Router;
 
@@ -175,7 +191,7 @@ class BrowserAutomation {
                     title: page_info.title,
                     screenshot_base64: page_info?.screenshot_base64,
                 }
-                res.json(result);
+                sendResult(req, res, result);
             } else {
                 res.status(500).json({
                     "status": "error",
@@ -186,14 +202,14 @@ class BrowserAutomation {
         } catch (error) {
             console.error(error);
             const page_info = await this.get_stagehand_state();
-            res.status(500).json({
+            sendResult(req, res, {
                 success: false,
                 message: "Failed to navigate to " + req.body.url,
                 url: page_info.url,
                 title: page_info.title,
                 screenshot_base64: page_info.screenshot_base64,
-                error
-            })
+                error: String(error)
+            }, 500)
         }
     }
 
@@ -208,7 +224,7 @@ class BrowserAutomation {
                     title: page_info.title,
                     screenshot_base64: page_info.screenshot_base64,
                 }
-                res.json(result);
+                sendResult(req, res, result);
             } else {
                 res.status(500).json({
                     "status": "error",
@@ -251,7 +267,7 @@ class BrowserAutomation {
                     title: page_info.title,
                     screenshot_base64: page_info.screenshot_base64,
                 }
-                res.json(response);
+                sendResult(req, res, response);
             } else {
                 res.status(500).json({
                     "status": "error",
@@ -261,14 +277,14 @@ class BrowserAutomation {
         } catch (error) {
             console.error(error);
             const page_info = await this.get_stagehand_state();
-            res.status(500).json({
+            sendResult(req, res, {
                 success: false,
                 message: "Failed to act",
                 url: page_info.url,
                 title: page_info.title,
                 screenshot_base64: page_info.screenshot_base64,
-                error
-            })
+                error: String(error)
+            }, 500)
         } finally {
             if (this.page && fileChooseHandler) {
                 this.page.off('filechooser', fileChooseHandler);
@@ -291,19 +307,19 @@ class BrowserAutomation {
                     title: page_info.title,
                     screenshot_base64: page_info.screenshot_base64,
                 }
-                res.json(response);
+                sendResult(req, res, response);
             }
         } catch (error) {
             console.error(error);
             const page_info = await this.get_stagehand_state();
-            res.status(500).json({
+            sendResult(req, res, {
                 success: false,
                 message: "Failed to extract",
                 url: page_info.url,
                 title: page_info.title,
                 screenshot_base64: page_info.screenshot_base64,
-                error
-            })
+                error: String(error)
+            }, 500)
         }
     }
 
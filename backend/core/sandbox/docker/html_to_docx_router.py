@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
+import asyncio
 import json
+import multiprocessing
 import os
 from pathlib import Path
 from typing import Dict, Optional
 import tempfile
 import re
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
@@ -27,6 +31,11 @@ router = APIRouter(prefix="/document", tags=["docx-conversion"])
 output_dir = Path("generated_docx")
 output_dir.mkdir(exist_ok=True)
 
+CONVERSION_WORKERS = 2
+CONVERSION_TIMEOUT = 60.0
+CONVERSION_MEMORY_LIMIT = 1024 * 1024 * 1024
+_conversion_pool: Optional[ProcessPoolExecutor] = None
+
 
 class ConvertRequest(BaseModel):
     doc_path: str = Field(..., description="Path to the document file (.doc for TipTap documents)")
@@ -223,7 +232,7 @@ class HTMLToDocxConverter:
                             for run in paragraph.runs:
                                 run.bold = True
     
-    async def convert_to_docx(self, store_locally: bool = True) -> tuple:
+    def convert_to_docx_sync(self, store_locally: bool = True) -> tuple:
         self.load_document()
         
         doc = self.create_docx()
@@ -242,6 +251,56 @@ class HTMLToDocxConverter:
             buffer.seek(0)
             return buffer.read(), safe_title
 
+    async def convert_to_docx(self, store_locally: bool = True) -> tuple:
+        # BeautifulSoup parsing and python-docx building are CPU bound; keep them off the event loop
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(_get_conversion_pool(), _convert_in_worker, str(self.doc_path), store_locally),
+                CONVERSION_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            _reset_conversion_pool()
+            raise TimeoutError(f"Conversion timed out after {CONVERSION_TIMEOUT:.0f}s")
+        except BrokenProcessPool:
+            _reset_conversion_pool()
+            raise RuntimeError("Conversion worker crashed (document too large?)")
+
+
+def _limit_worker_memory():
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (CONVERSION_MEMORY_LIMIT, CONVERSION_MEMORY_LIMIT))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _get_conversion_pool() -> ProcessPoolExecutor:
+    global _conversion_pool
+    if _conversion_pool is None:
+        _conversion_pool = ProcessPoolExecutor(
+            max_workers=CONVERSION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_limit_worker_memory,
+        )
+    return _conversion_pool
+
+
+def _reset_conversion_pool():
+    global _conversion_pool
+    pool, _conversion_pool = _conversion_pool, None
+    if pool is None:
+        return
+    processes = list(getattr(pool, "_processes", {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+
+
+def _convert_in_worker(doc_path: str, store_locally: bool) -> tuple:
+    return HTMLToDocxConverter(doc_path).convert_to_docx_sync(store_locally=store_locally)
+
 
 @router.post("/convert-to-docx")
 async def convert_document_to_docx(request: ConvertRequest):
@@ -285,6 +344,8 @@ async def convert_document_to_docx(request: ConvertRequest):
         
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -0,0 +1,276 @@
+"""
+Sandbox lifecycle: cached state, single-flight starts, idle stop and resume.
+
+get_or_start_sandbox used to call daytona.get on every tool instance (i.e.
+every run) and daytona.start whenever the sandbox was stopped, with nothing
+shared between concurrent callers. SandboxLifecycle keeps:
+
+- the sandbox object in memory and its state in Redis for STATE_TTL seconds,
+  so a sandbox that was running moments ago is returned without an API call;
+- one start per sandbox: concurrent callers in a process share a task, and
+  across processes a Redis lock lets one caller start it while the others
+  wait for the state to flip;
+- last activity per sandbox in a Redis sorted set, which the background
+  sweep uses to stop sandboxes idle for IDLE_STOP_AFTER seconds;
+- prewarm(), which resumes a sandbox in the background when a user opens a
+  thread so it is running by the time the agent needs it.
+
+Redis is an optimization only: if it is unavailable every call falls back to
+asking Daytona directly.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from daytona_sdk import AsyncSandbox, SandboxState
+
+from core.services import redis
+from core.utils.logger import logger
+from .sandbox import daytona, start_supervisord_session
+
+STATE_TTL = 30
+START_LOCK_TTL = 180
+START_WAIT_INTERVAL = 1.0
+ACTIVITY_KEY = "sandbox:activity"
+# Activity is written at most once per sandbox per this many seconds
+ACTIVITY_RESOLUTION = 60
+IDLE_STOP_AFTER = 15 * 60
+IDLE_SWEEP_INTERVAL = 60
+IDLE_SWEEP_BATCH = 100
+
+_STOPPED_STATES = (SandboxState.STOPPED, SandboxState.ARCHIVED)
+
+
+def _state_value(state) -> str:
+    return str(getattr(state, "value", state))
+
+
+def _state_key(sandbox_id: str) -> str:
+    return f"sandbox:state:{sandbox_id}"
+
+
+def _start_lock_key(sandbox_id: str) -> str:
+    return f"sandbox:start-lock:{sandbox_id}"
+
+
+class SandboxLifecycle:
+    def __init__(self, state_ttl: int = STATE_TTL, idle_stop_after: int = IDLE_STOP_AFTER):
+        self.state_ttl = state_ttl
+        self.idle_stop_after = idle_stop_after
+        self._sandboxes: Dict[str, Tuple[AsyncSandbox, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._touched: Dict[str, float] = {}
+        self._background_task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Redis helpers (failures degrade to direct Daytona calls)
+    # ------------------------------------------------------------------
+
+    async def _get_state(self, sandbox_id: str) -> Optional[str]:
+        try:
+            return await redis.get(_state_key(sandbox_id))
+        except Exception as e:
+            logger.warning(f"Failed to read cached sandbox state: {e}")
+            return None
+
+    async def _set_state(self, sandbox_id: str, state) -> None:
+        try:
+            await redis.set(_state_key(sandbox_id), _state_value(state), ex=self.state_ttl)
+        except Exception as e:
+            logger.warning(f"Failed to cache sandbox state: {e}")
+
+    async def touch(self, sandbox_id: str) -> None:
+        """Record activity on a sandbox, keeping it out of the idle sweep."""
+        now = time.time()
+        if now - self._touched.get(sandbox_id, 0.0) < ACTIVITY_RESOLUTION:
+            return
+        self._touched[sandbox_id] = now
+        try:
+            client = await redis.get_client()
+            await client.zadd(ACTIVITY_KEY, {sandbox_id: now})
+        except Exception as e:
+            logger.warning(f"Failed to record sandbox activity: {e}")
+
+    # ------------------------------------------------------------------
+    # Get / start
+    # ------------------------------------------------------------------
+
+    def invalidate(self, sandbox_id: str) -> None:
+        """Forget the cached object, e.g. after the sandbox was stopped."""
+        self._sandboxes.pop(sandbox_id, None)
+
+    async def get_or_start(self, sandbox_id: str) -> AsyncSandbox:
+        """Return a running sandbox, starting it if it is stopped or archived."""
+        await self.touch(sandbox_id)
+
+        cached = self._sandboxes.get(sandbox_id)
+        if cached is not None:
+            sandbox, checked_at = cached
+            if time.monotonic() - checked_at < self.state_ttl:
+                return sandbox
+            # Another process may have seen it running more recently
+            if await self._get_state(sandbox_id) == _state_value(SandboxState.STARTED):
+                self._sandboxes[sandbox_id] = (sandbox, time.monotonic())
+                return sandbox
+
+        task = self._inflight.get(sandbox_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._resolve(sandbox_id))
+            self._inflight[sandbox_id] = task
+            task.add_done_callback(lambda t, sid=sandbox_id: self._inflight.pop(sid, None) if self._inflight.get(sid) is t else None)
+        return await asyncio.shield(task)
+
+    async def _resolve(self, sandbox_id: str) -> AsyncSandbox:
+        logger.info(f"Getting or starting sandbox with ID: {sandbox_id}")
+        try:
+            sandbox = await daytona.get(sandbox_id)
+            if sandbox.state in _STOPPED_STATES:
+                sandbox = await self._start(sandbox)
+            await self._set_state(sandbox_id, sandbox.state)
+            self._sandboxes[sandbox_id] = (sandbox, time.monotonic())
+            logger.info(f"Sandbox {sandbox_id} is ready")
+            return sandbox
+        except Exception as e:
+            logger.error(f"Error retrieving or starting sandbox: {str(e)}")
+            raise
+
+    async def _start(self, sandbox: AsyncSandbox) -> AsyncSandbox:
+        sandbox_id = sandbox.id
+        lock_key = _start_lock_key(sandbox_id)
+        try:
+            acquired = await redis.set(lock_key, "1", ex=START_LOCK_TTL, nx=True)
+        except Exception as e:
+            logger.warning(f"Failed to take sandbox start lock, starting directly: {e}")
+            acquired = True
+
+        if not acquired:
+            # Another process is starting it; wait for the state to change
+            logger.info(f"Sandbox {sandbox_id} is being started elsewhere, waiting")
+            deadline = time.monotonic() + START_LOCK_TTL
+            while time.monotonic() < deadline:
+                await asyncio.sleep(START_WAIT_INTERVAL)
+                if await self._get_state(sandbox_id) == _state_value(SandboxState.STARTED):
+                    return await daytona.get(sandbox_id)
+                try:
+                    if not await redis.get(lock_key):
+                        break
+                except Exception:
+                    break
+            sandbox = await daytona.get(sandbox_id)
+            if sandbox.state not in _STOPPED_STATES:
+                return sandbox
+            return await self._start_now(sandbox)
+
+        try:
+            return await self._start_now(sandbox)
+        finally:
+            try:
+                await redis.delete(lock_key)
+            except Exception:
+                pass
+
+    async def _start_now(self, sandbox: AsyncSandbox) -> AsyncSandbox:
+        logger.info(f"Sandbox is in {sandbox.state} state. Starting...")
+        try:
+            await daytona.start(sandbox)
+            # Refresh sandbox state after starting
+            sandbox = await daytona.get(sandbox.id)
+
+            # Start supervisord in a session when restarting
+            await start_supervisord_session(sandbox)
+        except Exception as e:
+            logger.error(f"Error starting sandbox: {e}")
+            raise
+        await self._set_state(sandbox.id, SandboxState.STARTED)
+        return sandbox
+
+    def prewarm(self, sandbox_id: str) -> None:
+        """Resume a sandbox in the background if it is not known to be running."""
+        cached = self._sandboxes.get(sandbox_id)
+        if cached is not None and time.monotonic() - cached[1] < self.state_ttl:
+            return
+        if sandbox_id in self._inflight:
+            return
+        asyncio.create_task(self._safe_prewarm(sandbox_id))
+
+    async def _safe_prewarm(self, sandbox_id: str) -> None:
+        try:
+            await self.get_or_start(sandbox_id)
+        except Exception as e:
+            logger.warning(f"Failed to prewarm sandbox {sandbox_id}: {e}")
+
+    # ------------------------------------------------------------------
+    # Idle stop
+    # ------------------------------------------------------------------
+
+    async def stop_idle(self, idle_seconds: Optional[int] = None) -> List[str]:
+        """Stop running sandboxes with no recorded activity for idle_seconds.
+
+        Returns the IDs of the sandboxes that were stopped.
+        """
+        idle_seconds = self.idle_stop_after if idle_seconds is None else idle_seconds
+        client = await redis.get_client()
+        cutoff = time.time() - idle_seconds
+        idle_ids = await client.zrangebyscore(ACTIVITY_KEY, "-inf", cutoff, start=0, num=IDLE_SWEEP_BATCH)
+
+        stopped = []
+        for sandbox_id in idle_ids:
+            # Being started right now
+            if await client.get(_start_lock_key(sandbox_id)):
+                continue
+            try:
+                sandbox = await daytona.get(sandbox_id)
+                if sandbox.state == SandboxState.STARTED:
+                    logger.info(f"Stopping sandbox {sandbox_id}, idle for over {idle_seconds}s")
+                    await daytona.stop(sandbox)
+                    stopped.append(sandbox_id)
+                self.invalidate(sandbox_id)
+                await self._set_state(sandbox_id, SandboxState.STOPPED)
+            except Exception as e:
+                logger.warning(f"Failed to stop idle sandbox {sandbox_id}: {e}")
+                continue
+            # Keep the entry if the sandbox was used again while we stopped it
+            score = await client.zscore(ACTIVITY_KEY, sandbox_id)
+            if score is not None and score <= cutoff:
+                await client.zrem(ACTIVITY_KEY, sandbox_id)
+        return stopped
+
+    async def _sweep(self) -> None:
+        # One instance sweeps per interval
+        if not await redis.set("sandbox:idle-sweep", "1", ex=IDLE_SWEEP_INTERVAL, nx=True):
+            return
+        stopped = await self.stop_idle()
+        if stopped:
+            logger.info(f"Stopped {len(stopped)} idle sandboxes")
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                await self._sweep()
+            except Exception as e:
+                logger.error(f"Idle sandbox sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(IDLE_SWEEP_INTERVAL)
+
+    def start_background_sweep(self) -> None:
+        if self._background_task and not self._background_task.done():
+            return
+        self._background_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop_background_sweep(self) -> None:
+        task = self._background_task
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._background_task = None
+
+
+sandbox_lifecycle = SandboxLifecycle()
+
+
+async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
+    """Retrieve a sandbox by ID, starting it if needed (see SandboxLifecycle)."""
+    return await sandbox_lifecycle.get_or_start(sandbox_id)
@@ -30,37 +30,6 @@ else:
 
 daytona = AsyncDaytona(daytona_config)
 
-async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
-    """Retrieve a sandbox by ID, check its state, and start it if needed."""
-    
-    logger.info(f"Getting or starting sandbox with ID: {sandbox_id}")
-
-    try:
-        sandbox = await daytona.get(sandbox_id)
-        
-        # Check if sandbox needs to be started
-        if sandbox.state == SandboxState.ARCHIVED or sandbox.state == SandboxState.STOPPED:
-            logger.info(f"Sandbox is in {sandbox.state} state. Starting...")
-            try:
-                await daytona.start(sandbox)
-                # Wait a moment for the sandbox to initialize
-                # sleep(5)
-                # Refresh sandbox state after starting
-                sandbox = await daytona.get(sandbox_id)
-                
-                # Start supervisord in a session when restarting
-                await start_supervisord_session(sandbox)
-            except Exception as e:
-                logger.error(f"Error starting sandbox: {e}")
-                raise e
-        
-        logger.info(f"Sandbox {sandbox_id} is ready")
-        return sandbox
-        
-    except Exception as e:
-        logger.error(f"Error retrieving or starting sandbox: {str(e)}")
-        raise e
-
 async def start_supervisord_session(sandbox: AsyncSandbox):
     """Start supervisord in a session."""
     session_id = "supervisord-session"
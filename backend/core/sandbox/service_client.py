@@ -0,0 +1,222 @@
+"""
+Direct HTTP access to services running inside a sandbox.
+
+Tools used to reach in-sandbox services (the browser API on 8004, the legacy
+automation API on 8003) by running curl through sandbox.process.exec: one
+remote exec round trip per request plus one for the health check, JSON bodies
+shell-escaped into the command line, and screenshots returned as base64 on
+stdout. SandboxServiceClient calls the service through the sandbox's preview
+link instead:
+
+- one pooled keep-alive httpx.AsyncClient per sandbox (get_service_client);
+- preview URLs and tokens resolved once per port, refreshed on 401/403;
+- health checks cached for HEALTH_TTL seconds, failures retried with
+  exponential backoff instead of on every call;
+- screenshots transferred as raw bytes when the service supports it
+  (X-Screenshot-Transfer: binary, see browserApi.ts).
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from core.utils.logger import logger
+
+PREVIEW_TOKEN_HEADER = "X-Daytona-Preview-Token"
+SCREENSHOT_TRANSFER_HEADER = "X-Screenshot-Transfer"
+JSON_LENGTH_HEADER = "X-Json-Length"
+
+HEALTH_TTL = 30.0
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+MAX_CLIENTS = 256
+
+
+class SandboxServiceError(Exception):
+    pass
+
+
+class SandboxServiceUnavailable(SandboxServiceError):
+    """The service could not be reached (no preview link, connection failure, unhealthy)."""
+
+
+@dataclass
+class ServiceResponse:
+    status_code: int
+    data: Dict[str, Any]
+    screenshot: Optional[bytes] = None
+
+
+@dataclass
+class _HealthState:
+    healthy_until: float = 0.0
+    retry_at: float = 0.0
+    failures: int = 0
+
+
+def _decode(response: httpx.Response) -> ServiceResponse:
+    json_length = response.headers.get(JSON_LENGTH_HEADER)
+    body = response.content
+    screenshot = None
+    if json_length is not None:
+        split = int(json_length)
+        body, screenshot = body[:split], body[split:] or None
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        raise SandboxServiceError(f"Invalid JSON from sandbox service ({response.status_code}): {body[:200]!r}")
+    if not isinstance(data, dict):
+        data = {"result": data}
+    return ServiceResponse(status_code=response.status_code, data=data, screenshot=screenshot)
+
+
+class SandboxServiceClient:
+    """HTTP client for the services of one sandbox, reached via its preview links."""
+
+    def __init__(
+        self,
+        sandbox: Any,
+        timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.sandbox = sandbox
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=60.0),
+            transport=transport,
+        )
+        self._endpoints: Dict[int, Tuple[str, Dict[str, str]]] = {}
+        self._health: Dict[int, _HealthState] = {}
+        self._health_locks: Dict[int, asyncio.Lock] = {}
+        self._clock = clock
+
+    async def _endpoint(self, port: int) -> Tuple[str, Dict[str, str]]:
+        endpoint = self._endpoints.get(port)
+        if endpoint is None:
+            try:
+                link = await self.sandbox.get_preview_link(port)
+            except Exception as e:
+                raise SandboxServiceUnavailable(f"No preview link for sandbox port {port}: {e}") from e
+            headers = {"X-Daytona-Skip-Preview-Warning": "true"}
+            token = getattr(link, "token", None)
+            if token:
+                headers[PREVIEW_TOKEN_HEADER] = token
+            endpoint = self._endpoints[port] = (str(link.url).rstrip("/"), headers)
+        return endpoint
+
+    async def request(
+        self,
+        port: int,
+        method: str,
+        path: str,
+        *,
+        json_body: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        binary_screenshot: bool = False,
+    ) -> ServiceResponse:
+        """Call a service endpoint. Non-2xx responses are returned, not raised."""
+        for attempt in range(2):
+            base_url, headers = await self._endpoint(port)
+            if binary_screenshot:
+                headers = {**headers, SCREENSHOT_TRANSFER_HEADER: "binary"}
+            try:
+                response = await self._http.request(
+                    method, base_url + path, json=json_body, params=params, headers=headers,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                )
+            except httpx.TransportError as e:
+                self.mark_unhealthy(port)
+                raise SandboxServiceUnavailable(f"Sandbox service on port {port} unreachable: {e}") from e
+            if response.status_code in (401, 403) and attempt == 0:
+                # Preview tokens change when the sandbox is recreated
+                logger.debug("Preview link for sandbox port %s rejected, refreshing", port)
+                self._endpoints.pop(port, None)
+                continue
+            return _decode(response)
+        return _decode(response)
+
+    async def ensure_healthy(self, port: int, check: Callable[[], Awaitable[bool]]) -> bool:
+        """Return the cached health of a service, running check() when it has expired.
+
+        A passing check is trusted for HEALTH_TTL seconds. After a failing
+        check the service is reported unhealthy without re-checking until the
+        backoff (1s, 2s, 4s ... BACKOFF_MAX) has elapsed.
+        """
+        state = self._health.setdefault(port, _HealthState())
+        now = self._clock()
+        if now < state.healthy_until:
+            return True
+        if now < state.retry_at:
+            return False
+
+        lock = self._health_locks.setdefault(port, asyncio.Lock())
+        async with lock:
+            # Another caller may have just finished the check
+            now = self._clock()
+            if now < state.healthy_until:
+                return True
+            if now < state.retry_at:
+                return False
+            try:
+                healthy = await check()
+            except SandboxServiceError as e:
+                logger.warning(f"Sandbox service health check on port {port} failed: {e}")
+                healthy = False
+            now = self._clock()
+            if healthy:
+                state.healthy_until = now + HEALTH_TTL
+                state.retry_at = 0.0
+                state.failures = 0
+            else:
+                state.failures += 1
+                state.healthy_until = 0.0
+                state.retry_at = now + min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (state.failures - 1))
+            return healthy
+
+    def mark_unhealthy(self, port: int) -> None:
+        """Force the next ensure_healthy() call to re-check the service."""
+        state = self._health.get(port)
+        if state is not None:
+            state.healthy_until = 0.0
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+_clients: "OrderedDict[str, Tuple[SandboxServiceClient, asyncio.AbstractEventLoop]]" = OrderedDict()
+
+
+def get_service_client(sandbox: Any) -> SandboxServiceClient:
+    """Get the pooled client for a sandbox, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    key = sandbox.id
+    entry = _clients.get(key)
+    if entry is not None and entry[1] is loop:
+        _clients.move_to_end(key)
+        client = entry[0]
+        client.sandbox = sandbox
+        return client
+
+    # A client from another event loop is replaced: its connections belong to that loop
+    client = SandboxServiceClient(sandbox)
+    _clients[key] = (client, loop)
+    _clients.move_to_end(key)
+    while len(_clients) > MAX_CLIENTS:
+        _, (evicted, evicted_loop) = _clients.popitem(last=False)
+        if evicted_loop is loop:
+            loop.create_task(evicted.aclose())
+    return client
+
+
+async def close_service_clients() -> None:
+    loop = asyncio.get_running_loop()
+    clients = [client for client, client_loop in _clients.values() if client_loop is loop]
+    _clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
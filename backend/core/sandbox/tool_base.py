@@ -5,7 +5,8 @@ import asyncio
 from core.agentpress.thread_manager import ThreadManager
 from core.agentpress.tool import Tool
 from daytona_sdk import AsyncSandbox
-from core.sandbox.sandbox import get_or_start_sandbox, create_sandbox, delete_sandbox
+from core.sandbox.sandbox import create_sandbox, delete_sandbox
+from core.sandbox.lifecycle import get_or_start_sandbox, sandbox_lifecycle
 from core.utils.logger import logger
 from core.utils.files_utils import clean_path
 from core.utils.config import config
@@ -101,6 +102,9 @@ class SandboxToolsBase(Tool):
             except Exception as e:
                 logger.error(f"Error retrieving/creating sandbox for project {self.project_id}: {str(e)}")
                 raise e
+        elif self._sandbox_id:
+            # Keep the sandbox out of the idle sweep while tools are using it
+            await sandbox_lifecycle.touch(self._sandbox_id)
 
         return self._sandbox
 
@@ -0,0 +1,234 @@
+"""
+CPU-bound document text extraction in a process pool.
+
+PyPDF2, python-docx and chardet are pure Python and hold the GIL, so running
+them on the event loop (or in a thread) stalls every other request on the
+worker. Jobs here run in a small pool of spawned processes:
+
+- each job gets a soft time limit (SIGALRM inside the worker) and a hard one
+  enforced by the caller, after which the pool is recycled;
+- each worker process runs under an address-space limit so a pathological
+  file raises MemoryError instead of taking the API down;
+- PDFs are written to a temp file once and extracted in page batches, so big
+  files stream back page by page and extraction stops early at max_chars.
+"""
+
+import asyncio
+import io
+import os
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+import chardet
+
+from core.utils.logger import logger
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_TIME_LIMIT = float(os.getenv("EXTRACTION_TIME_LIMIT", "60"))
+EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_LIMIT_MB", "2048"))
+PDF_BATCH_PAGES = 50
+HARD_TIMEOUT_GRACE = 5.0
+
+TEXT_EXTENSIONS = {'.txt', '.json', '.xml', '.csv', '.yml', '.yaml', '.md', '.log', '.ini', '.cfg', '.conf'}
+TEXT_MIME_TYPES = {'application/json', 'application/xml', 'text/xml'}
+
+
+class ExtractionError(Exception):
+    pass
+
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Worker-side functions (run in the pool processes)
+# ---------------------------------------------------------------------------
+
+def _on_alarm(signum, frame):
+    raise ExtractionTimeout("extraction time limit exceeded")
+
+
+def _init_worker(memory_limit_bytes: Optional[int]) -> None:
+    if resource is not None and memory_limit_bytes:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ValueError, OSError):
+            pass
+    signal.signal(signal.SIGALRM, _on_alarm)
+
+
+def _run_job(time_limit: float, fn: Callable[..., Any], args: tuple) -> Any:
+    signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        return fn(*args)
+    except MemoryError:
+        raise ExtractionError("extraction memory limit exceeded")
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def decode_text(file_content: bytes) -> str:
+    detected = chardet.detect(file_content)
+    encoding = detected.get('encoding') or 'utf-8'
+    try:
+        return file_content.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return file_content.decode('utf-8', errors='replace')
+
+
+def extract_docx(file_content: bytes) -> str:
+    import docx
+    doc = docx.Document(io.BytesIO(file_content))
+    return '\n'.join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def extract_other(file_content: bytes, filename: str) -> str:
+    try:
+        detected = chardet.detect(file_content)
+        content = file_content.decode(detected.get('encoding') or 'utf-8')
+        # Only return if it seems to be mostly text content
+        if len([c for c in content[:1000] if c.isprintable() or c.isspace()]) > 800:
+            return content
+    except Exception:
+        pass
+    return f"[Binary file: {filename}] - Content cannot be extracted as text, but file is stored and available for download."
+
+
+def pdf_page_count(path: str) -> int:
+    import PyPDF2
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    import PyPDF2
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[i].extract_text() or '' for i in range(start, min(end, len(reader.pages)))]
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+class DocumentExtractionService:
+    def __init__(
+        self,
+        max_workers: int = EXTRACTION_WORKERS,
+        time_limit: float = EXTRACTION_TIME_LIMIT,
+        memory_limit_mb: int = EXTRACTION_MEMORY_LIMIT_MB,
+        pdf_batch_pages: int = PDF_BATCH_PAGES,
+    ):
+        self.max_workers = max_workers
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.pdf_batch_pages = pdf_batch_pages
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the API process has live threads (log writer, SDK pools) that fork would copy mid-state
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb * 1024 * 1024 if self.memory_limit_mb else None,),
+            )
+        return self._executor
+
+    def _recycle(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        processes = list(getattr(executor, "_processes", {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, time_limit: Optional[float] = None) -> Any:
+        """Run a picklable, module-level function in the pool under the job limits."""
+        limit = time_limit or self.time_limit
+        future = asyncio.get_running_loop().run_in_executor(self._get_executor(), _run_job, limit, fn, args)
+        try:
+            return await asyncio.wait_for(future, limit + HARD_TIMEOUT_GRACE)
+        except asyncio.TimeoutError:
+            logger.warning(f"Extraction job {getattr(fn, '__name__', fn)} ignored its time limit, recycling pool")
+            self._recycle()
+            raise ExtractionTimeout("extraction time limit exceeded")
+        except BrokenProcessPool:
+            self._recycle()
+            raise ExtractionError("extraction worker died (likely memory limit)")
+
+    async def iter_pdf_pages(self, file_content: bytes, max_chars: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield page texts in order, extracting pdf_batch_pages pages per job."""
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        pending: List[asyncio.Future] = []
+        try:
+            with os.fdopen(fd, "wb") as f:
+                await asyncio.to_thread(f.write, file_content)
+            page_count = await self.run(pdf_page_count, path)
+            starts = list(range(0, page_count, self.pdf_batch_pages))
+            extracted = 0
+            # Keep one batch in flight per worker, yield strictly in page order
+            for i in range(min(self.max_workers, len(starts))):
+                pending.append(asyncio.ensure_future(
+                    self.run(extract_pdf_pages, path, starts[i], starts[i] + self.pdf_batch_pages)
+                ))
+            next_batch = len(pending)
+            while pending:
+                texts = await pending.pop(0)
+                if next_batch < len(starts):
+                    pending.append(asyncio.ensure_future(
+                        self.run(extract_pdf_pages, path, starts[next_batch], starts[next_batch] + self.pdf_batch_pages)
+                    ))
+                    next_batch += 1
+                for text in texts:
+                    yield text
+                    extracted += len(text)
+                    if max_chars is not None and extracted >= max_chars:
+                        return
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    async def extract_text(self, file_content: bytes, filename: str, mime_type: str,
+                           max_chars: Optional[int] = None) -> str:
+        file_extension = Path(filename).suffix.lower()
+
+        if file_extension in TEXT_EXTENSIONS or mime_type.startswith('text/') or mime_type in TEXT_MIME_TYPES:
+            text = await self.run(decode_text, file_content)
+        elif file_extension == '.pdf':
+            pages: List[str] = []
+            async for page in self.iter_pdf_pages(file_content, max_chars=max_chars):
+                pages.append(page)
+            text = '\n\n'.join(pages)
+        elif file_extension == '.docx':
+            text = await self.run(extract_docx, file_content)
+        else:
+            text = await self.run(extract_other, file_content, filename)
+
+        return text[:max_chars] if max_chars is not None else text
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+extraction_service = DocumentExtractionService()
@@ -11,15 +11,20 @@ import asyncio
 import litellm
 from litellm.router import Router
 from litellm.files.main import ModelResponse
-from core.utils.logger import logger
+from core.utils.logger import logger, lazy
 from core.utils.config import config
 from core.agentpress.error_processor import ErrorProcessor
+from core.services.llm_router import router as llm_router
 
 # Configure LiteLLM
 os.environ['LITELLM_LOG'] = 'DEBUG'
 litellm.set_verbose = True  # Enable verbose logging
 litellm.modify_params = True
 litellm.drop_params = True
+# A cancelled stream (a stopped run, the losing deployment of a hedged call)
+# must close its connection so the provider stops generating: httpx closes
+# it when a read is cancelled, LiteLLM's aiohttp transport leaves it open
+litellm.disable_aiohttp_transport = True
 
 # Enable additional debug logging
 # import logging
@@ -88,7 +93,7 @@ def setup_provider_router(openai_compatible_api_key: str = None, openai_compatib
     ]
     provider_router = Router(model_list=model_list)
 
-def _configure_openai_compatible(params: Dict[str, Any], model_name: str, api_key: Optional[str], api_base: Optional[str]) -> None:
+def _configure_openai_compatible(model_name: str, api_key: Optional[str], api_base: Optional[str]) -> None:
     """Configure OpenAI-compatible provider setup."""
     if not model_name.startswith("openai-compatible/"):
         return
@@ -104,6 +109,18 @@ def _configure_openai_compatible(params: Dict[str, Any], model_name: str, api_ke
     setup_provider_router(api_key, api_base)
     logger.debug(f"Configured OpenAI-compatible provider with custom API base")
 
+def _summarize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Loggable view of LiteLLM params: sizes instead of prompt/tool bodies, no credentials."""
+    summary = {}
+    for key, value in params.items():
+        if key in ("api_key", "headers", "extra_headers"):
+            continue
+        if key in ("messages", "tools") and isinstance(value, list):
+            summary[f"{key}_count"] = len(value)
+        else:
+            summary[key] = value
+    return summary
+
 def _add_tools_config(params: Dict[str, Any], tools: Optional[List[Dict[str, Any]]], tool_choice: str) -> None:
     """Add tools configuration to parameters."""
     if tools is None:
@@ -157,24 +174,27 @@ async def make_llm_api_call(
     if extra_headers is not None:
         override_params["extra_headers"] = extra_headers
     
-    params = model_manager.get_litellm_params(resolved_model_name, **override_params)
-    
-    # logger.debug(f"Parameters from model_manager.get_litellm_params: {params}")
-    
-    if model_id:
-        params["model_id"] = model_id
-    
-    if stream:
-        params["stream_options"] = {"include_usage": True}
+    def build_params(deployment_id: str) -> Dict[str, Any]:
+        """Parameters for the requested model or an equivalent deployment the router picks."""
+        params = model_manager.get_litellm_params(deployment_id, **override_params)
+        
+        # logger.debug(f"Parameters from model_manager.get_litellm_params: {params}")
+        
+        if model_id:
+            params["model_id"] = model_id
+        
+        if stream:
+            params["stream_options"] = {"include_usage": True}
+        
+        _add_tools_config(params, tools, tool_choice)
+        logger.debug("LiteLLM parameters: %s", lazy(lambda: _summarize_params(params)))
+        return params
     
     # Apply additional configurations that aren't in the model config yet
-    _configure_openai_compatible(params, model_name, api_key, api_base)
-    _add_tools_config(params, tools, tool_choice)
+    _configure_openai_compatible(model_name, api_key, api_base)
     
     try:
-        # Log the complete parameters being sent to LiteLLM
         logger.debug(f"Calling LiteLLM acompletion for {resolved_model_name}")
-        logger.debug(f"Complete LiteLLM parameters: {params}")
         
         # # Save parameters to txt file for debugging
         # import json
@@ -195,7 +215,11 @@ async def make_llm_api_call(
         
         # logger.debug(f"LiteLLM parameters saved to: {filename}")
         
-        response = await provider_router.acompletion(**params)
+        # Calls with their own credentials or endpoint stay on the requested model
+        response = await llm_router.acompletion(
+            resolved_model_name, build_params, provider_router.acompletion, stream,
+            pinned=api_key is not None or api_base is not None,
+        )
         
         # For streaming responses, we need to handle errors that occur during iteration
         if hasattr(response, '__aiter__') and stream:
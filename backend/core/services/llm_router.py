@@ -0,0 +1,314 @@
+"""
+Routing of LLM calls between equivalent deployments.
+
+Models sharing a deployment_group in the ModelRegistry serve the same model
+through different endpoints (Sonnet 4.5 from Anthropic and through 302.AI,
+GLM-4.6 over its OpenAI and Anthropic APIs). For those, the router keeps per
+deployment, in each process, a rolling window of time to first chunk and of
+call outcomes, and on every call:
+
+- ranks the requested model and its equivalents: the requested one keeps the
+  call while it is healthy and not SWITCH_RATIO slower than another; one
+  failing MAX_ERROR_RATE of its recent calls is passed over. Equivalents
+  priced above the requested model are left out unless
+  LLM_ROUTING_ALLOW_PRICIER is set;
+- fails over to the next deployment when one fails with a deployment error
+  (5xx, 429, timeouts, connection errors) before its first chunk, or when an
+  equivalent the caller did not request rejects its credentials. LiteLLM's
+  own retries are left to the last deployment, so a failing endpoint is not
+  retried with backoff while another one is available;
+- with LLM_HEDGING_ENABLED, also starts the next deployment when the first
+  chunk takes longer than the p95 of the chosen one, streams whichever
+  answers first and cancels the other.
+
+Samples older than STATS_WINDOW_SECONDS are dropped, so a deployment passed
+over gets calls again once its failures have aged out. Models without
+equivalents, calls with their own api_key or api_base, and every call with
+LLM_ROUTING_ENABLED=false go straight to LiteLLM.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import litellm
+
+from core.ai_models import Model, model_manager
+from core.services import metrics
+from core.utils.config import config
+from core.utils.logger import logger
+
+STATS_WINDOW_SECONDS = 180
+TTFT_SAMPLES = 100
+# Outcomes are kept short so a burst of errors shows at once
+OUTCOME_SAMPLES = 10
+MIN_OUTCOMES = 3
+MIN_TTFT_SAMPLES = 5
+MAX_ERROR_RATE = 0.5
+SWITCH_RATIO = 0.5
+HEDGE_MIN_DELAY = 0.5
+HEDGE_MAX_DELAY = 30.0
+
+Completion = Callable[..., Awaitable[Any]]
+BuildParams = Callable[[str], Dict[str, Any]]
+
+_EMPTY = object()
+
+
+def is_deployment_error(error: BaseException) -> bool:
+    """Failures of the endpoint rather than of the request, which an
+    equivalent deployment may not have."""
+    if isinstance(error, (litellm.RateLimitError, litellm.ServiceUnavailableError, litellm.InternalServerError,
+                          litellm.APIConnectionError, litellm.Timeout, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+def is_failover_error(error: BaseException, deployment: str, requested: str) -> bool:
+    """Deployment errors, and authentication errors of an equivalent: its
+    credentials are wrong, which says nothing about the request."""
+    return is_deployment_error(error) or (
+        deployment != requested and isinstance(error, litellm.AuthenticationError))
+
+
+def is_pricier(model: Model, than: Model) -> bool:
+    if not model.pricing or not than.pricing:
+        return False
+    return (model.pricing.input_cost_per_million_tokens > than.pricing.input_cost_per_million_tokens
+            or model.pricing.output_cost_per_million_tokens > than.pricing.output_cost_per_million_tokens)
+
+
+class DeploymentStats:
+    """Rolling time to first chunk and call outcomes of one deployment."""
+
+    def __init__(self):
+        self._ttfts: Deque[Tuple[float, float]] = deque(maxlen=TTFT_SAMPLES)
+        self._outcomes: Deque[Tuple[float, bool]] = deque(maxlen=OUTCOME_SAMPLES)
+
+    def record_ttft(self, seconds: float) -> None:
+        self._ttfts.append((time.monotonic(), seconds))
+
+    def record_outcome(self, ok: bool) -> None:
+        self._outcomes.append((time.monotonic(), ok))
+
+    @staticmethod
+    def _recent(samples: Deque[Tuple[float, Any]]) -> List[Any]:
+        cutoff = time.monotonic() - STATS_WINDOW_SECONDS
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        return [value for _, value in samples]
+
+    def error_rate(self) -> Optional[float]:
+        outcomes = self._recent(self._outcomes)
+        if len(outcomes) < MIN_OUTCOMES:
+            return None
+        return outcomes.count(False) / len(outcomes)
+
+    def ttft_quantile(self, q: float) -> Optional[float]:
+        ttfts = sorted(self._recent(self._ttfts))
+        if len(ttfts) < MIN_TTFT_SAMPLES:
+            return None
+        return ttfts[min(int(q * len(ttfts)), len(ttfts) - 1)]
+
+    @property
+    def healthy(self) -> bool:
+        rate = self.error_rate()
+        return rate is None or rate < MAX_ERROR_RATE
+
+    def expected_ttft(self) -> Optional[float]:
+        """Median time to first chunk, inflated by the retries its error rate costs."""
+        median = self.ttft_quantile(0.5)
+        if median is None:
+            return None
+        return median / (1 - min(self.error_rate() or 0, 0.9))
+
+
+async def _abandon(iterator: Any) -> None:
+    """Drop a stream that will not be read. LiteLLM's stream wrappers have no
+    close reaching the connection; a read cancelled while waiting on it makes
+    httpx close the connection."""
+    read = asyncio.ensure_future(iterator.__anext__())
+    await asyncio.sleep(0)
+    read.cancel()
+    await asyncio.gather(read, return_exceptions=True)
+
+
+class LLMRouter:
+    def __init__(self):
+        self._stats: Dict[str, DeploymentStats] = {}
+
+    def stats(self, deployment: str) -> DeploymentStats:
+        stats = self._stats.get(deployment)
+        if stats is None:
+            stats = self._stats[deployment] = DeploymentStats()
+        return stats
+
+    def rank(self, model_id: str) -> Tuple[List[str], Optional[str]]:
+        """The requested model and its equivalents in the order to try them,
+        and why the first is not the requested one (unhealthy, latency)."""
+        equivalents = model_manager.get_equivalent_models(model_id)
+        requested = model_manager.get_model(model_id)
+        if requested and not config.LLM_ROUTING_ALLOW_PRICIER:
+            equivalents = [m for m in equivalents if not is_pricier(m, requested)]
+        candidates = [model_id] + [m.id for m in equivalents]
+        if len(candidates) == 1:
+            return candidates, None
+
+        expected = {c: self.stats(c).expected_ttft() for c in candidates}
+        # Unknown latency last, in registry priority order (sorted is stable)
+        healthy = sorted((c for c in candidates if self.stats(c).healthy),
+                         key=lambda c: (expected[c] is None, expected[c] or 0.0))
+        unhealthy = [c for c in candidates if c not in healthy]
+        first, reason = model_id, None
+        if model_id not in healthy:
+            if healthy:
+                first, reason = healthy[0], "unhealthy"
+        elif expected[model_id] is not None and healthy[0] != model_id and expected[healthy[0]] is not None \
+                and expected[healthy[0]] < expected[model_id] * SWITCH_RATIO:
+            first, reason = healthy[0], "latency"
+        return [first] + [c for c in healthy + unhealthy if c != first], reason
+
+    def hedge_delay(self, deployment: str) -> Optional[float]:
+        """p95 time to first chunk of `deployment`; None until it has enough samples."""
+        p95 = self.stats(deployment).ttft_quantile(0.95)
+        if p95 is None:
+            return None
+        return min(max(p95, HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+    async def acompletion(self, model_id: str, build_params: BuildParams, completion: Completion,
+                          stream: bool, pinned: bool = False) -> Any:
+        """Call `completion` (LiteLLM's acompletion) with `build_params(deployment)`
+        for the deployments of `model_id`, as described in the module docstring.
+
+        `pinned` keeps the call on `model_id` (its own credentials or endpoint).
+        """
+        if pinned or not config.LLM_ROUTING_ENABLED:
+            deployments, reason = [model_id], None
+        else:
+            deployments, reason = self.rank(model_id)
+        if len(deployments) == 1:
+            return await completion(**build_params(model_id))
+        if reason:
+            metrics.observe_llm_reroute(reason)
+            logger.info(f"Routing {model_id} to {deployments[0]} ({reason})")
+        if stream:
+            return await self._stream(model_id, deployments, build_params, completion)
+        return await self._complete(model_id, deployments, build_params, completion)
+
+    @staticmethod
+    def _params(deployments: List[str], index: int, build_params: BuildParams) -> Dict[str, Any]:
+        params = build_params(deployments[index])
+        if index + 1 < len(deployments):
+            params["num_retries"] = 0
+        return params
+
+    async def _complete(self, model_id: str, deployments: List[str], build_params: BuildParams,
+                        completion: Completion) -> Any:
+        for index, deployment in enumerate(deployments):
+            try:
+                response = await completion(**self._params(deployments, index, build_params))
+            except Exception as e:
+                if not is_failover_error(e, deployment, model_id):
+                    raise
+                self.stats(deployment).record_outcome(False)
+                if index + 1 == len(deployments):
+                    raise
+                metrics.observe_llm_reroute("failover")
+                logger.warning(f"LLM deployment {deployment} failed ({type(e).__name__}), "
+                               f"failing over to {deployments[index + 1]}")
+                continue
+            self.stats(deployment).record_outcome(True)
+            return response
+
+    async def _open(self, model_id: str, deployment: str, completion: Completion,
+                    params: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Send the request and wait for its first chunk."""
+        stats = self.stats(deployment)
+        started = time.monotonic()
+        try:
+            response = await completion(**params)
+            iterator = response.__aiter__()
+            try:
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                first = _EMPTY
+        except Exception as e:
+            if is_failover_error(e, deployment, model_id):
+                stats.record_outcome(False)
+            raise
+        stats.record_ttft(time.monotonic() - started)
+        stats.record_outcome(True)
+        return iterator, first
+
+    async def _stream(self, model_id: str, deployments: List[str], build_params: BuildParams,
+                      completion: Completion) -> Any:
+        attempts: Dict[asyncio.Task, Tuple[str, float]] = {}
+        failed: List[Tuple[str, Exception]] = []
+
+        def launch() -> None:
+            index = len(attempts) + len(failed)
+            params = self._params(deployments, index, build_params)
+            task = asyncio.create_task(self._open(model_id, deployments[index], completion, params))
+            attempts[task] = (deployments[index], time.monotonic())
+
+        launch()
+        hedge_delay = self.hedge_delay(deployments[0]) if config.LLM_HEDGING_ENABLED else None
+        try:
+            while True:
+                done, _ = await asyncio.wait(attempts, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"No first chunk from {deployments[0]} after {hedge_delay:.2f}s, "
+                                f"hedging with {deployments[1]}")
+                    hedge_delay = None
+                    launch()
+                    continue
+                winner = None
+                for task in done:
+                    deployment, _ = attempts.pop(task)
+                    if task.exception() is not None:
+                        failed.append((deployment, task.exception()))
+                    elif winner is None:
+                        winner = deployment, task.result()
+                    else:
+                        await _abandon(task.result()[0])
+                if winner is not None:
+                    deployment, (iterator, first) = winner
+                    if deployment != deployments[0]:
+                        metrics.observe_llm_reroute("failover" if failed else "hedge")
+                    return self._relay(deployment, iterator, first)
+                deployment, error = failed[-1]
+                if not is_failover_error(error, deployment, model_id):
+                    raise error
+                if not attempts:
+                    if len(failed) == len(deployments):
+                        raise error
+                    logger.warning(f"LLM deployment {deployment} failed ({type(error).__name__}), "
+                                   f"failing over to {deployments[len(failed)]}")
+                    hedge_delay = None
+                    launch()
+        finally:
+            # Losers (or all attempts, when the caller is cancelled): not
+            # having a first chunk by now is a lower bound of their latency
+            for task, (deployment, started) in attempts.items():
+                task.cancel()
+                self.stats(deployment).record_ttft(time.monotonic() - started)
+            for result in await asyncio.gather(*attempts, return_exceptions=True):
+                # Finished before it was cancelled
+                if isinstance(result, tuple):
+                    await _abandon(result[0])
+
+    async def _relay(self, deployment: str, iterator: Any, first: Any):
+        if first is not _EMPTY:
+            yield first
+        try:
+            async for chunk in iterator:
+                yield chunk
+        except Exception as e:
+            if is_deployment_error(e):
+                self.stats(deployment).record_outcome(False)
+            raise
+
+
+router = LLMRouter()
@@ -0,0 +1,261 @@
+"""
+Prometheus metrics for agent runs.
+
+Recorded here:
+
+- suna_llm_time_to_first_token_seconds{model}: LLM request sent to first
+  streamed chunk;
+- suna_llm_stream_duration_seconds{model,status}: LLM request sent to last
+  chunk;
+- suna_prompt_assembly_seconds{model}: PromptManager.build_system_prompt;
+- suna_context_compression_seconds{model}: ContextManager.compress_messages
+  before each LLM call;
+- suna_tool_execution_seconds{tool,status}: ResponseProcessor._execute_tool;
+- suna_redis_publish_lag_seconds: agent response produced to stored in the
+  run's Redis list and announced on its channel, for one response in
+  PUBLISH_LAG_SAMPLE (a run streams one per LLM chunk);
+- suna_db_calls_total and suna_db_calls_per_run{status}: Supabase requests;
+- suna_llm_reroutes_total{reason}: LLM calls the router moved to an
+  equivalent deployment (unhealthy, latency, failover, hedge).
+
+Labels only take bounded values: statuses are fixed sets, and tool and
+model names past the first MAX_LABEL_VALUES seen in a process (MCP tools are
+named by their servers) are reported as "other".
+
+The API serves them on /metrics; the dramatiq workers through the
+worker_metrics.py exporter. With gunicorn and dramatiq each running several
+processes, set PROMETHEUS_MULTIPROC_DIR to a directory shared by the processes
+of a container (emptied when the container starts): every process then
+writes its samples there and render() aggregates them. Without it, render()
+serves the samples of the current process.
+
+METRICS_ENABLED=false turns recording off.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+enabled = os.getenv("METRICS_ENABLED", "true").lower() != "false"
+
+MAX_LABEL_VALUES = 100
+OTHER = "other"
+PUBLISH_LAG_SAMPLE = 20
+
+# Seconds; LLM latencies go up to minutes, prompt assembly and compression
+# are milliseconds when cached
+LLM_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13, 21, 34, 60, 120, 300)
+STEP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TOOL_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+DB_CALL_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+TIME_TO_FIRST_TOKEN = Histogram(
+    "suna_llm_time_to_first_token_seconds", "LLM request sent to first streamed chunk",
+    ["model"], buckets=LLM_BUCKETS,
+)
+LLM_STREAM_DURATION = Histogram(
+    "suna_llm_stream_duration_seconds", "LLM request sent to last streamed chunk",
+    ["model", "status"], buckets=LLM_BUCKETS,
+)
+PROMPT_ASSEMBLY = Histogram(
+    "suna_prompt_assembly_seconds", "System prompt assembly time", ["model"], buckets=STEP_BUCKETS,
+)
+CONTEXT_COMPRESSION = Histogram(
+    "suna_context_compression_seconds", "Context compression time before an LLM call",
+    ["model"], buckets=STEP_BUCKETS,
+)
+TOOL_EXECUTION = Histogram(
+    "suna_tool_execution_seconds", "Tool execution time", ["tool", "status"], buckets=TOOL_BUCKETS,
+)
+REDIS_PUBLISH_LAG = Histogram(
+    "suna_redis_publish_lag_seconds", "Agent response produced to stored and announced in Redis",
+    buckets=STEP_BUCKETS,
+)
+DB_CALLS = Counter("suna_db_calls", "Supabase requests")
+LLM_REROUTES = Counter(
+    "suna_llm_reroutes", "LLM calls served by another deployment than the requested one", ["reason"],
+)
+DB_CALLS_PER_RUN = Histogram(
+    "suna_db_calls_per_run", "Supabase requests made by an agent run", ["status"], buckets=DB_CALL_BUCKETS,
+)
+
+
+class _BoundedLabel:
+    """Passes through the first `limit` distinct values, then OTHER."""
+
+    def __init__(self, limit: int = MAX_LABEL_VALUES):
+        self.limit = limit
+        self._values: Set[str] = set()
+
+    def __call__(self, value: Optional[str]) -> str:
+        value = value or "unknown"
+        if value in self._values:
+            return value
+        if len(self._values) >= self.limit:
+            return OTHER
+        self._values.add(value)
+        return value
+
+
+_model_label = _BoundedLabel()
+_tool_label = _BoundedLabel()
+
+# Labelled children by metric and label values: labels() validates and
+# locks on every call, several times the cost of the observation itself
+_children: Dict[Tuple[Any, ...], Any] = {}
+
+
+def _child(metric: Any, *labels: str) -> Any:
+    key = (metric, *labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+def observe_prompt_assembly(model: str, seconds: float) -> None:
+    if enabled:
+        _child(PROMPT_ASSEMBLY, _model_label(model)).observe(seconds)
+
+
+def observe_context_compression(model: str, seconds: float) -> None:
+    if enabled:
+        _child(CONTEXT_COMPRESSION, _model_label(model)).observe(seconds)
+
+
+def observe_tool_execution(tool: str, status: str, seconds: float) -> None:
+    """status: success, failure (the tool returned an unsuccessful result), not_found or error."""
+    if enabled:
+        _child(TOOL_EXECUTION, _tool_label(tool), status).observe(seconds)
+
+
+def observe_llm_reroute(reason: str) -> None:
+    """reason: unhealthy, latency, failover or hedge (see core.services.llm_router)."""
+    if enabled:
+        _child(LLM_REROUTES, reason).inc()
+
+
+_publish_lag_responses = itertools.count()
+
+
+def track_publish_lag(produced: float, *tasks: asyncio.Task) -> None:
+    """Record the time from `produced` (time.monotonic()) until all `tasks`
+    (the Redis writes of one agent response) have succeeded, for one call
+    in PUBLISH_LAG_SAMPLE."""
+    if not enabled or next(_publish_lag_responses) % PUBLISH_LAG_SAMPLE:
+        return
+    remaining = [len(tasks)]
+
+    def done(task: asyncio.Task) -> None:
+        remaining[0] -= 1
+        if remaining[0] == 0 and all(not t.cancelled() and t.exception() is None for t in tasks):
+            REDIS_PUBLISH_LAG.observe(time.monotonic() - produced)
+
+    for task in tasks:
+        task.add_done_callback(done)
+
+
+def timed_stream(stream: AsyncIterator[Any], model: str, started: float) -> AsyncIterator[Any]:
+    """Wrap an LLM stream to record its time to first chunk and duration.
+
+    `started` is the time.monotonic() at which the request was sent. A
+    stream the consumer stops reading early counts as completed at its last
+    chunk.
+    """
+    if not enabled:
+        return stream
+    return _TimedStream(stream, _model_label(model), started)
+
+
+class _TimedStream:
+    # A plain async iterator rather than an async generator: a stream the
+    # response processor stops reading is never closed, and an abandoned
+    # async generator would leave its finalization to the event loop
+    def __init__(self, stream: AsyncIterator[Any], model: str, started: float):
+        self._stream = stream.__aiter__()
+        self._model = model
+        self._started = started
+        self._last_chunk: Optional[float] = None
+        self._finished = False
+
+    def __aiter__(self) -> "_TimedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._finish("completed")
+            raise
+        except asyncio.CancelledError:
+            self._finish("cancelled")
+            raise
+        except Exception:
+            self._finish("error")
+            raise
+        now = time.monotonic()
+        if self._last_chunk is None:
+            _child(TIME_TO_FIRST_TOKEN, self._model).observe(now - self._started)
+        self._last_chunk = now
+        return chunk
+
+    def _finish(self, status: str) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        ended = self._last_chunk if status == "completed" and self._last_chunk is not None else time.monotonic()
+        _child(LLM_STREAM_DURATION, self._model, status).observe(ended - self._started)
+
+    def __del__(self):
+        # The consumer stopped reading early
+        self._finish("completed")
+
+
+# Supabase requests of the agent run in progress in this context
+_run_db_calls: ContextVar[Optional[Dict[str, int]]] = ContextVar("run_db_calls", default=None)
+
+
+async def _count_db_call(request: httpx.Request) -> None:
+    if not enabled:
+        return
+    DB_CALLS.inc()
+    calls = _run_db_calls.get()
+    if calls is not None:
+        calls["count"] += 1
+
+
+def instrument_http_client(client: httpx.AsyncClient) -> None:
+    """Count the requests `client` sends (the Supabase PostgREST session)."""
+    if _count_db_call not in client.event_hooks["request"]:
+        client.event_hooks["request"].append(_count_db_call)
+
+
+def start_run() -> Dict[str, int]:
+    """Count Supabase requests made from this context (and tasks it starts) on."""
+    calls = {"count": 0}
+    _run_db_calls.set(calls)
+    return calls
+
+
+def finish_run(calls: Dict[str, int], status: str) -> None:
+    """status: the run's final status (completed, failed, stopped or interrupted)."""
+    if enabled:
+        _child(DB_CALLS_PER_RUN, status).observe(calls["count"])
+    if _run_db_calls.get() is calls:
+        _run_db_calls.set(None)
+
+
+def render() -> Tuple[bytes, str]:
+    """The Prometheus exposition of all metrics and its content type."""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
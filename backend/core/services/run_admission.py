@@ -0,0 +1,352 @@
+"""
+Admission queue for agent runs.
+
+Runs used to be sent straight onto the dramatiq queue, so one account firing
+many runs (e.g. through triggers) delayed everyone queued behind it. Runs are
+now enqueued here and workers pull the next run to admit:
+
+- each account has its own FIFO list per priority class;
+- priority classes are strict: interactive runs are admitted before trigger
+  runs, which are admitted before batch runs;
+- within a class accounts are served by start-time fair queuing: an account
+  that just had a run admitted moves 1/weight behind the others, so N busy
+  accounts share admissions in proportion to their weights no matter how many
+  runs each has queued;
+- queue depth, the time runs spent waiting and the runs currently admitted
+  are kept in Redis for the metrics endpoint.
+
+Enqueue and dequeue (with its wait and running bookkeeping) are each one Lua
+script, so any number of API and worker processes see a consistent view in a
+single round trip, without a lock. A dequeued run stays claimed in Redis until
+the worker running it holds its run lease; claims older than CLAIM_TIMEOUT
+(the worker died in between) are put back at the head of their account's
+queue by requeue_stale_claims.
+
+Every key shares the {admission} hash tag and is passed to the scripts in
+KEYS, so the queue also works on Redis Cluster. The runs of all accounts of a
+priority class are kept in one sorted set, ordered by account and then
+submission, rather than one list per account, so that dequeue knows its keys
+up front.
+"""
+
+import json
+import math
+import time
+import uuid
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Dict, List, Optional
+
+from core.services import redis
+from core.utils.logger import logger
+
+KEY_PREFIX = "{admission}"
+RETRY_KEY = f"{KEY_PREFIX}:retry"
+WEIGHTS_KEY = f"{KEY_PREFIX}:weights"
+DEPTH_KEY = f"{KEY_PREFIX}:depth"
+RUNNING_KEY = f"{KEY_PREFIX}:running"
+# Queue entry -> job of queued and claimed runs
+JOBS_KEY = f"{KEY_PREFIX}:jobs"
+# job_id -> queue entry of dequeued runs not yet held by a run lease
+CLAIMS_KEY = f"{KEY_PREFIX}:claims"
+SEQ_KEY = f"{KEY_PREFIX}:seq"
+# Seconds a dequeued run may take to reach its run lease
+CLAIM_TIMEOUT = 300
+# Admitted runs older than this are assumed lost and dropped from metrics
+RUNNING_TTL = 3600 * 24
+WAIT_SAMPLES = 1000
+DEFAULT_WEIGHT = 1.0
+
+
+# Queue entries are "<account>:<sequence number>" with score 0, so each
+# account's entries sort together, in submission order, and its head is the
+# first entry in the lexical range "[<account>:" .. "[<account>:\xff".
+
+# KEYS: queue, ready, jobs, depth, vclock, finish, seq
+# ARGV: priority, account_id, job
+ENQUEUE_SCRIPT = """
+local queue_key, ready_key, jobs_key, depth_key, vclock_key, finish_key, seq_key = unpack(KEYS)
+local priority, account = ARGV[1], ARGV[2]
+local entry = account .. ':' .. string.format('%015d', redis.call('INCR', seq_key))
+redis.call('ZADD', queue_key, 0, entry)
+redis.call('HSET', jobs_key, entry, ARGV[3])
+redis.call('HINCRBY', depth_key, priority, 1)
+if not redis.call('ZSCORE', ready_key, account) then
+    -- An account becoming active starts at the current virtual time, or
+    -- later if its previous runs are not paid off yet
+    local vclock = tonumber(redis.call('GET', vclock_key) or '0')
+    local finish = tonumber(redis.call('ZSCORE', finish_key, account) or '0')
+    redis.call('ZADD', ready_key, math.max(vclock, finish), account)
+end
+"""
+
+# KEYS: jobs, depth, weights, running, claims, then per priority (in order):
+#       ready, queue, vclock, finish, waits
+# ARGV: now, default weight, wait samples
+DEQUEUE_SCRIPT = """
+local jobs_key, depth_key, weights_key, running_key, claims_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+local now = tonumber(ARGV[1])
+for base = 6, #KEYS, 5 do
+    local priority = (base - 6) / 5
+    local ready_key, queue_key, vclock_key, finish_key, waits_key =
+        KEYS[base], KEYS[base + 1], KEYS[base + 2], KEYS[base + 3], KEYS[base + 4]
+    while true do
+        local head = redis.call('ZRANGE', ready_key, 0, 0, 'WITHSCORES')
+        if #head == 0 then
+            break
+        end
+        local account, start = head[1], tonumber(head[2])
+        local entries = redis.call('ZRANGEBYLEX', queue_key, '[' .. account .. ':', '[' .. account .. ':\255',
+                                   'LIMIT', 0, 2)
+        local raw = entries[1] and redis.call('HGET', jobs_key, entries[1])
+        if entries[1] then
+            redis.call('ZREM', queue_key, entries[1])
+            redis.call('HINCRBY', depth_key, priority, -1)
+        end
+        if #entries < 2 then
+            redis.call('ZREM', ready_key, account)
+        end
+        if raw then
+            local weight = tonumber(redis.call('HGET', weights_key, account) or ARGV[2])
+            local finish = start + 1.0 / math.max(weight, 0.01)
+            local vclock = string.format('%.17g', start)
+            redis.call('SET', vclock_key, vclock)
+            redis.call('ZADD', finish_key, finish, account)
+            -- Finish tags behind the virtual time no longer delay anyone
+            redis.call('ZREMRANGEBYSCORE', finish_key, '-inf', vclock)
+            if #entries == 2 then
+                redis.call('ZADD', ready_key, finish, account)
+            end
+
+            local job = cjson.decode(raw)
+            redis.call('LPUSH', waits_key, string.format('%.3f', math.max(0, now - job['enqueued_at'])))
+            redis.call('LTRIM', waits_key, 0, tonumber(ARGV[3]) - 1)
+            redis.call('ZADD', running_key, now, job['job_id'])
+            redis.call('HSET', claims_key, job['job_id'], entries[1])
+            return raw
+        end
+        -- No entry (or its job vanished, e.g. flushed): drop it and look again
+    end
+end
+return false
+"""
+
+# KEYS: claims, jobs
+# ARGV: job_id
+RELEASE_SCRIPT = """
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if entry then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], entry)
+end
+return entry and 1 or 0
+"""
+
+# KEYS: claims, jobs, depth, running, then per priority (in order):
+#       ready, queue, vclock, finish
+# ARGV: claimed before (timestamp)
+REQUEUE_SCRIPT = """
+local claims_key, jobs_key, depth_key, running_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local requeued = 0
+local claims = redis.call('HGETALL', claims_key)
+for i = 1, #claims, 2 do
+    local job_id, entry = claims[i], claims[i + 1]
+    local claimed_at = tonumber(redis.call('ZSCORE', running_key, job_id) or '0')
+    if claimed_at < tonumber(ARGV[1]) then
+        redis.call('HDEL', claims_key, job_id)
+        redis.call('ZREM', running_key, job_id)
+        local raw = redis.call('HGET', jobs_key, entry)
+        if raw then
+            local job = cjson.decode(raw)
+            local base = 5 + job['priority'] * 4
+            local ready_key, queue_key, vclock_key, finish_key = KEYS[base], KEYS[base + 1], KEYS[base + 2], KEYS[base + 3]
+            -- Same entry, so it is back at the head of its account's runs
+            redis.call('ZADD', queue_key, 0, entry)
+            redis.call('HINCRBY', depth_key, job['priority'], 1)
+            if not redis.call('ZSCORE', ready_key, job['account_id']) then
+                local vclock = tonumber(redis.call('GET', vclock_key) or '0')
+                local finish = tonumber(redis.call('ZSCORE', finish_key, job['account_id']) or '0')
+                redis.call('ZADD', ready_key, math.max(vclock, finish), job['account_id'])
+            end
+            requeued = requeued + 1
+        end
+    end
+end
+return requeued
+"""
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    TRIGGER = 1
+    BATCH = 2
+
+
+def _queue_key(priority: Priority) -> str:
+    return f"{KEY_PREFIX}:q:{int(priority)}"
+
+
+def _ready_key(priority: Priority) -> str:
+    return f"{KEY_PREFIX}:ready:{int(priority)}"
+
+
+def _finish_key(priority: Priority) -> str:
+    return f"{KEY_PREFIX}:finish:{int(priority)}"
+
+
+def _vclock_key(priority: Priority) -> str:
+    return f"{KEY_PREFIX}:vclock:{int(priority)}"
+
+
+def _waits_key(priority: Priority) -> str:
+    return f"{KEY_PREFIX}:waits:{int(priority)}"
+
+
+@dataclass
+class AdmissionJob:
+    job_id: str
+    account_id: str
+    priority: Priority
+    enqueued_at: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "job_id": self.job_id,
+            "account_id": self.account_id,
+            "priority": int(self.priority),
+            "enqueued_at": self.enqueued_at,
+            "payload": self.payload,
+        })
+
+    @classmethod
+    def loads(cls, raw: str) -> "AdmissionJob":
+        data = json.loads(raw)
+        return cls(
+            job_id=data["job_id"],
+            account_id=data["account_id"],
+            priority=Priority(data["priority"]),
+            enqueued_at=data["enqueued_at"],
+            payload=data.get("payload") or {},
+        )
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index], 3)
+
+
+class AdmissionQueue:
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+
+    async def enqueue(
+        self,
+        account_id: str,
+        payload: Dict[str, Any],
+        priority: Priority = Priority.INTERACTIVE,
+        job_id: Optional[str] = None,
+    ) -> AdmissionJob:
+        job = AdmissionJob(
+            job_id=job_id or str(uuid.uuid4()),
+            account_id=account_id,
+            priority=Priority(priority),
+            enqueued_at=self.clock(),
+            payload=payload,
+        )
+        client = await redis.get_client()
+        enqueue = client.register_script(ENQUEUE_SCRIPT)
+        keys = [_queue_key(job.priority), _ready_key(job.priority), JOBS_KEY, DEPTH_KEY,
+                _vclock_key(job.priority), _finish_key(job.priority), SEQ_KEY]
+        await enqueue(keys=keys, args=[int(job.priority), account_id, job.dumps()])
+        return job
+
+    async def dequeue(self) -> Optional[AdmissionJob]:
+        """Pop the next run to admit, mark it running and claim it, or None if
+        nothing is waiting. The claim is given up with release()."""
+        client = await redis.get_client()
+        dequeue = client.register_script(DEQUEUE_SCRIPT)
+        keys = [JOBS_KEY, DEPTH_KEY, WEIGHTS_KEY, RUNNING_KEY, CLAIMS_KEY]
+        for priority in Priority:
+            keys += [_ready_key(priority), _queue_key(priority), _vclock_key(priority),
+                     _finish_key(priority), _waits_key(priority)]
+        raw = await dequeue(keys=keys, args=[self.clock(), DEFAULT_WEIGHT, WAIT_SAMPLES])
+        return AdmissionJob.loads(raw) if raw else None
+
+    async def release(self, job: AdmissionJob) -> None:
+        """Give up the claim on a dequeued run: its worker now holds the run
+        lease, which covers the run from here on, or it is not run at all."""
+        client = await redis.get_client()
+        release = client.register_script(RELEASE_SCRIPT)
+        await release(keys=[CLAIMS_KEY, JOBS_KEY], args=[job.job_id])
+
+    async def requeue_stale_claims(self) -> int:
+        """Put runs claimed more than CLAIM_TIMEOUT ago back at the head of
+        their account's queue; returns how many."""
+        client = await redis.get_client()
+        requeue = client.register_script(REQUEUE_SCRIPT)
+        keys = [CLAIMS_KEY, JOBS_KEY, DEPTH_KEY, RUNNING_KEY]
+        for priority in Priority:
+            keys += [_ready_key(priority), _queue_key(priority), _vclock_key(priority), _finish_key(priority)]
+        return int(await requeue(keys=keys, args=[self.clock() - CLAIM_TIMEOUT]) or 0)
+
+    async def claim_retry(self, delay_ms: int) -> bool:
+        """True for one caller per delay_ms, which re-sends the admission message
+        for all queued runs while every slot is busy."""
+        client = await redis.get_client()
+        return bool(await client.set(RETRY_KEY, "1", px=delay_ms, nx=True))
+
+    async def complete(self, job: AdmissionJob) -> None:
+        """Mark an admitted run as finished, releasing it if still claimed."""
+        try:
+            await self.release(job)
+            client = await redis.get_client()
+            await client.zrem(RUNNING_KEY, job.job_id)
+        except Exception as e:
+            logger.warning(f"Failed to mark admitted run {job.job_id} complete: {e}")
+
+    async def depth(self) -> int:
+        client = await redis.get_client()
+        values = await client.hgetall(DEPTH_KEY)
+        return sum(max(0, int(v)) for v in values.values())
+
+    async def set_weight(self, account_id: str, weight: float) -> None:
+        """Set an account's share of admissions relative to the default of 1."""
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        client = await redis.get_client()
+        if weight == DEFAULT_WEIGHT:
+            await client.hdel(WEIGHTS_KEY, account_id)
+        else:
+            await client.hset(WEIGHTS_KEY, account_id, str(weight))
+
+    async def metrics(self) -> Dict[str, Any]:
+        client = await redis.get_client()
+        now = self.clock()
+        await client.zremrangebyscore(RUNNING_KEY, "-inf", now - RUNNING_TTL)
+        depths = await client.hgetall(DEPTH_KEY)
+
+        priorities = {}
+        for priority in Priority:
+            waits = [float(w) for w in await client.lrange(_waits_key(priority), 0, -1)]
+            priorities[priority.name.lower()] = {
+                "queued": max(0, int(depths.get(str(int(priority)), 0))),
+                "waiting_accounts": await client.zcard(_ready_key(priority)),
+                "wait_seconds": {
+                    "samples": len(waits),
+                    "p50": _percentile(waits, 50),
+                    "p95": _percentile(waits, 95),
+                    "max": round(max(waits), 3) if waits else None,
+                },
+            }
+        return {
+            "queued": sum(p["queued"] for p in priorities.values()),
+            "running": await client.zcard(RUNNING_KEY),
+            "priorities": priorities,
+        }
+
+
+admission_queue = AdmissionQueue()
@@ -5,6 +5,7 @@ Centralized database connection management for AgentPress using Supabase.
 from typing import Optional
 from supabase import create_async_client, AsyncClient
 from core.utils.logger import logger
+from core.services import metrics
 from core.utils.config import config
 import base64
 import uuid
@@ -52,6 +53,7 @@ class DBConnection:
                 supabase_url, 
                 supabase_key,
             )
+            metrics.instrument_http_client(self._client.postgrest.session)
             
             self._initialized = True
             key_type = "SERVICE_ROLE_KEY" if config.SUPABASE_SERVICE_ROLE_KEY else "ANON_KEY"
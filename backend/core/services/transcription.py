@@ -1,76 +1,311 @@
+"""
+Audio transcription endpoint.
+
+The upload is streamed to a temporary file, split into segments on silence
+boundaries when it is longer than SPLIT_THRESHOLD_SECONDS, and the segments
+are transcribed concurrently through a shared AsyncOpenAI client. Nothing on
+the request path blocks the event loop: file I/O and WAV analysis run in
+worker threads, ffmpeg runs as a subprocess.
+
+Splitting:
+- WAV is analysed and cut with the standard library;
+- other formats are cut with ffmpeg (silencedetect) when it is installed,
+  otherwise they are sent as a single segment.
+
+With ?stream=true the response is an SSE stream of segment texts in order,
+followed by the stitched text.
+"""
+
+import asyncio
+import json
 import os
-import openai
+import re
+import shutil
 import tempfile
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import wave
+from array import array
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+import openai
+# openai imports its resource modules on first use (client.audio), which
+# takes hundreds of ms; do it at startup rather than inside a request
+import openai.resources  # noqa: F401
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
 from core.utils.logger import logger
 from core.utils.auth_utils import verify_and_get_user_id_from_jwt
 
 router = APIRouter(tags=["transcription"])
 
+TRANSCRIPTION_MODEL = "gpt-4o-mini-transcribe"
+# OpenAI supports these formats
+ALLOWED_TYPES = [
+    'audio/mp3', 'audio/mpeg', 'audio/mp4', 'audio/m4a',
+    'audio/wav', 'audio/webm', 'audio/mpga'
+]
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Audio longer than this is split into segments of about SEGMENT_SECONDS,
+# each cut at the quietest point within SPLIT_SEARCH_SECONDS of its target
+SPLIT_THRESHOLD_SECONDS = 150.0
+SEGMENT_SECONDS = 120.0
+SPLIT_SEARCH_SECONDS = 15.0
+ENERGY_WINDOW_SECONDS = 0.1
+# Transcription requests in flight per process, across all uploads
+MAX_CONCURRENT_SEGMENTS = 8
+
+_client: Optional[openai.AsyncOpenAI] = None
+_segment_slots: Optional[asyncio.Semaphore] = None
+
+
 class TranscriptionResponse(BaseModel):
     text: str
 
+
+def get_transcription_client() -> openai.AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def _get_segment_slots() -> asyncio.Semaphore:
+    global _segment_slots
+    if _segment_slots is None:
+        _segment_slots = asyncio.Semaphore(MAX_CONCURRENT_SEGMENTS)
+    return _segment_slots
+
+
+# ----------------------------------------------------------------------
+# Upload
+# ----------------------------------------------------------------------
+
+async def save_upload(audio_file: UploadFile, path: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> int:
+    """Stream the upload to `path` in chunks; returns the size in bytes."""
+    size = 0
+    with await asyncio.to_thread(open, path, 'wb') as out:
+        while True:
+            chunk = await audio_file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=400, detail=f"File size exceeds {max_bytes // (1024 * 1024)}MB limit")
+            await asyncio.to_thread(out.write, chunk)
+    return size
+
+
+# ----------------------------------------------------------------------
+# Segmentation
+# ----------------------------------------------------------------------
+
+def choose_cut_points(duration: float, quietness) -> List[float]:
+    """Cut times (seconds) for audio of `duration`.
+
+    `quietness(start, end)` returns the quietest time within [start, end];
+    each cut lands there instead of exactly every SEGMENT_SECONDS.
+    """
+    if duration <= SPLIT_THRESHOLD_SECONDS:
+        return []
+    cuts = []
+    position = 0.0
+    while duration - position > SPLIT_THRESHOLD_SECONDS:
+        target = position + SEGMENT_SECONDS
+        cut = quietness(max(position + 1.0, target - SPLIT_SEARCH_SECONDS), min(duration - 1.0, target + SPLIT_SEARCH_SECONDS))
+        cuts.append(cut)
+        position = cut
+    return cuts
+
+
+def _wav_window_energies(path: Path) -> Tuple[float, List[int]]:
+    """Duration and mean absolute amplitude per ENERGY_WINDOW_SECONDS of a 16-bit WAV."""
+    with wave.open(str(path), 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV is split natively")
+        channels, rate, frames = wav.getnchannels(), wav.getframerate(), wav.getnframes()
+        window_frames = max(1, int(rate * ENERGY_WINDOW_SECONDS))
+        # Every 8th sample is plenty to tell speech from silence
+        stride = 8 * channels
+        energies = []
+        while True:
+            data = wav.readframes(window_frames)
+            if not data:
+                break
+            samples = array('h', data)[::stride]
+            energies.append(sum(map(abs, samples)) // max(1, len(samples)))
+    return frames / rate, energies
+
+
+def _split_wav(path: Path, out_dir: Path) -> List[Path]:
+    duration, energies = _wav_window_energies(path)
+
+    def quietest(start: float, end: float) -> float:
+        first = int(start / ENERGY_WINDOW_SECONDS)
+        last = min(len(energies), max(first + 1, int(end / ENERGY_WINDOW_SECONDS)))
+        window = min(range(first, last), key=energies.__getitem__, default=first)
+        return (window + 0.5) * ENERGY_WINDOW_SECONDS
+
+    cuts = choose_cut_points(duration, quietest)
+    if not cuts:
+        return [path]
+
+    segments = []
+    with wave.open(str(path), 'rb') as wav:
+        params, rate = wav.getparams(), wav.getframerate()
+        bounds = [0] + [int(cut * rate) for cut in cuts] + [wav.getnframes()]
+        for index, (start, end) in enumerate(zip(bounds, bounds[1:])):
+            segment_path = out_dir / f"segment-{index:03d}.wav"
+            wav.setpos(start)
+            with wave.open(str(segment_path), 'wb') as out:
+                out.setparams(params)
+                out.writeframes(wav.readframes(end - start))
+            segments.append(segment_path)
+    return segments
+
+
+async def _run(*args: str) -> Tuple[int, str, str]:
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return process.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+
+
+async def _split_with_ffmpeg(path: Path, out_dir: Path) -> List[Path]:
+    code, out, _ = await _run('ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', str(path))
+    if code != 0 or not out.strip():
+        return [path]
+    duration = float(out.strip())
+    if duration <= SPLIT_THRESHOLD_SECONDS:
+        return [path]
+
+    _, _, log = await _run('ffmpeg', '-hide_banner', '-nostats', '-i', str(path),
+                           '-af', 'silencedetect=noise=-35dB:d=0.3', '-f', 'null', '-')
+    starts = [float(v) for v in re.findall(r"silence_start: (-?[\d.]+)", log)]
+    ends = [float(v) for v in re.findall(r"silence_end: ([\d.]+)", log)]
+    silences = [(s + e) / 2 for s, e in zip(starts, ends)]
+
+    def quietest(start: float, end: float) -> float:
+        target = (start + end) / 2
+        inside = [s for s in silences if start <= s <= end]
+        return min(inside, key=lambda s: abs(s - target)) if inside else target
+
+    cuts = choose_cut_points(duration, quietest)
+    segments = []
+    for index, (start, end) in enumerate(zip([0.0] + cuts, cuts + [duration])):
+        segment_path = out_dir / f"segment-{index:03d}{path.suffix}"
+        code, _, err = await _run('ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-ss', f"{start:.3f}",
+                                  '-to', f"{end:.3f}", '-i', str(path), '-c', 'copy', str(segment_path))
+        if code != 0:
+            logger.warning(f"ffmpeg failed to cut segment {index}, sending audio whole: {err.strip()[:200]}")
+            return [path]
+        segments.append(segment_path)
+    return segments
+
+
+async def split_audio(path: Path, out_dir: Path) -> List[Path]:
+    """Segments to transcribe, in order (just `path` for short audio)."""
+    if path.suffix.lower() == '.wav':
+        try:
+            return await asyncio.to_thread(_split_wav, path, out_dir)
+        except (wave.Error, ValueError, EOFError) as e:
+            logger.debug(f"Not splitting WAV natively: {e}")
+    if shutil.which('ffmpeg') and shutil.which('ffprobe'):
+        return await _split_with_ffmpeg(path, out_dir)
+    return [path]
+
+
+# ----------------------------------------------------------------------
+# Transcription
+# ----------------------------------------------------------------------
+
+async def transcribe_segment(segment: Path) -> str:
+    async with _get_segment_slots():
+        transcription = await get_transcription_client().audio.transcriptions.create(
+            model=TRANSCRIPTION_MODEL,
+            file=segment,
+            response_format="text"
+        )
+    return str(transcription).strip()
+
+
+async def transcribe_segments(segments: List[Path]) -> AsyncIterator[Tuple[int, str]]:
+    """Transcribe concurrently, yielding (index, text) in segment order."""
+    tasks = [asyncio.create_task(transcribe_segment(segment)) for segment in segments]
+    try:
+        for index, task in enumerate(tasks):
+            yield index, await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def stitch(texts: List[str]) -> str:
+    return " ".join(text for text in texts if text)
+
+
 @router.post("/transcription", response_model=TranscriptionResponse)
 async def transcribe_audio(
     audio_file: UploadFile = File(...),
+    stream: bool = Query(False, description="Stream segment texts as server-sent events"),
     user_id: str = Depends(verify_and_get_user_id_from_jwt)
 ):
-    """Transcribe audio file to text using OpenAI Whisper."""
+    """Transcribe audio file to text using OpenAI."""
+    logger.debug(f"Received audio file: {audio_file.filename}, content_type: {audio_file.content_type}")
+
+    if audio_file.content_type not in ALLOWED_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {audio_file.content_type}. Supported types: {', '.join(ALLOWED_TYPES)}"
+        )
+
+    file_extension = audio_file.filename.split('.')[-1] if audio_file.filename and '.' in audio_file.filename else 'webm'
+    work_dir = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix='transcription-'))
+
+    async def cleanup():
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+
     try:
-        # Validate file type - OpenAI supports these formats
-        allowed_types = [
-            'audio/mp3', 'audio/mpeg', 'audio/mp4', 'audio/m4a', 
-            'audio/wav', 'audio/webm', 'audio/mpga'
-        ]
-        
-        logger.debug(f"Received audio file: {audio_file.filename}, content_type: {audio_file.content_type}")
-        
-        if audio_file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file type: {audio_file.content_type}. Supported types: {', '.join(allowed_types)}"
-            )
-        
-        # Check file size (25MB limit)
-        content = await audio_file.read()
-        if len(content) > 25 * 1024 * 1024:  # 25MB
-            raise HTTPException(status_code=400, detail="File size exceeds 25MB limit")
-        
-        # Reset file pointer
-        await audio_file.seek(0)
-        
-        # Initialize OpenAI client
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        # Create a temporary file with the correct extension
-        file_extension = audio_file.filename.split('.')[-1] if audio_file.filename and '.' in audio_file.filename else 'webm'
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Transcribe audio using the temporary file
-            # OpenAI Whisper API has built-in limits: 25MB file size and handles duration limits internally
-            with open(temp_file_path, 'rb') as f:
-                transcription = client.audio.transcriptions.create(
-                    model="gpt-4o-mini-transcribe",
-                    file=f,
-                    response_format="text"
-                )
-            
-            logger.debug(f"Successfully transcribed audio for user {user_id}")
-            return TranscriptionResponse(text=transcription)
-            
-        finally:
-            # Clean up temporary file
+        upload_path = work_dir / f"upload.{file_extension}"
+        await save_upload(audio_file, upload_path, MAX_UPLOAD_BYTES)
+        segments = await split_audio(upload_path, work_dir)
+        logger.debug(f"Transcribing {len(segments)} segment(s) for user {user_id}")
+    except HTTPException:
+        await cleanup()
+        raise
+    except Exception as e:
+        await cleanup()
+        logger.error(f"Error preparing audio for user {user_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+    if stream:
+        async def event_stream():
+            texts = []
             try:
-                os.unlink(temp_file_path)
+                async for index, text in transcribe_segments(segments):
+                    texts.append(text)
+                    yield f"data: {json.dumps({'type': 'segment', 'index': index, 'total': len(segments), 'text': text})}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'text': stitch(texts)})}\n\n"
             except Exception as e:
-                logger.warning(f"Failed to delete temporary file {temp_file_path}: {e}")
-        
+                logger.error(f"Error transcribing audio for user {user_id}: {str(e)}")
+                yield f"data: {json.dumps({'type': 'error', 'message': f'Transcription failed: {str(e)}'})}\n\n"
+            finally:
+                await cleanup()
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+            "Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"
+        })
+
+    try:
+        texts = [text async for _, text in transcribe_segments(segments)]
+        logger.debug(f"Successfully transcribed audio for user {user_id}")
+        return TranscriptionResponse(text=stitch(texts))
     except Exception as e:
         logger.error(f"Error transcribing audio for user {user_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    finally:
+        await cleanup()
@@ -0,0 +1,454 @@
+"""
+Gateway for small, deterministic "utility" LLM calls.
+
+Project naming, icon selection and knowledge-base summaries send the same
+prompts over and over (re-uploaded files, repeated first messages). This
+gateway sits in front of make_llm_api_call and adds:
+
+- a content-hash response cache (in-process LRU + Redis with TTL and a cap
+  on the number of stored entries),
+- single-flight coalescing so identical in-flight requests share one call,
+- micro-batching of small JSON requests of one account that share a system
+  prompt and arrive within a short window into one LLM call (requests of
+  different accounts never share a prompt; project naming and agent icon
+  requests have prompts of their own, so each only batches with its kind),
+- hit / coalesce / batch counters and an estimate of saved tokens, written to
+  Redis in the background.
+
+Answers sampled with temperature > 0 are only reused (from the cache or an
+identical in-flight request) when the caller passes cache=True, i.e. when any
+one sampled answer to a prompt is as good as another.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.services import redis
+from core.services.llm import make_llm_api_call
+from core.utils.logger import logger
+
+CACHE_PREFIX = "utility_llm:resp:"
+CACHE_INDEX_KEY = "utility_llm:index"
+STATS_KEY = "utility_llm:stats"
+DEFAULT_TTL = 7 * 24 * 3600
+MAX_REDIS_ENTRIES = 50_000
+MAX_ENTRY_BYTES = 64 * 1024
+LOCAL_CACHE_SIZE = 1024
+BATCH_WINDOW_SECONDS = 0.05
+MAX_BATCH_SIZE = 8
+
+BATCH_INSTRUCTIONS = (
+    "\n\nYou will receive several numbered requests at once. Answer each one independently "
+    "following the instructions above and respond with a single JSON object of the form "
+    "{\"results\": [<answer for request 1>, <answer for request 2>, ...]} with exactly one "
+    "answer per request, in the same order."
+)
+
+
+def _response_content(response: Any) -> Tuple[str, int]:
+    """Extract message content and total token usage from a LiteLLM response or dict."""
+    try:
+        choices = response['choices'] if isinstance(response, dict) else response.choices
+        message = choices[0]['message'] if isinstance(choices[0], dict) else choices[0].message
+        content = message['content'] if isinstance(message, dict) else message.content
+    except (KeyError, IndexError, AttributeError, TypeError):
+        content = None
+
+    usage = response.get('usage') if isinstance(response, dict) else getattr(response, 'usage', None)
+    if isinstance(usage, dict):
+        tokens = usage.get('total_tokens') or 0
+    else:
+        tokens = getattr(usage, 'total_tokens', 0) or 0
+    return (content or '').strip(), int(tokens)
+
+
+def cache_key(model_name: str, messages: List[Dict[str, Any]], **params: Any) -> str:
+    payload = json.dumps(
+        {"model": model_name, "messages": messages, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class _PendingItem:
+    key: str
+    user_content: str
+    future: asyncio.Future
+    cache: bool = True
+
+
+@dataclass
+class _Batch:
+    model_name: str
+    system_prompt: str
+    temperature: float
+    max_tokens: Optional[int]
+    items: List[_PendingItem] = field(default_factory=list)
+    flush_handle: Optional[asyncio.TimerHandle] = None
+
+
+class UtilityLLMGateway:
+    def __init__(
+        self,
+        ttl: int = DEFAULT_TTL,
+        max_redis_entries: int = MAX_REDIS_ENTRIES,
+        local_cache_size: int = LOCAL_CACHE_SIZE,
+        batch_window: float = BATCH_WINDOW_SECONDS,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        self.ttl = ttl
+        self.max_redis_entries = max_redis_entries
+        self.local_cache_size = local_cache_size
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._batches: Dict[Tuple, _Batch] = {}
+        self._stats_tasks: Set[asyncio.Task] = set()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "batched": 0,
+            "llm_calls": 0,
+            "saved_tokens": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _local_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._local.get(key)
+        if not entry:
+            return None
+        stored_at, value = entry
+        if time.time() - stored_at > self.ttl:
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _local_set(self, key: str, value: Dict[str, Any]) -> None:
+        self._local[key] = (time.time(), value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_cache_size:
+            self._local.popitem(last=False)
+
+    async def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._local_get(key)
+        if value is not None:
+            return value
+        try:
+            client = await redis.get_client()
+            raw = await client.get(f"{CACHE_PREFIX}{key}")
+        except Exception as e:
+            logger.debug(f"Utility LLM cache read skipped: {e}")
+            return None
+        if not raw:
+            return None
+        value = json.loads(raw)
+        self._local_set(key, value)
+        return value
+
+    async def _cache_set(self, key: str, value: Dict[str, Any]) -> None:
+        self._local_set(key, value)
+        payload = json.dumps(value)
+        if len(payload) > MAX_ENTRY_BYTES:
+            return
+        try:
+            client = await redis.get_client()
+            await client.set(f"{CACHE_PREFIX}{key}", payload, ex=self.ttl)
+            await client.zadd(CACHE_INDEX_KEY, {key: time.time()})
+            overflow = await client.zcard(CACHE_INDEX_KEY) - self.max_redis_entries
+            if overflow > 0:
+                evicted = await client.zpopmin(CACHE_INDEX_KEY, overflow)
+                if evicted:
+                    await client.delete(*[f"{CACHE_PREFIX}{k}" for k, _ in evicted])
+        except Exception as e:
+            logger.debug(f"Utility LLM cache write skipped: {e}")
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        self.stats[name] += amount
+
+    async def get_stats(self) -> Dict[str, int]:
+        """Process-local counters merged with the shared Redis counters when available."""
+        if self._stats_tasks:
+            await asyncio.gather(*self._stats_tasks, return_exceptions=True)
+        try:
+            client = await redis.get_client()
+            shared = await client.hgetall(STATS_KEY)
+            return {"local": dict(self.stats), "shared": {k: int(v) for k, v in shared.items()}}
+        except Exception:
+            return {"local": dict(self.stats), "shared": {}}
+
+    def _flush_stats(self, deltas: Dict[str, int]) -> None:
+        """Add to the shared counters in the background, off the request path."""
+        task = asyncio.get_running_loop().create_task(self._write_stats(deltas))
+        self._stats_tasks.add(task)
+        task.add_done_callback(self._stats_tasks.discard)
+
+    async def _write_stats(self, deltas: Dict[str, int]) -> None:
+        try:
+            client = await redis.get_client()
+            pipe = client.pipeline()
+            for name, amount in deltas.items():
+                if amount:
+                    pipe.hincrby(STATS_KEY, name, amount)
+            await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Utility LLM stats write skipped: {e}")
+
+    def _record_hit(self, value: Dict[str, Any]) -> None:
+        saved = int(value.get("tokens", 0))
+        self._count("hits")
+        self._count("saved_tokens", saved)
+        self._flush_stats({"hits": 1, "saved_tokens": saved})
+
+    @staticmethod
+    def _reuses(temperature: float, cache: Optional[bool]) -> bool:
+        return cache if cache is not None else temperature == 0
+
+    def _record_coalesced(self, value: Dict[str, Any]) -> None:
+        saved = int(value.get("tokens", 0))
+        self._count("coalesced")
+        self._count("saved_tokens", saved)
+        self._flush_stats({"coalesced": 1, "saved_tokens": saved})
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def complete(
+        self,
+        messages: List[Dict[str, Any]],
+        model_name: str,
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Any] = None,
+        cache: Optional[bool] = None,
+    ) -> str:
+        """Return the message content for a non-streaming call, cached by content
+        hash unless sampled (see the module docstring)."""
+        key = cache_key(model_name, messages, temperature=temperature,
+                        max_tokens=max_tokens, response_format=response_format)
+        self._count("requests")
+        reuse = self._reuses(temperature, cache)
+
+        if reuse:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                self._record_hit(cached)
+                return cached["content"]
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                value = await asyncio.shield(inflight)
+                self._record_coalesced(value)
+                return value["content"]
+
+        future = asyncio.get_running_loop().create_future()
+        if reuse:
+            self._inflight[key] = future
+        try:
+            self._count("misses")
+            self._count("llm_calls")
+            self._flush_stats({"misses": 1, "llm_calls": 1})
+            response = await make_llm_api_call(
+                messages=messages,
+                model_name=model_name,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format=response_format,
+                stream=False,
+            )
+            content, tokens = _response_content(response)
+            value = {"content": content, "tokens": tokens}
+            if content and reuse:
+                await self._cache_set(key, value)
+            future.set_result(value)
+            return content
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an un-awaited future does not log a warning
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def complete_json(
+        self,
+        system_prompt: str,
+        user_content: str,
+        model_name: str,
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        account_id: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Small JSON task that may be micro-batched with concurrent calls of the
+        same account sharing system_prompt; calls without account_id are sent alone.
+
+        Returns the parsed JSON object for this request, or None if the model did
+        not return a usable object.
+        """
+        content = await self.complete_json_text(system_prompt, user_content, model_name,
+                                                temperature, max_tokens, account_id, cache)
+        return _parse_json_object(content)
+
+    async def complete_json_text(
+        self,
+        system_prompt: str,
+        user_content: str,
+        model_name: str,
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        account_id: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> str:
+        """Like complete_json, but returns the message content as the model sent
+        it, for callers with a fallback for answers that are not valid JSON."""
+        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}]
+        response_format = {"type": "json_object"}
+        key = cache_key(model_name, messages, temperature=temperature,
+                        max_tokens=max_tokens, response_format=response_format)
+        self._count("requests")
+        reuse = self._reuses(temperature, cache)
+
+        if reuse:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                self._record_hit(cached)
+                return cached["content"]
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                value = await asyncio.shield(inflight)
+                self._record_coalesced(value)
+                return value["content"]
+
+        future = asyncio.get_running_loop().create_future()
+        if reuse:
+            self._inflight[key] = future
+        item = _PendingItem(key, user_content, future, reuse)
+        if account_id is None:
+            batch = _Batch(model_name, system_prompt, temperature, max_tokens, [item])
+            asyncio.get_running_loop().create_task(self._run_single(batch, item))
+        else:
+            self._enqueue(item, account_id, model_name, system_prompt, temperature, max_tokens)
+        try:
+            value = await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        return value["content"]
+
+    # ------------------------------------------------------------------
+    # Micro-batching
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, item: _PendingItem, account_id: str, model_name: str, system_prompt: str,
+                 temperature: float, max_tokens: Optional[int]) -> None:
+        # One account per batch: a request's content must never reach the
+        # prompt that answers another account's request
+        batch_key = (account_id, model_name, system_prompt, temperature, max_tokens)
+        batch = self._batches.get(batch_key)
+        if batch is None:
+            batch = _Batch(model_name, system_prompt, temperature, max_tokens)
+            self._batches[batch_key] = batch
+            loop = asyncio.get_running_loop()
+            batch.flush_handle = loop.call_later(self.batch_window, self._start_flush, batch_key)
+        batch.items.append(item)
+        if len(batch.items) >= self.max_batch_size:
+            batch.flush_handle.cancel()
+            self._start_flush(batch_key)
+
+    def _start_flush(self, batch_key: Tuple) -> None:
+        batch = self._batches.pop(batch_key, None)
+        if batch and batch.items:
+            asyncio.get_running_loop().create_task(self._flush(batch))
+
+    async def _flush(self, batch: _Batch) -> None:
+        if len(batch.items) == 1:
+            await self._run_single(batch, batch.items[0])
+            return
+
+        numbered = "\n\n".join(f"Request {i + 1}:\n{item.user_content}" for i, item in enumerate(batch.items))
+        messages = [
+            {"role": "system", "content": batch.system_prompt + BATCH_INSTRUCTIONS},
+            {"role": "user", "content": numbered},
+        ]
+        try:
+            self._count("llm_calls")
+            self._flush_stats({"llm_calls": 1})
+            response = await make_llm_api_call(
+                messages=messages,
+                model_name=batch.model_name,
+                temperature=batch.temperature,
+                max_tokens=batch.max_tokens * len(batch.items) if batch.max_tokens else None,
+                response_format={"type": "json_object"},
+                stream=False,
+            )
+            content, tokens = _response_content(response)
+            results = (_parse_json_object(content) or {}).get("results")
+            if not isinstance(results, list) or len(results) != len(batch.items):
+                raise ValueError(f"expected {len(batch.items)} results, got {results!r:.200}")
+        except Exception as e:
+            logger.warning(f"Utility LLM batch of {len(batch.items)} failed, retrying individually: {e}")
+            await asyncio.gather(*(self._run_single(batch, item) for item in batch.items))
+            return
+
+        self._count("misses", len(batch.items))
+        self._count("batched", len(batch.items))
+        self._flush_stats({"misses": len(batch.items), "batched": len(batch.items)})
+        per_item_tokens = tokens // len(batch.items)
+        for item, result in zip(batch.items, results):
+            value = {"content": json.dumps(result), "tokens": per_item_tokens}
+            if isinstance(result, dict) and item.cache:
+                await self._cache_set(item.key, value)
+            if not item.future.done():
+                item.future.set_result(value)
+
+    async def _run_single(self, batch: _Batch, item: _PendingItem) -> None:
+        messages = [{"role": "system", "content": batch.system_prompt}, {"role": "user", "content": item.user_content}]
+        try:
+            self._count("misses")
+            self._count("llm_calls")
+            self._flush_stats({"misses": 1, "llm_calls": 1})
+            response = await make_llm_api_call(
+                messages=messages,
+                model_name=batch.model_name,
+                temperature=batch.temperature,
+                max_tokens=batch.max_tokens,
+                response_format={"type": "json_object"},
+                stream=False,
+            )
+            content, tokens = _response_content(response)
+            value = {"content": content, "tokens": tokens}
+            if item.cache and _parse_json_object(content) is not None:
+                await self._cache_set(item.key, value)
+            if not item.future.done():
+                item.future.set_result(value)
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+
+
+def _parse_json_object(content: str) -> Optional[Dict[str, Any]]:
+    try:
+        parsed = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+utility_llm = UtilityLLMGateway()
@@ -0,0 +1,259 @@
+"""
+Firecrawl scrapes and Tavily searches for the web search tool.
+
+SandboxWebSearchTool used to open a new httpx.AsyncClient (new connection,
+new TLS handshake) for every URL it scraped, scrape the same URL again when
+it was listed twice, and repeat Tavily searches the agent had already run.
+ScrapeService shares that work across tool calls:
+
+- one long-lived pooled HTTP/2 client per event loop for Firecrawl, with at
+  most PER_HOST_CONCURRENCY scrapes of the same target host at a time;
+- scrapes of a URL already in flight wait for that scrape instead of
+  starting another one;
+- scraped pages are cached in Redis for SCRAPE_CACHE_TTL seconds: the
+  normalized URL points at the page content, which is stored once under its
+  sha256 (pages reached through different URLs share it);
+- search responses are cached for SEARCH_CACHE_TTL seconds under the
+  normalized query and search parameters.
+
+Redis is an optimization only: if it is unavailable, nothing is cached.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from core.services import redis
+from core.utils.config import config
+from core.utils.logger import logger
+
+MAX_CONNECTIONS = 100
+PER_HOST_CONCURRENCY = 8
+SCRAPE_TIMEOUT = 30
+SCRAPE_RETRIES = 3
+# Seconds before the first retry of a scrape, doubled on each further retry
+RETRY_BACKOFF = 2.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+SCRAPE_CACHE_TTL = 60 * 60
+SEARCH_CACHE_TTL = 10 * 60
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|mc_cid|mc_eid)$", re.IGNORECASE)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for caching.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters, sorts the query string and strips a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not _TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+class ScrapeError(Exception):
+    pass
+
+
+class ScrapeService:
+    def __init__(
+        self,
+        firecrawl_url: Optional[str] = None,
+        firecrawl_api_key: Optional[str] = None,
+        max_connections: int = MAX_CONNECTIONS,
+        per_host_concurrency: int = PER_HOST_CONCURRENCY,
+        timeout: float = SCRAPE_TIMEOUT,
+        retries: int = SCRAPE_RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+        scrape_cache_ttl: int = SCRAPE_CACHE_TTL,
+        search_cache_ttl: int = SEARCH_CACHE_TTL
+    ):
+        self._firecrawl_url = firecrawl_url
+        self._firecrawl_api_key = firecrawl_api_key
+        self.max_connections = max_connections
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.scrape_cache_ttl = scrape_cache_ttl
+        self.search_cache_ttl = search_cache_ttl
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def firecrawl_url(self) -> str:
+        return (self._firecrawl_url or config.FIRECRAWL_URL).rstrip("/")
+
+    @property
+    def firecrawl_api_key(self) -> Optional[str]:
+        return self._firecrawl_api_key or config.FIRECRAWL_API_KEY
+
+    async def _bind_loop(self) -> None:
+        # The client and semaphores belong to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            stale_client, stale_loop = self._client, self._loop
+            self._loop = loop
+            self._client = None
+            self._host_slots = {}
+            self._in_flight = {}
+            if stale_client is not None:
+                await self._close_stale_client(stale_client, stale_loop)
+
+    @staticmethod
+    async def _close_stale_client(client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Close a client left by another event loop, on that loop while it still runs."""
+        try:
+            if loop is not None and loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                await client.aclose()
+        except Exception as e:
+            logger.debug(f"Error closing scrape client of a previous event loop: {e}")
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).hostname or ""
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return slot
+
+    async def _coalesce(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _cache_get(self, key: str) -> Optional[str]:
+        try:
+            return await redis.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read web scrape cache: {e}")
+            return None
+
+    async def _cache_set(self, values: Dict[str, str], ttl: int) -> None:
+        try:
+            for key, value in values.items():
+                await redis.set(key, value, ex=ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write web scrape cache: {e}")
+
+    async def _post_scrape(self, url: str, formats: list) -> Dict[str, Any]:
+        headers = {
+            "Authorization": f"Bearer {self.firecrawl_api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {"url": url, "formats": formats}
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._host_slot(url):
+                    response = await self._http().post(f"{self.firecrawl_url}/v1/scrape", json=payload, headers=headers)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+                    return response.json().get("data", {})
+                error = ScrapeError(f"Firecrawl returned {response.status_code}")
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                error = ScrapeError(f"Request failed: {e!r}")
+            if attempt >= self.retries:
+                raise ScrapeError(f"Scraping {url} failed after {attempt} attempts: {error}")
+            delay = self.retry_backoff * 2 ** (attempt - 1)
+            logger.warning(f"Scraping {url} failed (attempt {attempt}/{self.retries}): {error}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _scrape(self, url: str, formats: list, url_key: str) -> Dict[str, Any]:
+        content_key = await self._cache_get(url_key)
+        if content_key:
+            cached = await self._cache_get(content_key)
+            if cached:
+                logger.debug(f"Serving scrape of {url} from cache")
+                return json.loads(cached)
+
+        data = await self._post_scrape(url, formats)
+        page = {
+            "title": data.get("metadata", {}).get("title", ""),
+            "markdown": data.get("markdown", ""),
+        }
+        if "html" in formats:
+            page["html"] = data.get("html", "")
+        if "metadata" in data:
+            page["metadata"] = data["metadata"]
+
+        serialized = json.dumps(page, ensure_ascii=False, sort_keys=True)
+        content_key = f"web_scrape:content:{_digest(serialized)}"
+        await self._cache_set({content_key: serialized, url_key: content_key}, self.scrape_cache_ttl)
+        return page
+
+    async def scrape(self, url: str, include_html: bool = False) -> Dict[str, Any]:
+        """Scrape `url` with Firecrawl.
+
+        Returns {"title", "markdown", "metadata"?, "html"? (when requested)}.
+        Raises ScrapeError or httpx.HTTPStatusError.
+        """
+        await self._bind_loop()
+        formats = ["markdown", "html"] if include_html else ["markdown"]
+        url_key = f"web_scrape:url:{','.join(formats)}:{_digest(normalize_url(url))}"
+        return await self._coalesce(url_key, lambda: self._scrape(url, formats, url_key))
+
+    async def _search(self, tavily_client, key: str, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        cached = await self._cache_get(key)
+        if cached:
+            logger.debug(f"Serving web search for '{query}' from cache")
+            return json.loads(cached)
+        response = await tavily_client.search(query=query, **params)
+        if response.get("results") or (response.get("answer") or "").strip():
+            await self._cache_set({key: json.dumps(response, ensure_ascii=False)}, self.search_cache_ttl)
+        return response
+
+    async def search(self, tavily_client, query: str, **params) -> Dict[str, Any]:
+        """Run tavily_client.search(query=query, **params), cached by normalized query.
+
+        Empty responses are not cached.
+        """
+        await self._bind_loop()
+        signature = json.dumps({"query": normalize_query(query), **params}, sort_keys=True)
+        key = f"web_search:{_digest(signature)}"
+        return await self._coalesce(key, lambda: self._search(tavily_client, key, query, params))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+scrape_service = ScrapeService()
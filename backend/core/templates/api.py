@@ -339,6 +339,7 @@ class MarketplacePaginationInfo(BaseModel):
     total_pages: int
     has_next: bool
     has_previous: bool
+    next_cursor: Optional[str] = None
 
 class MarketplaceTemplatesResponse(BaseModel):
     templates: List[TemplateResponse]
@@ -352,8 +353,9 @@ async def get_marketplace_templates(
     tags: Optional[str] = Query(None, description="Comma-separated list of tags to filter by"),
     is_kortix_team: Optional[bool] = Query(None, description="Filter for Kortix team templates"),
     mine: Optional[bool] = Query(None, description="Filter to show only user's own templates"),
-    sort_by: Optional[str] = Query("download_count", description="Sort field: download_count, newest, name"),
+    sort_by: Optional[str] = Query(None, description="Sort field: download_count, newest, name, relevance (default: relevance when searching, else download_count)"),
     sort_order: Optional[str] = Query("desc", description="Sort order: asc, desc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
     request: Request = None
 ):
     try:
@@ -374,9 +376,13 @@ async def get_marketplace_templates(
 
         pagination_params = PaginationParams(
             page=page,
-            page_size=limit
+            page_size=limit,
+            cursor=cursor
         )
         
+        if not sort_by:
+            sort_by = "relevance" if search and search.strip() else "download_count"
+        
         filters = MarketplaceFilters(
             search=search,
             tags=tags_list,
@@ -406,7 +412,8 @@ async def get_marketplace_templates(
                 total_items=paginated_result.pagination.total_items,
                 total_pages=paginated_result.pagination.total_pages,
                 has_next=paginated_result.pagination.has_next,
-                has_previous=paginated_result.pagination.has_previous
+                has_previous=paginated_result.pagination.has_previous,
+                next_cursor=paginated_result.pagination.next_cursor
             )
         )
         
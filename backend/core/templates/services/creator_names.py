@@ -0,0 +1,129 @@
+"""
+Account id -> creator name lookups for marketplace templates.
+
+Every marketplace page used to resolve the names of its template creators
+with a query on basejump.accounts. Creator names change rarely and the same
+few creators (Kortix team, prolific publishers) fill most pages, so names
+are cached in two tiers:
+
+- in process for LOCAL_TTL seconds (bounded to LOCAL_MAX_ENTRIES);
+- in Redis for REDIS_TTL seconds, shared by every API worker.
+
+Accounts without a name or slug are cached too, so they don't miss on every
+page. Redis is an optimization only: if it is unavailable, names are read
+from the database.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from core.services import redis
+from core.utils.logger import logger
+from core.utils.query_utils import batch_query_in
+
+LOCAL_TTL = 60
+LOCAL_MAX_ENTRIES = 10_000
+REDIS_TTL = 15 * 60
+# Stored for accounts that have neither a name nor a slug
+_NO_NAME = ""
+
+
+def _redis_key(account_id: str) -> str:
+    return f"template_creator_name:{account_id}"
+
+
+class CreatorNameCache:
+    def __init__(self, local_ttl: int = LOCAL_TTL, redis_ttl: int = REDIS_TTL,
+                 max_entries: int = LOCAL_MAX_ENTRIES):
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+
+    def _get_local(self, account_id: str) -> Tuple[bool, Optional[str]]:
+        entry = self._local.get(account_id)
+        if entry is None:
+            return False, None
+        name, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._local[account_id]
+            return False, None
+        self._local.move_to_end(account_id)
+        return True, name
+
+    def _set_local(self, account_id: str, name: Optional[str]) -> None:
+        self._local[account_id] = (name, time.monotonic() + self.local_ttl)
+        self._local.move_to_end(account_id)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def _get_redis(self, account_ids: list) -> Dict[str, Optional[str]]:
+        try:
+            client = await redis.get_client()
+            values = await client.mget([_redis_key(account_id) for account_id in account_ids])
+        except Exception as e:
+            logger.warning(f"Failed to read cached creator names: {e}")
+            return {}
+        return {
+            account_id: value or None
+            for account_id, value in zip(account_ids, values)
+            if value is not None
+        }
+
+    async def _set_redis(self, names: Dict[str, Optional[str]]) -> None:
+        try:
+            client = await redis.get_client()
+            pipe = client.pipeline()
+            for account_id, name in names.items():
+                pipe.set(_redis_key(account_id), name or _NO_NAME, ex=self.redis_ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to cache creator names: {e}")
+
+    async def get_many(self, client, account_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Return {account_id: creator name or None} for the given accounts."""
+        names: Dict[str, Optional[str]] = {}
+        missing = []
+        for account_id in dict.fromkeys(a for a in account_ids if a):
+            found, name = self._get_local(account_id)
+            if found:
+                names[account_id] = name
+            else:
+                missing.append(account_id)
+        if not missing:
+            return names
+
+        cached = await self._get_redis(missing)
+        for account_id, name in cached.items():
+            names[account_id] = name
+            self._set_local(account_id, name)
+        missing = [account_id for account_id in missing if account_id not in cached]
+        if not missing:
+            return names
+
+        accounts = await batch_query_in(
+            client=client,
+            table_name='accounts',
+            select_fields='id, name, slug',
+            in_field='id',
+            in_values=missing,
+            schema='basejump'
+        )
+        loaded = {account_id: None for account_id in missing}
+        for account in accounts:
+            loaded[account['id']] = account.get('name') or account.get('slug')
+        for account_id, name in loaded.items():
+            names[account_id] = name
+            self._set_local(account_id, name)
+        await self._set_redis(loaded)
+        return names
+
+    async def get(self, client, account_id: str) -> Optional[str]:
+        return (await self.get_many(client, [account_id])).get(account_id)
+
+    def clear(self) -> None:
+        self._local.clear()
+
+
+creator_names = CreatorNameCache()
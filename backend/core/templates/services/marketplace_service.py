@@ -1,3 +1,5 @@
+import base64
+import json
 from typing import List, Dict, Any, Optional
 from core.utils.pagination import PaginationService, PaginationParams, PaginatedResponse, PaginationMeta
 from core.utils.logger import logger
@@ -32,8 +34,6 @@ class TemplateService:
         filters: MarketplaceFilters
     ) -> PaginatedResponse[Dict[str, Any]]:
         try:
-            # logger.debug(f"Fetching marketplace templates with filters: {filters.__dict__}")
-            
             from ..template_service import get_template_service
             from ..utils import format_template_for_response
             from core.services.supabase import DBConnection
@@ -41,51 +41,44 @@ class TemplateService:
             db_connection = DBConnection()
             template_service = get_template_service(db_connection)
             
-            limit = pagination_params.page_size
-            offset = (pagination_params.page - 1) * pagination_params.page_size
+            sort_desc = filters.sort_order != "asc"
+            page = pagination_params.page
+            cursor = self._parse_marketplace_cursor(pagination_params.cursor, filters)
+            if cursor:
+                page = cursor["page"]
             
-            templates = await template_service.get_public_templates(
-                is_kortix_team=filters.is_kortix_team,
-                limit=limit,
-                offset=offset,
+            result = await template_service.search_public_templates(
                 search=filters.search,
-                tags=filters.tags
+                tags=filters.tags,
+                is_kortix_team=filters.is_kortix_team,
+                creator_id=filters.creator_id,
+                sort_by=filters.sort_by,
+                sort_desc=sort_desc,
+                limit=pagination_params.page_size,
+                offset=(page - 1) * pagination_params.page_size,
+                after=cursor["after"] if cursor else None,
+                with_total=cursor is None
             )
             
-            base_query = self._build_marketplace_base_query(filters)
-            count_query = self._build_marketplace_count_query(filters)
-            count_result = await count_query.execute()
-            total_items = count_result.count if count_result.count is not None else 0
-            
-            if filters.creator_id is not None:
-                templates = [t for t in templates if t.creator_id == filters.creator_id]
-                if filters.creator_id:
-                    all_templates = await template_service.get_public_templates(
-                        is_kortix_team=filters.is_kortix_team,
-                        search=filters.search,
-                        tags=filters.tags
-                    )
-                    filtered_templates = [t for t in all_templates if t.creator_id == filters.creator_id]
-                    total_items = len(filtered_templates)
+            total_items = result.total if result.total is not None else cursor["total"]
+            template_responses = [format_template_for_response(t) for t in result.templates]
             
-            template_responses = []
-            for template in templates:
-                template_response = format_template_for_response(template)
-                template_responses.append(template_response)
+            next_cursor = None
+            if result.next_after:
+                next_cursor = self._create_marketplace_cursor(filters, result.next_after, page + 1, total_items)
             
             total_pages = (total_items + pagination_params.page_size - 1) // pagination_params.page_size
-            has_next = pagination_params.page < total_pages
-            has_previous = pagination_params.page > 1
             
             return PaginatedResponse(
                 data=template_responses,
                 pagination=PaginationMeta(
-                    current_page=pagination_params.page,
+                    current_page=page,
                     page_size=pagination_params.page_size,
                     total_items=total_items,
                     total_pages=total_pages,
-                    has_next=has_next,
-                    has_previous=has_previous
+                    has_next=result.next_after is not None,
+                    has_previous=page > 1,
+                    next_cursor=next_cursor
                 )
             )
                 
@@ -97,6 +90,38 @@ class TemplateService:
             logger.error(f"Error fetching marketplace templates: {error_str}")
             raise
 
+    @staticmethod
+    def _marketplace_cursor_scope(filters: MarketplaceFilters) -> List[Any]:
+        return [filters.search, sorted(filters.tags), filters.is_kortix_team, filters.creator_id,
+                filters.sort_by, filters.sort_order]
+
+    def _create_marketplace_cursor(self, filters: MarketplaceFilters, after: List[str], page: int, total: int) -> str:
+        cursor_data = {
+            "scope": self._marketplace_cursor_scope(filters),
+            "after": after,
+            "page": page,
+            "total": total
+        }
+        return base64.urlsafe_b64encode(json.dumps(cursor_data).encode()).decode()
+
+    def _parse_marketplace_cursor(self, cursor: Optional[str], filters: MarketplaceFilters) -> Optional[Dict[str, Any]]:
+        """Decode a next_cursor; cursors from other filters or sorts are ignored."""
+        if not cursor:
+            return None
+        try:
+            cursor_data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if cursor_data["scope"] != self._marketplace_cursor_scope(filters):
+                logger.debug("Ignoring marketplace cursor issued for different filters")
+                return None
+            return {
+                "after": [str(v) for v in cursor_data["after"]],
+                "page": int(cursor_data["page"]),
+                "total": int(cursor_data["total"])
+            }
+        except Exception as e:
+            logger.warning(f"Failed to parse marketplace cursor: {e}")
+            return None
+
     async def get_user_templates_paginated(
         self,
         pagination_params: PaginationParams,
@@ -176,55 +201,6 @@ class TemplateService:
             logger.error(f"Error fetching user templates: {error_str}")
             raise
 
-    def _build_marketplace_base_query(self, filters: MarketplaceFilters):
-        query = self.db.table('agent_templates').select('*').eq('is_public', True)
-        
-        if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.ilike("name", search_term)
-        
-        if filters.is_kortix_team is not None:
-            query = query.eq('is_kortix_team', filters.is_kortix_team)
-            
-        if filters.creator_id is not None:
-            query = query.eq('creator_id', filters.creator_id)
-        
-        if filters.tags:
-            for tag in filters.tags:
-                query = query.contains('tags', [tag])
-        
-        if filters.sort_by == "download_count":
-            query = query.order('download_count', desc=(filters.sort_order == "desc"))
-            query = query.order('marketplace_published_at', desc=True)
-        elif filters.sort_by == "newest":
-            query = query.order('marketplace_published_at', desc=True)
-        elif filters.sort_by == "name":
-            query = query.order('name', desc=(filters.sort_order == "desc"))
-        else:
-            query = query.order('download_count', desc=True)
-            query = query.order('marketplace_published_at', desc=True)
-        
-        return query
-
-    def _build_marketplace_count_query(self, filters: MarketplaceFilters):
-        query = self.db.table('agent_templates').select('*', count='exact').eq('is_public', True)
-        
-        if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.ilike("name", search_term)
-        
-        if filters.is_kortix_team is not None:
-            query = query.eq('is_kortix_team', filters.is_kortix_team)
-            
-        if filters.creator_id is not None:
-            query = query.eq('creator_id', filters.creator_id)
-            
-        if filters.tags:
-            for tag in filters.tags:
-                query = query.contains('tags', [tag])
-                
-        return query
-
     def _build_user_templates_base_query(self, filters: MarketplaceFilters):
         query = self.db.table('agent_templates').select('*')
         
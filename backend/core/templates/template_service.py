@@ -8,6 +8,7 @@ import string
 
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
+from .services.creator_names import creator_names
 
 ConfigType = Dict[str, Any]
 ProfileId = str
@@ -169,6 +170,13 @@ class TemplateCreationRequest:
     make_public: bool = False
     tags: Optional[List[str]] = None
 
+@dataclass
+class PublicTemplatePage:
+    templates: List[AgentTemplate]
+    total: Optional[int] = None
+    # Sort key of the last template when more follow; pass back as `after`
+    next_after: Optional[List[str]] = None
+
 class TemplateNotFoundError(Exception):
     pass
 
@@ -245,13 +253,7 @@ class TemplateService:
             logger.debug(f"Template {template_id} found, creator_id: {creator_id}")
             
             try:
-                creator_result = await client.schema('basejump').from_('accounts').select('id, name, slug').eq('id', creator_id).execute()
-                
-                creator_name = None
-                if creator_result.data and len(creator_result.data) > 0:
-                    account = creator_result.data[0]
-                    creator_name = account.get('name') or account.get('slug')
-                
+                creator_name = await creator_names.get(client, creator_id)
                 result.data['creator_name'] = creator_name
                 logger.debug(f"Creator name resolved for {template_id}: {creator_name}")
                 
@@ -279,12 +281,7 @@ class TemplateService:
         if not result.data:
             return []
         
-        creator_result = await client.schema('basejump').from_('accounts').select('id, name, slug').eq('id', creator_id).execute()
-        
-        creator_name = None
-        if creator_result.data:
-            account = creator_result.data[0]
-            creator_name = account.get('name') or account.get('slug')
+        creator_name = await creator_names.get(client, creator_id)
         
         templates = []
         for template_data in result.data:
@@ -301,57 +298,63 @@ class TemplateService:
         search: Optional[str] = None,
         tags: Optional[List[str]] = None
     ) -> List[AgentTemplate]:
+        page = await self.search_public_templates(
+            search=search,
+            tags=tags,
+            is_kortix_team=is_kortix_team,
+            limit=limit,
+            offset=offset,
+            with_total=False
+        )
+        return page.templates
+    
+    async def search_public_templates(
+        self,
+        search: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        is_kortix_team: Optional[bool] = None,
+        creator_id: Optional[str] = None,
+        sort_by: str = "download_count",
+        sort_desc: bool = True,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        after: Optional[List[str]] = None,
+        with_total: bool = True
+    ) -> PublicTemplatePage:
         client = await self._db.client
         
-        query = client.table('agent_templates').select('*').eq('is_public', True)
-        
-        if is_kortix_team is not None:
-            query = query.eq('is_kortix_team', is_kortix_team)
-        
-        if search:
-            query = query.ilike("name", f"%{search}%")
-        
-        if tags:
-            for tag in tags:
-                query = query.contains('tags', [tag])
-        
-        query = query.order('download_count', desc=True)\
-                    .order('marketplace_published_at', desc=True)
-        
-        if limit:
-            query = query.limit(limit)
-        if offset:
-            query = query.offset(offset)
-        
-        result = await query.execute()
-        
-        if not result.data:
-            return []
-        
-        creator_ids = list(set(template['creator_id'] for template in result.data))
-        
-        from core.utils.query_utils import batch_query_in
+        # One row past the page tells whether another page follows
+        result = await client.rpc('search_marketplace_templates', {
+            'p_search': search,
+            'p_tags': tags or None,
+            'p_is_kortix_team': is_kortix_team,
+            'p_creator_id': creator_id,
+            'p_sort_by': sort_by,
+            'p_sort_desc': sort_desc,
+            'p_limit': limit + 1 if limit else None,
+            'p_offset': offset,
+            'p_after': after,
+            'p_with_total': with_total
+        }).execute()
         
-        accounts_data = await batch_query_in(
-            client=client,
-            table_name='accounts',
-            select_fields='id, name, slug',
-            in_field='id',
-            in_values=creator_ids,
-            schema='basejump'
-        )
+        payload = result.data or {}
+        rows = payload.get('templates') or []
+        has_more = bool(limit) and len(rows) > limit
+        if has_more:
+            rows = rows[:limit]
         
-        creator_names = {}
-        for account in accounts_data:
-            creator_names[account['id']] = account.get('name') or account.get('slug')
+        names = await creator_names.get_many(client, (row['creator_id'] for row in rows))
         
         templates = []
-        for template_data in result.data:
-            creator_name = creator_names.get(template_data['creator_id'])
-            template_data['creator_name'] = creator_name
+        for template_data in rows:
+            template_data['creator_name'] = names.get(template_data['creator_id'])
             templates.append(self._map_to_template(template_data))
         
-        return templates
+        return PublicTemplatePage(
+            templates=templates,
+            total=payload.get('total'),
+            next_after=rows[-1]['sort_key'] if has_more else None
+        )
     
     async def publish_template(self, template_id: str, creator_id: str) -> bool:
         logger.debug(f"Publishing template {template_id}")
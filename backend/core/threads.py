@@ -8,6 +8,7 @@ from fastapi import APIRouter, HTTPException, Depends, Form, Query
 from core.utils.auth_utils import verify_and_get_user_id_from_jwt, verify_and_authorize_thread_access, require_thread_access, AuthorizedThreadAccess
 from core.utils.logger import logger
 from core.sandbox.sandbox import create_sandbox, delete_sandbox
+from core.sandbox.lifecycle import sandbox_lifecycle
 
 from .api_models import CreateThreadResponse, MessageCreateRequest
 from . import core_utils as utils
@@ -156,6 +157,10 @@ async def get_thread(
                     "created_at": project['created_at'],
                     "updated_at": project['updated_at']
                 }
+                # Resume the sandbox now so it is running when the user sends a message
+                sandbox_id = (project.get('sandbox') or {}).get('id')
+                if sandbox_id:
+                    sandbox_lifecycle.prewarm(sandbox_id)
         
         # Get message count for the thread
         message_count_result = await client.table('messages').select('message_id', count='exact').eq('thread_id', thread_id).execute()
@@ -2,7 +2,8 @@ from core.agentpress.tool import ToolResult, openapi_schema
 from core.agentpress.thread_manager import ThreadManager
 from core.sandbox.tool_base import SandboxToolsBase
 from core.utils.logger import logger
-from core.utils.s3_upload_utils import upload_base64_image
+from core.utils.s3_upload_utils import upload_base64_image, upload_image_bytes
+from core.sandbox.service_client import SandboxServiceError, get_service_client
 import asyncio
 import json
 import base64
@@ -11,6 +12,8 @@ import traceback
 from PIL import Image
 from core.utils.config import config
 
+STAGEHAND_PORT = 8004
+
 class BrowserTool(SandboxToolsBase):
     """
     Browser Tool for browser automation using local Stagehand API.
@@ -69,34 +72,42 @@ class BrowserTool(SandboxToolsBase):
             except Exception as e:
                 return False, f"Base64 decoding failed: {str(e)}"
             
-            # Check decoded data size
-            if len(image_data) == 0:
-                return False, "Decoded image data is empty"
-            
-            # Check if decoded data size exceeds limit
-            max_size_bytes = max_size_mb * 1024 * 1024
-            if len(image_data) > max_size_bytes:
-                return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
-            
-            # Validate that decoded data is actually a valid image using PIL
-            try:
-                image_stream = io.BytesIO(image_data)
-                with Image.open(image_stream) as img:
-                    # Verify the image by attempting to load it
-                    img.verify()
-                    
-                    # Check if image format is supported
-                    supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
-                    if img.format not in supported_formats:
-                        return False, f"Unsupported image format: {img.format}"
-                    
-                    return True, "Image validation successful"
-                    
-            except Exception as e:
-                return False, f"Image validation failed: {str(e)}"
+            return self._validate_image_bytes(image_data, max_size_mb)
                 
         except Exception as e:
             return False, f"Image validation error: {str(e)}"
+
+    def _validate_image_bytes(self, image_data: bytes, max_size_mb: int = 10) -> tuple[bool, str]:
+        """Validate raw image bytes (size and format).
+
+        Returns:
+            tuple[bool, str]: (is_valid, error_message)
+        """
+        # Check decoded data size
+        if len(image_data) == 0:
+            return False, "Decoded image data is empty"
+        
+        # Check if decoded data size exceeds limit
+        max_size_bytes = max_size_mb * 1024 * 1024
+        if len(image_data) > max_size_bytes:
+            return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
+        
+        # Validate that decoded data is actually a valid image using PIL
+        try:
+            image_stream = io.BytesIO(image_data)
+            with Image.open(image_stream) as img:
+                # Verify the image by attempting to load it
+                img.verify()
+                
+                # Check if image format is supported
+                supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
+                if img.format not in supported_formats:
+                    return False, f"Unsupported image format: {img.format}"
+                
+                return True, "Image validation successful"
+                
+        except Exception as e:
+            return False, f"Image validation failed: {str(e)}"
     
     async def _debug_sandbox_services(self) -> str:
         """Debug method to check what services are running in the sandbox"""
@@ -131,61 +142,63 @@ class BrowserTool(SandboxToolsBase):
             return f"Error getting debug info: {e}"
 
     async def _check_stagehand_api_health(self) -> bool:
-        """Check if the Stagehand API server is running and accessible"""
+        """Check if the Stagehand API server is running, initializing the browser if needed"""
+        client = get_service_client(self.sandbox)
+        response = await client.request(STAGEHAND_PORT, "GET", "/api", timeout=10)
+        if response.data.get("status") == "healthy":
+            logger.info("✅ Stagehand API server is running and healthy")
+            return True
+
+        # If the browser api is not healthy, we need to restart the browser api
+        response = await client.request(
+            STAGEHAND_PORT, "POST", "/api/init",
+            json_body={"api_key": config.GEMINI_API_KEY},
+            timeout=90,
+        )
+        if response.status_code == 200:
+            logger.info("Stagehand API server restarted successfully")
+            return True
+        logger.warning(f"Stagehand API server restart failed: {response.data}")
+        return False
+
+    async def _process_screenshot(self, result: dict, screenshot: bytes = None) -> None:
+        """Upload the screenshot of a Stagehand response and replace it with image_url"""
         try:
-            await self._ensure_sandbox()
-            
-            
-            # Simple health check curl command
-            curl_cmd = "curl -s -X GET 'http://localhost:8004/api' -H 'Content-Type: application/json'"
-            
-            # logger.debug(f"Checking Stagehand API health with: {curl_cmd}")
+            if screenshot:
+                is_valid, validation_message = self._validate_image_bytes(screenshot)
+            else:
+                is_valid, validation_message = self._validate_base64_image(result["screenshot_base64"])
             
-            response = await self.sandbox.process.exec(curl_cmd, timeout=10)
-            if response.exit_code == 0:
-                try:
-                    result = json.loads(response.result)
-                    if result.get("status") == "healthy":
-                        logger.info("✅ Stagehand API server is running and healthy")
-                        return True
-                    else:
-                        # If the browser api is not healthy, we need to restart the browser api
-                        # Pass API key securely as environment variable instead of command line argument
-                        env_vars = {"GEMINI_API_KEY": config.GEMINI_API_KEY}
-
-                        response = await self.sandbox.process.exec(
-                            "curl -X POST 'http://localhost:8004/api/init' -H 'Content-Type: application/json' -d '{\"api_key\": \"'$GEMINI_API_KEY'\"}'",
-                            timeout=90,
-                            env=env_vars
-                        )
-                        if response.exit_code == 0:
-                            logger.info("Stagehand API server restarted successfully")
-                            return True
-                        else:
-                            logger.warning(f"Stagehand API server restart failed: {response.result}")
-                            return False
-                except json.JSONDecodeError:
-                    logger.warning(f"Stagehand API server responded but with invalid JSON: {response.result}")
-                    return False
+            if is_valid:
+                logger.debug(f"Screenshot validation passed: {validation_message}")
+                if screenshot:
+                    image_url = await upload_image_bytes(screenshot, "image/png", "browser-screenshots", filename_prefix="image")
+                else:
+                    image_url = await upload_base64_image(result["screenshot_base64"], "browser-screenshots")
+                result["image_url"] = image_url
+                logger.debug(f"Uploaded screenshot to {image_url}")
             else:
-                logger.warning(f"Stagehand API server health check failed with exit code {response.exit_code}")
-                return False
-                
+                logger.warning(f"Screenshot validation failed: {validation_message}")
+                result["image_validation_error"] = validation_message
+            
         except Exception as e:
-            logger.error(f"Error checking Stagehand API health: {e}")
-            return False
+            logger.error(f"Failed to process screenshot: {e}")
+            result["image_upload_error"] = str(e)
+        finally:
+            result.pop("screenshot_base64", None)
 
     async def _execute_stagehand_api(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
         """Execute a Stagehand action through the sandbox API"""
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
+            client = get_service_client(self.sandbox)
             
-            # Check if Stagehand API server is running
-            stagehand_healthy = await self._check_stagehand_api_health()
+            # Check if Stagehand API server is running (cached between calls)
+            stagehand_healthy = await client.ensure_healthy(STAGEHAND_PORT, self._check_stagehand_api_health)
             
             if not stagehand_healthy:
-                error_msg = "Stagehand API server is not running. Please ensure the Stagehand API server is running. Error: {response}"
+                error_msg = "Stagehand API server is not running. Please ensure the Stagehand API server is running."
                 
                 # Add debug information
                 debug_info = await self._debug_sandbox_services()
@@ -194,104 +207,65 @@ class BrowserTool(SandboxToolsBase):
                 logger.error(error_msg)
                 return self.fail_response(error_msg)
             
-            
-            # Build the curl command to call the local Stagehand API
-            url = f"http://localhost:8004/api/{endpoint}"  # Fixed localhost as curl runs inside container
-            
-            if method == "GET" and params:
-                query_params = "&".join([f"{k}={v}" for k, v in params.items()])
-                url = f"{url}?{query_params}"
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
+            # Call the Stagehand API directly through the sandbox preview link
+            response = await client.request(
+                STAGEHAND_PORT, method, f"/api/{endpoint}",
+                params=params if method == "GET" else None,
+                json_body=params if method != "GET" else None,
+                binary_screenshot=True,
+            )
+            result = response.data
+            logger.debug("Stagehand API request completed with status %s", response.status_code)
+
+            if response.screenshot or result.get("screenshot_base64"):
+                await self._process_screenshot(result, response.screenshot)
             else:
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-                if params:
-                    json_data = json.dumps(params)
-                    curl_cmd += f" -d '{json_data}'"
+                result.pop("screenshot_base64", None)
             
-            # logger.debug(f"\033[95mExecuting curl command:\033[0m\n{curl_cmd}")
-            
-            response = await self.sandbox.process.exec(curl_cmd, timeout=30)  # Execute curl inside sandbox
-            
-            if response.exit_code == 0:
-                try:
-                    result = json.loads(response.result)
-                    logger.debug(f"Stagehand API result: {result}")
-
-                    logger.debug("Stagehand API request completed successfully")
-
-                    if "screenshot_base64" in result:
-                        try:
-                            screenshot_data = result["screenshot_base64"]
-                            is_valid, validation_message = self._validate_base64_image(screenshot_data)
-                            
-                            if is_valid:
-                                logger.debug(f"Screenshot validation passed: {validation_message}")
-                                image_url = await upload_base64_image(screenshot_data, "browser-screenshots")
-                                result["image_url"] = image_url
-                                logger.debug(f"Uploaded screenshot to {image_url}")
-                            else:
-                                logger.warning(f"Screenshot validation failed: {validation_message}")
-                                result["image_validation_error"] = validation_message
-                                
-                            del result["screenshot_base64"]
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to process screenshot: {e}")
-                            result["image_upload_error"] = str(e)
-                    
-                    result["input"] = params
-                    added_message = await self.thread_manager.add_message(
-                        thread_id=self.thread_id,
-                        type="browser_state",
-                        content=result,
-                        is_llm_message=False
-                    )
+            result["input"] = params
+            added_message = await self.thread_manager.add_message(
+                thread_id=self.thread_id,
+                type="browser_state",
+                content=result,
+                is_llm_message=False
+            )
 
-                    # Prepare clean response for agent (filter out internal metadata)
-                    # Only include data that's useful for the agent's decision making
-                    clean_result = {
-                        "success": result.get("success", True),
-                        "message": result.get("message", "Stagehand action completed successfully")
-                    }
-
-                    # Include only data that actually comes from browserApi.ts
-                    if result.get("url"):
-                        clean_result["url"] = result["url"]
-                    if result.get("title"):
-                        clean_result["title"] = result["title"]
-                    if result.get("action"):
-                        clean_result["action"] = result["action"]
-                    if result.get("image_url"):  # This is screenshot_base64 converted to image_url
-                        clean_result["image_url"] = result["image_url"]
-                    
-                    # Include any error context that's useful for the agent
-                    if result.get("image_validation_error"):
-                        clean_result["screenshot_issue"] = f"Screenshot processing issue: {result['image_validation_error']}"
-                    if result.get("image_upload_error"):
-                        clean_result["screenshot_issue"] = f"Screenshot upload issue: {result['image_upload_error']}"
-                    clean_result["message_id"] = added_message.get("message_id")
+            # Prepare clean response for agent (filter out internal metadata)
+            # Only include data that's useful for the agent's decision making
+            clean_result = {
+                "success": result.get("success", True),
+                "message": result.get("message", "Stagehand action completed successfully")
+            }
 
-                    if clean_result.get("success"):
-                        return self.success_response(clean_result)
-                    else:
-                        # Handle error responses with helpful context  
-                        error_msg = result.get("error", result.get("message", "Unknown error"))
-                        clean_result["message"] = error_msg
-                        return self.fail_response(clean_result)
+            # Include only data that actually comes from browserApi.ts
+            if result.get("url"):
+                clean_result["url"] = result["url"]
+            if result.get("title"):
+                clean_result["title"] = result["title"]
+            if result.get("action"):
+                clean_result["action"] = result["action"]
+            if result.get("image_url"):  # Uploaded screenshot
+                clean_result["image_url"] = result["image_url"]
+            
+            # Include any error context that's useful for the agent
+            if result.get("image_validation_error"):
+                clean_result["screenshot_issue"] = f"Screenshot processing issue: {result['image_validation_error']}"
+            if result.get("image_upload_error"):
+                clean_result["screenshot_issue"] = f"Screenshot upload issue: {result['image_upload_error']}"
+            clean_result["message_id"] = added_message.get("message_id")
 
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse response JSON: {response.result} {e}")
-                    return self.fail_response(f"Failed to parse response JSON: {response.result} {e}")
+            if clean_result.get("success"):
+                return self.success_response(clean_result)
             else:
-                # Check if it's a connection error (exit code 7)
-                if response.exit_code == 7:
-                    error_msg = f"Stagehand API server is not available on port 8004. Please ensure the Stagehand API server is running. Error: {response}"
-                    logger.error(error_msg)
-                    return self.fail_response(error_msg)
-                else:
-                    logger.error(f"Stagehand API request failed: {response}")
-                    return self.fail_response(f"Stagehand API request failed: {response}")
+                # Handle error responses with helpful context  
+                error_msg = result.get("error", result.get("message", "Unknown error"))
+                clean_result["message"] = error_msg
+                return self.fail_response(clean_result)
 
+        except SandboxServiceError as e:
+            error_msg = f"Stagehand API server is not available on port {STAGEHAND_PORT}. Please ensure the Stagehand API server is running. Error: {e}"
+            logger.error(error_msg)
+            return self.fail_response(error_msg)
         except Exception as e:
             logger.error(f"Error executing Stagehand action: {e}")
             logger.debug(traceback.format_exc())
@@ -10,6 +10,7 @@ from core.utils.logger import logger
 from core.agentpress.thread_manager import ThreadManager
 # Billing removed - no credit deduction
 from core.services.supabase import DBConnection
+from core.tools.utils.exa_websets import WebsetSearchError, webset_searches
 
 
 class PaperSearchTool(Tool):
@@ -114,68 +115,40 @@ class PaperSearchTool(Tool):
             )
             
             try:
-                webset = await asyncio.to_thread(
-                    self.exa_client.websets.create,
-                    params=webset_params
-                )
+                results = await webset_searches.search(self.exa_client, "paper", user_id, webset_params)
+            except WebsetSearchError as search_error:
+                if search_error.stage == 'create':
+                    logger.error(f"Failed to create paper webset - Error type: {type(search_error.error).__name__}")
+                    try:
+                        error_str = str(search_error.error)
+                        logger.error(f"Failed to create paper webset - Error message: {error_str}")
+                    except:
+                        error_str = "Unknown error"
+                        logger.error(f"Failed to create paper webset - Could not convert error to string")
                 
-                logger.info(f"Paper webset created with ID: {webset.id}")
-            except Exception as create_error:
-                logger.error(f"Failed to create paper webset - Error type: {type(create_error).__name__}")
-                try:
-                    error_str = str(create_error)
-                    logger.error(f"Failed to create paper webset - Error message: {error_str}")
-                except:
-                    error_str = "Unknown error"
-                    logger.error(f"Failed to create paper webset - Could not convert error to string")
-                
-                if "401" in error_str:
-                    return self.fail_response(
-                        "Authentication failed with Exa API. Please check your API key and Pro plan status."
-                    )
-                elif "400" in error_str:
-                    return self.fail_response(
-                        "Invalid request to Exa API. Please check your query format."
-                    )
+                    if "401" in error_str:
+                        return self.fail_response(
+                            "Authentication failed with Exa API. Please check your API key and Pro plan status."
+                        )
+                    elif "400" in error_str:
+                        return self.fail_response(
+                            "Invalid request to Exa API. Please check your query format."
+                        )
+                    else:
+                        return self.fail_response(
+                            "Failed to create paper search webset. Please try again."
+                        )
+                elif search_error.stage == 'wait':
+                    logger.error(f"Error waiting for paper webset: {type(search_error.error).__name__}: {repr(search_error.error)}")
+                    return self.fail_response("Failed while waiting for paper search results. Please try again.")
                 else:
-                    return self.fail_response(
-                        "Failed to create paper search webset. Please try again."
-                    )
-            
-            logger.info(f"Waiting for paper webset {webset.id} to complete processing...")
-            try:
-                webset = await asyncio.to_thread(
-                    self.exa_client.websets.wait_until_idle,
-                    webset.id
-                )
-                logger.info(f"Paper webset {webset.id} processing complete")
-            except Exception as wait_error:
-                logger.error(f"Error waiting for paper webset: {type(wait_error).__name__}: {repr(wait_error)}")
-                return self.fail_response("Failed while waiting for paper search results. Please try again.")
+                    logger.error(f"Error retrieving paper items: {type(search_error.error).__name__}: {repr(search_error.error)}")
+                    return self.fail_response("Failed to retrieve paper search results. Please try again.")
 
-            logger.info(f"Retrieving paper items from webset {webset.id}...")
-            try:
-                items = await asyncio.to_thread(
-                    self.exa_client.websets.items.list,
-                    webset_id=webset.id
-                )
-                logger.info(f"Retrieved paper items from webset")
-            except Exception as items_error:
-                logger.error(f"Error retrieving paper items: {type(items_error).__name__}: {repr(items_error)}")
-                return self.fail_response("Failed to retrieve paper search results. Please try again.")
-            
-            results = items.data if items else []
             logger.info(f"Got {len(results)} paper results from webset")
             
             formatted_results = []
-            for idx, item in enumerate(results[:10], 1):
-                if hasattr(item, 'model_dump'):
-                    item_dict = item.model_dump()
-                elif isinstance(item, dict):
-                    item_dict = item
-                else:
-                    item_dict = vars(item) if hasattr(item, '__dict__') else {}
-                
+            for idx, item_dict in enumerate(results[:10], 1):
                 properties = item_dict.get('properties', {})
                 
                 evaluations_text = ""
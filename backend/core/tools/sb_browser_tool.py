@@ -8,7 +8,10 @@ from core.agentpress.tool import ToolResult, openapi_schema
 from core.agentpress.thread_manager import ThreadManager
 from core.sandbox.tool_base import SandboxToolsBase
 from core.utils.logger import logger
-from core.utils.s3_upload_utils import upload_base64_image
+from core.utils.s3_upload_utils import upload_base64_image, upload_image_bytes
+from core.sandbox.service_client import SandboxServiceError, get_service_client
+
+AUTOMATION_PORT = 8003
 
 
 class SandboxBrowserTool(SandboxToolsBase):
@@ -57,52 +60,61 @@ class SandboxBrowserTool(SandboxToolsBase):
             except Exception as e:
                 return False, f"Base64 decoding failed: {str(e)}"
             
-            # Check decoded data size
-            if len(image_data) == 0:
-                return False, "Decoded image data is empty"
-            
-            # Check if decoded data size exceeds limit
-            max_size_bytes = max_size_mb * 1024 * 1024
-            if len(image_data) > max_size_bytes:
-                return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
-            
-            # Validate that decoded data is actually a valid image using PIL
-            try:
-                image_stream = io.BytesIO(image_data)
-                with Image.open(image_stream) as img:
-                    # Verify the image by attempting to load it
-                    img.verify()
-                    
-                    # Check if image format is supported
-                    supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
-                    if img.format not in supported_formats:
-                        return False, f"Unsupported image format: {img.format}"
-                    
-                    # Re-open for dimension checks (verify() closes the image)
-                    image_stream.seek(0)
-                    with Image.open(image_stream) as img_check:
-                        width, height = img_check.size
-                        
-                        # Check reasonable dimension limits
-                        max_dimension = 8192  # 8K resolution limit
-                        if width > max_dimension or height > max_dimension:
-                            return False, f"Image dimensions ({width}x{height}) exceed limit ({max_dimension}x{max_dimension})"
-                        
-                        # Check minimum dimensions
-                        if width < 1 or height < 1:
-                            return False, f"Invalid image dimensions: {width}x{height}"
-                        
-                        logger.debug(f"Valid image detected: {img.format}, {width}x{height}, {len(image_data)} bytes")
-                        
-            except Exception as e:
-                return False, f"Invalid image data: {str(e)}"
-            
-            return True, "Valid image"
+            return self._validate_image_bytes(image_data, max_size_mb)
             
         except Exception as e:
             logger.error(f"Unexpected error during base64 image validation: {e}")
             return False, f"Validation error: {str(e)}"
 
+    def _validate_image_bytes(self, image_data: bytes, max_size_mb: int = 10) -> tuple[bool, str]:
+        """
+        Validation of raw image data (size, format and dimensions).
+        
+        Returns:
+            tuple[bool, str]: (is_valid, error_message)
+        """
+        # Check decoded data size
+        if len(image_data) == 0:
+            return False, "Decoded image data is empty"
+        
+        # Check if decoded data size exceeds limit
+        max_size_bytes = max_size_mb * 1024 * 1024
+        if len(image_data) > max_size_bytes:
+            return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
+        
+        # Validate that decoded data is actually a valid image using PIL
+        try:
+            image_stream = io.BytesIO(image_data)
+            with Image.open(image_stream) as img:
+                # Verify the image by attempting to load it
+                img.verify()
+                
+                # Check if image format is supported
+                supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
+                if img.format not in supported_formats:
+                    return False, f"Unsupported image format: {img.format}"
+                
+                # Re-open for dimension checks (verify() closes the image)
+                image_stream.seek(0)
+                with Image.open(image_stream) as img_check:
+                    width, height = img_check.size
+                    
+                    # Check reasonable dimension limits
+                    max_dimension = 8192  # 8K resolution limit
+                    if width > max_dimension or height > max_dimension:
+                        return False, f"Image dimensions ({width}x{height}) exceed limit ({max_dimension}x{max_dimension})"
+                    
+                    # Check minimum dimensions
+                    if width < 1 or height < 1:
+                        return False, f"Invalid image dimensions: {width}x{height}"
+                    
+                    logger.debug(f"Valid image detected: {img.format}, {width}x{height}, {len(image_data)} bytes")
+                    
+        except Exception as e:
+            return False, f"Invalid image data: {str(e)}"
+        
+        return True, "Valid image"
+
     async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
         """Execute a browser automation action through the API
         
@@ -118,101 +130,91 @@ class SandboxBrowserTool(SandboxToolsBase):
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            # Build the curl command
-            url = f"http://localhost:8003/api/automation/{endpoint}"
-            
-            if method == "GET" and params:
-                query_params = "&".join([f"{k}={v}" for k, v in params.items()])
-                url = f"{url}?{query_params}"
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-            else:
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-                if params:
-                    json_data = json.dumps(params)
-                    curl_cmd += f" -d '{json_data}'"
-            
-            logger.debug("\033[95mExecuting curl command:\033[0m")
-            logger.debug(f"{curl_cmd}")
+            # Call the automation API directly through the sandbox preview link
+            response = await get_service_client(self.sandbox).request(
+                AUTOMATION_PORT, method, f"/api/automation/{endpoint}",
+                params=params if method == "GET" else None,
+                json_body=params if method != "GET" else None,
+                binary_screenshot=True,
+            )
             
-            response = await self.sandbox.process.exec(curl_cmd, timeout=30)
+            result = response.data
+
+            if not "content" in result:
+                result["content"] = ""
             
-            if response.exit_code == 0:
-                try:
-                    result = json.loads(response.result)
+            if not "role" in result:
+                result["role"] = "assistant"
 
-                    if not "content" in result:
-                        result["content"] = ""
-                    
-                    if not "role" in result:
-                        result["role"] = "assistant"
-
-                    logger.debug("Browser automation request completed successfully")
-
-                    if "screenshot_base64" in result:
-                        try:
-                            # Comprehensive validation of the base64 image data
-                            screenshot_data = result["screenshot_base64"]
-                            is_valid, validation_message = self._validate_base64_image(screenshot_data)
-                            
-                            if is_valid:
-                                logger.debug(f"Screenshot validation passed: {validation_message}")
-                                image_url = await upload_base64_image(screenshot_data, "browser-screenshots")
-                                result["image_url"] = image_url
-                                logger.debug(f"Uploaded screenshot to {image_url}")
-                            else:
-                                logger.warning(f"Screenshot validation failed: {validation_message}")
-                                result["image_validation_error"] = validation_message
-                                
-                            # Remove base64 data from result to keep it clean
-                            del result["screenshot_base64"]
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to process screenshot: {e}")
-                            result["image_upload_error"] = str(e)
-
-                    added_message = await self.thread_manager.add_message(
-                        thread_id=self.thread_id,
-                        type="browser_state",
-                        content=result,
-                        is_llm_message=False
-                    )
-
-                    success_response = {}
-
-                    if result.get("success"):
-                        success_response["success"] = result["success"]
-                        success_response["message"] = result.get("message", "Browser action completed successfully")
+            logger.debug("Browser automation request completed successfully")
+
+            if response.screenshot or "screenshot_base64" in result:
+                try:
+                    if response.screenshot:
+                        # Raw PNG bytes, no base64 round trip
+                        is_valid, validation_message = self._validate_image_bytes(response.screenshot)
                     else:
-                        success_response["success"] = False
-                        success_response["message"] = result.get("message", "Browser action failed")
-
-                    if added_message and 'message_id' in added_message:
-                        success_response['message_id'] = added_message['message_id']
-                    if result.get("url"):
-                        success_response["url"] = result["url"]
-                    if result.get("title"):
-                        success_response["title"] = result["title"]
-                    if result.get("element_count"):
-                        success_response["elements_found"] = result["element_count"]
-                    if result.get("pixels_below"):
-                        success_response["scrollable_content"] = result["pixels_below"] > 0
-                    if result.get("ocr_text"):
-                        success_response["ocr_text"] = result["ocr_text"]
-                    if result.get("image_url"):
-                        success_response["image_url"] = result["image_url"]
-
-                    if success_response.get("success"):
-                        return self.success_response(success_response)
+                        # Comprehensive validation of the base64 image data
+                        is_valid, validation_message = self._validate_base64_image(result["screenshot_base64"])
+                    
+                    if is_valid:
+                        logger.debug(f"Screenshot validation passed: {validation_message}")
+                        if response.screenshot:
+                            image_url = await upload_image_bytes(response.screenshot, "image/png", "browser-screenshots", filename_prefix="image")
+                        else:
+                            image_url = await upload_base64_image(result["screenshot_base64"], "browser-screenshots")
+                        result["image_url"] = image_url
+                        logger.debug(f"Uploaded screenshot to {image_url}")
                     else:
-                        return self.fail_response(success_response)
-
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse response JSON: {response.result} {e}")
-                    return self.fail_response(f"Failed to parse response JSON: {response.result} {e}")
+                        logger.warning(f"Screenshot validation failed: {validation_message}")
+                        result["image_validation_error"] = validation_message
+                        
+                except Exception as e:
+                    logger.error(f"Failed to process screenshot: {e}")
+                    result["image_upload_error"] = str(e)
+                finally:
+                    # Remove base64 data from result to keep it clean
+                    result.pop("screenshot_base64", None)
+
+            added_message = await self.thread_manager.add_message(
+                thread_id=self.thread_id,
+                type="browser_state",
+                content=result,
+                is_llm_message=False
+            )
+
+            success_response = {}
+
+            if result.get("success"):
+                success_response["success"] = result["success"]
+                success_response["message"] = result.get("message", "Browser action completed successfully")
+            else:
+                success_response["success"] = False
+                success_response["message"] = result.get("message", "Browser action failed")
+
+            if added_message and 'message_id' in added_message:
+                success_response['message_id'] = added_message['message_id']
+            if result.get("url"):
+                success_response["url"] = result["url"]
+            if result.get("title"):
+                success_response["title"] = result["title"]
+            if result.get("element_count"):
+                success_response["elements_found"] = result["element_count"]
+            if result.get("pixels_below"):
+                success_response["scrollable_content"] = result["pixels_below"] > 0
+            if result.get("ocr_text"):
+                success_response["ocr_text"] = result["ocr_text"]
+            if result.get("image_url"):
+                success_response["image_url"] = result["image_url"]
+
+            if success_response.get("success"):
+                return self.success_response(success_response)
             else:
-                logger.error(f"Browser automation request failed 2: {response}")
-                return self.fail_response(f"Browser automation request failed 2: {response}")
+                return self.fail_response(success_response)
 
+        except SandboxServiceError as e:
+            logger.error(f"Browser automation request failed: {e}")
+            return self.fail_response(f"Browser automation request failed: {e}")
         except Exception as e:
             logger.error(f"Error executing browser action: {e}")
             logger.debug(traceback.format_exc())
@@ -1,3 +1,4 @@
+import asyncio
 from chunkr_ai import Chunkr
 from typing import Dict, Any
 
@@ -66,7 +67,9 @@ class SandboxDocumentParserTool(SandboxToolsBase):
             logger.debug(f"Chunkr task completed successfully")
             
             # Extract meaningful content from the Chunkr response
-            parsed_content = self._extract_meaningful_content(task, extract_tables, extract_structured_data)
+            parsed_content = await asyncio.to_thread(
+                self._extract_meaningful_content, task, extract_tables, extract_structured_data
+            )
             
             return self.success_response({
                 "message": f"Successfully parsed document from URL: {url}",
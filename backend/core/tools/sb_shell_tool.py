@@ -1,12 +1,20 @@
 import asyncio
+import base64
+import shlex
 from typing import Optional, Dict, Any
 import time
-import asyncio
 from uuid import uuid4
 from core.agentpress.tool import ToolResult, openapi_schema
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
 
+# Per-session output log and exit-code files written inside the sandbox
+COMMAND_LOG_DIR = "/tmp/.agent_commands"
+# Longest a single exec waits in the sandbox for a command to finish
+WAIT_SLICE = 25
+DEFAULT_OUTPUT_BYTES = 30_000
+MAX_OUTPUT_BYTES = 200_000
+
 class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
     Uses sessions for maintaining state between commands and provides comprehensive process management."""
@@ -95,65 +103,42 @@ class SandboxShellTool(SandboxToolsBase):
             if not session_name:
                 session_name = f"session_{str(uuid4())[:8]}"
             
-            # Check if tmux session already exists
-            check_session = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            session_exists = "not_exists" not in check_session.get("output", "")
-            
-            if not session_exists:
-                # Create a new tmux session with the specified working directory
-                await self._execute_raw_command(f"tmux new-session -d -s {session_name} -c {cwd}")
-            
-            # Escape double quotes for the command
-            wrapped_command = command.replace('"', '\\"')
-            
+            # Create the session if needed and type the command in one exec
+            log_dir = self._command_dir(session_name)
+            command_id = str(uuid4())[:8]
+            await self._execute_raw_command(
+                f"mkdir -p {shlex.quote(log_dir)} && "
+                f"{{ tmux has-session -t {shlex.quote(session_name)} 2>/dev/null || "
+                f"tmux new-session -d -s {shlex.quote(session_name)} -c {shlex.quote(cwd)}; }} && "
+                f"tmux send-keys -t {shlex.quote(session_name)} {shlex.quote(self._wrap_command(command, log_dir, command_id))} Enter"
+            )
+
             if blocking:
-                # For blocking execution, use a more reliable approach
-                # Add a unique marker to detect command completion
-                marker = f"COMMAND_DONE_{str(uuid4())[:8]}"
-                completion_command = self._format_completion_command(command, marker)
-                wrapped_completion_command = completion_command.replace('"', '\\"')
-                
-                # Send the command with completion marker
-                await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_completion_command}" Enter')
-                
-                start_time = time.time()
-                final_output = ""
-                
-                while (time.time() - start_time) < timeout:
-                    # Wait a shorter interval for more responsive checking
-                    await asyncio.sleep(0.5)
-                    
-                    # Check if session still exists (command might have exited)
-                    check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'ended'")
-                    if "ended" in check_result.get("output", ""):
+                # The sandbox waits for the exit-code file itself, so a command
+                # costs one exec per WAIT_SLICE seconds rather than two per poll
+                deadline = time.time() + timeout
+                while True:
+                    result = await self._read_output(
+                        session_name, command_id=command_id,
+                        wait=max(0, min(WAIT_SLICE, int(deadline - time.time()))),
+                    )
+                    if result["exit_code"] is not None or not result["running"] or time.time() >= deadline:
                         break
-                        
-                    # Get current output and check for our completion marker
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    current_output = output_result.get("output", "")
 
-                    if self._is_command_completed(current_output, marker):
-                        final_output = current_output
-                        break
-                
-                # If we didn't get the marker, capture whatever output we have
-                if not final_output:
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    final_output = output_result.get("output", "")
-                
                 # Kill the session after capture
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
-                
+                await self._execute_raw_command(
+                    f"tmux kill-session -t {shlex.quote(session_name)}; rm -rf {shlex.quote(self._command_dir(session_name))}"
+                )
+
                 return self.success_response({
-                    "output": final_output,
+                    "output": result["output"],
+                    "exit_code": result["exit_code"],
+                    "truncated": result["truncated"],
                     "session_name": session_name,
                     "cwd": cwd,
-                    "completed": True
+                    "completed": result["exit_code"] is not None
                 })
             else:
-                # Send command to tmux session for non-blocking execution
-                await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_command}" Enter')
-                
                 # For non-blocking, just return immediately
                 return self.success_response({
                     "session_name": session_name,
@@ -171,7 +156,7 @@ class SandboxShellTool(SandboxToolsBase):
                     pass
             return self.fail_response(f"Error executing command: {str(e)}")
 
-    async def _execute_raw_command(self, command: str) -> Dict[str, Any]:
+    async def _execute_raw_command(self, command: str, timeout: int = 30) -> Dict[str, Any]:
         """Execute a raw command directly in the sandbox."""
         # Ensure session exists for raw commands
         session_id = await self._ensure_session("raw_commands")
@@ -187,7 +172,7 @@ class SandboxShellTool(SandboxToolsBase):
         response = await self.sandbox.process.execute_session_command(
             session_id=session_id,
             req=req,
-            timeout=30  # Short timeout for utility commands
+            timeout=timeout  # Short timeout for utility commands
         )
         
         logs = await self.sandbox.process.get_session_command_logs(
@@ -216,6 +201,15 @@ class SandboxShellTool(SandboxToolsBase):
                         "type": "boolean",
                         "description": "Whether to terminate the tmux session after checking. Set to true when you're done with the command.",
                         "default": False
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Optional byte offset to read output from, e.g. the next_offset returned by the previous check. Omit to get the most recent output."
+                    },
+                    "max_bytes": {
+                        "type": "integer",
+                        "description": f"Maximum bytes of output to return. Defaults to {DEFAULT_OUTPUT_BYTES}.",
+                        "default": DEFAULT_OUTPUT_BYTES
                     }
                 },
                 "required": ["session_name"]
@@ -225,33 +219,42 @@ class SandboxShellTool(SandboxToolsBase):
     async def check_command_output(
         self,
         session_name: str,
-        kill_session: bool = False
+        kill_session: bool = False,
+        offset: Optional[int] = None,
+        max_bytes: int = DEFAULT_OUTPUT_BYTES
     ) -> ToolResult:
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            # Check if session exists
-            check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            if "not_exists" in check_result.get("output", ""):
+            # Session state and output are read in the same exec
+            result = await self._read_output(session_name, offset=offset, max_bytes=max_bytes)
+            if not result["running"]:
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
-            # Get output from tmux pane
-            output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-            output = output_result.get("output", "")
-            
             # Kill session if requested
             if kill_session:
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                await self._execute_raw_command(
+                    f"tmux kill-session -t {shlex.quote(session_name)}; rm -rf {shlex.quote(self._command_dir(session_name))}"
+                )
                 termination_status = "Session terminated."
             else:
                 termination_status = "Session still running."
             
-            return self.success_response({
-                "output": output,
+            response = {
+                "output": result["output"],
                 "session_name": session_name,
-                "status": termination_status
-            })
+                "status": termination_status,
+                "exit_code": result["exit_code"]
+            }
+            if result["from_log"]:
+                response.update({
+                    "offset": result["offset"],
+                    "next_offset": result["next_offset"],
+                    "total_bytes": result["total_bytes"],
+                    "truncated": result["truncated"]
+                })
+            return self.success_response(response)
                 
         except Exception as e:
             return self.fail_response(f"Error checking command output: {str(e)}")
@@ -287,7 +290,9 @@ class SandboxShellTool(SandboxToolsBase):
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
             # Kill the session
-            await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+            await self._execute_raw_command(
+                f"tmux kill-session -t {shlex.quote(session_name)}; rm -rf {shlex.quote(self._command_dir(session_name))}"
+            )
             
             return self.success_response({
                 "message": f"Tmux session '{session_name}' terminated successfully."
@@ -339,97 +344,89 @@ class SandboxShellTool(SandboxToolsBase):
         except Exception as e:
             return self.fail_response(f"Error listing commands: {str(e)}")
 
-    def _format_completion_command(self, command: str, marker: str) -> str:
-        """Format command with completion marker, handling heredocs properly."""
-        import re
-        
-        # Check if command contains heredoc syntax
-        # Look for patterns like: << EOF, << 'EOF', << "EOF", <<EOF
-        heredoc_pattern = r'<<\s*[\'"]?\w+[\'"]?'
-        
-        if re.search(heredoc_pattern, command):
-            # For heredoc commands, add the completion marker on a new line
-            # This ensures it executes after the heredoc completes
-            return f"{command}\necho {marker}"
-        else:
-            # For regular commands, use semicolon separator
-            return f"{command} ; echo {marker}"
+    def _command_dir(self, session_name: str) -> str:
+        return f"{COMMAND_LOG_DIR}/{session_name}"
 
-    def _is_command_completed(self, current_output: str, marker: str) -> bool:
-        """
-        Check if command execution is completed by comparing marker from end to start.
-        
-        Args:
-            current_output: Current output content
-            marker: Completion marker
-            
-        Returns:
-            bool: True if command completed, False otherwise
+    def _wrap_command(self, command: str, log_dir: str, command_id: str) -> str:
+        """Shell line that runs command in the session, appending its output to
+        the session log. The log offset where the command's output starts is
+        written to {command_id}.start and its exit code to {command_id}.exit.
+
+        The command is passed base64-encoded and eval'd in the session's shell,
+        so quoting and heredocs need no escaping and cd/export still persist.
         """
-        if not current_output or not marker:
-            return False
+        encoded = base64.b64encode(command.encode()).decode()
+        log_file = shlex.quote(f"{log_dir}/output.log")
+        start_file = shlex.quote(f"{log_dir}/{command_id}.start")
+        exit_file = shlex.quote(f"{log_dir}/{command_id}.exit")
+        last_exit = shlex.quote(f"{log_dir}/last.exit")
+        return (
+            f"rm -f {last_exit}; stat -c %s {log_file} > {start_file} 2>/dev/null || echo 0 > {start_file}; "
+            f'{{ eval "$(printf %s {encoded} | base64 -d)"; }} >> {log_file} 2>&1; '
+            f"echo $? | tee {exit_file} > {last_exit}"
+        )
 
-        # Find the last complete marker match position to start comparison
-        # Avoid terminal prompt output at the end
-        marker_end_pos = -1
-        for i in range(len(current_output) - len(marker), -1, -1):
-            if current_output[i:i+len(marker)] == marker:
-                marker_end_pos = i + len(marker) - 1
-                break
-        
-        # Start comparison from found marker position or end of output
-        if marker_end_pos != -1:
-            output_idx = marker_end_pos
-            marker_idx = len(marker) - 1
+    async def _read_output(
+        self,
+        session_name: str,
+        offset: Optional[int] = None,
+        max_bytes: int = DEFAULT_OUTPUT_BYTES,
+        command_id: Optional[str] = None,
+        wait: int = 0,
+    ) -> Dict[str, Any]:
+        """Read a session's output log in a single exec.
+
+        Waits up to `wait` seconds inside the sandbox for the command to exit
+        (or the session to end). With an offset, returns at most max_bytes
+        starting there; otherwise the last max_bytes of the output of
+        command_id, or of the whole log. exit_code is that of command_id, or
+        of the session's last command. Sessions without a log fall back to
+        the tail of the tmux pane.
+        """
+        max_bytes = max(1, min(max_bytes, MAX_OUTPUT_BYTES))
+        log_dir = self._command_dir(session_name)
+        session = shlex.quote(session_name)
+        if command_id:
+            exit_file = f"{log_dir}/{command_id}.exit"
+            base = f"$(cat {shlex.quote(log_dir + '/' + command_id + '.start')} 2>/dev/null || echo 0)"
         else:
-            output_idx = len(current_output) - 1
-            marker_idx = len(marker) - 1
-        
-        # Compare characters from end to start
-        while marker_idx >= 0 and output_idx >= 0:
-            # Skip newlines in current_output
-            if current_output[output_idx] == '\n':
-                output_idx -= 1
-                continue
-                
-            # Compare characters
-            if current_output[output_idx] != marker[marker_idx]:
-                return False
-                
-            # Continue comparison
-            output_idx -= 1
-            marker_idx -= 1
-        
-        # If marker not fully matched
-        if marker_idx >= 0:
-            return False
-            
-        # Check if preceded by "echo " (command just started)
-        check_count = 0
-        echo_chars = "echo "
-        echo_idx = len(echo_chars) - 1
-        
-        while output_idx >= 0 and check_count < 5:
-            # Skip newlines
-            if current_output[output_idx] == '\n':
-                output_idx -= 1
-                continue
-                
-            check_count += 1
-            
-            # Check for "echo " pattern
-            if echo_idx >= 0 and current_output[output_idx] == echo_chars[echo_idx]:
-                echo_idx -= 1
-            else:
-                echo_idx = len(echo_chars) - 1
-                
-            output_idx -= 1
-            
-        # If "echo " found, command just started
-        if echo_idx < 0:
-            return False
-            
-        return True
+            exit_file, base = f"{log_dir}/last.exit", "0"
+        start = f"from={int(offset)}" if offset is not None else (
+            f"[ $((size - {max_bytes})) -gt $base ] && from=$((size - {max_bytes})) || from=$base"
+        )
+        script = (
+            f"log={shlex.quote(log_dir + '/output.log')}; "
+            f"exitf={shlex.quote(exit_file)}; "
+            f"end=$(( $(date +%s) + {int(wait)} )); "
+            f"alive() {{ tmux has-session -t {session} 2>/dev/null; }}; "
+            f'while [ ! -f "$exitf" ] && alive && [ $(date +%s) -lt $end ]; do sleep 0.2; done; '
+            f"if alive; then state=running; else state=ended; fi; "
+            f'code=$(cat "$exitf" 2>/dev/null); base={base}; '
+            f'if [ -f "$log" ]; then '
+            f'size=$(stat -c %s "$log"); {start}; '
+            f'echo "log $size $base $from $state ${{code:--}}"; '
+            f'tail -c +$((from + 1)) "$log" | head -c {max_bytes}; '
+            f'else echo "pane 0 0 0 $state -"; '
+            f"tmux capture-pane -t {session} -p -S -2000 2>/dev/null | tail -c {max_bytes}; fi"
+        )
+        result = await self._execute_raw_command(script, timeout=int(wait) + 30)
+        header, _, output = (result.get("output") or "").partition("\n")
+        parts = header.split()
+        if len(parts) != 6:
+            raise RuntimeError(f"Unexpected output from sandbox: {header[:200]}")
+        source, size, base_offset, start_at, state, code = parts
+        size, base_offset, start_at = int(size), int(base_offset), int(start_at)
+        return {
+            "output": output,
+            "exit_code": int(code) if code.lstrip("-").isdigit() else None,
+            "running": state == "running",
+            "from_log": source == "log",
+            "offset": start_at,
+            "next_offset": min(size, start_at + max_bytes),
+            "total_bytes": size,
+            # Tail reads skip the start of long output
+            "truncated": offset is None and start_at > base_offset,
+        }
 
     async def cleanup(self):
         """Clean up all sessions."""
@@ -439,6 +436,6 @@ class SandboxShellTool(SandboxToolsBase):
         # Also clean up any tmux sessions
         try:
             await self._ensure_sandbox()
-            await self._execute_raw_command("tmux kill-server 2>/dev/null || true")
+            await self._execute_raw_command(f"tmux kill-server 2>/dev/null || true; rm -rf {COMMAND_LOG_DIR}")
         except:
             pass
\ No newline at end of file
@@ -4,9 +4,14 @@ from core.utils.logger import logger
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from enum import Enum
+import asyncio
 import json
 import uuid
 
+# Saves closer together than this are written to the database together
+FLUSH_DELAY = 0.2
+MAX_FLUSH_ATTEMPTS = 3
+
 class TaskStatus(str, Enum):
     PENDING = "pending"
     COMPLETED = "completed"
@@ -22,6 +27,37 @@ class Task(BaseModel):
     status: TaskStatus = TaskStatus.PENDING
     section_id: str  # Reference to section ID instead of section name
 
+def _merge_items(base: List[Dict[str, Any]], ours: List[Dict[str, Any]], theirs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Three-way merge of id-keyed items (sections or tasks).
+
+    Keeps the stored order (theirs) and applies this run's changes since base:
+    items it edited take its version, items it deleted are dropped, and items
+    it added are inserted after the item preceding them in ours. Edits and
+    deletions made elsewhere are kept where this run did not touch the item.
+    """
+    base_map = {item['id']: item for item in base}
+    ours_map = {item['id']: item for item in ours}
+    merged = []
+    for item in theirs:
+        item_id = item['id']
+        if item_id in base_map and item_id not in ours_map:
+            continue
+        ours_item = ours_map.get(item_id)
+        merged.append(ours_item if ours_item is not None and ours_item != base_map.get(item_id) else item)
+    
+    positions = {item['id']: i for i, item in enumerate(merged)}
+    previous_id = None
+    for item in ours:
+        if item['id'] not in base_map and item['id'] not in positions:
+            if previous_id is None:
+                index = 0
+            else:
+                index = positions[previous_id] + 1 if previous_id in positions else len(merged)
+            merged.insert(index, item)
+            positions = {m['id']: i for i, m in enumerate(merged)}
+        previous_id = item['id']
+    return merged
+
 class TaskListTool(SandboxToolsBase):
     """Task management system for organizing and tracking tasks. It contains the action plan for the agent to follow.
     
@@ -35,84 +71,181 @@ class TaskListTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
         self.task_list_message_type = "task_list"
+        # The task list is read once per run and kept here; saves mark it
+        # dirty and are written back by a coalesced flush
+        self._sections: Optional[List[Section]] = None
+        self._tasks: List[Task] = []
+        self._message_id: Optional[str] = None
+        self._version: Optional[str] = None  # updated_at of the stored row
+        self._persisted: Optional[Dict[str, Any]] = None  # content as last read or written
+        self._revision = 0
+        self._flushed_revision = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        # Error of the last delayed write, reported by the next save
+        self._flush_error: Optional[Exception] = None
+
+    @property
+    def _dirty(self) -> bool:
+        return self._revision != self._flushed_revision
+
+    @staticmethod
+    def _parse_content(content: Any) -> tuple[List[Section], List[Task]]:
+        if isinstance(content, str):
+            content = json.loads(content)
+        if not content:
+            return [], []
+        
+        sections = [Section(**s) for s in content.get('sections', [])]
+        tasks = [Task(**t) for t in content.get('tasks', [])]
+        
+        # Handle migration from old format
+        if not sections and 'sections' in content:
+            # Create sections from old nested format
+            for old_section in content['sections']:
+                section = Section(title=old_section['title'])
+                sections.append(section)
+                
+                # Update tasks to reference section ID
+                for old_task in old_section.get('tasks', []):
+                    task = Task(
+                        content=old_task['content'],
+                        status=TaskStatus(old_task.get('status', 'pending')),
+                        section_id=section.id
+                    )
+                    if 'id' in old_task:
+                        task.id = old_task['id']
+                    tasks.append(task)
+        
+        return sections, tasks
+
+    def _content(self) -> Dict[str, Any]:
+        return {
+            'sections': [section.model_dump(mode='json') for section in self._sections or []],
+            'tasks': [task.model_dump(mode='json') for task in self._tasks]
+        }
+
+    async def _fetch_row(self) -> Optional[Dict[str, Any]]:
+        client = await self.thread_manager.db.client
+        result = await client.table('messages').select('message_id, content, updated_at')\
+            .eq('thread_id', self.thread_id)\
+            .eq('type', self.task_list_message_type)\
+            .order('created_at', desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    def _set_row(self, row: Optional[Dict[str, Any]]):
+        if row is None:
+            self._message_id = self._version = None
+            self._persisted = None
+            return
+        self._message_id = row['message_id']
+        self._version = row.get('updated_at')
+        content = row.get('content')
+        self._persisted = json.loads(content) if isinstance(content, str) else content
     
     async def _load_data(self) -> tuple[List[Section], List[Task]]:
-        """Load sections and tasks from storage"""
-        try:
-            client = await self.thread_manager.db.client
-            result = await client.table('messages').select('*')\
-                .eq('thread_id', self.thread_id)\
-                .eq('type', self.task_list_message_type)\
-                .order('created_at', desc=True).limit(1).execute()
-            
-            if result.data and result.data[0].get('content'):
-                content = result.data[0]['content']
-                if isinstance(content, str):
-                    content = json.loads(content)
-                
-                sections = [Section(**s) for s in content.get('sections', [])]
-                tasks = [Task(**t) for t in content.get('tasks', [])]
-                
-                # Handle migration from old format
-                if not sections and 'sections' in content:
-                    # Create sections from old nested format
-                    for old_section in content['sections']:
-                        section = Section(title=old_section['title'])
-                        sections.append(section)
-                        
-                        # Update tasks to reference section ID
-                        for old_task in old_section.get('tasks', []):
-                            task = Task(
-                                content=old_task['content'],
-                                status=TaskStatus(old_task.get('status', 'pending')),
-                                section_id=section.id
-                            )
-                            if 'id' in old_task:
-                                task.id = old_task['id']
-                            tasks.append(task)
-                
-                return sections, tasks
-            
-            # Return empty lists - no default section
-            return [], []
-            
-        except Exception as e:
-            logger.error(f"Error loading data: {e}")
-            return [], []
+        """Load sections and tasks, reading storage only on first use in the run.
+
+        Returns copies, so a tool call that fails half-way leaves the cached
+        state untouched; changes are kept by passing them to _save_data.
+        """
+        if self._sections is None:
+            try:
+                row = await self._fetch_row()
+                sections, tasks = self._parse_content(row.get('content') if row else None)
+            except Exception as e:
+                logger.error(f"Error loading data: {e}")
+                # Return empty lists - no default section
+                return [], []
+            self._set_row(row)
+            self._sections, self._tasks = sections, tasks
+        return [s.model_copy() for s in self._sections], [t.model_copy() for t in self._tasks]
     
     async def _save_data(self, sections: List[Section], tasks: List[Task]):
-        """Save sections and tasks to storage"""
+        """Replace the cached sections and tasks and schedule a write.
+
+        Saves within FLUSH_DELAY of each other (e.g. parallel tool calls) are
+        written together; anything still pending is flushed at the end of the run.
+        If the last delayed write failed, raises instead, leaving the cached
+        state as it was, so the tool call fails rather than reporting changes
+        that may never be stored.
+        """
+        if self._flush_error is not None:
+            error, self._flush_error = self._flush_error, None
+            raise RuntimeError(f"Task list could not be saved: {error}") from error
+        self._sections, self._tasks = list(sections), list(tasks)
+        self._revision += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
         try:
-            client = await self.thread_manager.db.client
-            
-            content = {
-                'sections': [section.model_dump() for section in sections],
-                'tasks': [task.model_dump() for task in tasks]
-            }
-            
-            # Find existing message
-            result = await client.table('messages').select('message_id')\
-                .eq('thread_id', self.thread_id)\
-                .eq('type', self.task_list_message_type)\
-                .order('created_at', desc=True).limit(1).execute()
-            
-            if result.data:
-                # Update existing
-                await client.table('messages').update({'content': content})\
-                    .eq('message_id', result.data[0]['message_id']).execute()
-            else:
-                # Create new
-                await client.table('messages').insert({
-                    'thread_id': self.thread_id,
-                    'type': self.task_list_message_type,
-                    'content': content,
-                    'is_llm_message': False,
-                    'metadata': {}
-                }).execute()
-            
+            while self._dirty:
+                await asyncio.sleep(FLUSH_DELAY)
+                await self.flush()
+            self._flush_error = None
         except Exception as e:
             logger.error(f"Error saving data: {e}")
-            raise
+            self._flush_error = e
+
+    async def flush(self) -> None:
+        """Write the task list if it changed since the last write.
+
+        The update only applies if the row's updated_at is still the one last
+        read. If the list was edited elsewhere in the meantime (e.g. from the
+        UI), the stored version is merged with this run's changes and the
+        write is retried.
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            client = await self.thread_manager.db.client
+            for _ in range(MAX_FLUSH_ATTEMPTS):
+                revision = self._revision
+                content = self._content()
+                if content == self._persisted:
+                    self._flushed_revision = revision
+                    return
+                
+                if self._message_id is None:
+                    result = await client.table('messages').insert({
+                        'thread_id': self.thread_id,
+                        'type': self.task_list_message_type,
+                        'content': content,
+                        'is_llm_message': False,
+                        'metadata': {}
+                    }).execute()
+                else:
+                    result = await client.table('messages').update({'content': content})\
+                        .eq('message_id', self._message_id)\
+                        .eq('updated_at', self._version).execute()
+                
+                if result.data:
+                    self._set_row({**result.data[0], 'content': content})
+                    self._flushed_revision = revision
+                    return
+                
+                # The row changed (or was deleted) since it was read
+                row = await self._fetch_row()
+                theirs = self._parse_content(row.get('content') if row else None)
+                if row is not None:
+                    logger.info(f"Task list for thread {self.thread_id} was modified concurrently, merging")
+                    base = self._persisted or {}
+                    ours = self._content()
+                    theirs_content = {
+                        'sections': [s.model_dump(mode='json') for s in theirs[0]],
+                        'tasks': [t.model_dump(mode='json') for t in theirs[1]]
+                    }
+                    merged = {
+                        key: _merge_items(base.get(key, []), ours[key], theirs_content[key])
+                        for key in ('sections', 'tasks')
+                    }
+                    # Tasks whose section was deleted go with it
+                    section_ids = {s['id'] for s in merged['sections']}
+                    merged['tasks'] = [t for t in merged['tasks'] if t['section_id'] in section_ids]
+                    self._sections, self._tasks = self._parse_content(merged)
+                self._set_row(row)
+            raise RuntimeError(f"Task list for thread {self.thread_id} kept changing while saving")
     
     def _format_response(self, sections: List[Section], tasks: List[Task]) -> Dict[str, Any]:
         """Format data for response"""
@@ -0,0 +1,265 @@
+"""
+Exa websets for the people, company and paper search tools.
+
+The tools used to run the synchronous Exa SDK in asyncio.to_thread and block
+in websets.wait_until_idle, which polls every second for as long as the
+webset takes to fill (often tens of seconds). Each search held a default
+thread-pool slot the whole time, and repeating a search created (and billed)
+a new webset.
+
+- WebsetPoller: one background task per event loop polls every pending
+  webset. Each webset is polled with exponential backoff (INITIAL_POLL_INTERVAL
+  up to MAX_POLL_INTERVAL) and the tool calls waiting on it are woken through
+  a future once it is idle, fails or times out. Only the individual SDK
+  requests run in a thread.
+- WebsetSearches: runs create -> wait -> list items, and caches the items in
+  Redis for CACHE_TTL seconds per account under the normalized query, so a
+  repeated search (case, whitespace or trailing punctuation aside) returns
+  without a new webset. Identical searches in flight at the same time share
+  one webset.
+
+Redis is an optimization only: if it is unavailable, searches run uncached.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from exa_py.websets.types import CreateWebsetParameters, WebsetStatus
+
+from core.services import redis
+from core.utils.logger import logger
+
+INITIAL_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 10.0
+POLL_BACKOFF = 1.5
+WAIT_TIMEOUT = 15 * 60
+# Consecutive failed status requests before a webset is given up on
+POLL_ERROR_LIMIT = 5
+CACHE_TTL = 6 * 60 * 60
+
+_TRAILING_PUNCTUATION = ".?!,;: "
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().rstrip(_TRAILING_PUNCTUATION).lower()
+
+
+def _cache_key(kind: str, account_id: str, params: CreateWebsetParameters) -> str:
+    dumped = params.model_dump(by_alias=True, exclude_none=True, mode='json')
+    dumped['search']['query'] = normalize_query(dumped['search']['query'])
+    for enrichment in dumped.get('enrichments', []):
+        enrichment['description'] = normalize_query(enrichment['description'])
+    digest = hashlib.sha256(json.dumps(dumped, sort_keys=True).encode()).hexdigest()
+    return f"exa_webset_search:{kind}:{account_id}:{digest}"
+
+
+def _item_dict(item: Any) -> Dict[str, Any]:
+    if hasattr(item, 'model_dump'):
+        return item.model_dump(mode='json')
+    if isinstance(item, dict):
+        return item
+    return vars(item) if hasattr(item, '__dict__') else {}
+
+
+class WebsetSearchError(Exception):
+    """A webset search failed; `stage` is 'create', 'wait' or 'items'."""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"Webset {stage} failed: {error!r}")
+        self.stage = stage
+        self.error = error
+
+
+@dataclass
+class _PendingWebset:
+    client: Any
+    future: asyncio.Future
+    interval: float
+    next_poll_at: float
+    deadline: float
+    errors: int = 0
+    waiters: int = 0
+
+
+class WebsetPoller:
+    def __init__(
+        self,
+        initial_interval: float = INITIAL_POLL_INTERVAL,
+        max_interval: float = MAX_POLL_INTERVAL,
+        backoff: float = POLL_BACKOFF,
+        timeout: float = WAIT_TIMEOUT,
+        error_limit: int = POLL_ERROR_LIMIT
+    ):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.error_limit = error_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, _PendingWebset] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def wait_until_idle(self, client, webset_id: str, timeout: Optional[float] = None):
+        """Wait until the webset is idle and return it, like websets.wait_until_idle.
+
+        Raises asyncio.TimeoutError after `timeout` seconds, or the last
+        status request error after POLL_ERROR_LIMIT failures in a row.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending = {}
+            self._task = None
+            self._wakeup = asyncio.Event()
+
+        pending = self._pending.get(webset_id)
+        if pending is None:
+            now = loop.time()
+            pending = _PendingWebset(
+                client=client,
+                future=loop.create_future(),
+                interval=self.initial_interval,
+                next_poll_at=now + self.initial_interval,
+                deadline=now + (timeout or self.timeout)
+            )
+            self._pending[webset_id] = pending
+        pending.waiters += 1
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        self._wakeup.set()
+
+        try:
+            return await asyncio.shield(pending.future)
+        finally:
+            pending.waiters -= 1
+            if not pending.waiters and not pending.future.done():
+                # Nobody is waiting any more: stop polling this webset
+                pending.future.cancel()
+                if self._pending.get(webset_id) is pending:
+                    del self._pending[webset_id]
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            now = loop.time()
+            due = [(webset_id, p) for webset_id, p in self._pending.items() if p.next_poll_at <= now]
+            if due:
+                results = await asyncio.gather(
+                    *(asyncio.to_thread(p.client.websets.get, webset_id) for webset_id, p in due),
+                    return_exceptions=True
+                )
+                now = loop.time()
+                for (webset_id, pending), result in zip(due, results):
+                    self._handle(webset_id, pending, result, now)
+                if not self._pending:
+                    break
+
+            self._wakeup.clear()
+            delay = max(0.0, min(p.next_poll_at for p in self._pending.values()) - loop.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finish(self, webset_id: str, pending: _PendingWebset, result=None, error: Exception = None) -> None:
+        if self._pending.get(webset_id) is pending:
+            del self._pending[webset_id]
+        if pending.future.done():
+            return
+        if error is not None:
+            pending.future.set_exception(error)
+        else:
+            pending.future.set_result(result)
+
+    def _handle(self, webset_id: str, pending: _PendingWebset, result, now: float) -> None:
+        if pending.future.done():
+            return
+        if isinstance(result, Exception):
+            pending.errors += 1
+            logger.warning(f"Polling webset {webset_id} failed ({pending.errors}/{self.error_limit}): {result!r}")
+            if pending.errors >= self.error_limit:
+                return self._finish(webset_id, pending, error=result)
+        else:
+            pending.errors = 0
+            if result.status == WebsetStatus.idle:
+                return self._finish(webset_id, pending, result=result)
+        if now >= pending.deadline:
+            return self._finish(webset_id, pending, error=asyncio.TimeoutError(f"Webset {webset_id} timed out"))
+        pending.interval = min(pending.interval * self.backoff, self.max_interval)
+        pending.next_poll_at = min(now + pending.interval, pending.deadline)
+
+
+class WebsetSearches:
+    def __init__(self, poller: Optional[WebsetPoller] = None, cache_ttl: int = CACHE_TTL):
+        self.poller = poller or WebsetPoller()
+        self.cache_ttl = cache_ttl
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def _get_cached(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            cached = await redis.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read cached webset search: {e}")
+            return None
+        return json.loads(cached) if cached is not None else None
+
+    async def _set_cached(self, key: str, items: List[Dict[str, Any]]) -> None:
+        try:
+            await redis.set(key, json.dumps(items, default=str), ex=self.cache_ttl)
+        except Exception as e:
+            logger.warning(f"Failed to cache webset search: {e}")
+
+    async def _run_search(self, client, params: CreateWebsetParameters, key: Optional[str]) -> List[Dict[str, Any]]:
+        try:
+            webset = await asyncio.to_thread(client.websets.create, params=params)
+        except Exception as e:
+            raise WebsetSearchError('create', e) from e
+        logger.info(f"Webset created with ID: {webset.id}, waiting for it to complete")
+
+        try:
+            webset = await self.poller.wait_until_idle(client, webset.id)
+        except Exception as e:
+            raise WebsetSearchError('wait', e) from e
+
+        try:
+            items = await asyncio.to_thread(client.websets.items.list, webset_id=webset.id)
+        except Exception as e:
+            raise WebsetSearchError('items', e) from e
+
+        results = [_item_dict(item) for item in (items.data if items else [])]
+        if key:
+            await self._set_cached(key, results)
+        return results
+
+    async def search(self, client, kind: str, account_id: Optional[str],
+                     params: CreateWebsetParameters) -> List[Dict[str, Any]]:
+        """Create a webset for `params` and return its items as dicts.
+
+        Results are cached per account; without an account the search always
+        runs. Raises WebsetSearchError.
+        """
+        if not account_id:
+            return await self._run_search(client, params, None)
+
+        key = _cache_key(kind, account_id, params)
+        cached = await self._get_cached(key)
+        if cached is not None:
+            logger.info(f"Serving {kind} search for '{params.search.query}' from cache")
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run_search(client, params, key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+
+webset_searches = WebsetSearches()
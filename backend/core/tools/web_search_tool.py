@@ -1,10 +1,10 @@
 from tavily import AsyncTavilyClient
-import httpx
 from dotenv import load_dotenv
 from core.agentpress.tool import Tool, ToolResult, openapi_schema
 from core.utils.config import config
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
+from core.services.web_scrape import scrape_service
 import json
 import datetime
 import asyncio
@@ -82,8 +82,9 @@ class SandboxWebSearchTool(SandboxToolsBase):
 
             # Execute the search with Tavily
             logging.info(f"Executing web search for query: '{query}' with {num_results} results")
-            search_response = await self.tavily_client.search(
-                query=query,
+            search_response = await scrape_service.search(
+                self.tavily_client,
+                query,
                 max_results=num_results,
                 include_images=True,
                 include_answer="advanced",
@@ -251,57 +252,15 @@ class SandboxWebSearchTool(SandboxToolsBase):
         
         try:
             # ---------- Firecrawl scrape endpoint ----------
+            # Pooled, coalesced and cached across tool calls
             logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                # Determine formats to request based on include_html flag
-                formats = ["markdown"]
-                if include_html:
-                    formats.append("html")
-                
-                payload = {
-                    "url": url,
-                    "formats": formats
-                }
-                
-                # Use longer timeout and retry logic for more reliability
-                max_retries = 3
-                timeout_seconds = 30
-                retry_count = 0
-                
-                while retry_count < max_retries:
-                    try:
-                        logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
-                        response = await client.post(
-                            f"{self.firecrawl_url}/v1/scrape",
-                            json=payload,
-                            headers=headers,
-                            timeout=timeout_seconds,
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-                        logging.info(f"Successfully received response from Firecrawl for {url}")
-                        break
-                    except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
-                        retry_count += 1
-                        logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
-                        if retry_count >= max_retries:
-                            raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
-                        # Exponential backoff
-                        logging.info(f"Waiting {2 ** retry_count}s before retry")
-                        await asyncio.sleep(2 ** retry_count)
-                    except Exception as e:
-                        # Don't retry on non-timeout errors
-                        logging.error(f"Error during scraping: {str(e)}")
-                        raise e
+            page = await scrape_service.scrape(url, include_html=include_html)
+            logging.info(f"Successfully received response from Firecrawl for {url}")
 
             # Format the response
-            title = data.get("data", {}).get("metadata", {}).get("title", "")
-            markdown_content = data.get("data", {}).get("markdown", "")
-            html_content = data.get("data", {}).get("html", "") if include_html else ""
+            title = page.get("title", "")
+            markdown_content = page.get("markdown", "")
+            html_content = page.get("html", "") if include_html else ""
             
             logging.info(f"Extracted content from {url}: title='{title}', content length={len(markdown_content)}" + 
                         (f", HTML length={len(html_content)}" if html_content else ""))
@@ -317,9 +276,9 @@ class SandboxWebSearchTool(SandboxToolsBase):
                 formatted_result["html"] = html_content
             
             # Add metadata if available
-            if "metadata" in data.get("data", {}):
-                formatted_result["metadata"] = data["data"]["metadata"]
-                logging.info(f"Added metadata: {data['data']['metadata'].keys()}")
+            if "metadata" in page:
+                formatted_result["metadata"] = page["metadata"]
+                logging.info(f"Added metadata: {page['metadata'].keys()}")
             
             # Create a simple filename from the URL domain and date
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -7,7 +7,8 @@ from core.services.supabase import DBConnection
 from core.services import redis
 from core.utils.logger import logger, structlog
 from core.utils.config import config, EnvMode
-from run_agent_background import run_agent_background
+from run_agent_background import submit_agent_run
+from core.services.run_admission import Priority
 # Billing removed - model validation now done through model_manager
 from core.ai_models import model_manager as ai_model_manager
 from .trigger_service import TriggerEvent, TriggerResult
@@ -358,7 +359,9 @@ class AgentExecutor:
         
         await self._register_agent_run(agent_run_id)
         
-        run_agent_background.send(
+        await submit_agent_run(
+            account_id=account_id,
+            priority=Priority.TRIGGER,
             agent_run_id=agent_run_id,
             thread_id=thread_id,
             instance_id="trigger_executor",
@@ -33,6 +33,16 @@ async def verify_admin_api_key(x_admin_api_key: Optional[str] = Header(None)):
     
     return True
 
+async def verify_metrics_access(
+    authorization: Optional[str] = Header(None),
+    x_admin_api_key: Optional[str] = Header(None),
+):
+    """The admin API key, as X-Admin-Api-Key or as a bearer token (what
+    Prometheus sends with `authorization: {credentials: ...}` in a scrape config)."""
+    if not x_admin_api_key and authorization and authorization.lower().startswith("bearer "):
+        x_admin_api_key = authorization[len("bearer "):].strip()
+    return await verify_admin_api_key(x_admin_api_key)
+
 def _decode_jwt_safely(token: str) -> dict:
     return jwt.decode(
         token, 
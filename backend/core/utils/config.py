@@ -268,8 +268,14 @@ class Configuration:
     OPENAI_COMPATIBLE_API_BASE: Optional[str] = None
     AI302_API_KEY: Optional[str] = None  # 302.AI discounted pricing
     OR_SITE_URL: Optional[str] = "https://kortix.ai"
-    OR_APP_NAME: Optional[str] = "Kortix AI"    
-    
+    OR_APP_NAME: Optional[str] = "Kortix AI"
+
+    # LLM routing between equivalent deployments (see core.services.llm_router)
+    LLM_ROUTING_ENABLED: bool = True
+    LLM_HEDGING_ENABLED: bool = False
+    # Also route to equivalents priced above the requested model
+    LLM_ROUTING_ALLOW_PRICIER: bool = False
+
     # AWS Bedrock authentication
     AWS_BEARER_TOKEN_BEDROCK: Optional[str] = None
     
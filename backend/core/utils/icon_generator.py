@@ -1,11 +1,10 @@
 """
 Icon and color generation utilities for agents and projects.
 """
-import json
 import traceback
-from typing import Dict
+from typing import Dict, Optional
 from core.utils.logger import logger
-from core.services.llm import make_llm_api_call
+from core.services.utility_llm import utility_llm
 
 # Lucide React icons (hardcoded for performance)
 RELEVANT_ICONS = [
@@ -117,13 +116,15 @@ RELEVANT_ICONS = [
 ]
 
 
-async def generate_icon_and_colors(name: str, description: str = "") -> Dict[str, str]:
+async def generate_icon_and_colors(name: str, description: str = "", account_id: Optional[str] = None) -> Dict[str, str]:
     """
     Generate appropriate icon and color scheme for an agent or project.
     
     Args:
         name: The name of the agent/project
         description: Optional description for better context
+        account_id: Account the request is made for; concurrent requests of
+            one account may be batched into one LLM call
         
     Returns:
         Dict with keys: icon_name, icon_color, icon_background
@@ -159,16 +160,17 @@ Example response:
 {{"icon": "youtube", "background_color": "#EF4444", "text_color": "#FFFFFF"}}"""
 
         user_message = f"Select the most appropriate icon and color scheme for this AI agent:\n{context}"
-        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}]
 
         logger.debug(f"Calling LLM ({model_name}) for icon and color generation.")
-        response = await make_llm_api_call(
-            messages=messages, 
-            model_name=model_name, 
-            max_tokens=4000, 
+        parsed_response = await utility_llm.complete_json(
+            system_prompt=system_prompt,
+            user_content=user_message,
+            model_name=model_name,
+            max_tokens=4000,
             temperature=0.7,
-            response_format={"type": "json_object"},
-            stream=False
+            account_id=account_id,
+            # Any suitable icon will do: reuse the answer for the same name
+            cache=True,
         )
 
         # Default fallback values
@@ -178,43 +180,32 @@ Example response:
             "icon_background": "#6366F1"
         }
         
-        if response and response.get('choices') and response['choices'][0].get('message'):
-            raw_content = response['choices'][0]['message'].get('content', '').strip()
-            try:
-                parsed_response = json.loads(raw_content)
-                
-                if isinstance(parsed_response, dict):
-                    # Extract and validate icon
-                    icon = parsed_response.get('icon', '').strip()
-                    if icon and icon in RELEVANT_ICONS:
-                        result["icon_name"] = icon
-                        logger.debug(f"LLM selected icon: '{icon}'")
-                    else:
-                        logger.warning(f"LLM selected invalid icon '{icon}', using default 'bot'")
-                    
-                    # Extract and validate colors
-                    bg_color = parsed_response.get('background_color', '').strip()
-                    text_color = parsed_response.get('text_color', '').strip()
-                    
-                    if bg_color in frontend_colors:
-                        result["icon_background"] = bg_color
-                        logger.debug(f"LLM selected background color: '{bg_color}'")
-                    else:
-                        logger.warning(f"LLM selected invalid background color '{bg_color}', using default")
-                    
-                    if text_color in frontend_colors:
-                        result["icon_color"] = text_color
-                        logger.debug(f"LLM selected text color: '{text_color}'")
-                    else:
-                        logger.warning(f"LLM selected invalid text color '{text_color}', using default")
-                        
-                else:
-                    logger.warning(f"LLM returned non-dict JSON: {parsed_response}")
-                    
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to parse LLM JSON response: {e}. Raw content: {raw_content}")
+        if parsed_response:
+            # Extract and validate icon
+            icon = parsed_response.get('icon', '').strip()
+            if icon and icon in RELEVANT_ICONS:
+                result["icon_name"] = icon
+                logger.debug(f"LLM selected icon: '{icon}'")
+            else:
+                logger.warning(f"LLM selected invalid icon '{icon}', using default 'bot'")
+            
+            # Extract and validate colors
+            bg_color = parsed_response.get('background_color', '').strip()
+            text_color = parsed_response.get('text_color', '').strip()
+            
+            if bg_color in frontend_colors:
+                result["icon_background"] = bg_color
+                logger.debug(f"LLM selected background color: '{bg_color}'")
+            else:
+                logger.warning(f"LLM selected invalid background color '{bg_color}', using default")
+            
+            if text_color in frontend_colors:
+                result["icon_color"] = text_color
+                logger.debug(f"LLM selected text color: '{text_color}'")
+            else:
+                logger.warning(f"LLM selected invalid text color '{text_color}', using default")
         else:
-            logger.warning(f"Failed to get valid response from LLM for icon generation. Response: {response}")
+            logger.warning("Failed to get valid JSON from LLM for icon generation, using defaults")
 
         logger.debug(f"Generated styling: icon={result['icon_name']}, bg={result['icon_background']}, color={result['icon_color']}")
         return result
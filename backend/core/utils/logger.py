@@ -1,41 +1,403 @@
-import structlog, logging, os
+"""
+Structured logging for the backend.
+
+Everything that runs on the caller's thread is kept cheap: level filtering,
+context merging, sampling, lazy value resolution and a timestamp. Rendering
+(tracebacks, JSON / console output) and the actual write happen on a single
+background thread fed by a bounded queue, so a slow stdout never stalls the
+event loop. When the queue is full new events are dropped and counted rather
+than blocking.
+
+Hot paths can use a named logger with a sampling rule and defer expensive
+values until an event is actually emitted:
+
+    stream_logger = get_logger("agentpress.stream")
+    stream_logger.debug("Chunk %s: %s", idx, lazy(lambda: describe(chunk)))
+
+Environment:
+    LOGGING_LEVEL   minimum level (INFO in PRODUCTION, DEBUG otherwise)
+    LOG_SAMPLING    per-logger rules, e.g. "agentpress.stream=0.1,agentpress.tools=50/s"
+    LOG_ASYNC       "false" renders and writes inline (useful when debugging crashes)
+    LOG_QUEUE_SIZE  max events buffered for the writer thread
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, TextIO
+
+import structlog
 
 ENV_MODE = os.getenv("ENV_MODE", "LOCAL")
 
 # Set default logging level based on environment
 if ENV_MODE.upper() == "PRODUCTION":
-    default_level = "DEBUG"
+    default_level = "INFO"
 else:
-    default_level = "DEBUG" 
-    # default_level = "INFO"
+    default_level = "DEBUG"
 
 LOGGING_LEVEL = logging.getLevelNamesMapping().get(
-    os.getenv("LOGGING_LEVEL", default_level).upper(), 
-    logging.DEBUG  
+    os.getenv("LOGGING_LEVEL", default_level).upper(),
+    logging.DEBUG
 )
 
-renderer = [structlog.processors.JSONRenderer()]
-if ENV_MODE.lower() == "local".lower() or ENV_MODE.lower() == "staging".lower():
-    renderer = [structlog.dev.ConsoleRenderer(colors=True)]
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() != "false"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
-structlog.configure(
-    processors=[
+_METHOD_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "msg": logging.INFO,
+    "warn": logging.WARNING,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "exception": logging.ERROR,
+    "critical": logging.CRITICAL,
+    "fatal": logging.CRITICAL,
+}
+
+
+class lazy:
+    """Defer computing a log value until the event passes filtering and sampling.
+
+    Works both as a keyword value and as a %-style positional argument.
+    """
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+
+    def resolve(self) -> Any:
+        try:
+            return self.fn()
+        except Exception as e:
+            return f"<lazy log value failed: {e!r}>"
+
+    def __str__(self) -> str:
+        return str(self.resolve())
+
+    def __repr__(self) -> str:
+        return repr(self.resolve())
+
+
+# ---------------------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------------------
+
+@dataclass
+class SamplingRule:
+    rate: float = 1.0
+    per_second: Optional[int] = None
+
+
+DEFAULT_SAMPLING: Dict[str, SamplingRule] = {
+    "agentpress.stream": SamplingRule(per_second=20),
+    "agentpress.tools": SamplingRule(per_second=100),
+}
+
+
+def parse_sampling(spec: str) -> Dict[str, SamplingRule]:
+    """Parse "name=0.1,other=50/s" into sampling rules; malformed entries are ignored."""
+    rules: Dict[str, SamplingRule] = {}
+    for part in spec.split(","):
+        name, _, value = part.strip().partition("=")
+        if not name or not value:
+            continue
+        try:
+            if value.endswith("/s"):
+                rules[name] = SamplingRule(per_second=int(value[:-2]))
+            else:
+                rules[name] = SamplingRule(rate=float(value))
+        except ValueError:
+            continue
+    return rules
+
+
+class LogSampler:
+    """Drops below-WARNING events for keys with a sampling rule.
+
+    The key is an explicit ``sample_key`` passed with the event, otherwise the
+    ``logger`` name bound by get_logger(). Rate limits use one-second windows;
+    the first event of a window reports how many were suppressed before it.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, SamplingRule]] = None):
+        self._rules: Dict[str, SamplingRule] = dict(rules or {})
+        self._windows: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rules: Dict[str, SamplingRule]) -> None:
+        with self._lock:
+            self._rules = dict(rules)
+            self._windows.clear()
+
+    def __call__(self, _, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        key = event_dict.pop("sample_key", None) or event_dict.get("logger")
+        if key is None:
+            return event_dict
+        rule = self._rules.get(key)
+        if rule is None or _METHOD_LEVELS.get(method_name, logging.INFO) >= logging.WARNING:
+            return event_dict
+
+        if rule.rate < 1.0 and random.random() >= rule.rate:
+            raise structlog.DropEvent
+
+        if rule.per_second is not None:
+            now = int(time.monotonic())
+            with self._lock:
+                window = self._windows.get(key)
+                if window is None or window[0] != now:
+                    suppressed = window[2] if window else 0
+                    self._windows[key] = [now, 1, 0]
+                    if suppressed:
+                        event_dict["suppressed"] = suppressed
+                elif window[1] >= rule.per_second:
+                    window[2] += 1
+                    raise structlog.DropEvent
+                else:
+                    window[1] += 1
+        return event_dict
+
+
+sampler = LogSampler({**DEFAULT_SAMPLING, **parse_sampling(os.getenv("LOG_SAMPLING", ""))})
+
+
+def configure_sampling(rules: Dict[str, SamplingRule]) -> None:
+    sampler.configure(rules)
+
+
+# ---------------------------------------------------------------------------
+# Caller-thread processors
+# ---------------------------------------------------------------------------
+
+def resolve_lazy(_, __, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    for key, value in event_dict.items():
+        if isinstance(value, lazy):
+            event_dict[key] = value.resolve()
+    args = event_dict.get("positional_args")
+    if args and any(isinstance(arg, lazy) for arg in args):
+        event_dict["positional_args"] = tuple(arg.resolve() if isinstance(arg, lazy) else arg for arg in args)
+    return event_dict
+
+
+def capture_exc_info(_, __, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    # exc_info=True only means something on the thread that logged it
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+def add_callsite(_, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Filename, function and line number, only for WARNING and above."""
+    if _METHOD_LEVELS.get(method_name, logging.INFO) < logging.WARNING:
+        return event_dict
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith(("structlog", __name__)):
+        frame = frame.f_back
+    if frame is not None:
+        event_dict["filename"] = os.path.basename(frame.f_code.co_filename)
+        event_dict["func_name"] = frame.f_code.co_name
+        event_dict["lineno"] = frame.f_lineno
+    return event_dict
+
+
+def add_raw_timestamp(_, __, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    event_dict["timestamp"] = time.time()
+    return event_dict
+
+
+def format_timestamp(_, __, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    ts = event_dict.get("timestamp")
+    if isinstance(ts, float):
+        event_dict["timestamp"] = datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+    return event_dict
+
+
+# ---------------------------------------------------------------------------
+# Background rendering and output
+# ---------------------------------------------------------------------------
+
+class QueueLogWriter:
+    """Renders events and writes them to a stream from a daemon thread."""
+
+    def __init__(self, renderer: Callable, stream: Optional[TextIO] = None,
+                 maxsize: int = LOG_QUEUE_SIZE, asynchronous: bool = True):
+        self._processors = [structlog.processors.dict_tracebacks, format_timestamp, renderer]
+        self._stream = stream
+        self._maxsize = maxsize
+        self.asynchronous = asynchronous
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> queue.Queue:
+        # Re-create the thread after fork (dramatiq worker processes)
+        if self._thread is None or self._pid != os.getpid():
+            with self._start_lock:
+                if self._thread is None or self._pid != os.getpid():
+                    self._queue = queue.Queue(self._maxsize)
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+        return self._queue
+
+    def submit(self, event_dict: Dict[str, Any]) -> None:
+        if not self.asynchronous:
+            self._write([event_dict])
+            return
+        try:
+            self._ensure_started().put_nowait(event_dict)
+        except queue.Full:
+            self.dropped += 1
+
+    def _render(self, event_dict: Dict[str, Any]) -> str:
+        method_name = event_dict.get("level", "info")
+        result: Any = event_dict
+        for processor in self._processors:
+            result = processor(None, method_name, result)
+        return result if isinstance(result, str) else str(result)
+
+    def _write(self, events: list) -> None:
+        stream = self._stream or sys.stdout
+        lines = []
+        for event_dict in events:
+            try:
+                lines.append(self._render(event_dict))
+            except Exception as e:
+                lines.append(f"log render failed ({e!r}): {event_dict!r}")
+        if self.dropped != self._reported_dropped:
+            lines.append(f"log queue full, dropped {self.dropped - self._reported_dropped} events")
+            self._reported_dropped = self.dropped
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except Exception:
+            pass
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            events = [q.get()]
+            # Drain whatever else is ready and write it in one go
+            while len(events) < 256:
+                try:
+                    events.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(event is None for event in events)
+            self._write([event for event in events if event is not None])
+            for _ in events:
+                q.task_done()
+            if stop:
+                return
+
+    def flush(self) -> None:
+        """Block until everything queued so far has been written."""
+        if self._queue is not None and self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+class QueueLogger:
+    """structlog output logger that hands the processed event dict to a writer."""
+
+    def __init__(self, writer: QueueLogWriter):
+        self._writer = writer
+
+    def msg(self, **event_dict: Any) -> None:
+        self._writer.submit(event_dict)
+
+    log = debug = info = warn = warning = error = critical = exception = fatal = msg
+
+
+def make_deferred_bound_logger(min_level: int) -> type:
+    """structlog's filtering bound logger, except that %-style arguments travel
+    as ``positional_args`` and are only formatted by PositionalArgumentsFormatter,
+    after sampling. structlog's own logger formats them before any processor
+    runs, so dropped events would still pay for it (and resolve their lazy args).
+    """
+    base = structlog.make_filtering_bound_logger(min_level)
+
+    def make_method(name: str) -> Callable[..., Any]:
+        def meth(self: Any, event: str, *args: Any, **kw: Any) -> Any:
+            if args:
+                kw["positional_args"] = args
+            return self._proxy_to_logger(name, event, **kw)
+
+        meth.__name__ = name
+        return meth
+
+    def log(self: Any, level: int, event: str, *args: Any, **kw: Any) -> Any:
+        if level < min_level:
+            return None
+        if args:
+            kw["positional_args"] = args
+        return self._proxy_to_logger(logging.getLevelName(level).lower(), event, **kw)
+
+    meths: Dict[str, Any] = {"log": log}
+    for name, level in _METHOD_LEVELS.items():
+        if level >= min_level and name not in ("exception", "msg", "warn", "fatal"):
+            meths[name] = make_method(name)
+    for alias, name in (("msg", "info"), ("warn", "warning"), ("fatal", "critical")):
+        if name in meths:
+            meths[alias] = meths[name]
+    return type(f"Deferred{base.__name__}", (base,), meths)
+
+
+def caller_processors(sampling: Optional[LogSampler] = None) -> list:
+    """The processors that run synchronously on the logging thread."""
+    return [
+        structlog.contextvars.merge_contextvars,
         structlog.stdlib.add_log_level,
+        sampling or sampler,
+        resolve_lazy,
         structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.dict_tracebacks,
-        structlog.processors.CallsiteParameterAdder(
-            {
-                structlog.processors.CallsiteParameter.FILENAME,
-                structlog.processors.CallsiteParameter.FUNC_NAME,
-                structlog.processors.CallsiteParameter.LINENO,
-            }
-        ),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.contextvars.merge_contextvars,
-        *renderer,
-    ],
+        capture_exc_info,
+        add_callsite,
+        add_raw_timestamp,
+    ]
+
+
+renderer = structlog.processors.JSONRenderer()
+if ENV_MODE.lower() == "local".lower() or ENV_MODE.lower() == "staging".lower():
+    renderer = structlog.dev.ConsoleRenderer(colors=True)
+
+log_writer = QueueLogWriter(renderer, asynchronous=LOG_ASYNC)
+atexit.register(log_writer.stop)
+
+structlog.configure(
+    processors=caller_processors(),
+    logger_factory=lambda *args: QueueLogger(log_writer),
     cache_logger_on_first_use=True,
-    wrapper_class=structlog.make_filtering_bound_logger(LOGGING_LEVEL),
+    wrapper_class=make_deferred_bound_logger(LOGGING_LEVEL),
 )
 
 logger: structlog.stdlib.BoundLogger = structlog.get_logger()
+
+
+def get_logger(name: str) -> structlog.stdlib.BoundLogger:
+    """Logger whose events carry ``logger=name`` so sampling rules can target it."""
+    return structlog.get_logger().bind(logger=name)
+
+
+def flush_logs() -> None:
+    log_writer.flush()
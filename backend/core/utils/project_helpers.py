@@ -1,13 +1,14 @@
 """Project-related helper functions."""
 import json
 import traceback
+from typing import Optional
 from core.services.supabase import DBConnection
-from core.services.llm import make_llm_api_call
+from core.services.utility_llm import utility_llm
 from .logger import logger
 from .icon_generator import RELEVANT_ICONS
 
 
-async def generate_and_update_project_name(project_id: str, prompt: str):
+async def generate_and_update_project_name(project_id: str, prompt: str, account_id: Optional[str] = None):
     """
     Generates a project name and icon using an LLM and updates the database.
     
@@ -16,6 +17,8 @@ async def generate_and_update_project_name(project_id: str, prompt: str):
     Args:
         project_id: The project ID to update
         prompt: The initial user prompt to base the name/icon on
+        account_id: The project's account, which lets the call be batched with
+            the account's other naming calls
     """
     logger.debug(f"Starting background task to generate name and icon for project: {project_id}")
     
@@ -40,35 +43,35 @@ async def generate_and_update_project_name(project_id: str, prompt: str):
         {{"title": "Code Review Help", "icon": "code"}}"""
 
         user_message = f"Generate an extremely brief title (2-4 words only) and select the most appropriate icon for a chat thread that starts with this message: \"{prompt}\""
-        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}]
 
         logger.debug(f"Calling LLM ({model_name}) for project {project_id} naming and icon selection.")
-        response = await make_llm_api_call(
-            messages=messages, 
-            model_name=model_name, 
-            max_tokens=1000, 
+        raw_content = await utility_llm.complete_json_text(
+            system_prompt=system_prompt,
+            user_content=user_message,
+            model_name=model_name,
+            max_tokens=1000,
             temperature=0.7,
-            response_format={"type": "json_object"},
-            stream=False
+            account_id=account_id,
+            # Any fitting title will do: reuse the answer for the same message
+            cache=True,
         )
 
         generated_name = None
         selected_icon = None
         
-        if response and response.get('choices') and response['choices'][0].get('message'):
-            raw_content = response['choices'][0]['message'].get('content', '').strip()
+        if raw_content:
             try:
                 parsed_response = json.loads(raw_content)
                 
                 if isinstance(parsed_response, dict):
                     # Extract title
-                    title = parsed_response.get('title', '').strip()
+                    title = str(parsed_response.get('title', '')).strip()
                     if title:
                         generated_name = title.strip('\'" \n\t')
                         logger.debug(f"LLM generated name for project {project_id}: '{generated_name}'")
                     
                     # Extract icon
-                    icon = parsed_response.get('icon', '').strip()
+                    icon = str(parsed_response.get('icon', '')).strip()
                     if icon and icon in relevant_icons:
                         selected_icon = icon
                         logger.debug(f"LLM selected icon for project {project_id}: '{selected_icon}'")
@@ -86,7 +89,7 @@ async def generate_and_update_project_name(project_id: str, prompt: str):
                     generated_name = cleaned_content[:50]  # Limit fallback title length
                 selected_icon = "message-circle"  # Default icon
         else:
-            logger.warning(f"Failed to get valid response from LLM for project {project_id} naming. Response: {response}")
+            logger.warning(f"Failed to get valid response from LLM for project {project_id} naming.")
 
         if generated_name:
             # Store title and icon in dedicated fields
@@ -0,0 +1,215 @@
+"""Agent run checkpoints and worker leases.
+
+A worker used to hold ``agent_run_lock:{id}`` for 24 hours, so a worker that
+died mid-run left the run stuck in ``running`` and the user had to start over,
+paying again for every LLM call already made. Now:
+
+- the lock is a lease of LEASE_TTL seconds that the owning worker renews from a
+  heartbeat; expiries are mirrored in the LEASES_KEY sorted set so expired
+  leases can be found without scanning keys;
+- AgentRunner checkpoints the run as it goes (iteration, auto-continue count,
+  continuous_state and tool calls that have started but not finished);
+- a sweep in the workers resubmits runs whose lease expired while still
+  ``running``, and the new worker resumes from the last checkpoint instead of
+  from scratch.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from core.services import redis
+from core.utils.logger import logger
+
+LEASE_TTL = 30
+HEARTBEAT_INTERVAL = 10
+LEASES_KEY = "agent_run:leases"
+CHECKPOINT_TTL = 3600 * 24
+ORPHAN_SWEEP_INTERVAL = 15
+ORPHAN_SWEEP_LOCK = "agent_run:orphan-sweep"
+# Give up on a run that keeps killing its workers
+MAX_RESUMES = 3
+
+
+def lease_key(agent_run_id: str) -> str:
+    return f"agent_run_lock:{agent_run_id}"
+
+
+def _checkpoint_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:checkpoint"
+
+
+def _args_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:args"
+
+
+@dataclass
+class RunCheckpoint:
+    iteration: int = 0
+    auto_continue_count: int = 0
+    continuous_state: Dict[str, Any] = field(default_factory=dict)
+    # Tool calls of the current LLM call that started but have no result yet
+    pending_tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+    updated_at: float = 0.0
+
+    def auto_continue_state(self) -> Dict[str, Any]:
+        """The run_thread auto-continue state to resume the current iteration with."""
+        return {
+            'count': self.auto_continue_count,
+            'active': True,
+            'continuous_state': dict(self.continuous_state) or {'accumulated_content': '', 'thread_run_id': None},
+        }
+
+
+async def save_checkpoint(agent_run_id: str, checkpoint: RunCheckpoint) -> None:
+    checkpoint.updated_at = time.time()
+    try:
+        await redis.set(_checkpoint_key(agent_run_id), json.dumps(asdict(checkpoint)), ex=CHECKPOINT_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to checkpoint agent run {agent_run_id}: {e}")
+
+
+async def load_checkpoint(agent_run_id: str) -> Optional[RunCheckpoint]:
+    raw = await redis.get(_checkpoint_key(agent_run_id))
+    if not raw:
+        return None
+    try:
+        return RunCheckpoint(**json.loads(raw))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable checkpoint for agent run {agent_run_id}: {e}")
+        return None
+
+
+async def save_run_args(agent_run_id: str, run_args: Dict[str, Any]) -> None:
+    """Keep the arguments a run was started with so another worker can resume it."""
+    await redis.set(_args_key(agent_run_id), json.dumps({"args": run_args, "resumes": 0}), ex=CHECKPOINT_TTL)
+
+
+async def clear_run_state(agent_run_id: str) -> None:
+    """Drop checkpoint, arguments and lease entry of a run that ended."""
+    try:
+        client = await redis.get_client()
+        await client.delete(_checkpoint_key(agent_run_id), _args_key(agent_run_id))
+        await client.zrem(LEASES_KEY, agent_run_id)
+    except Exception as e:
+        logger.warning(f"Failed to clear run state for {agent_run_id}: {e}")
+
+
+class RunLease:
+    """Exclusive, renewable ownership of an agent run by one worker."""
+
+    def __init__(self, agent_run_id: str, owner: str, ttl: int = LEASE_TTL,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL):
+        self.agent_run_id = agent_run_id
+        self.owner = owner
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.lost = False
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def _mark(self, client, expires_at: float) -> None:
+        await client.zadd(LEASES_KEY, {self.agent_run_id: expires_at})
+
+    async def acquire(self) -> bool:
+        client = await redis.get_client()
+        if not await client.set(lease_key(self.agent_run_id), self.owner, ex=self.ttl, nx=True):
+            return False
+        await self._mark(client, time.time() + self.ttl)
+        return True
+
+    async def current_owner(self) -> Optional[str]:
+        return await redis.get(lease_key(self.agent_run_id))
+
+    async def renew(self) -> bool:
+        """Extend the lease; returns False once another worker owns the run."""
+        client = await redis.get_client()
+        key = lease_key(self.agent_run_id)
+        owner = await client.get(key)
+        if owner is None:
+            # Expired while we were stalled; take it back unless someone else did
+            if not await client.set(key, self.owner, ex=self.ttl, nx=True):
+                self.lost = True
+                return False
+        elif owner != self.owner:
+            self.lost = True
+            return False
+        else:
+            await client.expire(key, self.ttl)
+        await self._mark(client, time.time() + self.ttl)
+        return True
+
+    async def _heartbeat_loop(self) -> None:
+        while not self.lost:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                if not await self.renew():
+                    logger.warning(f"Lost lease on agent run {self.agent_run_id} to another worker")
+            except Exception as e:
+                logger.warning(f"Failed to renew lease on agent run {self.agent_run_id}: {e}")
+
+    def start_heartbeat(self) -> None:
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop_heartbeat(self) -> None:
+        if self._heartbeat and not self._heartbeat.done():
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._heartbeat = None
+
+    async def release(self, finished: bool = True) -> None:
+        """Give up the lease.
+
+        A finished run forgets its checkpoint. An interrupted one (e.g. the
+        worker is shutting down) keeps it and is marked expired so the next
+        sweep hands it to another worker straight away.
+        """
+        await self.stop_heartbeat()
+        if self.lost:
+            return
+        try:
+            client = await redis.get_client()
+            if await client.get(lease_key(self.agent_run_id)) == self.owner:
+                await client.delete(lease_key(self.agent_run_id))
+            if finished:
+                await clear_run_state(self.agent_run_id)
+            else:
+                await self._mark(client, 0)
+        except Exception as e:
+            logger.warning(f"Failed to release lease on agent run {self.agent_run_id}: {e}")
+
+
+async def find_orphaned_runs(limit: int = 100) -> List[str]:
+    """Runs whose lease expired without the run being cleaned up."""
+    client = await redis.get_client()
+    expired = await client.zrangebyscore(LEASES_KEY, "-inf", time.time(), start=0, num=limit)
+    orphaned = []
+    for agent_run_id in expired:
+        # The sorted set lags the lease key by at most one heartbeat
+        if not await client.get(lease_key(agent_run_id)):
+            orphaned.append(agent_run_id)
+    return orphaned
+
+
+async def claim_orphaned_run(agent_run_id: str) -> Optional[Dict[str, Any]]:
+    """Take an orphaned run off the lease set.
+
+    Returns {"args": ..., "resumes": n} with n counting this resume, or None
+    if another sweep claimed the run first or its arguments are gone. Only one
+    caller gets the record for a given orphan.
+    """
+    client = await redis.get_client()
+    if not await client.zrem(LEASES_KEY, agent_run_id):
+        return None
+    raw = await client.get(_args_key(agent_run_id))
+    if not raw:
+        return None
+    record = json.loads(raw)
+    record["resumes"] = record.get("resumes", 0) + 1
+    await client.set(_args_key(agent_run_id), json.dumps(record), ex=CHECKPOINT_TTL)
+    return record
@@ -62,7 +62,7 @@ async def update_context_usage(
         Updated context data
     """
     from core.events.counter_events import counter_events
-    await counter_events.emit_context_used(session_id, used, total, force=True)
+    await counter_events.emit_context_used(session_id, used, total)
     return {"status": "ok", "session_id": session_id}
 
 
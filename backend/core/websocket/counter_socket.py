@@ -1,19 +1,52 @@
-"""WebSocket handler for counter updates."""
-
-from typing import Dict, Set
+"""WebSocket handler for counter updates.
+
+Counter updates are published to a Redis channel per session
+(COUNTER_CHANNEL_PREFIX + session_id) rather than sent to local sockets
+directly, so clients get them whichever API instance they are connected to.
+Each instance subscribes, on one pub/sub connection, only to the sessions
+that have a socket connected to it. A single listener task owns that
+connection: it brings the subscriptions in line with the connected sessions
+before each read and re-establishes both after an error.
+
+It coalesces the updates it receives: a session is sent updates at most once
+every FLUSH_INTERVAL seconds, the latest update of each type that arrived
+since, one frame per type (clients read one message per frame). If Redis is
+unavailable, updates are delivered to the local sockets only.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
+from core.services import redis
 from core.utils.logger import logger
 import json
 import asyncio
 
+COUNTER_CHANNEL_PREFIX = "counter_updates:"
+# Minimum seconds between two sends to the same session
+FLUSH_INTERVAL = 0.1
+# Seconds before the pub/sub connection is re-established after an error
+RECONNECT_DELAY = 1.0
+# Longest a read waits, and so the longest a new session waits for its subscription
+POLL_INTERVAL = 0.1
+
 
 class ConnectionManager:
     """Manages WebSocket connections for counter updates."""
 
-    def __init__(self):
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
         # session_id -> Set of WebSocket connections
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         self._lock = asyncio.Lock()
+        self.flush_interval = flush_interval
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        # Sessions to subscribe to, and the channels the connection has
+        self._subscribed: Set[str] = set()
+        self._channels: Set[str] = set()
+        # session_id -> {message type: latest message}
+        self._pending: Dict[str, "OrderedDict[str, dict]"] = {}
+        self._flushers: Dict[str, asyncio.Task] = {}
 
     async def connect(self, websocket: WebSocket, session_id: str):
         """Accept and register a new WebSocket connection."""
@@ -21,17 +54,23 @@ class ConnectionManager:
         async with self._lock:
             if session_id not in self.active_connections:
                 self.active_connections[session_id] = set()
+                await self._subscribe(session_id)
             self.active_connections[session_id].add(websocket)
         logger.info(f"WebSocket connected for session {session_id}. Active connections: {len(self.active_connections[session_id])}")
 
     async def disconnect(self, websocket: WebSocket, session_id: str):
         """Remove a WebSocket connection."""
+        await self._remove(session_id, {websocket})
+        logger.info(f"WebSocket disconnected for session {session_id}")
+
+    async def _remove(self, session_id: str, websockets: Set[WebSocket]):
         async with self._lock:
             if session_id in self.active_connections:
-                self.active_connections[session_id].discard(websocket)
+                self.active_connections[session_id] -= websockets
                 if not self.active_connections[session_id]:
                     del self.active_connections[session_id]
-        logger.info(f"WebSocket disconnected for session {session_id}")
+                    self._pending.pop(session_id, None)
+                    await self._unsubscribe(session_id)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """Send a message to a specific WebSocket."""
@@ -40,8 +79,16 @@ class ConnectionManager:
         except Exception as e:
             logger.error(f"Error sending message to websocket: {e}")
 
+    async def publish(self, message: dict, session_id: str):
+        """Send a message to the session's sockets on every API instance."""
+        try:
+            await redis.publish(f"{COUNTER_CHANNEL_PREFIX}{session_id}", json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Failed to publish counter update for session {session_id}, delivering locally: {e}")
+            self._enqueue(session_id, message)
+
     async def broadcast_to_session(self, message: dict, session_id: str):
-        """Broadcast a message to all connections in a session."""
+        """Broadcast a message to all connections in a session on this instance."""
         if session_id not in self.active_connections:
             return
 
@@ -57,25 +104,122 @@ class ConnectionManager:
 
         # Clean up disconnected connections
         if disconnected:
-            async with self._lock:
-                self.active_connections[session_id] -= disconnected
-                if not self.active_connections[session_id]:
-                    del self.active_connections[session_id]
+            await self._remove(session_id, disconnected)
+
+    def _enqueue(self, session_id: str, message: dict):
+        if session_id not in self.active_connections:
+            return
+        pending = self._pending.setdefault(session_id, OrderedDict())
+        pending[message.get("type", "")] = message
+        if session_id not in self._flushers:
+            self._flushers[session_id] = asyncio.create_task(self._flush(session_id))
+
+    async def _flush(self, session_id: str):
+        """Send the pending updates of a session, all of them at most once per
+        flush interval.
+
+        The first updates after a quiet period go out right away; updates
+        arriving within the interval after a send replace those of their type
+        and go out together at the end of it.
+        """
+        try:
+            while self._pending.get(session_id):
+                pending = self._pending.pop(session_id)
+                for message in pending.values():
+                    await self.broadcast_to_session(message, session_id)
+                await asyncio.sleep(self.flush_interval)
+        except Exception as e:
+            logger.error(f"Error flushing counter updates for session {session_id}: {e}")
+        finally:
+            self._flushers.pop(session_id, None)
+            if not self._pending.get(session_id):
+                self._pending.pop(session_id, None)
+
+    async def _subscribe(self, session_id: str):
+        self._subscribed.add(session_id)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _unsubscribe(self, session_id: str):
+        # The listener drops the channel before its next read
+        self._subscribed.discard(session_id)
+
+    async def _sync_subscriptions(self):
+        """Subscribe to the connected sessions and unsubscribe from the others."""
+        if self._pubsub is None:
+            self._pubsub = await redis.create_pubsub()
+            self._channels = set()
+        wanted = {f"{COUNTER_CHANNEL_PREFIX}{s}" for s in self._subscribed}
+        added, removed = wanted - self._channels, self._channels - wanted
+        if added:
+            await self._pubsub.subscribe(*added)
+            self._channels |= added
+        if removed:
+            await self._pubsub.unsubscribe(*removed)
+            self._channels -= removed
+
+    async def _listen(self):
+        """Hand counter updates for locally connected sessions to the coalescer.
+
+        Only this task uses the pub/sub connection, so subscription changes
+        never run concurrently with a read.
+        """
+        while self._subscribed or self._channels:
+            try:
+                await self._sync_subscriptions()
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Counter update subscription failed, reconnecting: {e}")
+                await self._close_pubsub()
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            session_id = message["channel"][len(COUNTER_CHANNEL_PREFIX):]
+            try:
+                self._enqueue(session_id, json.loads(message["data"]))
+            except ValueError as e:
+                logger.warning(f"Invalid counter update for session {session_id}: {e}")
+
+    async def _close_pubsub(self):
+        pubsub, self._pubsub, self._channels = self._pubsub, None, set()
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing counter update subscription: {e}")
+
+    async def close(self):
+        """Stop listening for counter updates."""
+        for task in [self._listener, *self._flushers.values()]:
+            if task is not None:
+                task.cancel()
+        self._listener = None
+        self._subscribed.clear()
+        await self._close_pubsub()
 
 
 # Global connection manager instance
 counter_manager = ConnectionManager()
 
 
-async def handle_counter_websocket(websocket: WebSocket, session_id: str):
+async def handle_counter_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    manager: Optional[ConnectionManager] = None
+):
     """
     Handle WebSocket connection for counter updates.
 
     Args:
         websocket: The WebSocket connection
         session_id: The session/thread ID for this connection
+        manager: Connection manager to register with (default: counter_manager)
     """
-    await counter_manager.connect(websocket, session_id)
+    manager = manager or counter_manager
+    await manager.connect(websocket, session_id)
 
     try:
         while True:
@@ -94,4 +238,4 @@ async def handle_counter_websocket(websocket: WebSocket, session_id: str):
     except Exception as e:
         logger.error(f"WebSocket error for session {session_id}: {e}")
     finally:
-        await counter_manager.disconnect(websocket, session_id)
+        await manager.disconnect(websocket, session_id)
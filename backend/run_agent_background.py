@@ -4,10 +4,11 @@ dotenv.load_dotenv(".env")
 import sentry
 import asyncio
 import json
+import time
 import traceback
 from datetime import datetime, timezone
-from typing import Optional
-from core.services import redis
+from typing import Awaitable, Callable, Optional
+from core.services import metrics, redis
 from core.run import run_agent
 from core.utils.logger import logger, structlog
 import dramatiq
@@ -15,6 +16,11 @@ import uuid
 from core.agentpress.thread_manager import ThreadManager
 from core.agentpress.error_processor import ErrorProcessor
 from core.services.supabase import DBConnection
+from core.services.run_admission import Priority, admission_queue
+from core.utils.run_checkpoint import (
+    MAX_RESUMES, ORPHAN_SWEEP_INTERVAL, ORPHAN_SWEEP_LOCK, RunLease,
+    claim_orphaned_run, clear_run_state, find_orphaned_runs, load_checkpoint, save_run_args,
+)
 from core.services import redis
 from dramatiq.brokers.redis import RedisBroker
 import os
@@ -65,24 +71,136 @@ _initialized = False
 db = DBConnection()
 instance_id = ""
 
+# Agent runs (LLM streams) one worker process executes at once
+MAX_CONCURRENT_RUNS = int(os.getenv("AGENT_RUN_CONCURRENCY", "6"))
+ADMISSION_RETRY_DELAY_MS = 5000
+_active_runs = 0
+
+# Identifies this worker process as the owner of run leases
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_orphan_sweep_task: Optional[asyncio.Task] = None
+
 async def initialize():
     """Initialize the agent API with resources from the main API."""
-    global db, instance_id, _initialized
+    global db, instance_id, _initialized, _orphan_sweep_task
 
     if not instance_id:
         instance_id = str(uuid.uuid4())[:8]
     await retry(lambda: redis.initialize_async())
     await db.initialize()
 
+    if _orphan_sweep_task is None or _orphan_sweep_task.done():
+        _orphan_sweep_task = asyncio.create_task(_orphan_sweep_loop())
+
     _initialized = True
     logger.debug(f"Initialized agent API with instance ID: {instance_id}")
 
+async def resume_orphaned_runs():
+    """Resubmit runs whose worker died, so they continue from their checkpoint."""
+    # One worker sweeps per interval
+    if not await redis.set(ORPHAN_SWEEP_LOCK, WORKER_ID, ex=ORPHAN_SWEEP_INTERVAL, nx=True):
+        return
+    for agent_run_id in await find_orphaned_runs():
+        record = await claim_orphaned_run(agent_run_id)
+        if record is None:
+            continue
+        client = await db.client
+        run = await client.table('agent_runs').select('status').eq('id', agent_run_id).execute()
+        if not run.data or run.data[0].get('status') != 'running':
+            await clear_run_state(agent_run_id)
+            continue
+        if record['resumes'] > MAX_RESUMES:
+            logger.error(f"Agent run {agent_run_id} was interrupted {record['resumes']} times, giving up")
+            await update_agent_run_status(client, agent_run_id, "failed", error="Agent run was interrupted too many times")
+            await redis.publish(f"agent_run:{agent_run_id}:control", "ERROR")
+            await clear_run_state(agent_run_id)
+            continue
+        logger.warning(f"Resuming orphaned agent run {agent_run_id} (attempt {record['resumes']})")
+        run_agent_background.send(**record['args'])
+
+async def requeue_unstarted_runs():
+    """Put back runs a worker dequeued but died before starting."""
+    requeued = await admission_queue.requeue_stale_claims()
+    if requeued:
+        logger.warning(f"Requeued {requeued} admitted agent runs that never started")
+        admit_agent_runs.send()
+
+async def _orphan_sweep_loop():
+    while True:
+        try:
+            await resume_orphaned_runs()
+        except Exception as e:
+            logger.error(f"Orphaned agent run sweep failed: {e}", exc_info=True)
+        try:
+            await requeue_unstarted_runs()
+        except Exception as e:
+            logger.error(f"Admission claim sweep failed: {e}", exc_info=True)
+        await asyncio.sleep(ORPHAN_SWEEP_INTERVAL)
+
 @dramatiq.actor
 async def check_health(key: str):
     """Run the agent in the background using Redis for state."""
     structlog.contextvars.clear_contextvars()
     await redis.set(key, "healthy", ex=redis.REDIS_KEY_TTL)
 
+async def submit_agent_run(account_id: str, priority: Priority = Priority.INTERACTIVE, **run_kwargs):
+    """Queue an agent run for admission by a worker.
+
+    run_kwargs are the arguments of run_agent_background. If the admission
+    queue is unavailable the run is sent to the workers directly.
+    """
+    try:
+        await admission_queue.enqueue(account_id, run_kwargs, priority=priority, job_id=run_kwargs.get("agent_run_id"))
+    except Exception as e:
+        logger.warning(f"Admission queue unavailable, sending agent run directly: {e}")
+        run_agent_background.send(**run_kwargs)
+        return
+    admit_agent_runs.send()
+
+@dramatiq.actor
+async def admit_agent_runs():
+    """Run queued agent runs while this process has a free run slot.
+
+    One message is sent per queued run. A message that gets a slot keeps
+    admitting the fairest waiting run until the queue is empty; when all
+    slots are busy the runs here will pick the work up as they finish, and
+    one message per retry delay across all workers is re-sent later in case
+    another process is idle. Runs stopped while they were queued are skipped.
+
+    A dequeued run stays claimed in the admission queue until _run_agent
+    holds its lease, so a worker dying in between does not lose it.
+    """
+    global _active_runs
+    structlog.contextvars.clear_contextvars()
+    await initialize()
+
+    if _active_runs >= MAX_CONCURRENT_RUNS:
+        if await admission_queue.depth() and await admission_queue.claim_retry(ADMISSION_RETRY_DELAY_MS):
+            admit_agent_runs.send_with_options(delay=ADMISSION_RETRY_DELAY_MS)
+        return
+
+    _active_runs += 1
+    try:
+        while True:
+            job = await admission_queue.dequeue()
+            if job is None:
+                return
+            try:
+                if not await _is_still_running(job.payload["agent_run_id"]):
+                    logger.debug(f"Skipping agent run {job.job_id}, it was stopped while queued")
+                    continue
+                logger.debug(f"Admitted agent run {job.job_id} for account {job.account_id} ({job.priority.name.lower()})")
+                await _run_agent(**job.payload, on_started=lambda job=job: admission_queue.release(job))
+            finally:
+                await admission_queue.complete(job)
+    finally:
+        _active_runs -= 1
+
+async def _is_still_running(agent_run_id: str) -> bool:
+    client = await db.client
+    run = await client.table('agent_runs').select('status').eq('id', agent_run_id).execute()
+    return bool(run.data) and run.data[0].get('status') == 'running'
+
 @dramatiq.actor
 async def run_agent_background(
     agent_run_id: str,
@@ -93,7 +211,28 @@ async def run_agent_background(
     agent_config: Optional[dict] = None,
     request_id: Optional[str] = None
 ):
-    """Run the agent in the background using Redis for state."""
+    """Run the agent in the background, bypassing the admission queue."""
+    await _run_agent(
+        agent_run_id=agent_run_id, thread_id=thread_id, instance_id=instance_id,
+        project_id=project_id, model_name=model_name, agent_config=agent_config,
+        request_id=request_id,
+    )
+
+async def _run_agent(
+    agent_run_id: str,
+    thread_id: str,
+    instance_id: str,
+    project_id: str,
+    model_name: str = "openai/gpt-5-mini",
+    agent_config: Optional[dict] = None,
+    request_id: Optional[str] = None,
+    on_started: Optional[Callable[[], Awaitable[None]]] = None
+):
+    """Run the agent in the background using Redis for state.
+
+    on_started is awaited once the run holds its lease and its arguments are
+    saved for resuming it.
+    """
     structlog.contextvars.clear_contextvars()
     structlog.contextvars.bind_contextvars(
         agent_run_id=agent_run_id,
@@ -107,24 +246,31 @@ async def run_agent_background(
         logger.critical(f"Failed to initialize Redis connection: {e}")
         raise e
 
-    # Idempotency check: prevent duplicate runs
-    run_lock_key = f"agent_run_lock:{agent_run_id}"
-    
-    # Try to acquire a lock for this agent run
-    lock_acquired = await redis.set(run_lock_key, instance_id, nx=True, ex=redis.REDIS_KEY_TTL)
-    
-    if not lock_acquired:
-        # Check if the run is already being handled by another instance
-        existing_instance = await redis.get(run_lock_key)
-        if existing_instance:
-            logger.info(f"Agent run {agent_run_id} is already being processed by instance {existing_instance.decode() if isinstance(existing_instance, bytes) else existing_instance}. Skipping duplicate execution.")
-            return
-        else:
-            # Lock exists but no value, try to acquire again
-            lock_acquired = await redis.set(run_lock_key, instance_id, nx=True, ex=redis.REDIS_KEY_TTL)
-            if not lock_acquired:
-                logger.info(f"Agent run {agent_run_id} is already being processed by another instance. Skipping duplicate execution.")
-                return
+    # Idempotency check: one worker holds the run's lease at a time
+    lease = RunLease(agent_run_id, WORKER_ID)
+    if not await lease.acquire():
+        existing_worker = await lease.current_owner()
+        logger.info(f"Agent run {agent_run_id} is already being processed by worker {existing_worker or 'unknown'}. Skipping duplicate execution.")
+        return
+    db_calls = metrics.start_run()
+
+    checkpoint = None
+    try:
+        checkpoint = await load_checkpoint(agent_run_id)
+        if checkpoint is None:
+            await save_run_args(agent_run_id, {
+                "agent_run_id": agent_run_id, "thread_id": thread_id, "instance_id": instance_id,
+                "project_id": project_id, "model_name": model_name, "agent_config": agent_config,
+                "request_id": request_id,
+            })
+    except Exception as e:
+        logger.warning(f"Failed to load run state for {agent_run_id}, it will not be resumable: {e}")
+
+    if on_started is not None:
+        try:
+            await on_started()
+        except Exception as e:
+            logger.warning(f"Failed to hand over admitted run {agent_run_id}: {e}")
 
     sentry.sentry.set_tag("thread_id", thread_id)
 
@@ -142,6 +288,11 @@ async def run_agent_background(
     pubsub = None
     stop_checker = None
     stop_signal_received = False
+    interrupted = False
+    # Read in the finally block, so set before anything can fail or be cancelled
+    final_status = "running"
+    error_message = None
+    pending_redis_operations = []
 
     # Define Redis keys and channels
     response_list_key = f"agent_run:{agent_run_id}:responses"
@@ -155,6 +306,10 @@ async def run_agent_background(
         if not pubsub: return
         try:
             while not stop_signal_received:
+                if lease.lost:
+                    logger.warning(f"Agent run {agent_run_id} was taken over by another worker, stopping here")
+                    stop_signal_received = True
+                    break
                 message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.5)
                 if message and message.get("type") == "message":
                     data = message.get("data")
@@ -176,6 +331,8 @@ async def run_agent_background(
             stop_signal_received = True # Stop the run if the checker fails
 
     try:
+        lease.start_heartbeat()
+
         # Setup Pub/Sub listener for control signals
         pubsub = await redis.create_pubsub()
         try:
@@ -197,13 +354,10 @@ async def run_agent_background(
             model_name=effective_model,
             agent_config=agent_config,
             trace=trace,
+            agent_run_id=agent_run_id,
+            resume_from=checkpoint,
         )
 
-        final_status = "running"
-        error_message = None
-
-        pending_redis_operations = []
-
         async for response in agent_gen:
             if stop_signal_received:
                 logger.debug(f"Agent run {agent_run_id} stopped by signal.")
@@ -212,9 +366,12 @@ async def run_agent_background(
                 break
 
             # Store response in Redis list and publish notification
+            produced = time.monotonic()
             response_json = json.dumps(response)
-            pending_redis_operations.append(asyncio.create_task(redis.rpush(response_list_key, response_json)))
-            pending_redis_operations.append(asyncio.create_task(redis.publish(response_channel, "new")))
+            stored = asyncio.create_task(redis.rpush(response_list_key, response_json))
+            published = asyncio.create_task(redis.publish(response_channel, "new"))
+            metrics.track_publish_lag(produced, stored, published)
+            pending_redis_operations += [stored, published]
             total_responses += 1
 
             # Check for agent-signaled completion or error
@@ -230,6 +387,10 @@ async def run_agent_background(
                          logger.error(f"Agent run failed: {error_message}")
                      break
 
+        if lease.lost:
+            # The worker that took over owns the status and the stream now
+            return
+
         # If loop finished without explicit completion/error/stop signal, mark as completed
         if final_status == "running":
              final_status = "completed"
@@ -256,6 +417,12 @@ async def run_agent_background(
         except Exception as e:
             logger.warning(f"Failed to publish final control signal {control_signal}: {str(e)}")
 
+    except asyncio.CancelledError:
+        # Worker shutting down: leave the run to be resumed elsewhere
+        interrupted = True
+        logger.warning(f"Agent run {agent_run_id} interrupted on instance {instance_id}, leaving it to be resumed")
+        raise
+
     except Exception as e:
         error_message = ErrorProcessor.safe_error_to_string(e)
         traceback_str = traceback.format_exc()
@@ -302,11 +469,13 @@ async def run_agent_background(
         # Set TTL on the response list in Redis
         await _cleanup_redis_response_list(agent_run_id)
 
-        # Remove the instance-specific active run key
-        await _cleanup_redis_instance_key(agent_run_id)
+        handed_over = interrupted or lease.lost
+        if not handed_over:
+            # Remove the instance-specific active run key
+            await _cleanup_redis_instance_key(agent_run_id)
 
-        # Clean up the run lock
-        await _cleanup_redis_run_lock(agent_run_id)
+        # Release the run lease; a finished run also drops its checkpoint
+        await lease.release(finished=not handed_over)
 
         # Wait for all pending redis operations to complete, with timeout
         try:
@@ -314,6 +483,7 @@ async def run_agent_background(
         except asyncio.TimeoutError:
             logger.warning(f"Timeout waiting for pending Redis operations for {agent_run_id}")
 
+        metrics.finish_run(db_calls, "interrupted" if handed_over else final_status)
         logger.debug(f"Agent run background task fully completed for: {agent_run_id} (Instance: {instance_id}) with final status: {final_status}")
 
 async def _cleanup_redis_instance_key(agent_run_id: str):
@@ -329,16 +499,6 @@ async def _cleanup_redis_instance_key(agent_run_id: str):
     except Exception as e:
         logger.warning(f"Failed to clean up Redis key {key}: {str(e)}")
 
-async def _cleanup_redis_run_lock(agent_run_id: str):
-    """Clean up the run lock Redis key for an agent run."""
-    run_lock_key = f"agent_run_lock:{agent_run_id}"
-    # logger.debug(f"Cleaning up Redis run lock key: {run_lock_key}")
-    try:
-        await redis.delete(run_lock_key)
-        # logger.debug(f"Successfully cleaned up Redis run lock key: {run_lock_key}")
-    except Exception as e:
-        logger.warning(f"Failed to clean up Redis run lock key {run_lock_key}: {str(e)}")
-
 # TTL for Redis response lists (24 hours)
 REDIS_RESPONSE_LIST_TTL = 3600 * 24
 
@@ -0,0 +1,148 @@
+BEGIN;
+
+-- ============================================================================
+-- Materialized finance balances
+-- Keeps finance_accounts.current_balance in sync with finance_transactions so
+-- the summary endpoints read balances instead of aggregating every row:
+--   - current_balance = opening_balance + INCOME - everything else
+--   - maintained by triggers inside the same transaction as the write
+--   - finance_reconcile_account_balances() verifies and repairs drift
+--   - a nightly pg_cron job runs the reconcile for every account
+-- ============================================================================
+
+ALTER TABLE finance_accounts
+    ADD COLUMN IF NOT EXISTS current_balance NUMERIC(14,2) NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS balance_reconciled_at TIMESTAMP WITH TIME ZONE;
+
+-- Summary reads filter by account and order by creation date
+CREATE INDEX IF NOT EXISTS idx_finance_accounts_account_created
+    ON finance_accounts(account_id, created_at);
+
+-- Balance updates would otherwise bump updated_at on every transaction write
+DROP TRIGGER IF EXISTS trg_finance_accounts_updated_at ON finance_accounts;
+CREATE TRIGGER trg_finance_accounts_updated_at
+    BEFORE UPDATE OF name, account_type, currency, opening_balance, color ON finance_accounts
+    FOR EACH ROW
+    EXECUTE FUNCTION public.update_updated_at_column();
+
+-- --------------------------------------------------------------------------
+-- Opening balance changes shift the materialized balance by the same delta
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.finance_apply_opening_balance()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        NEW.current_balance := COALESCE(NEW.opening_balance, 0);
+    ELSIF NEW.opening_balance IS DISTINCT FROM OLD.opening_balance THEN
+        NEW.current_balance := NEW.current_balance
+            + COALESCE(NEW.opening_balance, 0)
+            - COALESCE(OLD.opening_balance, 0);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_finance_accounts_opening_balance ON finance_accounts;
+CREATE TRIGGER trg_finance_accounts_opening_balance
+    BEFORE INSERT OR UPDATE OF opening_balance ON finance_accounts
+    FOR EACH ROW
+    EXECUTE FUNCTION public.finance_apply_opening_balance();
+
+-- --------------------------------------------------------------------------
+-- Transaction writes apply their signed amount to the owning account
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.finance_transaction_signed_amount(p_type TEXT, p_amount NUMERIC)
+RETURNS NUMERIC AS $$
+    SELECT CASE WHEN p_type = 'INCOME' THEN COALESCE(p_amount, 0) ELSE -COALESCE(p_amount, 0) END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.finance_apply_transaction_balance()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE finance_accounts
+        SET current_balance = current_balance - public.finance_transaction_signed_amount(OLD.type, OLD.amount)
+        WHERE id = OLD.finance_account_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE finance_accounts
+        SET current_balance = current_balance + public.finance_transaction_signed_amount(NEW.type, NEW.amount)
+        WHERE id = NEW.finance_account_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trg_finance_transactions_balance ON finance_transactions;
+CREATE TRIGGER trg_finance_transactions_balance
+    AFTER INSERT OR DELETE OR UPDATE OF type, amount, finance_account_id ON finance_transactions
+    FOR EACH ROW
+    EXECUTE FUNCTION public.finance_apply_transaction_balance();
+
+-- --------------------------------------------------------------------------
+-- Reconcile: recompute from transactions, repair drift, report what changed
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.finance_reconcile_account_balances(p_account_id UUID DEFAULT NULL)
+RETURNS TABLE (
+    finance_account_id UUID,
+    stored_balance NUMERIC,
+    computed_balance NUMERIC
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_account RECORD;
+    v_stored NUMERIC;
+    v_computed NUMERIC;
+BEGIN
+    FOR v_account IN
+        SELECT fa.id, fa.opening_balance
+        FROM finance_accounts fa
+        WHERE p_account_id IS NULL OR fa.account_id = p_account_id
+        ORDER BY fa.id
+    LOOP
+        -- Lock the account so concurrent trigger updates queue behind the recount
+        SELECT fa.current_balance INTO v_stored
+        FROM finance_accounts fa
+        WHERE fa.id = v_account.id
+        FOR UPDATE;
+
+        SELECT COALESCE(v_account.opening_balance, 0)
+            + COALESCE(SUM(public.finance_transaction_signed_amount(ft.type, ft.amount)), 0)
+        INTO v_computed
+        FROM finance_transactions ft
+        WHERE ft.finance_account_id = v_account.id;
+
+        IF v_stored IS DISTINCT FROM v_computed THEN
+            finance_account_id := v_account.id;
+            stored_balance := v_stored;
+            computed_balance := v_computed;
+            RETURN NEXT;
+        END IF;
+
+        UPDATE finance_accounts fa
+        SET current_balance = v_computed,
+            balance_reconciled_at = NOW()
+        WHERE fa.id = v_account.id;
+    END LOOP;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.finance_reconcile_account_balances(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.finance_reconcile_account_balances(UUID) TO service_role;
+
+-- Backfill existing accounts
+SELECT public.finance_reconcile_account_balances();
+
+-- Nightly verification
+SELECT cron.unschedule(jobid) FROM cron.job WHERE jobname = 'finance-reconcile-balances';
+SELECT cron.schedule(
+    'finance-reconcile-balances',
+    '30 3 * * *',
+    $cron$SELECT public.finance_reconcile_account_balances();$cron$
+);
+
+COMMIT;
@@ -0,0 +1,164 @@
+BEGIN;
+
+-- ============================================================================
+-- Agent tool facets
+-- Denormalizes the tool configuration of each agent's current version onto
+-- agents so the agent list can filter by tools, sort by tool count and
+-- paginate in one indexed query instead of loading every agent and version:
+--   - tools_count          MCPs + enabled AgentPress tools
+--   - has_mcp_tools        at least one configured MCP
+--   - has_agentpress_tools at least one enabled AgentPress tool
+--   - tool_names           'mcp:<name>' and 'agentpress:<tool>' entries
+--   - recomputed by triggers when current_version_id changes or the current
+--     version's config is written
+-- Agents without a current version get empty facets, including Suna default
+-- agents, whose in-code config the database cannot see.
+-- ============================================================================
+
+ALTER TABLE agents
+    ADD COLUMN IF NOT EXISTS tools_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS has_mcp_tools BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS has_agentpress_tools BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS tool_names TEXT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_agents_account_tools_count
+    ON agents(account_id, tools_count DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_agents_account_tool_flags
+    ON agents(account_id, has_mcp_tools, has_agentpress_tools);
+CREATE INDEX IF NOT EXISTS idx_agents_tool_names
+    ON agents USING gin(tool_names);
+
+-- --------------------------------------------------------------------------
+-- Facets of a version config, matching how the API reads the config:
+-- AgentPress entries are either a boolean or {"enabled": ...}
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.agent_jsonb_truthy(p_value JSONB)
+RETURNS BOOLEAN AS $$
+    SELECT CASE jsonb_typeof(p_value)
+        WHEN 'boolean' THEN p_value = 'true'::jsonb
+        WHEN 'number' THEN p_value <> '0'::jsonb
+        WHEN 'string' THEN p_value <> '""'::jsonb
+        WHEN 'array' THEN jsonb_array_length(p_value) > 0
+        WHEN 'object' THEN p_value <> '{}'::jsonb
+        ELSE FALSE
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.agent_tool_enabled(p_value JSONB)
+RETURNS BOOLEAN AS $$
+    SELECT CASE
+        WHEN jsonb_typeof(p_value) = 'object' THEN public.agent_jsonb_truthy(p_value->'enabled')
+        ELSE public.agent_jsonb_truthy(p_value)
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.agent_tool_facets(p_config JSONB)
+RETURNS TABLE (
+    tools_count INTEGER,
+    has_mcp_tools BOOLEAN,
+    has_agentpress_tools BOOLEAN,
+    tool_names TEXT[]
+)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    WITH mcps AS (
+        SELECT value
+        FROM jsonb_array_elements(CASE
+            WHEN jsonb_typeof(p_config->'tools'->'mcp') = 'array' THEN p_config->'tools'->'mcp'
+            ELSE '[]'::jsonb
+        END)
+    ),
+    agentpress AS (
+        SELECT key
+        FROM jsonb_each(CASE
+            WHEN jsonb_typeof(p_config->'tools'->'agentpress') = 'object' THEN p_config->'tools'->'agentpress'
+            ELSE '{}'::jsonb
+        END)
+        WHERE public.agent_tool_enabled(value)
+    )
+    SELECT
+        ((SELECT COUNT(*) FROM mcps) + (SELECT COUNT(*) FROM agentpress))::INTEGER,
+        EXISTS (SELECT 1 FROM mcps),
+        EXISTS (SELECT 1 FROM agentpress),
+        ARRAY(
+            SELECT 'mcp:' || (value->>'name') FROM mcps
+            WHERE jsonb_typeof(value) = 'object' AND value->>'name' IS NOT NULL
+            UNION
+            SELECT 'agentpress:' || key FROM agentpress
+        );
+$$;
+
+-- --------------------------------------------------------------------------
+-- Activating a version (or creating an agent) recomputes the agent's facets
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.agents_apply_tool_facets()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_config JSONB;
+BEGIN
+    SELECT av.config INTO v_config
+    FROM agent_versions av
+    WHERE av.version_id = NEW.current_version_id;
+
+    SELECT f.tools_count, f.has_mcp_tools, f.has_agentpress_tools, f.tool_names
+    INTO NEW.tools_count, NEW.has_mcp_tools, NEW.has_agentpress_tools, NEW.tool_names
+    FROM public.agent_tool_facets(v_config) f;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_agents_tool_facets ON agents;
+CREATE TRIGGER trg_agents_tool_facets
+    BEFORE INSERT OR UPDATE OF current_version_id ON agents
+    FOR EACH ROW
+    EXECUTE FUNCTION public.agents_apply_tool_facets();
+
+-- --------------------------------------------------------------------------
+-- Writing the config of an agent's current version refreshes its facets
+-- (covers versions inserted after current_version_id was pointed at them)
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.agent_versions_apply_tool_facets()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    UPDATE agents a
+    SET tools_count = f.tools_count,
+        has_mcp_tools = f.has_mcp_tools,
+        has_agentpress_tools = f.has_agentpress_tools,
+        tool_names = f.tool_names
+    FROM public.agent_tool_facets(NEW.config) f
+    WHERE a.agent_id = NEW.agent_id
+      AND a.current_version_id = NEW.version_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_agent_versions_tool_facets ON agent_versions;
+CREATE TRIGGER trg_agent_versions_tool_facets
+    AFTER INSERT OR UPDATE OF config ON agent_versions
+    FOR EACH ROW
+    EXECUTE FUNCTION public.agent_versions_apply_tool_facets();
+
+-- Backfill without touching updated_at, which the agent list sorts by
+ALTER TABLE agents DISABLE TRIGGER trigger_agents_updated_at;
+
+UPDATE agents a
+SET tools_count = f.tools_count,
+    has_mcp_tools = f.has_mcp_tools,
+    has_agentpress_tools = f.has_agentpress_tools,
+    tool_names = f.tool_names
+FROM agent_versions av,
+     LATERAL public.agent_tool_facets(av.config) f
+WHERE av.version_id = a.current_version_id;
+
+ALTER TABLE agents ENABLE TRIGGER trigger_agents_updated_at;
+
+COMMIT;
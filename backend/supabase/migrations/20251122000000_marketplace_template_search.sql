@@ -0,0 +1,200 @@
+BEGIN;
+
+-- ============================================================================
+-- Marketplace template search
+-- Replaces the unindexed name ILIKE + OFFSET + separate COUNT used by the
+-- marketplace with one indexed call:
+--   - search_vector          name (A), tags (B) and description (C), kept
+--                            up to date by a trigger
+--   - trigram index on name  substring matches for partial words ("slac")
+--   - partial sort indexes   keyset pagination over public templates
+--   - search_marketplace_templates() returns a page (optionally ranked by
+--     relevance) and the total in a single round trip
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE agent_templates
+    ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+-- Keyset comparisons skip rows with NULL sort keys
+UPDATE agent_templates SET download_count = 0 WHERE download_count IS NULL;
+ALTER TABLE agent_templates
+    ALTER COLUMN download_count SET DEFAULT 0,
+    ALTER COLUMN download_count SET NOT NULL;
+
+-- --------------------------------------------------------------------------
+-- Search vector
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.agent_templates_build_search_vector(
+    p_name TEXT,
+    p_description TEXT,
+    p_tags TEXT[]
+)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', COALESCE(p_name, '')), 'A')
+        || setweight(to_tsvector('simple', COALESCE(array_to_string(p_tags, ' '), '')), 'B')
+        || setweight(to_tsvector('simple', COALESCE(p_description, '')), 'C');
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION public.agent_templates_apply_search_vector()
+RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := public.agent_templates_build_search_vector(NEW.name, NEW.description, NEW.tags);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_agent_templates_search_vector ON agent_templates;
+CREATE TRIGGER trg_agent_templates_search_vector
+    BEFORE INSERT OR UPDATE OF name, description, tags ON agent_templates
+    FOR EACH ROW
+    EXECUTE FUNCTION public.agent_templates_apply_search_vector();
+
+UPDATE agent_templates
+SET search_vector = public.agent_templates_build_search_vector(name, description, tags);
+
+-- --------------------------------------------------------------------------
+-- Indexes (public templates only, which is all the marketplace reads)
+-- --------------------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_agent_templates_public_search
+    ON agent_templates USING gin(search_vector) WHERE is_public;
+CREATE INDEX IF NOT EXISTS idx_agent_templates_public_name_trgm
+    ON agent_templates USING gin(name gin_trgm_ops) WHERE is_public;
+CREATE INDEX IF NOT EXISTS idx_agent_templates_public_downloads
+    ON agent_templates(download_count DESC, (COALESCE(marketplace_published_at, created_at)) DESC, template_id DESC)
+    WHERE is_public;
+CREATE INDEX IF NOT EXISTS idx_agent_templates_public_newest
+    ON agent_templates((COALESCE(marketplace_published_at, created_at)) DESC, template_id DESC)
+    WHERE is_public;
+CREATE INDEX IF NOT EXISTS idx_agent_templates_public_name
+    ON agent_templates(name, template_id)
+    WHERE is_public;
+
+-- --------------------------------------------------------------------------
+-- One page of public templates.
+--   p_sort_by     download_count | newest | name | relevance (needs p_search)
+--   p_after       sort_key of the last row of the previous page (keyset);
+--                 p_offset is used when it is NULL
+--   p_with_total  also count every match (skipped on keyset pages, whose
+--                 total the caller already knows)
+-- Returns {"templates": [row + sort_key, ...], "total": n | null}
+-- --------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.search_marketplace_templates(
+    p_search TEXT DEFAULT NULL,
+    p_tags TEXT[] DEFAULT NULL,
+    p_is_kortix_team BOOLEAN DEFAULT NULL,
+    p_creator_id UUID DEFAULT NULL,
+    p_sort_by TEXT DEFAULT 'download_count',
+    p_sort_desc BOOLEAN DEFAULT TRUE,
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0,
+    p_after TEXT[] DEFAULT NULL,
+    p_with_total BOOLEAN DEFAULT TRUE
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_search TEXT := NULLIF(btrim(p_search), '');
+    v_query tsquery;
+    v_pattern TEXT;
+    v_where TEXT := 't.is_public';
+    v_sort_by TEXT := p_sort_by;
+    v_desc BOOLEAN := p_sort_desc;
+    v_keys TEXT[];
+    v_types TEXT[];
+    v_order TEXT;
+    v_page_order TEXT;
+    v_columns TEXT;
+    v_keyset TEXT;
+    v_templates JSONB;
+    v_total BIGINT;
+BEGIN
+    IF v_search IS NOT NULL THEN
+        v_query := websearch_to_tsquery('simple', v_search);
+        v_pattern := '%' || replace(replace(replace(v_search, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+        v_where := v_where || ' AND (t.search_vector @@ $1 OR t.name ILIKE $2)';
+    END IF;
+    IF cardinality(p_tags) > 0 THEN
+        v_where := v_where || ' AND t.tags @> $3';
+    END IF;
+    IF p_is_kortix_team IS NOT NULL THEN
+        v_where := v_where || ' AND t.is_kortix_team = $4';
+    END IF;
+    IF p_creator_id IS NOT NULL THEN
+        v_where := v_where || ' AND t.creator_id = $5';
+    END IF;
+
+    IF v_sort_by = 'relevance' AND v_search IS NULL THEN
+        v_sort_by := 'download_count';
+    END IF;
+
+    CASE v_sort_by
+        WHEN 'relevance' THEN
+            v_keys := ARRAY['ts_rank_cd(t.search_vector, $1)', 't.template_id'];
+            v_types := ARRAY['real', 'uuid'];
+            v_desc := TRUE;
+        WHEN 'newest' THEN
+            v_keys := ARRAY['COALESCE(t.marketplace_published_at, t.created_at)', 't.template_id'];
+            v_types := ARRAY['timestamptz', 'uuid'];
+            v_desc := TRUE;
+        WHEN 'name' THEN
+            v_keys := ARRAY['t.name::text', 't.template_id'];
+            v_types := ARRAY['text', 'uuid'];
+        ELSE
+            v_keys := ARRAY['t.download_count', 'COALESCE(t.marketplace_published_at, t.created_at)', 't.template_id'];
+            v_types := ARRAY['integer', 'timestamptz', 'uuid'];
+    END CASE;
+
+    SELECT string_agg(k || CASE WHEN v_desc THEN ' DESC' ELSE ' ASC' END, ', ' ORDER BY i),
+           string_agg(format('page.k%s', i) || CASE WHEN v_desc THEN ' DESC' ELSE ' ASC' END, ', ' ORDER BY i),
+           string_agg(format('%s AS k%s', k, i), ', ' ORDER BY i)
+    INTO v_order, v_page_order, v_columns
+    FROM unnest(v_keys) WITH ORDINALITY AS u(k, i);
+
+    v_keyset := '';
+    IF p_after IS NOT NULL THEN
+        SELECT format(' AND (%s) %s (%s)',
+                      string_agg(k, ', ' ORDER BY i),
+                      CASE WHEN v_desc THEN '<' ELSE '>' END,
+                      string_agg(format('$6[%s]::%s', i, v_types[i]), ', ' ORDER BY i))
+        INTO v_keyset
+        FROM unnest(v_keys) WITH ORDINALITY AS u(k, i);
+    END IF;
+
+    -- The subquery's ORDER BY picks the page; the aggregate orders it again
+    -- because jsonb_agg is not guaranteed to keep the subquery's row order
+    EXECUTE format(
+        'SELECT COALESCE(jsonb_agg(page.item ORDER BY %s), ''[]''::jsonb) FROM ('
+        '    SELECT (to_jsonb(t) - ''search_vector'') || jsonb_build_object(''sort_key'', ARRAY[%s]::text[]) AS item, %s'
+        '    FROM agent_templates t'
+        '    WHERE %s%s'
+        '    ORDER BY %s'
+        '    LIMIT $7 OFFSET $8'
+        ') page',
+        v_page_order,
+        (SELECT string_agg(k || '::text', ', ') FROM unnest(v_keys) AS k),
+        v_columns, v_where, v_keyset, v_order
+    )
+    INTO v_templates
+    USING v_query, v_pattern, p_tags, p_is_kortix_team, p_creator_id, p_after, p_limit,
+          CASE WHEN p_after IS NULL THEN COALESCE(p_offset, 0) ELSE 0 END;
+
+    IF p_with_total THEN
+        EXECUTE format('SELECT count(*) FROM agent_templates t WHERE %s', v_where)
+        INTO v_total
+        USING v_query, v_pattern, p_tags, p_is_kortix_team, p_creator_id;
+    END IF;
+
+    RETURN jsonb_build_object('templates', v_templates, 'total', v_total);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.search_marketplace_templates(TEXT, TEXT[], BOOLEAN, UUID, TEXT, BOOLEAN, INTEGER, INTEGER, TEXT[], BOOLEAN)
+    TO anon, authenticated, service_role;
+
+ANALYZE agent_templates;
+
+COMMIT;
@@ -1,6 +1,183 @@
+import asyncio
+import socket
 import sys
+import time
 from pathlib import Path
 
+import pytest
+import uvicorn
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
-    sys.path.insert(0, str(ROOT))
\ No newline at end of file
+    sys.path.insert(0, str(ROOT))
+
+
+class LocalServer:
+    """Serves an ASGI app with uvicorn on a free local port inside the test loop."""
+
+    def __init__(self, app):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="error"))
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.should_exit = True
+        await self.task
+
+
+class FakeRedis:
+    """The subset of redis-py (and of core.services.redis) the tests need, in
+    memory. Expiry is checked against `clock`, so tests can move time."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.values, self.lists, self.hashes, self.zsets = {}, {}, {}, {}
+        self.expires, self.published = {}, []
+
+    async def get_client(self):
+        return self
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def _live(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= self.clock():
+            self.values.pop(key, None)
+            del self.expires[key]
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and self._live(key) is not None:
+            return None
+        self.values[key] = value
+        self.expires.pop(key, None)
+        if ex or px:
+            self.expires[key] = self.clock() + (ex or px / 1000)
+        return True
+
+    async def get(self, key, default=None):
+        value = self._live(key)
+        return value if value is not None else default
+
+    async def mget(self, keys):
+        return [self._live(key) for key in keys]
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+    async def expire(self, key, seconds):
+        if self._live(key) is not None:
+            self.expires[key] = self.clock() + seconds
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    async def lpush(self, key, *values):
+        for value in values:
+            self.lists.setdefault(key, []).insert(0, value)
+
+    async def lpop(self, key):
+        items = self.lists.get(key)
+        return items.pop(0) if items else None
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:end + 1]
+
+    async def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hincrby(self, key, field, amount):
+        table = self.hashes.setdefault(key, {})
+        table[field] = str(int(table.get(field, 0)) + amount)
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    async def zrem(self, key, member):
+        return 1 if self.zsets.get(key, {}).pop(member, None) is not None else 0
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    async def zrange(self, key, start, end, withscores=False):
+        items = sorted((s, m) for m, s in self.zsets.get(key, {}).items())
+        items = items[start:] if end == -1 else items[start:end + 1]
+        return [(m, s) for s, m in items] if withscores else [m for _, m in items]
+
+    async def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = sorted((s, m) for m, s in self.zsets.get(key, {}).items() if float(low) <= s <= float(high))
+        return [m for _, m in members][start:start + num if num else None]
+
+    async def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, s in zset.items() if float(low) <= s <= float(high)]:
+            del zset[member]
+
+    async def zpopmin(self, key, count=1):
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda kv: kv[1])[:count]
+        for member, _ in members:
+            del self.zsets[key][member]
+        return members
+
+
+class FakePipeline:
+    """Queues FakeRedis commands and runs them in order on execute()."""
+
+    def __init__(self, redis):
+        self.redis, self.commands = redis, []
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """A FakeRedis behind core.services.redis.get_client."""
+    from core.services import redis
+
+    fake = FakeRedis()
+    monkeypatch.setattr(redis, "get_client", fake.get_client)
+    return fake
@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks.agent_loop_replay import MemoryRedis, load_recording, replay, run
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_recordings_replay_through_the_agent_loop():
+    recordings = [load_recording(name) for name in ("landing_page", "landing_page_native", "quick_answer")]
+
+    report = await run(recordings, repeat=1, time_scale=0)
+
+    for recording in recordings:
+        result = report["recordings"][recording["name"]]
+        # Every recorded turn is one LLM call, ending on `complete` (or a reply without tool calls)
+        assert result["errors"] == [] and result["llm_calls"] == result["turns"] == len(recording["turns"])
+        assert result["prompt_messages"] == [2 * n for n in range(1, result["llm_calls"] + 1)]
+        assert result["db_round_trips"]["by_operation"]["messages.insert"] == result["messages_saved"]
+        assert result["ttft_ms"] > 0 and result["iteration_overhead_ms"] > 0
+    # XML and native tool calls run the same tools against the sandbox
+    xml, native = report["recordings"]["landing_page"], report["recordings"]["landing_page_native"]
+    assert xml["sandbox_ops"] == native["sandbox_ops"] and xml["sandbox_ops"]["by_operation"]["upload_file"] == 2
+    assert report["recordings"]["quick_answer"]["sandbox_ops"]["total"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_replay_follows_recorded_timing_and_reports_missing_turns():
+    recording = load_recording("quick_answer")
+    first_offset = recording["turns"][0]["chunks"][0][0]
+
+    result = await replay(recording, MemoryRedis(), time_scale=0.1)
+    assert result["ttft_ms"] >= first_offset * 0.1
+    assert result["wall_ms"] >= recording["turns"][0]["chunks"][-1][0] * 0.1
+
+    # The loop asks for a third LLM call the recording does not have
+    truncated = dict(load_recording("landing_page"))
+    truncated["turns"] = truncated["turns"][:2]
+    result = await replay(truncated, MemoryRedis(), time_scale=0)
+    assert result["llm_calls"] == 2 and result["errors"]
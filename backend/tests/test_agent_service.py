@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core.agent_service import AgentFilters, AgentService
+from core.utils.pagination import PaginationParams
+
+
+class FakeQuery:
+    """Records a PostgREST query and evaluates it over in-memory rows."""
+
+    def __init__(self, db, table):
+        self.db, self.table = db, table
+        self.filters, self.orders = [], []
+        self.count = None
+        self.window = None
+        db.queries.append(self)
+
+    def select(self, columns, count=None):
+        self.count = count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(("eq", column, value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(("in", column, list(values)))
+        return self
+
+    def ov(self, column, value):
+        self.filters.append(("ov", column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        return self
+
+    def _matches(self, row, op, column, value):
+        if op == "eq":
+            return row.get(column) == value
+        if op == "in":
+            return row.get(column) in value
+        wanted = {v.strip('"') for v in value.strip("{}").split('","')}
+        return bool(wanted & set(row.get(column) or []))
+
+    async def execute(self):
+        rows = [r for r in self.db.tables[self.table] if all(self._matches(r, *f) for f in self.filters)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda r: r[column], reverse=desc)
+        total = len(rows)
+        if self.window:
+            rows = rows[self.window[0]:self.window[1] + 1]
+        return SimpleNamespace(data=rows, count=total if self.count else None)
+
+
+class FakeDB:
+    def __init__(self, agents, versions):
+        self.tables = {"agents": agents, "agent_versions": versions}
+        self.queries = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def _agent(n, tools):
+    return {
+        "agent_id": f"agent-{n}", "account_id": "acct", "name": f"Agent {n}", "created_at": f"2025-01-{n + 1:02d}",
+        "current_version_id": f"version-{n}", "metadata": {},
+        "tools_count": len(tools), "has_mcp_tools": any(t.startswith("mcp:") for t in tools),
+        "has_agentpress_tools": any(t.startswith("agentpress:") for t in tools), "tool_names": tools,
+    }
+
+
+def _version(n, tools):
+    return {
+        "version_id": f"version-{n}", "agent_id": f"agent-{n}", "version_number": 1, "version_name": "v1",
+        "config": {"tools": {
+            "mcp": [{"name": t[4:]} for t in tools if t.startswith("mcp:")],
+            "agentpress": {t[11:]: True for t in tools if t.startswith("agentpress:")},
+        }},
+    }
+
+
+@pytest.fixture
+def db():
+    tool_sets = [
+        ["agentpress:web_search"],
+        ["mcp:Google Drive, Docs", "agentpress:web_search", "agentpress:sb_files_tool"],
+        [],
+        ["mcp:Slack"],
+        ["agentpress:web_search", "agentpress:browser_tool"],
+    ]
+    return FakeDB([_agent(n, t) for n, t in enumerate(tool_sets)], [_version(n, t) for n, t in enumerate(tool_sets)])
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_tool_filters_sort_and_page_in_one_agents_query(db):
+    service = AgentService(db)
+    result = await service.get_agents_paginated(
+        "acct", PaginationParams(page=1, page_size=2),
+        AgentFilters(tools=["agentpress:web_search", "mcp:Google Drive, Docs"], sort_by="tools_count"),
+    )
+
+    assert [a["agent_id"] for a in result.data] == ["agent-1", "agent-4"]
+    assert result.pagination.total_items == 3 and result.pagination.total_pages == 2
+    assert result.pagination.has_next and not result.pagination.has_previous
+    # Configs come from the page's versions only
+    assert sorted(result.data[0]["agentpress_tools"]) == ["sb_files_tool", "web_search"]
+
+    agent_queries = [q for q in db.queries if q.table == "agents"]
+    version_queries = [q for q in db.queries if q.table == "agent_versions"]
+    assert len(agent_queries) == 1 and agent_queries[0].window == (0, 1)
+    assert agent_queries[0].filters[-1] == ("ov", "tool_names", '{"agentpress:web_search","mcp:Google Drive, Docs"}')
+    (op, column, version_ids), = version_queries[0].filters
+    assert (op, column, sorted(version_ids)) == ("in", "version_id", ["version-1", "version-4"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_boolean_tool_facets_filter_on_columns(db):
+    service = AgentService(db)
+    result = await service.get_agents_paginated(
+        "acct", PaginationParams(page=1, page_size=10),
+        AgentFilters(has_mcp_tools=True, has_agentpress_tools=False, sort_order="asc"),
+    )
+
+    assert [a["agent_id"] for a in result.data] == ["agent-3"]
+    assert ("eq", "has_mcp_tools", True) in db.queries[0].filters
+    assert db.queries[0].orders == [("created_at", False)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_boolean_agentpress_entries_count_as_enabled(db):
+    service = AgentService(db)
+    result = await service.get_agents_paginated(
+        "acct", PaginationParams(page=1, page_size=10), AgentFilters(has_agentpress_tools=True),
+    )
+
+    # Versions store the entries as booleans: the facets count them, as the
+    # loader reads them
+    assert sorted(a["agent_id"] for a in result.data) == ["agent-0", "agent-1", "agent-4"]
+    assert all(tool["enabled"] for a in result.data for tool in a["agentpress_tools"].values())
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_unversioned_suna_default_filters_on_stored_facets(db):
+    suna = {**_agent(9, []), "current_version_id": None, "metadata": {"is_suna_default": True}}
+    db.tables["agents"].append(suna)
+    service = AgentService(db)
+
+    # Listed with the in-code Suna tools, which are not in the facets the
+    # filter runs on
+    result = await service.get_agents_paginated(
+        "acct", PaginationParams(page=1, page_size=10), AgentFilters(has_agentpress_tools=False),
+    )
+    (listed_suna,) = [a for a in result.data if a["agent_id"] == "agent-9"]
+    assert any(tool["enabled"] for tool in listed_suna["agentpress_tools"].values())
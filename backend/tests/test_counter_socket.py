@@ -0,0 +1,234 @@
+import asyncio
+import json
+import time
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis_asyncio
+import websockets
+from fastapi import FastAPI, WebSocket
+
+import core.websocket.counter_socket as counter_socket
+from core.websocket.counter_socket import COUNTER_CHANNEL_PREFIX, ConnectionManager, handle_counter_websocket
+from conftest import LocalServer
+
+FLUSH_INTERVAL = 0.1
+
+
+def _resp(value) -> bytes:
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, list):
+        return f"*{len(value)}\r\n".encode() + b"".join(_resp(v) for v in value)
+    data = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+class LocalRedis:
+    """A local Redis server speaking just enough RESP for pub/sub (PUBLISH, (UN)SUBSCRIBE, PING)."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.published = 0
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        for writer in list(self.subscriptions):
+            writer.close()
+
+    def channels(self):
+        return sorted(channel for channels in self.subscriptions.values() for channel in channels)
+
+    @staticmethod
+    async def _read_command(reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2].decode())
+        return args
+
+    async def _handle(self, reader, writer):
+        channels = self.subscriptions[writer] = set()
+        try:
+            while (command := await self._read_command(reader)) is not None:
+                name = command[0].upper()
+                if name == "PUBLISH":
+                    self.published += 1
+                    receivers = [w for w, subscribed in self.subscriptions.items() if command[1] in subscribed]
+                    for receiver in receivers:
+                        receiver.write(_resp(["message", command[1], command[2]]))
+                    writer.write(_resp(len(receivers)))
+                elif name == "SUBSCRIBE":
+                    for channel in command[1:]:
+                        channels.add(channel)
+                        writer.write(_resp(["subscribe", channel, len(channels)]))
+                elif name == "UNSUBSCRIBE":
+                    for channel in command[1:] or list(channels):
+                        channels.discard(channel)
+                        writer.write(_resp(["unsubscribe", channel, len(channels)]))
+                elif name == "PING":
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.subscriptions[writer]
+            writer.close()
+
+
+class AppInstance(LocalServer):
+    """One API instance: its own ConnectionManager behind the counter websocket, served by uvicorn."""
+
+    def __init__(self):
+        self.manager = ConnectionManager(flush_interval=FLUSH_INTERVAL)
+        app = FastAPI()
+
+        @app.websocket("/ws/counters/{session_id}")
+        async def counters(websocket: WebSocket, session_id: str):
+            await handle_counter_websocket(websocket, session_id, self.manager)
+
+        super().__init__(app)
+
+    def counters_url(self, session_id):
+        return f"ws://127.0.0.1:{self.port}/ws/counters/{session_id}"
+
+    async def __aexit__(self, *exc):
+        await self.manager.close()
+        await super().__aexit__(*exc)
+
+
+class Receiver:
+    """Collects (arrival time, message) frames from a websocket."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.frames = []
+        self.task = asyncio.create_task(self._receive())
+
+    async def _receive(self):
+        async for frame in self.websocket:
+            self.frames.append((time.perf_counter(), json.loads(frame)))
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline
+        await asyncio.sleep(0.01)
+
+
+def _update(session_id, used):
+    return {"type": "context_update", "session_id": session_id,
+            "data": {"used": used, "total": 1000, "percentage": used / 10}, "timestamp": time.time()}
+
+
+@pytest_asyncio.fixture
+async def shared_redis(monkeypatch):
+    async with LocalRedis() as server:
+        client = redis_asyncio.Redis(host="127.0.0.1", port=server.port, decode_responses=True)
+
+        async def get_client():
+            return client
+
+        monkeypatch.setattr(counter_socket.redis, "get_client", get_client)
+        yield server
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_updates_reach_sessions_on_other_instances_coalesced(shared_redis):
+    async with AppInstance() as a, AppInstance() as b:
+        async with websockets.connect(a.counters_url("s1")) as on_a, websockets.connect(b.counters_url("s1")) as on_b, \
+                websockets.connect(b.counters_url("s2")) as other:
+            # Each instance subscribes only for its connected sessions
+            await _wait_for(lambda: shared_redis.channels() == sorted(
+                [f"{COUNTER_CHANNEL_PREFIX}s1", f"{COUNTER_CHANNEL_PREFIX}s1", f"{COUNTER_CHANNEL_PREFIX}s2"]))
+            receivers = [Receiver(on_a), Receiver(on_b), Receiver(other)]
+
+            # A burst of 50 updates over 250ms, published from instance A
+            started = time.perf_counter()
+            for used in range(50):
+                await a.manager.publish(_update("s1", used), "s1")
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(3 * FLUSH_INTERVAL)
+            elapsed = time.perf_counter() - started
+
+            for receiver in receivers[:2]:
+                times = [t for t, _ in receiver.frames]
+                used = [m["data"]["used"] for _, m in receiver.frames]
+                assert 2 <= len(used) <= elapsed / FLUSH_INTERVAL + 1
+                # Latest value delivered, in order, at most one frame per interval
+                assert used[0] == 0 and used[-1] == 49 and used == sorted(used)
+                assert all(later - earlier >= FLUSH_INTERVAL * 0.9 for earlier, later in zip(times, times[1:]))
+            assert receivers[2].frames == []
+            assert shared_redis.published == 50
+
+        # Last sockets gone: subscriptions dropped
+        await _wait_for(lambda: shared_redis.channels() == [])
+        assert not a.manager.active_connections and not b.manager._pending
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_local_delivery_when_redis_unavailable(monkeypatch):
+    async def unavailable():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(counter_socket.redis, "get_client", unavailable)
+    async with AppInstance() as instance:
+        async with websockets.connect(instance.counters_url("s1")) as websocket:
+            receiver = Receiver(websocket)
+            await _wait_for(lambda: "s1" in instance.manager.active_connections)
+            await instance.manager.publish(_update("s1", 1), "s1")
+            await instance.manager.publish({"type": "token_count", "session_id": "s1", "data": {"count": 3}}, "s1")
+            await instance.manager.publish(_update("s1", 2), "s1")
+            await _wait_for(lambda: len(receiver.frames) == 2)
+
+    # Both message types kept, the newer context update replacing the older
+    # one, and sent together rather than an interval apart
+    assert [m["type"] for _, m in receiver.frames] == ["context_update", "token_count"]
+    assert receiver.frames[0][1]["data"]["used"] == 2
+    assert receiver.frames[1][0] - receiver.frames[0][0] < FLUSH_INTERVAL / 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_subscription_retried_after_redis_errors(shared_redis, monkeypatch):
+    monkeypatch.setattr(counter_socket, "RECONNECT_DELAY", 0.05)
+    create_pubsub = counter_socket.redis.create_pubsub
+    failures = [ConnectionError("redis not ready")]
+
+    async def flaky_create_pubsub():
+        if failures:
+            raise failures.pop()
+        return await create_pubsub()
+
+    monkeypatch.setattr(counter_socket.redis, "create_pubsub", flaky_create_pubsub)
+    async with AppInstance() as instance:
+        async with websockets.connect(instance.counters_url("s1")) as websocket:
+            receiver = Receiver(websocket)
+            # The first subscribe failed and is retried
+            await _wait_for(lambda: shared_redis.channels() == [f"{COUNTER_CHANNEL_PREFIX}s1"])
+            await instance.manager.publish(_update("s1", 1), "s1")
+            await _wait_for(lambda: len(receiver.frames) == 1)
+
+            # The connection drops: the listener reconnects and resubscribes
+            for writer in list(shared_redis.subscriptions):
+                if shared_redis.subscriptions[writer]:
+                    writer.close()
+            await _wait_for(lambda: shared_redis.channels() == [])
+            await _wait_for(lambda: shared_redis.channels() == [f"{COUNTER_CHANNEL_PREFIX}s1"])
+            await instance.manager.publish(_update("s1", 2), "s1")
+            await _wait_for(lambda: len(receiver.frames) == 2)
+    assert receiver.frames[-1][1]["data"]["used"] == 2
@@ -0,0 +1,82 @@
+import asyncio
+import io
+import time
+
+import pytest
+
+from core.services.document_extraction import DocumentExtractionService, ExtractionTimeout
+
+
+def _make_pdf(pages: int) -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for i in range(pages):
+        pdf.drawString(72, 720, f"Page {i + 1} marker")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _spin(seconds: float) -> str:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+    return "done"
+
+
+@pytest.fixture
+def service():
+    svc = DocumentExtractionService(max_workers=1, time_limit=10, pdf_batch_pages=4)
+    yield svc
+    svc.shutdown()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_pdf_pages_stream_in_order(service):
+    pages = [page async for page in service.iter_pdf_pages(_make_pdf(10))]
+    assert len(pages) == 10
+    assert "Page 1 marker" in pages[0]
+    assert "Page 10 marker" in pages[-1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_pdf_extraction_stops_at_max_chars(service):
+    text = await service.extract_text(_make_pdf(30), "big.pdf", "application/pdf", max_chars=40)
+    assert len(text) == 40
+    assert text.startswith("Page 1 marker")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_text_and_binary_fallbacks(service):
+    text = "Relatório de operação, versão três.\n" * 50
+    assert await service.extract_text(text.encode("utf-8"), "notes.txt", "text/plain") == text
+    binary = await service.extract_text(bytes(range(256)) * 8, "blob.bin", "application/octet-stream")
+    assert binary.startswith("[Binary file: blob.bin]")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_job_time_limit_and_loop_stays_responsive(service):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    tick_task = asyncio.create_task(ticker())
+    try:
+        with pytest.raises(ExtractionTimeout):
+            await service.run(_spin, 5, time_limit=0.5)
+    finally:
+        tick_task.cancel()
+    assert ticks > 10
+
+    # The worker survives a soft timeout and keeps serving jobs
+    assert await service.run(_spin, 0) == "done"
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import core.google.drive_upload_executor as executor_module
+from core.google.drive_upload_executor import DriveUploadExecutor
+
+CHUNK = 256 * 1024
+CHUNK_DELAY = 0.1
+MAX_LOOP_STALL_MS = 50
+
+
+class ResumableDriveStub(ThreadingHTTPServer):
+    """Emulates Drive's resumable upload protocol (initiate, PUT chunks, 308/200)."""
+
+    def __init__(self, fail_chunks=()):
+        super().__init__(("127.0.0.1", 0), _DriveHandler)
+        self.fail_chunks = set(fail_chunks)
+        self.sessions = {}
+        self.puts = []
+        self.status_queries = 0
+        self.auth_headers = set()
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _DriveHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        assert self.path.startswith("/upload/drive/v3/files?") and "uploadType=resumable" in self.path
+        self.server.auth_headers.add(self.headers["Authorization"])
+        session = f"session-{len(self.server.sessions)}"
+        self.server.sessions[session] = {"metadata": json.loads(self._body()), "data": b""}
+        self._reply(200, headers={"Location": f"{self.server.url}upload/{session}"})
+
+    def do_PUT(self):
+        session = self.server.sessions[self.path.rsplit("/", 1)[1]]
+        chunk = self._body()
+        if self.headers["Content-Range"].startswith("bytes */"):
+            # Status query after a failure: report what has been received
+            self.server.status_queries += 1
+            received = len(session["data"])
+            return self._reply(308, headers={"Range": f"bytes=0-{received - 1}"} if received else None)
+        start, end, total = map(int, re.match(r"bytes (\d+)-(\d+)/(\d+)", self.headers["Content-Range"]).groups())
+        index = start // CHUNK
+        self.server.puts.append(index)
+        time.sleep(CHUNK_DELAY)
+        if index in self.server.fail_chunks:
+            self.server.fail_chunks.discard(index)
+            return self._reply(503, {"error": {"code": 503, "message": "backend error"}})
+        assert start == len(session["data"])
+        session["data"] += chunk
+        if end + 1 < total:
+            return self._reply(308, headers={"Range": f"bytes=0-{end}"})
+        metadata = session["metadata"]
+        self._reply(200, {"id": "file-1", "name": metadata["name"], "mimeType": metadata["mimeType"],
+                          "webViewLink": "https://docs.google.com/presentation/d/file-1/edit"})
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.max_stall_ms = 0.0
+
+    async def _tick(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            self.max_stall_ms = max(self.max_stall_ms, (time.perf_counter() - started - 0.005) * 1000)
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self._tick())
+        return self
+
+    async def __aexit__(self, *exc):
+        self.task.cancel()
+
+
+@pytest.fixture
+def deck(tmp_path):
+    path = tmp_path / "deck.pptx"
+    path.write_bytes(bytes(range(256)) * (4 * CHUNK // 256) + b"tail")
+    return path
+
+
+def _credentials(token="token-1", refresh_token="refresh-1"):
+    return Credentials(token=token, refresh_token=refresh_token, client_id="client", client_secret="secret")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_resumable_upload_retries_failed_chunk_off_the_loop(deck):
+    progress = []
+    with ResumableDriveStub(fail_chunks={2}) as stub:
+        executor = DriveUploadExecutor(chunk_size=CHUNK, retry_backoff=0, root_url=stub.url)
+        async with LoopMonitor() as monitor:
+            result = await executor.upload_file(
+                _credentials(), deck, {"name": "Deck", "mimeType": "application/vnd.google-apps.presentation"},
+                mimetype="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                on_progress=lambda done, total: progress.append((done, total)),
+            )
+
+    assert result["id"] == "file-1" and result["name"] == "Deck"
+    assert stub.sessions["session-0"]["data"] == deck.read_bytes()
+    # Only the failed chunk was sent again, no new upload session
+    assert stub.puts == [0, 1, 2, 2, 3, 4] and stub.status_queries == 1 and len(stub.sessions) == 1
+    size = deck.stat().st_size
+    assert progress == [(CHUNK * i, size) for i in range(1, 5)] + [(size, size)]
+    assert stub.auth_headers == {"Bearer token-1"}
+    # Six chunk round trips of CHUNK_DELAY each never held up the loop
+    assert monitor.max_stall_ms < MAX_LOOP_STALL_MS
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_discovery_parsed_once_and_service_cached_per_grant(deck, monkeypatch):
+    builds = []
+    original = executor_module.build_from_document
+
+    def counting_build(document, **kwargs):
+        builds.append(kwargs["credentials"].refresh_token)
+        return original(document, **kwargs)
+
+    monkeypatch.setattr(executor_module, "build_from_document", counting_build)
+    with ResumableDriveStub() as stub:
+        executor = DriveUploadExecutor(chunk_size=CHUNK, root_url=stub.url)
+        metadata = {"name": "Deck", "mimeType": "application/vnd.google-apps.presentation"}
+        await asyncio.gather(*(
+            executor.upload_file(_credentials(token, refresh), deck, metadata, mimetype="application/octet-stream")
+            for token, refresh in (("token-1", "refresh-1"), ("token-1", "refresh-1"), ("other", "refresh-2"))
+        ))
+        # The same grant after an access token refresh
+        await executor.upload_file(_credentials("token-2"), deck, metadata, mimetype="application/octet-stream")
+
+    assert sorted(set(builds)) == ["refresh-1", "refresh-2"]
+    assert builds.count("refresh-2") == 1 and len(executor._services) == 2
+    # Uploads with the cached service authorize with the caller's current token
+    assert stub.auth_headers == {"Bearer token-1", "Bearer other", "Bearer token-2"}
+    assert all(s["data"] == deck.read_bytes() for s in stub.sessions.values()) and len(stub.sessions) == 4
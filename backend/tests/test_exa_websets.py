@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from exa_py.websets.types import CreateEnrichmentParameters, CreateWebsetParameters, WebsetStatus
+
+from core.tools.people_search_tool import PeopleSearchTool
+from core.tools.utils.exa_websets import WebsetPoller, WebsetSearchError, WebsetSearches
+
+# A webset becomes idle this long after it is created
+COMPLETION_DELAY = 0.6
+POLL_INTERVAL = 0.02
+
+
+class FakeExa:
+    """Exa websets client whose websets take COMPLETION_DELAY to fill."""
+
+    def __init__(self, completion_delay=COMPLETION_DELAY):
+        self.completion_delay = completion_delay
+        self.created = []
+        self.gets = {}
+        self.threads_in_use = self.max_threads_in_use = 0
+        self._lock = threading.Lock()
+        self.websets = SimpleNamespace(create=self._create, get=self._get,
+                                       items=SimpleNamespace(list=self._list_items))
+
+    def _call(self, fn):
+        with self._lock:
+            self.threads_in_use += 1
+            self.max_threads_in_use = max(self.max_threads_in_use, self.threads_in_use)
+        try:
+            time.sleep(0.005)
+            return fn()
+        finally:
+            with self._lock:
+                self.threads_in_use -= 1
+
+    def _create(self, params):
+        def create():
+            webset_id = f"ws-{len(self.created)}"
+            self.created.append((webset_id, params.search.query, time.monotonic() + self.completion_delay))
+            return SimpleNamespace(id=webset_id, status=WebsetStatus.running)
+        return self._call(create)
+
+    def _get(self, webset_id):
+        def get():
+            self.gets[webset_id] = self.gets.get(webset_id, 0) + 1
+            ready_at = next(r for w, _, r in self.created if w == webset_id)
+            status = WebsetStatus.idle if time.monotonic() >= ready_at else WebsetStatus.running
+            return SimpleNamespace(id=webset_id, status=status)
+        return self._call(get)
+
+    def _list_items(self, webset_id):
+        query = next(q for w, q, _ in self.created if w == webset_id)
+        return self._call(lambda: SimpleNamespace(data=[{
+            "id": f"{webset_id}-item-{n}", "webset_id": webset_id, "source": "search",
+            "properties": {"url": f"https://linkedin.com/in/{n}", "type": "person", "description": query,
+                           "person": {"name": f"Person {n}", "location": "SF", "position": "CTO"}},
+            "evaluations": [], "enrichments": [{"result": [f"https://linkedin.com/in/{n}"]}],
+        } for n in range(3)]))
+
+
+def _params(query):
+    return CreateWebsetParameters(
+        search={"query": query, "count": 10},
+        enrichments=[CreateEnrichmentParameters(description="LinkedIn profile URL", format="text")]
+    )
+
+
+def _searches():
+    return WebsetSearches(WebsetPoller(initial_interval=POLL_INTERVAL, backoff=2, max_interval=0.2))
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_pending_websets_polled_by_one_task_with_backoff(fake_redis):
+    exa = FakeExa()
+    searches = _searches()
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        searches.search(exa, "people", "acct-1", _params(f"CTOs at startup {n}")) for n in range(8)
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert [r[0]["properties"]["description"] for r in results] == [f"CTOs at startup {n}" for n in range(8)]
+    # All websets waited on together, not one thread blocked per search
+    assert elapsed < COMPLETION_DELAY * 2
+    assert exa.max_threads_in_use <= 8
+    # Backoff: a handful of status requests per webset instead of one per poll interval
+    assert all(count <= 7 for count in exa.gets.values())
+    assert sum(exa.gets.values()) < 8 * COMPLETION_DELAY / POLL_INTERVAL / 3
+    assert not searches.poller._pending and searches.poller._task.done()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_repeated_search_served_from_cache_per_account(fake_redis):
+    exa = FakeExa()
+    searches = _searches()
+
+    # Concurrent identical searches share a webset
+    first, same = await asyncio.gather(
+        searches.search(exa, "people", "acct-1", _params("CTOs at AI startups in SF")),
+        searches.search(exa, "people", "acct-1", _params("CTOs at AI startups in SF")),
+    )
+    assert first == same and len(exa.created) == 1
+
+    started = time.perf_counter()
+    cached = await searches.search(exa, "people", "acct-1", _params("  ctos at AI   startups in sf? "))
+    assert time.perf_counter() - started < 0.05
+    assert cached == first and len(exa.created) == 1
+
+    # Other accounts, other tools and queries without an account still create websets
+    await searches.search(exa, "people", "acct-2", _params("CTOs at AI startups in SF"))
+    await searches.search(exa, "company", "acct-1", _params("CTOs at AI startups in SF"))
+    await searches.search(exa, "people", None, _params("CTOs at AI startups in SF"))
+    assert len(exa.created) == 4 and len(fake_redis.values) == 3
+    assert all(json.loads(value) for value in fake_redis.values.values())
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_wait_timeout_and_cancelled_waiters(fake_redis):
+    exa = FakeExa(completion_delay=60)
+    poller = WebsetPoller(initial_interval=POLL_INTERVAL, backoff=2, max_interval=0.05, timeout=0.2)
+    searches = WebsetSearches(poller)
+
+    with pytest.raises(WebsetSearchError) as error:
+        await searches.search(exa, "people", "acct-1", _params("never finishes"))
+    assert error.value.stage == "wait" and isinstance(error.value.error, asyncio.TimeoutError)
+    assert not fake_redis.values
+
+    waiter = asyncio.create_task(poller.wait_until_idle(exa, "ws-0", timeout=30))
+    await asyncio.sleep(0.1)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await asyncio.sleep(0.1)
+    assert not poller._pending and poller._task.done()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_people_search_tool_formats_cached_results(fake_redis, monkeypatch):
+    exa = FakeExa(completion_delay=0.1)
+    monkeypatch.setattr("core.tools.people_search_tool.webset_searches", _searches())
+    tool = PeopleSearchTool(thread_manager=None)
+    tool.exa_client = exa
+
+    async def thread_and_user():
+        return "thread-1", "acct-1"
+
+    monkeypatch.setattr(tool, "_get_current_thread_and_user", thread_and_user)
+
+    first = await tool.people_search("CTOs at AI startups")
+    again = await tool.people_search("ctos at ai startups.")
+
+    assert first.success and again.success and len(exa.created) == 1
+    output = json.loads(first.output)
+    assert output["total_results"] == 3
+    assert output["results"][0]["person_name"] == "Person 0"
+    assert output["results"][0]["enrichment_data"] == "https://linkedin.com/in/0"
+    assert json.loads(again.output)["results"] == output["results"]
@@ -0,0 +1,143 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from supabase import create_async_client
+
+import core.finance as finance
+from core.utils.config import config
+
+
+async def _return(value):
+    return value
+
+
+async def _ledger_balance(client, finance_account_id):
+    """The balance as the summary used to compute it: opening balance plus
+    every transaction, read from the ledger."""
+    account = await client.table('finance_accounts').select('opening_balance') \
+        .eq('id', finance_account_id).single().execute()
+    rows = await client.table('finance_transactions').select('type, amount') \
+        .eq('finance_account_id', finance_account_id).execute()
+    signed = (finance._to_float(r['amount']) * (1 if r['type'] == 'INCOME' else -1) for r in rows.data)
+    return round(finance._to_float(account.data['opening_balance']) + sum(signed), 2)
+
+
+async def _stored_balance(client, finance_account_id):
+    account = await client.table('finance_accounts').select('current_balance') \
+        .eq('id', finance_account_id).single().execute()
+    return finance._to_float(account.data['current_balance'])
+
+
+@pytest_asyncio.fixture
+async def ledger(monkeypatch):
+    """A fresh user, with its personal account, on a local Supabase with the
+    migrations applied; skipped when there is none."""
+    try:
+        client = await create_async_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_ROLE_KEY)
+        await client.table('finance_accounts').select('id').limit(1).execute()
+    except Exception as e:
+        pytest.skip(f"needs a local Supabase with the migrations applied: {e}")
+
+    user = await client.auth.admin.create_user({
+        "email": f"finance-{uuid.uuid4().hex}@example.com",
+        "password": uuid.uuid4().hex,
+        "email_confirm": True,
+    })
+    user_id = user.user.id
+    monkeypatch.setattr(finance, "_get_supabase_client", lambda: _return(client))
+
+    async def open_account(opening_balance):
+        result = await client.table('finance_accounts').insert({
+            "account_id": user_id, "created_by": user_id, "name": "Test",
+            "account_type": "CHECKING", "opening_balance": opening_balance,
+        }).execute()
+        return result.data[0]['id']
+
+    async def record(finance_account_id, type, amount):
+        result = await client.table('finance_transactions').insert({
+            "account_id": user_id, "finance_account_id": finance_account_id, "created_by": user_id,
+            "type": type, "amount": amount,
+        }).execute()
+        return result.data[0]['id']
+
+    async def assert_in_sync(*finance_account_ids):
+        for finance_account_id in finance_account_ids:
+            assert await _stored_balance(client, finance_account_id) == await _ledger_balance(client, finance_account_id)
+
+    # Personal Basejump accounts share their owner's id
+    yield SimpleNamespace(client=client, account_id=user_id, user_id=user_id, open_account=open_account,
+                          record=record, assert_in_sync=assert_in_sync)
+    # Finance rows cascade from the user
+    await client.auth.admin.delete_user(user_id)
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_stored_balance_follows_credits_and_debits(ledger):
+    client = ledger.client
+    checking, savings = await ledger.open_account(100), await ledger.open_account(0)
+    await ledger.assert_in_sync(checking, savings)
+
+    salary = await ledger.record(checking, 'INCOME', 2500.10)
+    rent = await ledger.record(checking, 'EXPENSE', 1200.55)
+    await ledger.assert_in_sync(checking)
+    assert await _stored_balance(client, checking) == 1399.55
+
+    await client.table('finance_transactions').update({"amount": 1300}).eq('id', rent).execute()
+    await client.table('finance_transactions').update({"type": 'EXPENSE'}).eq('id', salary).execute()
+    await ledger.assert_in_sync(checking)
+
+    await client.table('finance_transactions').update({"finance_account_id": savings}).eq('id', salary).execute()
+    await client.table('finance_transactions').delete().eq('id', rent).execute()
+    await client.table('finance_accounts').update({"opening_balance": 50}).eq('id', checking).execute()
+    await ledger.assert_in_sync(checking, savings)
+    assert await _stored_balance(client, checking) == 50
+    assert await _stored_balance(client, savings) == -2500.10
+
+    accounts = await finance._load_finance_accounts(client, ledger.account_id, ledger.user_id)
+    assert {a.id: a.balance for a in accounts} == {checking: 50, savings: -2500.10}
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_reconcile_repairs_drift_from_the_ledger(ledger):
+    client = ledger.client
+    checking = await ledger.open_account(10)
+    await ledger.record(checking, 'INCOME', 40)
+    await ledger.record(checking, 'EXPENSE', 15.5)
+    await client.table('finance_accounts').update({"current_balance": 999}).eq('id', checking).execute()
+
+    result = await finance.reconcile_finance_accounts(account_id=ledger.account_id, user_id=ledger.user_id)
+    assert result == {"repaired": 1, "drift": [
+        {"financeAccountId": checking, "storedBalance": 999.0, "computedBalance": 34.5},
+    ]}
+    await ledger.assert_in_sync(checking)
+
+    result = await finance.reconcile_finance_accounts(account_id=ledger.account_id, user_id=ledger.user_id)
+    assert result == {"repaired": 0, "drift": []}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_reconcile_reports_the_drift_the_rpc_repaired(monkeypatch):
+    calls = []
+
+    class FakeClient:
+        def rpc(self, name, params):
+            calls.append((name, params))
+            rows = [{"finance_account_id": "fa-1", "stored_balance": "12.00", "computed_balance": "10.50"}]
+            return SimpleNamespace(execute=lambda: _return(SimpleNamespace(data=rows)))
+
+    async def resolve(client, user_id, requested_account_id):
+        return "acct-1"
+
+    monkeypatch.setattr(finance, "_get_supabase_client", lambda: _return(FakeClient()))
+    monkeypatch.setattr(finance, "_resolve_account_id", resolve)
+
+    result = await finance.reconcile_finance_accounts(account_id=None, user_id="user-1")
+    assert calls == [("finance_reconcile_account_balances", {"p_account_id": "acct-1"})]
+    assert result == {"repaired": 1, "drift": [
+        {"financeAccountId": "fa-1", "storedBalance": 12.0, "computedBalance": 10.5},
+    ]}
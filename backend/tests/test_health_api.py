@@ -61,4 +61,19 @@ async def test_health_docker_endpoint(monkeypatch):
     data = resp.json()
     assert data.get("status") == "ok"
     assert "timestamp" in data
-    assert "instance_id" in data
\ No newline at end of file
+    assert "instance_id" in data
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_metrics_endpoint_requires_admin_key(monkeypatch):
+    from core.utils.config import config
+    monkeypatch.setattr(config, "KORTIX_ADMIN_API_KEY", "admin-key")
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        assert (await ac.get("/metrics")).status_code == 401
+        assert (await ac.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 403
+        resp = await ac.get("/metrics", headers={"Authorization": "Bearer admin-key"})
+        assert resp.status_code == 200
+        assert "suna_" in resp.text
+        assert (await ac.get("/metrics", headers={"X-Admin-Api-Key": "admin-key"})).status_code == 200
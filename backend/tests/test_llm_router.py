@@ -0,0 +1,233 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import REGISTRY
+
+import core.services.llm as llm
+import core.services.llm_router as llm_router
+from core.ai_models import Model, ModelProvider, ModelRegistry, model_manager
+from core.ai_models.ai_models import ModelConfig, ModelPricing
+from core.services.llm import LLMError, make_llm_api_call
+from core.services.llm_router import LLMRouter
+from core.utils.config import config
+from conftest import LocalServer
+
+FAST = 0.02
+
+
+class FakeProvider(LocalServer):
+    """OpenAI-compatible streaming chat completions: the first chunk after
+    `first_token_delay` (or the next of `spikes`), and 503s, 400s or 401s
+    while `failures` / `bad_requests` / `unauthorized` last."""
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.abandoned = 0
+        self.first_token_delay = FAST
+        self.spikes = deque()
+        self.failures = 0
+        self.bad_requests = 0
+        self.unauthorized = 0
+        app = FastAPI()
+
+        @app.post("/v1/chat/completions")
+        async def completions():
+            self.requests += 1
+            if self.failures:
+                self.failures -= 1
+                return JSONResponse({"error": {"message": "overloaded", "type": "server_error"}}, status_code=503)
+            if self.bad_requests:
+                self.bad_requests -= 1
+                return JSONResponse({"error": {"message": "bad request", "type": "invalid_request_error"}},
+                                    status_code=400)
+            if self.unauthorized:
+                self.unauthorized -= 1
+                return JSONResponse({"error": {"message": "Incorrect API key provided", "type": "authentication_error"}},
+                                    status_code=401)
+            delay = self.spikes.popleft() if self.spikes else self.first_token_delay
+            return StreamingResponse(self._stream(delay), media_type="text/event-stream")
+
+        super().__init__(app)
+
+    async def _stream(self, delay):
+        def event(choices, **extra):
+            return "data: " + json.dumps({"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 1,
+                                          "model": "fake", "choices": choices, **extra}) + "\n\n"
+
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.abandoned += 1
+            raise
+        yield event([{"index": 0, "delta": {"role": "assistant", "content": f"Hello from {self.name}"},
+                      "finish_reason": None}])
+        yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        yield event([], usage={"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8})
+        yield "data: [DONE]\n\n"
+
+
+@pytest_asyncio.fixture
+async def providers(monkeypatch):
+    async with FakeProvider("primary") as primary, FakeProvider("backup") as backup:
+        registry = ModelRegistry()
+        for name, server, priority in (("primary", primary, 2), ("backup", backup, 1)):
+            registry.register(Model(
+                id=f"openai/fake-{name}", name=name, provider=ModelProvider.OPENAI, priority=priority,
+                deployment_group="fake", api_key_setting="OPENAI_API_KEY",
+                config=ModelConfig(api_base=f"{server.url}/v1", num_retries=0),
+            ))
+        monkeypatch.setattr(model_manager, "registry", registry)
+        monkeypatch.setattr(llm, "llm_router", LLMRouter())
+        monkeypatch.setattr(config, "OPENAI_API_KEY", "test")
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        yield primary, backup
+
+
+async def _ask(**kwargs):
+    response = await make_llm_api_call([{"role": "user", "content": "Hi"}], "openai/fake-primary", **kwargs)
+    return "".join([chunk.choices[0].delta.content or "" async for chunk in response if chunk.choices])
+
+
+def _reroutes(reason):
+    return REGISTRY.get_sample_value("suna_llm_reroutes_total", {"reason": reason}) or 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_5xx_burst_fails_over_then_routes_around_until_recovered(providers, monkeypatch):
+    primary, backup = providers
+    failovers, unhealthy = _reroutes("failover"), _reroutes("unhealthy")
+    primary.failures = 3
+
+    # Each 503 fails over at once: no LiteLLM retries against the failing endpoint
+    assert [await _ask() for _ in range(3)] == ["Hello from backup"] * 3
+    assert (primary.requests, backup.requests) == (3, 3)
+    assert _reroutes("failover") == failovers + 3
+    # 3 of its 3 recent calls failed: the next call goes to the backup directly
+    assert await _ask() == "Hello from backup"
+    assert (primary.requests, _reroutes("unhealthy")) == (3, unhealthy + 1)
+    # Calls with their own credentials stay on the requested deployment
+    assert await _ask(api_key="test") == "Hello from primary"
+
+    # The failures age out and the primary gets its calls back
+    monkeypatch.setattr(llm_router, "STATS_WINDOW_SECONDS", 0)
+    assert await _ask() == "Hello from primary"
+
+    # Errors of the request itself are not failed over
+    primary.bad_requests = 1
+    backup_requests = backup.requests
+    with pytest.raises(LLMError):
+        await _ask()
+    assert backup.requests == backup_requests
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_rejected_credentials_of_an_equivalent_fail_over(providers, monkeypatch):
+    primary, backup = providers
+    primary.failures = 3
+    for _ in range(3):
+        assert await _ask() == "Hello from backup"
+
+    # The primary is passed over; the backup's key is rejected, so the call
+    # goes back to the requested deployment instead of failing
+    backup.unauthorized = 1
+    assert await _ask() == "Hello from primary"
+    assert backup.requests == 4
+
+    # The requested deployment rejecting its key is an error of the call
+    monkeypatch.setattr(llm_router, "STATS_WINDOW_SECONDS", 0)
+    primary.unauthorized = 1
+    with pytest.raises(LLMError):
+        await _ask()
+    assert backup.requests == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_latency_spike_hedged_with_equivalent_deployment(providers, monkeypatch):
+    primary, backup = providers
+    monkeypatch.setattr(llm_router, "HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(config, "LLM_HEDGING_ENABLED", True)
+    hedges = _reroutes("hedge")
+
+    # No hedging until the primary's p95 is known
+    for _ in range(llm_router.MIN_TTFT_SAMPLES):
+        assert await _ask() == "Hello from primary"
+    assert backup.requests == 0
+    assert await _ask() == "Hello from primary"
+    assert backup.requests == 0
+
+    primary.spikes.extend([5.0, 5.0])
+    for _ in range(2):
+        started = time.monotonic()
+        assert await _ask() == "Hello from backup"
+        assert time.monotonic() - started < 1.0
+    assert _reroutes("hedge") == hedges + 2
+    # The primary's streams were cancelled, not read to the end
+    for _ in range(100):
+        if primary.abandoned == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert primary.abandoned == 2
+
+
+@pytest.mark.unit
+def test_rank_prefers_requested_deployment_unless_much_slower(monkeypatch):
+    registry = ModelRegistry()
+    for name, priority in (("a", 3), ("b", 2), ("c", 1)):
+        registry.register(Model(id=f"openai/{name}", name=name, provider=ModelProvider.OPENAI,
+                                priority=priority, deployment_group="g", api_key_setting="OPENAI_API_KEY"))
+    registry.register(Model(id="openai/small", name="small", provider=ModelProvider.OPENAI,
+                            deployment_group="g", api_key_setting="OPENAI_API_KEY", context_window=8_000))
+    monkeypatch.setattr(model_manager, "registry", registry)
+    monkeypatch.setattr(config, "OPENAI_API_KEY", "test")
+    router = LLMRouter()
+
+    # Unknown latencies: registry order; smaller context windows are not equivalent
+    assert router.rank("openai/a") == (["openai/a", "openai/b", "openai/c"], None)
+    for _ in range(llm_router.MIN_TTFT_SAMPLES):
+        router.stats("openai/a").record_ttft(1.0)
+        router.stats("openai/b").record_ttft(0.6)
+        router.stats("openai/c").record_ttft(0.3)
+    assert router.rank("openai/b") == (["openai/b", "openai/c", "openai/a"], None)
+    assert router.rank("openai/a") == (["openai/c", "openai/b", "openai/a"], "latency")
+
+    for _ in range(llm_router.MIN_OUTCOMES):
+        router.stats("openai/c").record_outcome(False)
+    assert router.rank("openai/a") == (["openai/a", "openai/b", "openai/c"], None)
+    assert router.rank("openai/c") == (["openai/b", "openai/a", "openai/c"], "unhealthy")
+
+
+@pytest.mark.unit
+def test_rank_skips_equivalents_without_credentials_or_pricier(monkeypatch):
+    registry = ModelRegistry()
+    registry.register(Model(id="anthropic/direct", name="direct", provider=ModelProvider.ANTHROPIC, priority=1,
+                            deployment_group="g", api_key_setting="ANTHROPIC_API_KEY",
+                            pricing=ModelPricing(3.00, 15.00)))
+    registry.register(Model(id="anthropic/reseller", name="reseller", provider=ModelProvider.ANTHROPIC, priority=2,
+                            deployment_group="g", api_key_setting="AI302_API_KEY",
+                            pricing=ModelPricing(0.90, 4.50)))
+    monkeypatch.setattr(model_manager, "registry", registry)
+    monkeypatch.setattr(config, "ANTHROPIC_API_KEY", "test")
+    monkeypatch.setattr(config, "AI302_API_KEY", None)
+    router = LLMRouter()
+
+    # No key for the reseller: not an equivalent
+    assert router.rank("anthropic/direct") == (["anthropic/direct"], None)
+
+    monkeypatch.setattr(config, "AI302_API_KEY", "test")
+    assert router.rank("anthropic/direct") == (["anthropic/direct", "anthropic/reseller"], None)
+    # Calls to the cheaper deployment only move to the pricier one when allowed
+    for _ in range(llm_router.MIN_OUTCOMES):
+        router.stats("anthropic/reseller").record_outcome(False)
+    assert router.rank("anthropic/reseller") == (["anthropic/reseller"], None)
+    monkeypatch.setattr(config, "LLM_ROUTING_ALLOW_PRICIER", True)
+    assert router.rank("anthropic/reseller") == (["anthropic/direct", "anthropic/reseller"], "unhealthy")
@@ -0,0 +1,160 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+import structlog
+
+from core.utils.logger import (
+    LogSampler,
+    QueueLogger,
+    QueueLogWriter,
+    SamplingRule,
+    caller_processors,
+    lazy,
+    make_deferred_bound_logger,
+)
+
+
+def _make_logger(rules=None, renderer=None, level=logging.DEBUG, **writer_kwargs):
+    stream = io.StringIO()
+    writer = QueueLogWriter(renderer or structlog.processors.JSONRenderer(), stream=stream, **writer_kwargs)
+    log = structlog.wrap_logger(
+        QueueLogger(writer),
+        processors=caller_processors(LogSampler(rules)),
+        wrapper_class=make_deferred_bound_logger(level),
+    )
+    return log, writer, stream
+
+
+def _lines(writer, stream):
+    writer.flush()
+    return [json.loads(line) for line in stream.getvalue().splitlines() if line.startswith("{")]
+
+
+@pytest.mark.unit
+def test_rendering_happens_on_writer_thread():
+    render_threads = []
+
+    def renderer(_, __, event_dict):
+        render_threads.append(threading.current_thread().name)
+        return json.dumps(event_dict, default=str)
+
+    log, writer, stream = _make_logger(renderer=renderer)
+    log.info("hello %s", "world", user="u1")
+    lines = _lines(writer, stream)
+    writer.stop()
+
+    assert lines[0]["event"] == "hello world"
+    assert lines[0]["user"] == "u1"
+    assert lines[0]["timestamp"].endswith("Z")
+    assert render_threads == ["log-writer"]
+
+
+@pytest.mark.unit
+def test_rate_limited_logger_drops_low_levels_only():
+    log, writer, stream = _make_logger({"hot": SamplingRule(per_second=2)})
+    hot = log.bind(logger="hot")
+    for i in range(10):
+        hot.debug("chunk %s", i)
+    hot.warning("still delivered")
+    log.debug("unsampled")
+    lines = _lines(writer, stream)
+    writer.stop()
+
+    events = [line["event"] for line in lines]
+    assert events[:2] == ["chunk 0", "chunk 1"]
+    assert "still delivered" in events
+    assert "unsampled" in events
+    assert len(events) == 4
+
+
+@pytest.mark.unit
+def test_lazy_values_only_evaluated_when_emitted():
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "big"
+
+    log, writer, stream = _make_logger(level=logging.INFO)
+    log.debug("params: %s", lazy(expensive))
+    assert calls == []
+
+    log.info("params: %s", lazy(expensive), extra=lazy(expensive))
+    lines = _lines(writer, stream)
+    writer.stop()
+    assert lines[0]["event"] == "params: big"
+    assert lines[0]["extra"] == "big"
+    assert len(calls) == 2
+
+
+@pytest.mark.unit
+def test_sampled_out_events_are_not_formatted():
+    calls, formatted = [], []
+
+    class Payload:
+        def __str__(self):
+            formatted.append(1)
+            return "payload"
+
+    def expensive():
+        calls.append(1)
+        return "big"
+
+    log, writer, stream = _make_logger({"hot": SamplingRule(rate=0.0)})
+    hot = log.bind(logger="hot")
+    hot.debug("raw: %s %s", lazy(expensive), Payload())
+    hot.info("result: %s", Payload())
+    hot.warning("kept: %s %s", lazy(expensive), Payload())
+    lines = _lines(writer, stream)
+    writer.stop()
+
+    assert [line["event"] for line in lines] == ["kept: big payload"]
+    assert "positional_args" not in lines[0]
+    assert (len(calls), len(formatted)) == (1, 1)
+
+
+@pytest.mark.unit
+def test_callsite_only_for_warnings_and_above():
+    log, writer, stream = _make_logger()
+    log.info("plain")
+    log.error("boom")
+    info, error = _lines(writer, stream)
+    writer.stop()
+
+    assert "lineno" not in info
+    assert error["filename"] == "test_logger.py"
+    assert error["func_name"] == "test_callsite_only_for_warnings_and_above"
+
+
+@pytest.mark.unit
+def test_exception_info_is_captured_before_handoff():
+    log, writer, stream = _make_logger()
+    try:
+        raise ValueError("bad value")
+    except ValueError:
+        log.exception("failed")
+    (line,) = _lines(writer, stream)
+    writer.stop()
+    assert line["exception"][0]["exc_type"] == "ValueError"
+
+
+@pytest.mark.unit
+def test_full_queue_drops_instead_of_blocking():
+    release = threading.Event()
+
+    def slow_renderer(_, __, event_dict):
+        release.wait(5)
+        return json.dumps(event_dict, default=str)
+
+    log, writer, stream = _make_logger(renderer=slow_renderer, maxsize=1)
+    for i in range(50):
+        log.info("event %s", i)
+    release.set()
+    writer.flush()
+    writer.stop()
+
+    assert writer.dropped > 0
+    assert f"dropped {writer.dropped} events" in stream.getvalue()
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+
+import pytest
+
+import core.templates.template_service as template_service_module
+from core.templates.services.creator_names import CreatorNameCache
+from core.templates.services.marketplace_service import MarketplaceFilters, TemplateService
+from core.utils.pagination import PaginationParams
+
+
+class FakeAccountsQuery:
+    def __init__(self, db):
+        self.db = db
+
+    def select(self, columns):
+        return self
+
+    def in_(self, column, values):
+        self.db.account_queries.append(list(values))
+        self.ids = values
+        return self
+
+    async def execute(self):
+        return SimpleNamespace(data=[a for a in self.db.accounts if a["id"] in self.ids])
+
+
+class FakeRpc:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params
+
+    async def execute(self):
+        self.db.rpc_calls.append((self.name, self.params))
+        rows, limit = self.db.templates, self.params["p_limit"]
+        if self.params["p_after"]:
+            after = self.params["p_after"][-1]
+            rows = rows[next(i for i, r in enumerate(rows) if r["template_id"] == after) + 1:]
+        else:
+            rows = rows[self.params["p_offset"]:]
+        total = len(self.db.templates) if self.params["p_with_total"] else None
+        return SimpleNamespace(data={"templates": [dict(r) for r in rows[:limit]], "total": total})
+
+
+class FakeDB:
+    def __init__(self, templates, accounts):
+        self.templates, self.accounts = templates, accounts
+        self.account_queries, self.rpc_calls = [], []
+
+    def schema(self, name):
+        assert name == "basejump"
+        return SimpleNamespace(from_=lambda table: FakeAccountsQuery(self))
+
+    def rpc(self, name, params):
+        return FakeRpc(self, name, params)
+
+
+def _template(n, creator):
+    return {
+        "template_id": f"t{n}", "creator_id": creator, "name": f"Template {n}",
+        "config": {"system_prompt": "", "tools": {}}, "tags": [], "is_public": True,
+        "download_count": 100 - n, "created_at": "2025-01-01T00:00:00+00:00",
+        "updated_at": "2025-01-01T00:00:00+00:00", "icon_name": "brain",
+        "icon_color": "#000000", "icon_background": "#F3F4F6", "metadata": {},
+        "sort_key": [str(100 - n), "2025-01-01 00:00:00+00", f"t{n}"],
+    }
+
+
+@pytest.fixture
+def marketplace(monkeypatch, fake_redis):
+    db = FakeDB(
+        [_template(n, "acct-kortix" if n % 2 else "acct-ada") for n in range(5)],
+        [{"id": "acct-kortix", "name": "Kortix", "slug": "kortix"}, {"id": "acct-ada", "name": None, "slug": "ada"}],
+    )
+
+    class FakeConnection:
+        @property
+        async def client(self):
+            return db
+
+    monkeypatch.setattr(template_service_module, "creator_names", CreatorNameCache())
+    monkeypatch.setattr("core.services.supabase.DBConnection", FakeConnection)
+    return db, fake_redis
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_marketplace_pages_by_cursor_in_one_call_each(marketplace):
+    db, fake_redis = marketplace
+    service = TemplateService(db)
+    filters = MarketplaceFilters(sort_by="download_count")
+
+    first = await service.get_marketplace_templates_paginated(PaginationParams(page=1, page_size=2), filters)
+    assert [t["template_id"] for t in first.data] == ["t0", "t1"]
+    assert [t["creator_name"] for t in first.data] == ["ada", "Kortix"]
+    assert first.pagination.total_items == 5 and first.pagination.has_next
+    assert db.rpc_calls[0][1]["p_limit"] == 3 and db.rpc_calls[0][1]["p_with_total"] is True
+
+    second = await service.get_marketplace_templates_paginated(
+        PaginationParams(page=1, page_size=2, cursor=first.pagination.next_cursor), filters)
+    assert [t["template_id"] for t in second.data] == ["t2", "t3"]
+    assert second.pagination.current_page == 2 and second.pagination.total_items == 5
+    # Keyset page: continues after the last sort key and skips the count
+    assert db.rpc_calls[1][1]["p_after"][-1] == "t1" and db.rpc_calls[1][1]["p_with_total"] is False
+    # Creator names came from the cache after the first page
+    assert db.account_queries == [["acct-ada", "acct-kortix"]]
+    assert fake_redis.values["template_creator_name:acct-ada"] == "ada"
+
+    # A cursor from other filters falls back to page-based access
+    other = await service.get_marketplace_templates_paginated(
+        PaginationParams(page=1, page_size=2, cursor=first.pagination.next_cursor),
+        MarketplaceFilters(sort_by="name"))
+    assert other.pagination.current_page == 1 and db.rpc_calls[2][1]["p_after"] is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_creator_names_shared_through_redis_and_cached_when_missing(marketplace):
+    db, fake_redis = marketplace
+    first, second = CreatorNameCache(), CreatorNameCache()
+
+    assert await first.get_many(db, ["acct-kortix", "acct-gone"]) == {"acct-kortix": "Kortix", "acct-gone": None}
+    # Another worker finds both in Redis, including the account without a name
+    assert await second.get_many(db, ["acct-gone", "acct-kortix"]) == {"acct-gone": None, "acct-kortix": "Kortix"}
+    assert len(db.account_queries) == 1
+
+    fake_redis.values.clear()
+    assert await second.get(db, "acct-kortix") == "Kortix"
+    assert len(db.account_queries) == 1
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.agent_loop_replay import MemoryRedis, load_recording, replay
+from core.services import metrics
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_agent_loop_records_llm_prompt_compression_and_tool_metrics():
+    recording = load_recording("landing_page")
+    model = recording["model"]
+    before = {
+        "ttft": _sample("suna_llm_time_to_first_token_seconds_count", model=model),
+        "stream": _sample("suna_llm_stream_duration_seconds_count", model=model, status="completed"),
+        "prompt": _sample("suna_prompt_assembly_seconds_count", model=model),
+        "compression": _sample("suna_context_compression_seconds_count", model=model),
+        "tools": [_sample("suna_tool_execution_seconds_count", tool=tool, status="success")
+                  for tool in ("create_file", "str_replace", "complete")],
+    }
+
+    result = await replay(recording, MemoryRedis(), time_scale=0.05)
+
+    assert result["llm_calls"] == 3
+    assert _sample("suna_llm_time_to_first_token_seconds_count", model=model) == before["ttft"] + 3
+    assert _sample("suna_llm_stream_duration_seconds_count", model=model, status="completed") == before["stream"] + 3
+    assert _sample("suna_prompt_assembly_seconds_count", model=model) == before["prompt"] + 1
+    assert _sample("suna_context_compression_seconds_count", model=model) == before["compression"] + 3
+    assert [_sample("suna_tool_execution_seconds_count", tool=tool, status="success")
+            for tool in ("create_file", "str_replace", "complete")] == [n + 1 for n in before["tools"]]
+    # The recorded first chunk comes 710ms (scaled: 35ms) after the request
+    assert _sample("suna_llm_time_to_first_token_seconds_sum", model=model) >= 3 * 0.02
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_db_calls_counted_per_run_and_publish_lag(monkeypatch):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=[])))
+    metrics.instrument_http_client(client)
+    metrics.instrument_http_client(client)
+    before = _sample("suna_db_calls_per_run_count", status="completed")
+    before_sum = _sample("suna_db_calls_per_run_sum", status="completed")
+    total_before = _sample("suna_db_calls_total")
+
+    async def run(requests):
+        calls = metrics.start_run()
+
+        async def tool():
+            await client.get("http://db/rest/v1/messages")
+
+        for _ in range(requests):
+            await client.get("http://db/rest/v1/threads")
+        # Tasks the run starts count towards it
+        await asyncio.gather(asyncio.create_task(tool()), asyncio.create_task(tool()))
+        metrics.finish_run(calls, "completed")
+        return calls["count"]
+
+    assert await asyncio.gather(run(3), run(5)) == [5, 7]
+    await client.get("http://db/rest/v1/threads")
+    assert _sample("suna_db_calls_per_run_count", status="completed") == before + 2
+    assert _sample("suna_db_calls_per_run_sum", status="completed") == before_sum + 12
+    assert _sample("suna_db_calls_total") == total_before + 13
+    await client.aclose()
+
+    monkeypatch.setattr(metrics, "PUBLISH_LAG_SAMPLE", 1)
+    lag_before = _sample("suna_redis_publish_lag_seconds_count")
+    lag_sum_before = _sample("suna_redis_publish_lag_seconds_sum")
+
+    async def write(delay, fail=False):
+        await asyncio.sleep(delay)
+        if fail:
+            raise ConnectionError("redis down")
+
+    for tasks in ([write(0.01), write(0.05)], [write(0.01), write(0.02, fail=True)]):
+        tasks = [asyncio.create_task(task) for task in tasks]
+        metrics.track_publish_lag(time.monotonic(), *tasks)
+        await asyncio.gather(*tasks, return_exceptions=True)
+    # Failed writes are not a lag
+    assert _sample("suna_redis_publish_lag_seconds_count") == lag_before + 1
+    assert 0.05 <= _sample("suna_redis_publish_lag_seconds_sum") - lag_sum_before < 0.5
+
+    monkeypatch.setattr(metrics, "PUBLISH_LAG_SAMPLE", 4)
+    done = asyncio.get_running_loop().create_future()
+    done.set_result(None)
+    for _ in range(8):
+        metrics.track_publish_lag(time.monotonic(), done)
+    await asyncio.sleep(0)
+    assert _sample("suna_redis_publish_lag_seconds_count") == lag_before + 3
+
+
+@pytest.mark.unit
+def test_label_values_bounded():
+    label = metrics._BoundedLabel(limit=2)
+    assert [label(v) for v in ("a", "b", "c", "a", None, "b")] == ["a", "b", metrics.OTHER, "a", metrics.OTHER, "b"]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.unit
+def test_worker_exporter_sums_worker_processes(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "METRICS_PORT": str(_free_port()),
+           "LOGGING_LEVEL": "ERROR"}
+    worker = textwrap.dedent("""
+        import sys
+        from core.services import metrics
+        for _ in range(int(sys.argv[1])):
+            metrics.observe_tool_execution("web_search", "success", 0.3)
+        metrics.observe_tool_execution("web_search", "error", 2.0)
+    """)
+    for count in (2, 3):
+        subprocess.run([sys.executable, "-c", worker, str(count)], cwd=BACKEND, env=env, check=True)
+
+    exporter = subprocess.Popen([sys.executable, "worker_metrics.py"], cwd=BACKEND, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{env['METRICS_PORT']}/metrics")
+                break
+            except httpx.ConnectError:
+                assert time.monotonic() < deadline and exporter.poll() is None
+                time.sleep(0.1)
+    finally:
+        exporter.terminate()
+        exporter.wait()
+
+    samples = {(s.name, s.labels.get("status")): s.value
+               for family in text_string_to_metric_families(response.text) for s in family.samples
+               if s.labels.get("tool") == "web_search" and "bucket" not in s.name}
+    assert samples[("suna_tool_execution_seconds_count", "success")] == 5
+    assert samples[("suna_tool_execution_seconds_sum", "success")] == pytest.approx(1.5)
+    assert samples[("suna_tool_execution_seconds_count", "error")] == 2
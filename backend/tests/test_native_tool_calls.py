@@ -0,0 +1,121 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import core.run as run_module
+from core.agentpress.response_processor import ProcessorConfig, ResponseProcessor, StreamedToolArguments
+from core.agentpress.tool import ToolResult
+from core.agentpress.tool_registry import ToolRegistry
+from core.ai_models.ai_models import Model, ModelCapability, ModelProvider
+from core.run import PromptManager
+from tests.test_prompt_cache import EchoTool
+
+ARGUMENTS = {"path": "notes/{draft}.md", "text": 'say "hi" \\ then [wave] }'}
+
+
+def _fragments(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_streamed_arguments_complete_exactly_when_json_closes(size):
+    fragments = _fragments(json.dumps(ARGUMENTS), size)
+    streamed = StreamedToolArguments()
+    for fragment in fragments[:-1]:
+        # Braces, brackets, quotes and backslashes inside strings don't close it early
+        assert streamed.feed(fragment) is False
+    assert streamed.feed(fragments[-1]) is True
+    assert streamed.value == ARGUMENTS
+    assert streamed.text == json.dumps(ARGUMENTS)
+
+
+def _delta_chunk(content=None, tool_call=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=[tool_call] if tool_call else None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+def _tool_call_delta(index, arguments, call_id=None, name=None):
+    return SimpleNamespace(index=index, id=call_id, type="function",
+                           function=SimpleNamespace(name=name, arguments=arguments))
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_native_only_stream_runs_each_call_once_without_xml_scanning(monkeypatch):
+    saved, executed = [], []
+
+    async def add_message(thread_id, type, content, is_llm_message=False, metadata=None, **kwargs):
+        message = {"message_id": f"m{len(saved)}", "thread_id": thread_id, "type": type,
+                   "content": content, "metadata": metadata or {}, "is_llm_message": is_llm_message}
+        saved.append(message)
+        return message
+
+    trace = SimpleNamespace(event=lambda **kwargs: None, span=lambda **kwargs: SimpleNamespace(end=lambda **k: None))
+    processor = ResponseProcessor(ToolRegistry(), add_message, trace=trace)
+
+    async def execute(tool_call):
+        executed.append(tool_call)
+        return ToolResult(success=True, output="ok")
+
+    def no_xml(content):
+        raise AssertionError("XML scanning in native-only mode")
+
+    monkeypatch.setattr(processor, "_execute_tool", execute)
+    monkeypatch.setattr(processor, "_extract_xml_chunks", no_xml)
+
+    chunks = [_delta_chunk(content="Writing the note <not-a-tool>")]
+    arguments = _fragments(json.dumps(ARGUMENTS), 4)
+    chunks.append(_delta_chunk(tool_call=_tool_call_delta(0, arguments[0], call_id="call-1", name="create_file")))
+    chunks += [_delta_chunk(tool_call=_tool_call_delta(0, fragment)) for fragment in arguments[1:]]
+    chunks.append(_delta_chunk(tool_call=_tool_call_delta(1, '{"text": "done"}', call_id="call-2", name="echo")))
+    chunks.append(_delta_chunk(finish_reason="tool_calls"))
+
+    config = ProcessorConfig(xml_tool_calling=False, native_tool_calling=True,
+                             execute_tools=True, execute_on_stream=True, tool_execution_strategy="parallel")
+    async for _ in processor.process_streaming_response(_stream(chunks), "thread-1", [], "openai/gpt-5-mini", config):
+        pass
+
+    assert executed == [
+        {"function_name": "create_file", "arguments": ARGUMENTS, "id": "call-1"},
+        {"function_name": "echo", "arguments": {"text": "done"}, "id": "call-2"},
+    ]
+    assistant = next(m for m in saved if m["type"] == "assistant")
+    assert [c["function"]["arguments"] for c in assistant["content"]["tool_calls"]] == [ARGUMENTS, {"text": "done"}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_native_only_prompt_leaves_out_xml_tool_format(monkeypatch, fake_redis):
+    monkeypatch.setattr(run_module, "_compiled_prompts", run_module.OrderedDict())
+    registry = ToolRegistry()
+    registry.register_tool(EchoTool)
+
+    async def build(xml):
+        message = await PromptManager.build_system_prompt(
+            "openai/gpt-5-mini", None, "thread-1", None, tool_registry=registry,
+            include_xml_examples=xml, xml_tool_calling=xml,
+        )
+        return message["content"]
+
+    with_xml, native_only = await build(True), await build(False)
+    assert '"name": "echo"' in with_xml and "<sample_assistant_response>" in with_xml
+    assert '"name": "echo"' not in native_only and "<sample_assistant_response>" not in native_only
+    assert len(native_only) < len(with_xml)
+    assert len(fake_redis.values) == 2
+
+
+@pytest.mark.unit
+def test_native_tools_only_needs_function_calling():
+    def model(*capabilities):
+        return Model(id="m", name="m", provider=ModelProvider.OPENAI, capabilities=list(capabilities))
+
+    assert model(ModelCapability.FUNCTION_CALLING, ModelCapability.NATIVE_TOOLS_ONLY).native_tools_only
+    assert not model(ModelCapability.NATIVE_TOOLS_ONLY).native_tools_only
+    assert not model(ModelCapability.FUNCTION_CALLING).native_tools_only
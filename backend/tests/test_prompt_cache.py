@@ -0,0 +1,136 @@
+import pytest
+
+import core.run as run_module
+from core.agentpress.prompt_caching import add_cache_control
+from core.agentpress.tool import Tool, ToolResult, openapi_schema
+from core.agentpress.tool_registry import ToolRegistry
+from core.run import PromptManager
+
+
+class EchoTool(Tool):
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "echo",
+            "description": "Echo text back",
+            "parameters": {"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]},
+        },
+    })
+    async def echo(self, text: str) -> ToolResult:
+        return self.success_response(text)
+
+
+@pytest.fixture
+def prompt_env(monkeypatch, fake_redis):
+    compiles = []
+    original = PromptManager._compile_static_prompt
+
+    def counting_compile(*args, **kwargs):
+        compiles.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(PromptManager, "_compile_static_prompt", staticmethod(counting_compile))
+    monkeypatch.setattr(run_module, "_compiled_prompts", run_module.OrderedDict())
+    run_module._prompt_source_fingerprint.cache_clear()
+
+    registry = ToolRegistry()
+    registry.register_tool(EchoTool)
+    yield fake_redis, compiles, registry
+    run_module._prompt_source_fingerprint.cache_clear()
+
+
+async def _build(registry, model="openai/gpt-5-mini", supports_vision=True, agent_config=None):
+    return await PromptManager.build_system_prompt(
+        model, agent_config, "thread-1", None,
+        tool_registry=registry, include_xml_examples=True, xml_tool_calling=True,
+        supports_vision=supports_vision,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_static_prefix_compiled_once_and_reused(prompt_env):
+    fake, compiles, registry = prompt_env
+
+    first = await _build(registry)
+    second = await _build(registry)
+    assert len(compiles) == 1
+    assert first["content"] == second["content"]
+    assert '"name": "echo"' in first["content"]
+    assert first["content"].rstrip().endswith("when current date/time context is needed.")
+    assert len(fake.values) == 1
+
+    # Another process (empty local cache) reads the compiled prefix from Redis
+    run_module._compiled_prompts.clear()
+    await _build(registry)
+    assert len(compiles) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_cache_key_tracks_vision_agent_and_tools(prompt_env):
+    _, compiles, registry = prompt_env
+
+    await _build(registry)
+    await _build(registry, supports_vision=False)
+    await _build(registry, agent_config={"system_prompt": "You are a custom agent.", "current_version_id": "v1"})
+    await _build(ToolRegistry())
+    assert len(compiles) == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_changed_base_prompt_misses_cache(prompt_env, monkeypatch):
+    fake, compiles, registry = prompt_env
+
+    await _build(registry)
+    # A deploy that edits the base prompt: new process, same Redis
+    original = run_module.get_system_prompt()
+    monkeypatch.setattr(run_module, "get_system_prompt", lambda: original + "\nNew rule.")
+    run_module._prompt_source_fingerprint.cache_clear()
+    run_module._compiled_prompts.clear()
+
+    message = await _build(registry)
+    assert len(compiles) == 2
+    assert "New rule." in message["content"]
+    assert len(fake.values) == 2
+
+
+class FailingMCPWrapper:
+    _initialized = True
+
+    def get_schemas(self):
+        raise RuntimeError("MCP server unreachable")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_prompt_with_failed_mcp_tool_list_is_not_cached(prompt_env):
+    fake, compiles, registry = prompt_env
+    agent_config = {"system_prompt": "You are a custom agent.", "configured_mcps": [{"name": "search"}]}
+
+    for _ in range(2):
+        message = await PromptManager.build_system_prompt(
+            "openai/gpt-5-mini", agent_config, "thread-1", FailingMCPWrapper(),
+            tool_registry=registry, include_xml_examples=True, xml_tool_calling=True,
+        )
+        assert "Error loading MCP tool list" in message["content"]
+    # Compiled again on the next call instead of serving the error for a day
+    assert len(compiles) == 2
+    assert fake.values == {} and not run_module._compiled_prompts
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_anthropic_prompt_caches_static_block_only(prompt_env):
+    _, _, registry = prompt_env
+
+    message = await _build(registry, model="anthropic/claude-sonnet-4-20250514")
+    static_block, volatile_block = message["content"]
+    assert "CURRENT DATE/TIME" not in static_block["text"]
+    assert "CURRENT DATE/TIME" in volatile_block["text"]
+
+    cached = add_cache_control(message)
+    assert cached["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in cached["content"][1]
+    assert cached["content"][0]["text"] == static_block["text"]
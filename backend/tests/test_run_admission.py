@@ -0,0 +1,304 @@
+import asyncio
+import json
+
+import pytest
+
+import core.services.run_admission as run_admission
+import run_agent_background
+from core.services.run_admission import AdmissionQueue, Priority
+from conftest import FakeRedis
+
+
+class AdmissionRedis(FakeRedis):
+    """FakeRedis running the admission queue's Lua scripts as Python ports of
+    the same steps."""
+
+    def register_script(self, source):
+        port = {
+            run_admission.ENQUEUE_SCRIPT: self._enqueue,
+            run_admission.DEQUEUE_SCRIPT: self._dequeue,
+            run_admission.RELEASE_SCRIPT: self._release,
+            run_admission.REQUEUE_SCRIPT: self._requeue,
+        }[source]
+
+        async def script(keys=(), args=()):
+            # Scripts may only touch the keys they are given, all in one slot
+            assert all(key.startswith("{admission}:") for key in keys)
+            return await port(list(keys), *args)
+
+        return script
+
+    def _head(self, queue_key, account, count):
+        entries = sorted(e for e in self.zsets.get(queue_key, {}) if e.startswith(f"{account}:"))
+        return entries[:count]
+
+    async def _activate(self, ready_key, vclock_key, finish_key, account):
+        if await self.zscore(ready_key, account) is None:
+            vclock = float(await self.get(vclock_key) or 0)
+            finish = float(await self.zscore(finish_key, account) or 0)
+            await self.zadd(ready_key, {account: max(vclock, finish)})
+
+    async def _enqueue(self, keys, priority, account, raw):
+        queue_key, ready_key, jobs_key, depth_key, vclock_key, finish_key, seq_key = keys
+        seq = int(self.values.get(seq_key, 0)) + 1
+        self.values[seq_key] = seq
+        entry = f"{account}:{seq:015d}"
+        await self.zadd(queue_key, {entry: 0})
+        await self.hset(jobs_key, entry, raw)
+        await self.hincrby(depth_key, str(priority), 1)
+        await self._activate(ready_key, vclock_key, finish_key, account)
+
+    async def _dequeue(self, keys, now, default_weight, wait_samples):
+        jobs_key, depth_key, weights_key, running_key, claims_key = keys[:5]
+        for priority, base in enumerate(range(5, len(keys), 5)):
+            ready_key, queue_key, vclock_key, finish_key, waits_key = keys[base:base + 5]
+            while head := await self.zrange(ready_key, 0, 0, withscores=True):
+                account, start = head[0]
+                entries = self._head(queue_key, account, 2)
+                raw = await self.hget(jobs_key, entries[0]) if entries else None
+                if entries:
+                    await self.zrem(queue_key, entries[0])
+                    await self.hincrby(depth_key, str(priority), -1)
+                if len(entries) < 2:
+                    await self.zrem(ready_key, account)
+                if raw is None:
+                    continue
+                weight = float(await self.hget(weights_key, account) or default_weight)
+                finish = start + 1.0 / max(weight, 0.01)
+                await self.set(vclock_key, str(start))
+                await self.zadd(finish_key, {account: finish})
+                await self.zremrangebyscore(finish_key, "-inf", start)
+                if len(entries) == 2:
+                    await self.zadd(ready_key, {account: finish})
+                job = json.loads(raw)
+                await self.lpush(waits_key, f"{max(0.0, now - job['enqueued_at']):.3f}")
+                await self.ltrim(waits_key, 0, wait_samples - 1)
+                await self.zadd(running_key, {job["job_id"]: now})
+                await self.hset(claims_key, job["job_id"], entries[0])
+                return raw
+        return None
+
+    async def _release(self, keys, job_id):
+        claims_key, jobs_key = keys
+        entry = await self.hget(claims_key, job_id)
+        if entry is not None:
+            await self.hdel(claims_key, job_id)
+            await self.hdel(jobs_key, entry)
+        return int(entry is not None)
+
+    async def _requeue(self, keys, claimed_before):
+        claims_key, jobs_key, depth_key, running_key = keys[:4]
+        requeued = 0
+        for job_id, entry in list((await self.hgetall(claims_key)).items()):
+            if (await self.zscore(running_key, job_id) or 0) >= claimed_before:
+                continue
+            await self.hdel(claims_key, job_id)
+            await self.zrem(running_key, job_id)
+            raw = await self.hget(jobs_key, entry)
+            if raw is None:
+                continue
+            job = json.loads(raw)
+            base = 4 + job["priority"] * 4
+            ready_key, queue_key, vclock_key, finish_key = keys[base:base + 4]
+            await self.zadd(queue_key, {entry: 0})
+            await self.hincrby(depth_key, str(job["priority"]), 1)
+            await self._activate(ready_key, vclock_key, finish_key, job["account_id"])
+            requeued += 1
+        return requeued
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = AdmissionRedis()
+    monkeypatch.setattr(run_admission, "redis", fake)
+    return fake
+
+
+async def _drain(queue):
+    order = []
+    while (job := await queue.dequeue()) is not None:
+        order.append(job)
+    return order
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_accounts_share_admissions_regardless_of_backlog(fake_redis):
+    queue = AdmissionQueue()
+    for i in range(6):
+        await queue.enqueue("busy", {"n": i})
+    await queue.enqueue("alice", {"n": 0})
+    await queue.enqueue("bob", {"n": 0})
+
+    order = await _drain(queue)
+    assert [job.account_id for job in order] == ["alice", "bob"] + ["busy"] * 6
+    # Each account's own runs stay in submission order
+    assert [job.payload["n"] for job in order[2:]] == list(range(6))
+    assert fake_redis.zsets[run_admission._ready_key(Priority.INTERACTIVE)] == {}
+    assert await queue.depth() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_account_returning_after_a_burst_does_not_jump_the_queue(fake_redis):
+    queue = AdmissionQueue()
+    for i in range(4):
+        await queue.enqueue("busy", {"n": i})
+    await queue.enqueue("other", {"n": 0})
+    await queue.enqueue("other", {"n": 1})
+
+    first = [(j.account_id, j.payload["n"]) for j in [await queue.dequeue() for _ in range(4)]]
+    assert first == [("busy", 0), ("other", 0), ("busy", 1), ("other", 1)]
+    # "other" emptied its queue, but its next run still queues behind the
+    # share it already used instead of starting over at the front
+    await queue.enqueue("other", {"n": 2})
+    rest = [(j.account_id, j.payload["n"]) for j in await _drain(queue)]
+    assert rest == [("busy", 2), ("other", 2), ("busy", 3)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_priorities_and_weights(fake_redis):
+    queue = AdmissionQueue()
+    await queue.set_weight("big", 2)
+    for i in range(6):
+        await queue.enqueue("big", {"n": i}, priority=Priority.TRIGGER)
+        await queue.enqueue("small", {"n": i}, priority=Priority.TRIGGER)
+    await queue.enqueue("batch", {}, priority=Priority.BATCH)
+    await queue.enqueue("user", {}, priority=Priority.INTERACTIVE)
+
+    order = await _drain(queue)
+    assert order[0].account_id == "user"
+    assert order[-1].account_id == "batch"
+    trigger = [job.account_id for job in order[1:10]]
+    assert trigger.count("big") == 6 and trigger.count("small") == 3
+
+    with pytest.raises(ValueError):
+        await queue.set_weight("big", 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_metrics_report_depth_waits_and_running(fake_redis):
+    now = [1000.0]
+    queue = AdmissionQueue(clock=lambda: now[0])
+    await queue.enqueue("a", {}, job_id="run-1")
+    await queue.enqueue("b", {}, job_id="run-2", priority=Priority.TRIGGER)
+    now[0] += 4
+    job = await queue.dequeue()
+
+    metrics = await queue.metrics()
+    assert metrics["queued"] == 1 and metrics["running"] == 1
+    assert metrics["priorities"]["interactive"]["wait_seconds"]["p50"] == 4.0
+    assert metrics["priorities"]["trigger"] == {
+        "queued": 1, "waiting_accounts": 1,
+        "wait_seconds": {"samples": 0, "p50": None, "p95": None, "max": None},
+    }
+    await queue.complete(job)
+    assert (await queue.metrics())["running"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_unstarted_runs_are_requeued_at_the_head_of_their_account(fake_redis):
+    now = [1000.0]
+    queue = AdmissionQueue(clock=lambda: now[0])
+    for i in range(3):
+        await queue.enqueue("a", {"n": i})
+    await queue.enqueue("b", {"n": 0})
+
+    lost = await queue.dequeue()
+    started = await queue.dequeue()
+    await queue.release(started)
+    assert (lost.account_id, started.account_id) == ("a", "b")
+    # Nothing is requeued while the worker may still start the run
+    now[0] += run_admission.CLAIM_TIMEOUT - 1
+    assert await queue.requeue_stale_claims() == 0
+
+    now[0] += 2
+    assert await queue.requeue_stale_claims() == 1
+    assert (await queue.metrics())["running"] == 1
+    rest = await _drain(queue)
+    assert [j.payload["n"] for j in rest] == [0, 1, 2]
+    # Started runs are released and never come back
+    for job in rest:
+        await queue.release(job)
+    now[0] += run_admission.CLAIM_TIMEOUT + 1
+    assert await queue.requeue_stale_claims() == 0
+    for job in [started, *rest]:
+        await queue.complete(job)
+    assert fake_redis.hashes[run_admission.JOBS_KEY] == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_worker_caps_concurrent_runs_and_drains_queue(fake_redis, monkeypatch):
+    ran, resent = [], []
+    release = asyncio.Event()
+
+    async def fake_run(on_started=None, **kwargs):
+        ran.append(kwargs["agent_run_id"])
+        await on_started()
+        assert fake_redis.hashes.get(run_admission.CLAIMS_KEY, {}) == {}
+        await release.wait()
+
+    async def noop():
+        pass
+
+    async def still_running(agent_run_id):
+        return True
+
+    monkeypatch.setattr(run_agent_background, "_run_agent", fake_run)
+    monkeypatch.setattr(run_agent_background, "_is_still_running", still_running)
+    monkeypatch.setattr(run_agent_background, "initialize", noop)
+    monkeypatch.setattr(run_agent_background, "MAX_CONCURRENT_RUNS", 1)
+    monkeypatch.setattr(run_agent_background.admit_agent_runs, "send", lambda: None)
+    monkeypatch.setattr(run_agent_background.admit_agent_runs, "send_with_options",
+                        lambda **kwargs: resent.append(kwargs))
+    admit = run_agent_background.admit_agent_runs.fn.__wrapped__
+
+    for i in range(3):
+        await run_agent_background.submit_agent_run(account_id="acct", agent_run_id=f"run-{i}")
+
+    lane = asyncio.create_task(admit())
+    await asyncio.sleep(0.01)
+    # The slot is taken: further messages leave the work to the running lane,
+    # and only one of them is re-sent for other processes
+    await admit()
+    await admit()
+    assert ran == ["run-0"]
+    assert resent == [{"delay": run_agent_background.ADMISSION_RETRY_DELAY_MS}]
+
+    release.set()
+    await lane
+    assert ran == ["run-0", "run-1", "run-2"]
+    assert run_agent_background._active_runs == 0
+    assert (await run_admission.admission_queue.metrics())["running"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_runs_stopped_while_queued_are_skipped(fake_redis, monkeypatch):
+    ran = []
+    stopped = {"run-1"}
+
+    async def fake_run(on_started=None, **kwargs):
+        ran.append(kwargs["agent_run_id"])
+
+    async def still_running(agent_run_id):
+        return agent_run_id not in stopped
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(run_agent_background, "_run_agent", fake_run)
+    monkeypatch.setattr(run_agent_background, "_is_still_running", still_running)
+    monkeypatch.setattr(run_agent_background, "initialize", noop)
+    monkeypatch.setattr(run_agent_background.admit_agent_runs, "send", lambda: None)
+
+    for i in range(3):
+        await run_agent_background.submit_agent_run(account_id="acct", agent_run_id=f"run-{i}")
+    await run_agent_background.admit_agent_runs.fn.__wrapped__()
+
+    assert ran == ["run-0", "run-2"]
+    assert (await run_admission.admission_queue.metrics())["running"] == 0
@@ -0,0 +1,259 @@
+import asyncio
+import copy
+import itertools
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import core.run as run_module
+import core.utils.run_checkpoint as run_checkpoint
+import run_agent_background
+from core.run import AgentConfig, AgentRunner, INTERRUPTED_TOOL_MESSAGE
+from core.utils.run_checkpoint import RunLease, load_checkpoint
+from conftest import FakeRedis
+
+_clock = itertools.count(1)
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db, self.table, self.filters = db, table, []
+        self.limit_n, self.desc = None, False
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, key, value):
+        self.filters.append(lambda row, k=key, v=value: row.get(k) == v)
+        return self
+
+    def in_(self, key, values):
+        self.filters.append(lambda row, k=key, v=values: row.get(k) in v)
+        return self
+
+    def order(self, column, desc=False):
+        self.desc = desc
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    async def execute(self):
+        rows = [r for r in self.db.tables.get(self.table, []) if all(f(r) for f in self.filters)]
+        rows = sorted(rows, key=lambda r: r.get("created_at", 0), reverse=self.desc)[:self.limit_n]
+        return SimpleNamespace(data=copy.deepcopy(rows))
+
+
+class FakeDB:
+    def __init__(self):
+        self.tables = {"messages": [], "agent_runs": []}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    @property
+    async def client(self):
+        return self
+
+    def messages(self, type=None):
+        return [m for m in self.tables["messages"] if type is None or m["type"] == type]
+
+
+class FakeLLMThreadManager:
+    """run_thread stand-in that replays scripted LLM calls like the response processor."""
+
+    def __init__(self, db, calls):
+        self.db = db
+        self.calls = list(calls)
+        self.llm_calls = 0
+        self.received_states = []
+        self.tool_registry = SimpleNamespace(flush_tools=self._noop)
+
+    async def _noop(self):
+        pass
+
+    async def add_message(self, thread_id, type, content, is_llm_message=False, metadata=None):
+        message = {"message_id": f"msg-{next(_clock)}", "thread_id": thread_id, "type": type,
+                   "content": content, "metadata": metadata or {}, "created_at": next(_clock)}
+        self.db.tables["messages"].append(message)
+        return message
+
+    async def run_thread(self, thread_id, auto_continue_state, **kwargs):
+        self.received_states.append(copy.deepcopy(auto_continue_state))
+        return self._stream(thread_id, auto_continue_state)
+
+    async def _stream(self, thread_id, state):
+        continuous = state["continuous_state"]
+        continuous["thread_run_id"] = continuous.get("thread_run_id") or "thread-run-1"
+        while self.calls:
+            tool_calls, hang, terminate = self.calls.pop(0)
+            self.llm_calls += 1
+            yield {"type": "llm_response_start", "content": json.dumps({"auto_continue_count": state["count"]})}
+            assistant = await self.add_message(thread_id, "assistant", {
+                "role": "assistant", "content": "",
+                "tool_calls": [{"id": call_id, "function": {"name": name}} for call_id, name in tool_calls],
+            }, is_llm_message=True)
+            yield assistant
+            for index, (call_id, name) in enumerate(tool_calls):
+                started = {"status_type": "tool_started", "tool_index": index, "tool_call_id": call_id, "function_name": name}
+                yield {"type": "status", "content": json.dumps(started)}
+                if hang:
+                    await asyncio.Event().wait()  # the worker dies while this tool runs
+                await self.add_message(thread_id, "tool", {"role": "tool", "tool_call_id": call_id, "content": "ok"}, is_llm_message=True)
+                done = {**started, "status_type": "tool_completed"}
+                metadata = {"agent_should_terminate": "true"} if terminate else {}
+                yield {"type": "status", "content": json.dumps(done), "metadata": json.dumps(metadata)}
+            if terminate:
+                return
+            state["count"] += 1  # auto-continue after tool_calls
+
+
+@pytest.fixture
+def env(monkeypatch):
+    now = [1000.0]
+    fake_redis = FakeRedis(clock=lambda: now[0])
+    db = FakeDB()
+    monkeypatch.setattr(run_checkpoint, "redis", fake_redis)
+    monkeypatch.setattr(run_checkpoint, "time", SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(run_agent_background, "redis", fake_redis)
+    monkeypatch.setattr(run_agent_background, "db", db)
+
+    async def system_prompt(*args, **kwargs):
+        return {"role": "system", "content": "system"}
+
+    monkeypatch.setattr(run_module.PromptManager, "build_system_prompt", staticmethod(system_prompt))
+    db.tables["messages"].append({"message_id": "user-1", "thread_id": "thread-1", "type": "user",
+                                  "content": json.dumps({"role": "user", "content": "go"}), "created_at": 0})
+    return SimpleNamespace(now=now, redis=fake_redis, db=db)
+
+
+def _runner(env, calls, resume_from=None):
+    runner = AgentRunner(AgentConfig(thread_id="thread-1", project_id="proj", agent_run_id="run-1", resume_from=resume_from))
+    runner.thread_manager = FakeLLMThreadManager(env.db, calls)
+    runner.client = env.db
+
+    async def noop():
+        return None
+
+    runner.setup = runner.setup_tools = runner.setup_mcp_tools = noop
+    return runner
+
+
+async def _consume(runner):
+    return [chunk async for chunk in runner.run()]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_killed_worker_resumes_from_checkpoint_without_repeating_llm_calls(env):
+    script = [
+        ([("call-1", "web_search")], False, False),
+        ([("call-2", "create_file")], True, False),  # hangs: worker killed here
+    ]
+    first = _runner(env, script)
+    task = asyncio.create_task(_consume(first))
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        checkpoint = await load_checkpoint("run-1")
+        if checkpoint and checkpoint.pending_tool_calls:
+            break
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    checkpoint = await load_checkpoint("run-1")
+    assert checkpoint.iteration == 1
+    assert checkpoint.auto_continue_count == 1
+    assert checkpoint.continuous_state["thread_run_id"] == "thread-run-1"
+    assert [c["tool_call_id"] for c in checkpoint.pending_tool_calls] == ["call-2"]
+
+    second = _runner(env, [([("call-3", "complete")], False, True)], resume_from=checkpoint)
+    await _consume(second)
+
+    # Only the interrupted call's successor hit the LLM again
+    assert first.thread_manager.llm_calls == 2
+    assert second.thread_manager.llm_calls == 1
+    resumed_state = second.thread_manager.received_states[0]
+    assert resumed_state["count"] == 1
+    assert resumed_state["continuous_state"]["thread_run_id"] == "thread-run-1"
+
+    tool_results = {m["content"]["tool_call_id"]: m["content"]["content"] for m in env.db.messages("tool")}
+    assert tool_results == {"call-1": "ok", "call-2": INTERRUPTED_TOOL_MESSAGE, "call-3": "ok"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_expired_lease_is_taken_over_once(env):
+    await run_checkpoint.save_run_args("run-1", {"agent_run_id": "run-1", "thread_id": "thread-1"})
+    dead = RunLease("run-1", "worker-a")
+    assert await dead.acquire()
+    assert await run_checkpoint.find_orphaned_runs() == []
+
+    env.now[0] += run_checkpoint.LEASE_TTL + 1  # no heartbeat: the worker is gone
+    assert await run_checkpoint.find_orphaned_runs() == ["run-1"]
+    record = await run_checkpoint.claim_orphaned_run("run-1")
+    assert record == {"args": {"agent_run_id": "run-1", "thread_id": "thread-1"}, "resumes": 1}
+    assert await run_checkpoint.claim_orphaned_run("run-1") is None
+
+    replacement = RunLease("run-1", "worker-b")
+    assert await replacement.acquire()
+    # The old worker coming back finds it lost the run
+    assert await dead.renew() is False and dead.lost
+
+    env.now[0] += run_checkpoint.LEASE_TTL - 1
+    assert await replacement.renew()
+    env.now[0] += run_checkpoint.LEASE_TTL - 1
+    assert await run_checkpoint.find_orphaned_runs() == []
+
+    await replacement.release(finished=True)
+    assert await env.redis.get("agent_run:run-1:args") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_sweep_resubmits_running_orphans_only(env, monkeypatch):
+    sent, failed = [], []
+    monkeypatch.setattr(run_agent_background.run_agent_background, "send", lambda **kwargs: sent.append(kwargs))
+
+    async def update_status(client, agent_run_id, status, error=None):
+        failed.append((agent_run_id, status))
+
+    monkeypatch.setattr(run_agent_background, "update_agent_run_status", update_status)
+    env.db.tables["agent_runs"] = [{"id": "live", "status": "running"}, {"id": "stopped", "status": "stopped"},
+                                   {"id": "flaky", "status": "running"}]
+    for run_id in ("live", "stopped", "flaky"):
+        await run_checkpoint.save_run_args(run_id, {"agent_run_id": run_id})
+        assert await RunLease(run_id, "dead-worker").acquire()
+    flaky = json.loads(await env.redis.get("agent_run:flaky:args"))
+    flaky["resumes"] = run_checkpoint.MAX_RESUMES
+    await env.redis.set("agent_run:flaky:args", json.dumps(flaky))
+
+    env.now[0] += run_checkpoint.LEASE_TTL + 1
+    await run_agent_background.resume_orphaned_runs()
+
+    assert sent == [{"agent_run_id": "live"}]
+    assert failed == [("flaky", "failed")]
+    assert await env.redis.get("agent_run:stopped:args") is None
+    assert ("agent_run:flaky:control", "ERROR") in env.redis.published
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_cancelled_before_streaming_still_cleans_up(env, monkeypatch):
+    async def noop():
+        pass
+
+    async def cancelled_subscribe():
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(run_agent_background, "initialize", noop)
+    monkeypatch.setattr(env.redis, "create_pubsub", cancelled_subscribe, raising=False)
+
+    # The finally block runs before the status and pending writes exist
+    with pytest.raises(asyncio.CancelledError):
+        await run_agent_background._run_agent(
+            agent_run_id="run-1", thread_id="thread-1", instance_id="instance-1", project_id="project-1",
+        )
+    assert await env.redis.get(run_checkpoint.lease_key("run-1")) is None
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from daytona_sdk import SandboxState
+
+import core.sandbox.lifecycle as lifecycle
+from core.sandbox.lifecycle import SandboxLifecycle
+from conftest import FakeRedis
+
+
+class FakeDaytona:
+    def __init__(self, states):
+        self.states = dict(states)
+        self.calls = Counter()
+
+    async def get(self, sandbox_id):
+        self.calls["get"] += 1
+        return SimpleNamespace(id=sandbox_id, state=self.states[sandbox_id])
+
+    async def start(self, sandbox):
+        self.calls["start"] += 1
+        await asyncio.sleep(0.05)
+        self.states[sandbox.id] = SandboxState.STARTED
+
+    async def stop(self, sandbox):
+        self.calls["stop"] += 1
+        self.states[sandbox.id] = SandboxState.STOPPED
+
+
+@pytest.fixture
+def env(monkeypatch):
+    fake_redis = FakeRedis()
+    fake_daytona = FakeDaytona({"sb-1": SandboxState.STOPPED, "sb-2": SandboxState.STARTED})
+    supervisord = []
+
+    async def start_supervisord(sandbox):
+        supervisord.append(sandbox.id)
+
+    monkeypatch.setattr(lifecycle, "redis", fake_redis)
+    monkeypatch.setattr(lifecycle, "daytona", fake_daytona)
+    monkeypatch.setattr(lifecycle, "start_supervisord_session", start_supervisord)
+    monkeypatch.setattr(lifecycle, "START_WAIT_INTERVAL", 0.01)
+    return SimpleNamespace(redis=fake_redis, daytona=fake_daytona, supervisord=supervisord)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_concurrent_callers_share_one_start_and_reuse_the_result(env):
+    service = SandboxLifecycle()
+    results = await asyncio.gather(*(service.get_or_start("sb-1") for _ in range(5)))
+
+    assert all(r.state == SandboxState.STARTED for r in results)
+    assert env.daytona.calls["start"] == 1
+    assert env.supervisord == ["sb-1"]
+    assert env.redis.values["sandbox:state:sb-1"] == SandboxState.STARTED.value
+
+    gets = env.daytona.calls["get"]
+    await service.get_or_start("sb-1")
+    assert env.daytona.calls["get"] == gets
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_processes_coordinate_starts_through_redis(env):
+    first, second = SandboxLifecycle(), SandboxLifecycle()
+    a, b = await asyncio.gather(first.get_or_start("sb-1"), second.get_or_start("sb-1"))
+    assert a.state == b.state == SandboxState.STARTED
+    assert env.daytona.calls["start"] == 1
+    assert "sandbox:start-lock:sb-1" not in env.redis.values
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_expired_local_entry_revalidated_from_redis_state(env):
+    service = SandboxLifecycle(state_ttl=0)
+    await service.get_or_start("sb-2")
+    gets = env.daytona.calls["get"]
+
+    env.redis.values["sandbox:state:sb-2"] = SandboxState.STARTED.value
+    await service.get_or_start("sb-2")
+    assert env.daytona.calls["get"] == gets
+
+    del env.redis.values["sandbox:state:sb-2"]
+    await service.get_or_start("sb-2")
+    assert env.daytona.calls["get"] == gets + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_idle_sandboxes_are_stopped(env):
+    service = SandboxLifecycle()
+    await service.get_or_start("sb-1")
+    await service.get_or_start("sb-2")
+    env.redis.zsets[lifecycle.ACTIVITY_KEY]["sb-1"] = time.time() - 3600
+
+    assert await service.stop_idle(idle_seconds=600) == ["sb-1"]
+    assert env.daytona.states["sb-1"] == SandboxState.STOPPED
+    assert set(env.redis.zsets[lifecycle.ACTIVITY_KEY]) == {"sb-2"}
+
+    # The next request resumes it instead of returning the stale object
+    resumed = await service.get_or_start("sb-1")
+    assert resumed.state == SandboxState.STARTED
+    assert env.daytona.calls["start"] == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_prewarm_resumes_in_background(env):
+    service = SandboxLifecycle()
+    service.prewarm("sb-1")
+    service.prewarm("sb-1")
+    await asyncio.sleep(0.2)
+    assert env.daytona.calls["start"] == 1
+    assert env.daytona.states["sb-1"] == SandboxState.STARTED
@@ -0,0 +1,208 @@
+import base64
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+import core.tools.browser_tool as browser_tool_module
+from core.sandbox import service_client
+from core.sandbox.service_client import SandboxServiceClient, SandboxServiceError, get_service_client
+from core.tools.browser_tool import STAGEHAND_PORT, BrowserTool
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 3), (0, 128, 255)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+PNG = _png()
+
+
+class FakeBrowserApi(BaseHTTPRequestHandler):
+    """In-sandbox browser API as served through a preview link."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body: bytes, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {"Content-Type": "application/json"}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status, data):
+        self._send(status, json.dumps(data).encode())
+
+    def _authorized(self):
+        state = self.server.state
+        state["connections"].add(self.client_address)
+        if self.headers.get("X-Daytona-Preview-Token") != state["token"]:
+            self._json(401, {"error": "invalid preview token"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        state = self.server.state
+        state["health_checks"] += 1
+        if state["healthy"]:
+            self._json(200, {"status": "healthy", "service": "browserApi"})
+        else:
+            self._json(500, {"status": "unhealthy", "service": "browserApi"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self._authorized():
+            return
+        state = self.server.state
+        if self.path == "/api/init":
+            state["healthy"] = True
+            self._json(200, {"status": "healthy"})
+            return
+        result = {"success": True, "message": f"Navigated to {body.get('url')}", "url": body.get("url"), "title": "Example"}
+        if self.headers.get("X-Screenshot-Transfer") == "binary":
+            prefix = json.dumps(result).encode()
+            self._send(200, prefix + PNG, {"Content-Type": "application/octet-stream", "X-Json-Length": str(len(prefix))})
+        else:
+            self._json(200, {**result, "screenshot_base64": base64.b64encode(PNG).decode()})
+
+
+class FakeSandbox:
+    def __init__(self, url, tokens):
+        self.id = "sandbox-1"
+        self.url = url
+        self.tokens = list(tokens)
+        self.process = SimpleNamespace(exec=self._no_exec)
+
+    async def get_preview_link(self, port):
+        token = self.tokens.pop(0) if len(self.tokens) > 1 else self.tokens[0]
+        return SimpleNamespace(url=self.url, token=token)
+
+    async def _no_exec(self, *args, **kwargs):
+        raise AssertionError("browser calls must not go through process.exec")
+
+
+@pytest.fixture
+def fake_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBrowserApi)
+    server.daemon_threads = True
+    server.state = {"token": "tok", "healthy": False, "health_checks": 0, "connections": set()}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_binary_screenshot_over_one_keepalive_connection(fake_server):
+    server, url = fake_server
+    client = SandboxServiceClient(FakeSandbox(url, ["tok"]))
+    try:
+        for _ in range(5):
+            response = await client.request(STAGEHAND_PORT, "POST", "/api/navigate", json_body={"url": "https://example.com"}, binary_screenshot=True)
+            assert response.data["title"] == "Example"
+            assert response.screenshot == PNG
+        assert len(server.state["connections"]) == 1
+
+        legacy = await client.request(STAGEHAND_PORT, "POST", "/api/navigate", json_body={"url": "https://example.com"})
+        assert legacy.screenshot is None
+        assert base64.b64decode(legacy.data["screenshot_base64"]) == PNG
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_preview_token_refreshed_on_rejection(fake_server):
+    server, url = fake_server
+    client = SandboxServiceClient(FakeSandbox(url, ["stale", "tok"]))
+    try:
+        response = await client.request(STAGEHAND_PORT, "GET", "/api")
+        assert response.status_code == 500
+        assert response.data["status"] == "unhealthy"
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_health_cached_and_failures_back_off():
+    now = [100.0]
+    client = SandboxServiceClient(FakeSandbox("http://unused", ["tok"]), clock=lambda: now[0])
+    results = [False, False, True]
+    calls = []
+
+    async def check():
+        calls.append(now[0])
+        return results.pop(0)
+
+    try:
+        assert await client.ensure_healthy(1, check) is False
+        assert await client.ensure_healthy(1, check) is False  # within 1s backoff, not re-checked
+        now[0] += 1.0
+        assert await client.ensure_healthy(1, check) is False
+        now[0] += 1.5  # backoff doubled to 2s
+        assert await client.ensure_healthy(1, check) is False
+        now[0] += 0.5
+        assert await client.ensure_healthy(1, check) is True
+        now[0] += service_client.HEALTH_TTL - 1
+        assert await client.ensure_healthy(1, check) is True
+        assert calls == [100.0, 101.0, 103.0]
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_unreachable_service_raises():
+    client = SandboxServiceClient(FakeSandbox("http://127.0.0.1:9", ["tok"]))
+    try:
+        with pytest.raises(SandboxServiceError):
+            await client.request(STAGEHAND_PORT, "GET", "/api", timeout=2)
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_browser_tool_uses_direct_channel(fake_server, monkeypatch):
+    server, url = fake_server
+    uploads = []
+
+    async def fake_upload(image_bytes, content_type, bucket_name, filename_prefix="agent_profile"):
+        uploads.append(image_bytes)
+        return "https://storage.example/shot.png"
+
+    async def add_message(**kwargs):
+        assert "screenshot_base64" not in kwargs["content"]
+        return {"message_id": "msg-1"}
+
+    monkeypatch.setattr(browser_tool_module, "upload_image_bytes", fake_upload)
+    monkeypatch.setattr(service_client, "_clients", service_client.OrderedDict())
+
+    tool = BrowserTool(project_id="proj", thread_id="thread", thread_manager=SimpleNamespace(add_message=add_message))
+    tool._sandbox = FakeSandbox(url, ["tok"])
+    try:
+        first = await tool.browser_navigate_to("https://example.com")
+        second = await tool.browser_navigate_to("https://example.org")
+        assert first.success and second.success
+        assert json.loads(second.output)["image_url"] == "https://storage.example/shot.png"
+        assert uploads == [PNG, PNG]
+        # Browser initialized on the first call, health then served from cache
+        assert server.state["health_checks"] == 1
+        assert len(server.state["connections"]) == 1
+    finally:
+        await get_service_client(tool._sandbox).aclose()
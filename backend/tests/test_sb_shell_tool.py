@@ -0,0 +1,103 @@
+import asyncio
+import json
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+import core.tools.sb_shell_tool as sb_shell_tool
+from core.tools.sb_shell_tool import SandboxShellTool
+
+pytestmark = pytest.mark.skipif(shutil.which("tmux") is None, reason="tmux not installed")
+
+
+class LocalProcess:
+    """Sandbox process API that runs commands with the local shell."""
+
+    def __init__(self):
+        self.executed = []
+        self._logs = {}
+
+    async def create_session(self, session_id):
+        pass
+
+    async def delete_session(self, session_id):
+        pass
+
+    async def execute_session_command(self, session_id, req, timeout=None):
+        self.executed.append(req.command)
+        proc = await asyncio.create_subprocess_exec(
+            "bash", "-c", req.command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        cmd_id = str(len(self.executed))
+        self._logs[cmd_id] = stdout.decode()
+        return SimpleNamespace(cmd_id=cmd_id, exit_code=proc.returncode)
+
+    async def get_session_command_logs(self, session_id, command_id):
+        return self._logs[command_id]
+
+
+@pytest.fixture
+def shell_tool(tmp_path, monkeypatch):
+    monkeypatch.setenv("TMUX_TMPDIR", str(tmp_path))
+    monkeypatch.setattr(sb_shell_tool, "COMMAND_LOG_DIR", str(tmp_path / "commands"))
+    tool = SandboxShellTool(project_id="proj", thread_manager=None)
+    tool.workspace_path = str(tmp_path)
+    tool._sandbox = SimpleNamespace(process=LocalProcess())
+    yield tool
+    asyncio.run(tool._execute_raw_command("tmux kill-server 2>/dev/null || true"))
+
+
+def _output(result):
+    assert result.success, result.output
+    return json.loads(result.output)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_blocking_command_waits_for_exit_code_without_polling(shell_tool):
+    command = "sleep 2; echo \"quoted 'text'\"; cat <<'EOF'\nfrom heredoc $HOME\nEOF\n(exit 3)"
+    data = _output(await shell_tool.execute_command(command, blocking=True, timeout=20))
+
+    assert data["completed"] is True
+    assert data["exit_code"] == 3
+    assert data["output"] == "quoted 'text'\nfrom heredoc $HOME\n"
+    # Start the command, one read that waits for its exit code, kill the session
+    assert len(shell_tool.sandbox.process.executed) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_named_session_keeps_state_and_reports_only_new_output(shell_tool):
+    _output(await shell_tool.execute_command("cd / && export GREETING=hello && echo first", session_name="work"))
+    data = _output(await shell_tool.execute_command("echo $GREETING from $(pwd)", session_name="work", blocking=True, timeout=20))
+    assert data["output"] == "hello from /\n"
+    assert data["exit_code"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_check_command_output_reads_incrementally(shell_tool):
+    _output(await shell_tool.execute_command("seq 1 20000", session_name="long"))
+    for _ in range(100):
+        tail = _output(await shell_tool.check_command_output("long", max_bytes=100))
+        if tail["exit_code"] is not None:
+            break
+        await asyncio.sleep(0.2)
+
+    assert tail["exit_code"] == 0
+    assert tail["truncated"] is True
+    assert tail["output"].endswith("19999\n20000\n")
+    assert len(tail["output"]) == 100
+    total = tail["total_bytes"]
+
+    first = _output(await shell_tool.check_command_output("long", offset=0, max_bytes=10))
+    assert first["output"] == "1\n2\n3\n4\n5\n"
+    second = _output(await shell_tool.check_command_output("long", offset=first["next_offset"], max_bytes=10))
+    assert second["output"] == "6\n7\n8\n9\n10"
+    end = _output(await shell_tool.check_command_output("long", offset=total, kill_session=True))
+    assert end["output"] == "" and end["next_offset"] == total
+
+    missing = await shell_tool.check_command_output("long")
+    assert not missing.success
@@ -0,0 +1,184 @@
+import asyncio
+import copy
+import itertools
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import core.tools.task_list_tool as task_list_module
+from core.agentpress.tool_registry import ToolRegistry
+from core.tools.task_list_tool import TaskListTool
+
+_clock = itertools.count(1)
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db, self.table, self.filters = db, table, []
+        self.action, self.payload, self.limit_n, self.order_desc = "select", None, None, False
+
+    def select(self, columns):
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = "update", payload
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def eq(self, key, value):
+        self.filters.append((key, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_desc = desc
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    async def execute(self):
+        self.db.calls.append(self.action)
+        if self.db.fail_writes and self.action != "select":
+            raise ConnectionError("database unavailable")
+        rows = self.db.rows
+        if self.action == "insert":
+            row = {**copy.deepcopy(self.payload), "message_id": f"msg-{len(rows) + 1}",
+                   "created_at": next(_clock), "updated_at": f"v{next(_clock)}"}
+            rows.append(row)
+            return SimpleNamespace(data=[copy.deepcopy(row)])
+        matched = [r for r in rows if all(r.get(k) == v for k, v in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(copy.deepcopy(self.payload))
+                row["updated_at"] = f"v{next(_clock)}"
+        else:
+            matched = sorted(matched, key=lambda r: r["created_at"], reverse=self.order_desc)[:self.limit_n]
+        return SimpleNamespace(data=copy.deepcopy(matched))
+
+
+class FakeDB:
+    def __init__(self):
+        self.rows, self.calls = [], []
+        self.fail_writes = False
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    @property
+    async def client(self):
+        return self
+
+    def task_list(self):
+        return next(r for r in self.rows if r["type"] == "task_list")
+
+
+def _tool(db):
+    return TaskListTool(project_id="proj", thread_manager=SimpleNamespace(db=db), thread_id="thread-1")
+
+
+def _task_ids(result):
+    data = json.loads(result.output)
+    return [task["id"] for section in data["sections"] for task in section["tasks"]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_operations_in_a_run_share_one_read_and_coalesce_writes(monkeypatch):
+    monkeypatch.setattr(task_list_module, "FLUSH_DELAY", 60)
+    db = FakeDB()
+    registry = ToolRegistry()
+    registry.register_tool(TaskListTool, project_id="proj", thread_manager=SimpleNamespace(db=db), thread_id="thread-1")
+    functions = registry.get_available_functions()
+
+    created = await functions["create_tasks"](section_title="Build", task_contents=["a", "b", "c"])
+    ids = _task_ids(created)
+    for task_id in ids:
+        assert (await functions["update_tasks"](task_ids=task_id, status="completed")).success
+    assert (await functions["view_tasks"]()).success
+    assert db.calls == ["select"]
+
+    # Run end writes everything buffered in a single insert
+    await registry.flush_tools()
+    assert db.calls == ["select", "insert"]
+    stored = db.task_list()["content"]
+    assert [t["status"] for t in stored["tasks"]] == ["completed"] * 3
+
+    # Nothing changed since: no further writes
+    await registry.flush_tools()
+    assert db.calls == ["select", "insert"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_saves_are_flushed_after_a_short_delay(monkeypatch):
+    monkeypatch.setattr(task_list_module, "FLUSH_DELAY", 0.01)
+    db = FakeDB()
+    tool = _tool(db)
+    await asyncio.gather(
+        tool.create_tasks(section_title="One", task_contents=["a"]),
+        tool.create_tasks(section_title="Two", task_contents=["b"]),
+    )
+    await asyncio.sleep(0.1)
+    assert db.calls == ["select", "insert"]
+    assert [s["title"] for s in db.task_list()["content"]["sections"]] == ["One", "Two"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_failed_writes_fail_the_next_call_and_the_run_end_flush(monkeypatch):
+    monkeypatch.setattr(task_list_module, "FLUSH_DELAY", 0.01)
+    db = FakeDB()
+    db.fail_writes = True
+    registry = ToolRegistry()
+    registry.register_tool(TaskListTool, project_id="proj", thread_manager=SimpleNamespace(db=db), thread_id="thread-1")
+    functions = registry.get_available_functions()
+
+    assert (await functions["create_tasks"](section_title="Build", task_contents=["a"])).success
+    await asyncio.sleep(0.1)
+    # The delayed write failed: the next change is refused, not reported as saved
+    result = await functions["create_tasks"](section_title="Build", task_contents=["b"])
+    assert not result.success and "could not be saved" in result.output
+    with pytest.raises(RuntimeError, match="TaskListTool"):
+        await registry.flush_tools()
+
+    # Storage back: the changes of the run are written at its end
+    db.fail_writes = False
+    await registry.flush_tools()
+    assert [t["content"] for t in db.task_list()["content"]["tasks"]] == ["a"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_concurrent_edit_is_detected_and_merged(monkeypatch):
+    monkeypatch.setattr(task_list_module, "FLUSH_DELAY", 60)
+    db = FakeDB()
+    setup = _tool(db)
+    ids = _task_ids(await setup.create_tasks(section_title="Plan", task_contents=["first", "second"]))
+    await setup.flush()
+
+    tool = _tool(db)
+    await tool.view_tasks()
+
+    # Edited from the UI after the run read the list
+    row = db.task_list()
+    row["content"]["tasks"][1]["content"] = "second (edited)"
+    row["content"]["tasks"].append({"id": "ui-task", "content": "from ui", "status": "pending",
+                                    "section_id": row["content"]["sections"][0]["id"]})
+    row["updated_at"] = "edited-in-ui"
+
+    await tool.update_tasks(task_ids=ids[0], status="completed")
+    await tool.create_tasks(section_title="Plan", task_contents=["third"])
+    db.calls.clear()
+    await tool.flush()
+
+    assert db.calls == ["update", "select", "update"]
+    tasks = db.task_list()["content"]["tasks"]
+    assert [t["content"] for t in tasks] == ["first", "second (edited)", "third", "from ui"]
+    assert tasks[0]["status"] == "completed"
+    # The in-run view now includes the concurrent edits
+    assert [t.content for t in tool._tasks] == ["first", "second (edited)", "third", "from ui"]
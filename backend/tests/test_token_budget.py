@@ -0,0 +1,109 @@
+import random
+
+import pytest
+from litellm.utils import token_counter
+
+from core.agentpress.context_manager import ContextManager
+from core.agentpress.prompt_caching import apply_anthropic_caching_strategy, count_cache_breakpoints
+from core.agentpress.token_budget import TokenBudget, count_tokens, stable_chunk_size
+
+MODEL = "anthropic/claude-sonnet-4-20250514"
+
+
+def _thread(n, seed=7):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(n):
+        role = "user" if i % 2 == 0 else "assistant"
+        words = " ".join(f"w{rng.randint(0, 999)}" for _ in range(rng.randint(5, 400)))
+        messages.append({"role": role, "content": f"turn {i}: {words}", "message_id": f"m{i}"})
+    return messages
+
+
+@pytest.mark.unit
+def test_counts_match_token_counter():
+    messages = _thread(30)
+    system = {"role": "system", "content": "You are helpful."}
+    assert count_tokens(messages, MODEL, system) == token_counter(model=MODEL, messages=[system] + messages)
+    budget = TokenBudget(messages, MODEL)
+    assert budget.range_tokens(5, 12) == count_tokens(messages[5:12], MODEL) - count_tokens([], MODEL)
+
+
+@pytest.mark.unit
+def test_omission_window_is_minimal_and_centered():
+    messages = _thread(200)
+    budget = TokenBudget(messages, MODEL)
+    limit = budget.total // 3
+    start, end = budget.omission_window(limit, min_messages_to_keep=10)
+
+    assert budget.total - budget.range_tokens(start, end) <= limit
+    k = end - start
+    shorter_start = (len(messages) - (k - 1)) // 2
+    assert budget.total - budget.range_tokens(shorter_start, shorter_start + k - 1) > limit
+    assert abs(start - (len(messages) - end)) <= 1
+
+    # Infeasible budgets keep the newest messages
+    assert budget.omission_window(10, min_messages_to_keep=10) == (0, 190)
+
+
+@pytest.mark.unit
+def test_omission_window_does_not_orphan_tool_results():
+    messages = [{"role": "user", "content": "x " * 200} for _ in range(40)]
+    budget = TokenBudget(messages, MODEL)
+    start, end = budget.omission_window(budget.total - budget.costs[0] * 4)
+    messages[end] = {"role": "tool", "content": "result " * 200, "tool_call_id": "t1"}
+    budget = TokenBudget(messages, MODEL)
+    _, new_end = budget.omission_window(budget.total - budget.costs[0] * 4)
+    assert messages[new_end]["role"] != "tool"
+
+
+@pytest.mark.unit
+def test_omit_messages_fits_budget():
+    messages = _thread(300)
+    manager = ContextManager()
+    limit = count_tokens(messages, MODEL) // 2
+    result = manager.compress_messages_by_omitting_messages(messages, MODEL, max_tokens=limit)
+    assert count_tokens(result, MODEL) <= limit
+    assert result[0] is messages[0] and result[-1] is messages[-1]
+
+
+@pytest.mark.unit
+def test_stable_chunk_sizes_nest():
+    assert [stable_chunk_size(t) for t in (500, 1500, 3000, 5000, 9000)] == [1024, 1024, 2048, 4096, 8192]
+
+
+@pytest.mark.unit
+def test_breakpoints_stay_on_the_same_messages_as_the_thread_grows():
+    messages = _thread(400)
+    previous = []
+    for n in range(50, 401, 3):
+        budget = TokenBudget(messages[:n], MODEL)
+        breakpoints = budget.cache_breakpoints(4096, 3)
+        assert len(breakpoints) <= 3
+        assert n - 1 not in breakpoints
+        # Every earlier breakpoint still inside the window is reused as-is
+        assert not previous or [i for i in previous if i >= breakpoints[0]] == [i for i in breakpoints if i <= previous[-1]]
+        previous = breakpoints
+
+
+def _breakpoint_positions(prepared):
+    return [i for i, m in enumerate(prepared) if isinstance(m["content"], list) and "cache_control" in m["content"][-1]]
+
+
+@pytest.mark.unit
+def test_caching_strategy_marks_messages_in_place():
+    messages = _thread(120)
+    system = {"role": "system", "content": "Policy. " * 800}
+
+    def prepare(n):
+        return apply_anthropic_caching_strategy(system, messages[:n], MODEL, context_window_tokens=200_000, cache_threshold_tokens=4096)
+
+    first, second = prepare(100), prepare(103)
+    assert count_cache_breakpoints(second) <= 4
+    assert len(second) == 104
+    assert [m.get("message_id") for m in second[1:]] == [m["message_id"] for m in messages[:103]]
+
+    # The next turn keeps the previous newest breakpoint, so its cached prefix is read back
+    last = _breakpoint_positions(first)[-1]
+    assert last in _breakpoint_positions(second)
+    assert second[:last + 1] == first[:last + 1]
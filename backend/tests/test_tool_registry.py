@@ -0,0 +1,94 @@
+import pytest
+
+from core.agentpress.tool import Tool, ToolResult, openapi_schema
+from core.agentpress.tool_registry import ToolRegistry
+
+
+def _schema(name):
+    return {
+        "type": "function",
+        "function": {"name": name, "description": name, "parameters": {"type": "object", "properties": {}}},
+    }
+
+
+class CountingTool(Tool):
+    instances = 0
+
+    def __init__(self, prefix: str = ""):
+        super().__init__()
+        type(self).instances += 1
+        self.prefix = prefix
+
+    @property
+    def sandbox(self):
+        raise RuntimeError("must not be touched during registration")
+
+    @openapi_schema(_schema("greet"))
+    async def greet(self, name: str) -> ToolResult:
+        return self.success_response(f"{self.prefix}{name}")
+
+    @openapi_schema(_schema("wave"))
+    async def wave(self) -> ToolResult:
+        return self.success_response("wave")
+
+    async def helper(self):
+        return None
+
+
+class ExtendedTool(CountingTool):
+    @openapi_schema(_schema("shout"))
+    async def shout(self, text: str) -> ToolResult:
+        return self.success_response(text.upper())
+
+
+@pytest.fixture(autouse=True)
+def reset_counts():
+    CountingTool.instances = 0
+    ExtendedTool.instances = 0
+
+
+@pytest.mark.unit
+def test_class_schemas_collected_once_across_mro():
+    assert list(CountingTool.get_class_schemas()) == ["greet", "wave"]
+    assert list(ExtendedTool.get_class_schemas()) == ["greet", "shout", "wave"]
+    with pytest.raises(TypeError):
+        CountingTool.get_class_schemas()["other"] = ()
+
+    tool = ExtendedTool()
+    assert set(tool.get_schemas()) == {"greet", "shout", "wave"}
+    assert tool.get_schemas()["greet"][0].schema["function"]["name"] == "greet"
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_registration_is_lazy_and_shares_one_instance():
+    registry = ToolRegistry()
+    registry.register_tool(CountingTool, prefix="hi ")
+    assert CountingTool.instances == 0
+    assert [s["function"]["name"] for s in registry.get_openapi_schemas()] == ["greet", "wave"]
+    assert registry.get_function_names() == ["greet", "wave"]
+
+    functions = registry.get_available_functions()
+    assert CountingTool.instances == 0
+    result = await functions["greet"]("ana")
+    assert result.output == "hi ana"
+    await functions["wave"]()
+    assert CountingTool.instances == 1
+    assert registry.get_tool_instance("wave").prefix == "hi "
+
+
+@pytest.mark.unit
+def test_function_table_rebuilt_only_on_change():
+    registry = ToolRegistry()
+    registry.register_tool(CountingTool, function_names=["wave"])
+    first = registry.get_available_functions()
+    assert list(first) == ["wave"]
+    assert registry.get_available_functions() is first
+
+    # Direct writes (as done for MCP tools) still invalidate the table
+    instance = ExtendedTool()
+    registry.tools["shout"] = {"instance": instance, "schema": ExtendedTool.get_class_schemas()["shout"][0]}
+    second = registry.get_available_functions()
+    assert second is not first
+    assert second["shout"] == instance.shout
+    assert registry.get_tool_instance("shout") is instance
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.composio_integration.toolkit_catalog import ToolkitCatalog, catalog_for, toolkit_catalog
+from core.composio_integration.toolkit_service import ToolkitService
+
+
+def _item(slug, name, description="", categories=(), oauth=True):
+    schemes = ["OAUTH2"] if oauth else ["API_KEY"]
+    return {
+        "slug": slug,
+        "name": name,
+        "auth_schemes": schemes,
+        "composio_managed_auth_schemes": schemes,
+        "meta": {
+            "description": description,
+            "logo": f"https://logos/{slug}.png",
+            "categories": [{"id": c, "name": c.title()} for c in categories],
+        },
+    }
+
+
+ITEMS = [
+    _item("gmail", "Gmail", "Send and read email", ["communication"]),
+    _item("github", "GitHub", "Code hosting", ["productivity"]),
+    _item("slack", "Slack", "Team chat", ["communication"]),
+    _item("apikeyonly", "Api Key Only", "Filtered out", oauth=False),
+]
+
+
+class FakeToolkits:
+    def __init__(self):
+        self.calls = []
+
+    def list(self, limit, managed_by, category=None, cursor=None):
+        self.calls.append((category, cursor))
+        items = [i for i in ITEMS if category is None or category in [c["id"] for c in i["meta"]["categories"]]]
+        # Two pages for the unfiltered listing to exercise cursor handling
+        if category is None and cursor is None:
+            return {"items": items[:2], "next_cursor": "page-2"}
+        if category is None:
+            return {"items": items[2:], "next_cursor": None}
+        return {"items": items, "next_cursor": None}
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    async def no_redis(self):
+        return False
+
+    async def no_save(self):
+        return None
+
+    monkeypatch.setattr(ToolkitCatalog, "_load_from_redis", no_redis)
+    monkeypatch.setattr(ToolkitCatalog, "_save_to_redis", no_save)
+    cat = ToolkitCatalog()
+    cat._client = SimpleNamespace(toolkits=FakeToolkits())
+    return cat
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_list_paginates_sdk_and_filters_non_oauth(catalog):
+    result = await catalog.list_toolkits(limit=2)
+    assert [t.slug for t in result["items"]] == ["gmail", "github"]
+    assert result["total_items"] == 3
+    assert result["next_cursor"] == "2"
+
+    page_two = await catalog.list_toolkits(limit=2, cursor=result["next_cursor"])
+    assert [t.slug for t in page_two["items"]] == ["slack"]
+    assert page_two["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_search_keeps_substring_semantics(catalog):
+    assert [t.slug for t in (await catalog.search_toolkits("mail"))["items"]] == ["gmail"]
+    assert [t.slug for t in (await catalog.search_toolkits("COMMUNICATION"))["items"]] == ["gmail", "slack"]
+    assert [t.slug for t in (await catalog.search_toolkits("gi"))["items"]] == ["github"]
+    assert (await catalog.search_toolkits("nothing-here"))["items"] == []
+
+    filtered = await catalog.search_toolkits("a", category="communication")
+    assert [t.slug for t in filtered["items"]] == ["gmail", "slack"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_snapshot_served_from_memory_until_stale(catalog):
+    await catalog.list_toolkits()
+    calls = len(catalog.client.toolkits.calls)
+
+    await catalog.search_toolkits("slack")
+    await catalog.get_toolkit("github")
+    assert len(catalog.client.toolkits.calls) == calls
+
+    catalog._loaded_at = time.time() - catalog.refresh_interval - 1
+    await catalog.list_toolkits()
+    await asyncio.wait_for(catalog._refresh_task, timeout=5)
+    assert len(catalog.client.toolkits.calls) > calls
+    assert not catalog.is_stale
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_sdk_calls_run_off_loop(catalog, monkeypatch):
+    loop_thread = []
+
+    def blocking_list(**kwargs):
+        import threading
+        loop_thread.append(threading.current_thread() is threading.main_thread())
+        return {"items": [], "next_cursor": None}
+
+    catalog._client = SimpleNamespace(toolkits=SimpleNamespace(list=blocking_list))
+    await catalog.refresh(force=True)
+    assert loop_thread and not any(loop_thread)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_icons_shared_through_redis(monkeypatch, fake_redis):
+    first, second = ToolkitCatalog(), ToolkitCatalog()
+    for cat in (first, second):
+        cat._client = SimpleNamespace(toolkits=FakeToolkits())
+    fetched = []
+
+    async def loader():
+        fetched.append(1)
+        return "https://logos/unlisted.png"
+
+    assert await first.get_icon("unlisted", loader) == "https://logos/unlisted.png"
+    # Another process (empty memory) reads the icon from Redis instead of the SDK
+    assert await second.get_icon("unlisted", loader) == "https://logos/unlisted.png"
+    assert len(fetched) == 1
+
+
+@pytest.mark.unit
+def test_service_catalog_uses_service_api_key(monkeypatch):
+    monkeypatch.setenv("COMPOSIO_API_KEY", "default-key")
+    monkeypatch.setitem(catalog_for.__globals__, "_keyed_catalogs", {})
+    monkeypatch.setattr(ToolkitService, "__init__", lambda self, api_key=None: setattr(self, "api_key", api_key))
+
+    assert ToolkitService().catalog is toolkit_catalog
+    assert ToolkitService("default-key").catalog is toolkit_catalog
+    own = ToolkitService("own-key").catalog
+    assert own is catalog_for("own-key") and own is not toolkit_catalog
+    assert own.client.api_key == "own-key"
+    assert own.cache_key != toolkit_catalog.cache_key
+    assert own.icons_key != toolkit_catalog.icons_key
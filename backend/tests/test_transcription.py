@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+import wave
+from array import array
+
+import openai
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from httpx import ASGITransport, AsyncClient
+
+import core.services.transcription as transcription
+from core.utils.auth_utils import verify_and_get_user_id_from_jwt
+from conftest import LocalServer
+
+RATE = 8000
+# Silent gaps near the first two cut targets (120s and ~232s)
+GAPS = [(110.0, 111.0), (238.0, 239.0)]
+DURATION = 400.0
+SERVER_DELAY = 0.2
+MAX_LOOP_STALL_MS = 50
+
+
+def _write_wav(path):
+    loud = array('h', [6000, -6000]) * int(RATE / 2)
+    silent = array('h', [0]) * RATE
+    with wave.open(str(path), 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        for second in range(int(DURATION)):
+            out.writeframes((silent if any(s <= second < e for s, e in GAPS) else loud).tobytes())
+
+
+class FakeTranscriptionServer(LocalServer):
+    """OpenAI-compatible /audio/transcriptions."""
+
+    def __init__(self):
+        self.in_flight = self.max_in_flight = 0
+        app = FastAPI()
+
+        @app.post("/v1/audio/transcriptions")
+        async def transcriptions(request: Request):
+            form = await request.form()
+            upload = form["file"]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(SERVER_DELAY)
+            self.in_flight -= 1
+            return PlainTextResponse(f"text of {upload.filename}\n")
+
+        super().__init__(app)
+
+
+class LoopMonitor:
+    """Measures the longest time the event loop failed to run a 5ms ticker."""
+
+    def __init__(self):
+        self.max_stall_ms = 0.0
+
+    async def _tick(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            self.max_stall_ms = max(self.max_stall_ms, (time.perf_counter() - started - 0.005) * 1000)
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self._tick())
+        return self
+
+    async def __aexit__(self, *exc):
+        self.task.cancel()
+
+
+@pytest.fixture
+def wav_file(tmp_path):
+    path = tmp_path / "memo.wav"
+    _write_wav(path)
+    return path
+
+
+@pytest_asyncio.fixture
+async def api():
+    app = FastAPI()
+    app.include_router(transcription.router)
+    app.dependency_overrides[verify_and_get_user_id_from_jwt] = lambda: "user-1"
+    # Served over a socket so the upload arrives in chunks, as in production
+    async with LocalServer(app) as server, AsyncClient(base_url=server.url, timeout=30) as client:
+        yield client
+
+
+def _upload(api, wav_file, params=None):
+    return api.build_request("POST", "/transcription", params=params,
+                             files={"audio_file": ("memo.wav", wav_file.read_bytes(), "audio/wav")})
+
+
+@pytest_asyncio.fixture
+async def fake_server(monkeypatch):
+    async with FakeTranscriptionServer() as server:
+        client = openai.AsyncOpenAI(base_url=f"http://127.0.0.1:{server.port}/v1", api_key="test")
+        monkeypatch.setattr(transcription, "_client", client)
+        monkeypatch.setattr(transcription, "_segment_slots", None)
+        yield server
+        await client.close()
+
+
+@pytest.mark.unit
+def test_long_wav_is_cut_in_silent_gaps(wav_file, tmp_path):
+    segments = transcription._split_wav(wav_file, tmp_path)
+
+    durations = []
+    for segment in segments:
+        with wave.open(str(segment), 'rb') as wav:
+            durations.append(wav.getnframes() / RATE)
+    assert len(segments) == 4 and sum(durations) == DURATION
+    cuts = [sum(durations[:i + 1]) for i in range(2)]
+    assert all(start <= cut <= end for cut, (start, end) in zip(cuts, GAPS))
+    assert all(d <= transcription.SPLIT_THRESHOLD_SECONDS for d in durations)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_segments_transcribed_concurrently_without_blocking_loop(api, fake_server, wav_file):
+    request = _upload(api, wav_file)
+    async with LoopMonitor() as monitor:
+        started = time.perf_counter()
+        response = await api.send(request)
+        elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert response.json()["text"] == " ".join(f"text of segment-{i:03d}.wav" for i in range(4))
+    assert fake_server.max_in_flight == 4
+    # One server delay for all segments rather than one per segment
+    assert elapsed < SERVER_DELAY * 4
+    assert monitor.max_stall_ms < MAX_LOOP_STALL_MS
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_stream_emits_segments_in_order_then_stitched_text(api, fake_server, wav_file):
+    response = await api.send(_upload(api, wav_file, params={"stream": "true"}))
+
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["index"] for e in events if e["type"] == "segment"] == [0, 1, 2, 3]
+    assert events[-1] == {"type": "done", "text": " ".join(e["text"] for e in events[:-1])}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_oversized_upload_rejected_while_streaming_to_disk(api, monkeypatch):
+    monkeypatch.setattr(transcription, "MAX_UPLOAD_BYTES", 1024 * 1024)
+    response = await api.post("/transcription", files={"audio_file": ("a.webm", b"x" * (3 * 1024 * 1024), "audio/webm")})
+    assert response.status_code == 400
@@ -0,0 +1,200 @@
+import asyncio
+import json
+
+import pytest
+
+from core.services import utility_llm as utility_llm_module
+from core.services.utility_llm import CACHE_INDEX_KEY, CACHE_PREFIX, UtilityLLMGateway
+from core.utils import project_helpers
+
+
+class FakeLLM:
+    def __init__(self, responder=None, delay=0.01):
+        self.calls = []
+        self.responder = responder or (lambda messages: "ok")
+        self.delay = delay
+
+    async def __call__(self, messages, model_name, **kwargs):
+        self.calls.append(messages)
+        await asyncio.sleep(self.delay)
+        return {
+            "choices": [{"message": {"content": self.responder(messages)}}],
+            "usage": {"total_tokens": 100},
+        }
+
+
+def _install_llm(monkeypatch, llm):
+    monkeypatch.setattr(utility_llm_module, "make_llm_api_call", llm)
+    return llm
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_cache_hit_skips_llm_and_counts_saved_tokens(monkeypatch, fake_redis):
+    llm = _install_llm(monkeypatch, FakeLLM(lambda m: "summary"))
+    gateway = UtilityLLMGateway()
+    messages = [{"role": "user", "content": "summarize"}]
+
+    assert await gateway.complete(messages, "gpt-5-mini") == "summary"
+    assert await gateway.complete(messages, "gpt-5-mini") == "summary"
+    assert len(llm.calls) == 1
+    assert gateway.stats["hits"] == 1
+    assert gateway.stats["saved_tokens"] == 100
+
+    # A fresh process reads the shared Redis entry
+    other = UtilityLLMGateway()
+    assert await other.complete(messages, "gpt-5-mini") == "summary"
+    assert len(llm.calls) == 1
+    assert (await other.get_stats())["shared"]["hits"] == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_identical_concurrent_requests_are_coalesced(monkeypatch, fake_redis):
+    llm = _install_llm(monkeypatch, FakeLLM(lambda m: "same", delay=0.05))
+    gateway = UtilityLLMGateway()
+    messages = [{"role": "user", "content": "name this"}]
+
+    results = await asyncio.gather(*(gateway.complete(messages, "gpt-5-nano") for _ in range(5)))
+    assert results == ["same"] * 5
+    assert len(llm.calls) == 1
+    assert gateway.stats["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_sampled_answers_are_reused_only_when_asked(monkeypatch, fake_redis):
+    answers = iter(["first", "second", "third", "fourth"])
+    llm = _install_llm(monkeypatch, FakeLLM(lambda m: next(answers)))
+    gateway = UtilityLLMGateway()
+    messages = [{"role": "user", "content": "suggest a name"}]
+
+    results = await asyncio.gather(*(gateway.complete(messages, "gpt-5-nano", temperature=0.7) for _ in range(2)))
+    assert sorted(results) == ["first", "second"]
+    assert await gateway.complete(messages, "gpt-5-nano", temperature=0.7) == "third"
+    assert len(llm.calls) == 3 and not fake_redis.values
+
+    assert await gateway.complete(messages, "gpt-5-nano", temperature=0.7, cache=True) == "fourth"
+    assert await gateway.complete(messages, "gpt-5-nano", temperature=0.7, cache=True) == "fourth"
+    assert len(llm.calls) == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_json_requests_sharing_system_prompt_are_batched(monkeypatch, fake_redis):
+    def respond(messages):
+        user = messages[-1]["content"]
+        if user.startswith("Request 1:"):
+            count = user.count("Request ")
+            return json.dumps({"results": [{"title": f"t{i}"} for i in range(count)]})
+        return json.dumps({"title": "single"})
+
+    llm = _install_llm(monkeypatch, FakeLLM(respond))
+    gateway = UtilityLLMGateway(batch_window=0.02)
+
+    results = await asyncio.gather(*(
+        gateway.complete_json("Return a title", f"message {i}", "gpt-5-nano", account_id="acct") for i in range(3)
+    ))
+    assert results == [{"title": "t0"}, {"title": "t1"}, {"title": "t2"}]
+    assert len(llm.calls) == 1
+    assert gateway.stats["batched"] == 3
+
+    # Each batched answer is cached under its own un-batched key
+    assert await gateway.complete_json("Return a title", "message 1", "gpt-5-nano") == {"title": "t1"}
+    assert len(llm.calls) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_requests_of_different_accounts_are_never_batched(monkeypatch, fake_redis):
+    llm = _install_llm(monkeypatch, FakeLLM(lambda m: json.dumps({"echo": m[-1]["content"]})))
+    gateway = UtilityLLMGateway(batch_window=0.02)
+
+    results = await asyncio.gather(
+        gateway.complete_json("sys", "a", "gpt-5-nano", account_id="acct-1"),
+        gateway.complete_json("sys", "b", "gpt-5-nano", account_id="acct-2"),
+        gateway.complete_json("sys", "c", "gpt-5-nano"),
+    )
+    assert results == [{"echo": "a"}, {"echo": "b"}, {"echo": "c"}]
+    assert sorted(call[-1]["content"] for call in llm.calls) == ["a", "b", "c"]
+    assert gateway.stats["batched"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_coalesced_json_requests_count_saved_tokens(monkeypatch, fake_redis):
+    llm = _install_llm(monkeypatch, FakeLLM(lambda m: json.dumps({"title": "same"}), delay=0.05))
+    gateway = UtilityLLMGateway()
+
+    results = await asyncio.gather(*(gateway.complete_json("sys", "x", "gpt-5-nano") for _ in range(3)))
+    assert results == [{"title": "same"}] * 3
+    assert len(llm.calls) == 1
+    assert gateway.stats["coalesced"] == 2
+    assert gateway.stats["saved_tokens"] == 200
+    assert (await gateway.get_stats())["shared"]["saved_tokens"] == 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_malformed_batch_falls_back_to_individual_calls(monkeypatch, fake_redis):
+    def respond(messages):
+        if messages[-1]["content"].startswith("Request 1:"):
+            return json.dumps({"results": []})
+        return json.dumps({"echo": messages[-1]["content"]})
+
+    llm = _install_llm(monkeypatch, FakeLLM(respond))
+    gateway = UtilityLLMGateway(batch_window=0.02)
+
+    results = await asyncio.gather(
+        gateway.complete_json("sys", "a", "gpt-5-nano", account_id="acct"),
+        gateway.complete_json("sys", "b", "gpt-5-nano", account_id="acct"),
+    )
+    assert results == [{"echo": "a"}, {"echo": "b"}]
+    assert len(llm.calls) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_redis_entries_are_capped(monkeypatch, fake_redis):
+    _install_llm(monkeypatch, FakeLLM(lambda m: m[-1]["content"], delay=0))
+    gateway = UtilityLLMGateway(max_redis_entries=2)
+
+    for i in range(4):
+        await gateway.complete([{"role": "user", "content": f"q{i}"}], "gpt-5-mini")
+
+    assert len(fake_redis.zsets[CACHE_INDEX_KEY]) == 2
+    assert len([k for k in fake_redis.values if k.startswith(CACHE_PREFIX)]) == 2
+
+
+class FakeProjects:
+    def __init__(self):
+        self.updates = []
+
+    @property
+    async def client(self):
+        return self
+
+    def table(self, name):
+        return self
+
+    def update(self, data):
+        self.updates.append(data)
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    async def execute(self):
+        return type("Result", (), {"data": [self.updates[-1]]})()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_project_name_falls_back_to_raw_content_when_not_json(monkeypatch, fake_redis):
+    _install_llm(monkeypatch, FakeLLM(lambda m: 'Trip Planning Help'))
+    monkeypatch.setattr(project_helpers, "utility_llm", UtilityLLMGateway())
+    projects = FakeProjects()
+    monkeypatch.setattr(project_helpers, "DBConnection", lambda: projects)
+
+    await project_helpers.generate_and_update_project_name("project-1", "plan my trip", account_id="acct")
+    assert projects.updates == [{"name": "Trip Planning Help", "icon_name": "message-circle"}]
@@ -0,0 +1,162 @@
+import asyncio
+from collections import Counter
+from urllib.parse import urlsplit
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import core.services.web_scrape as web_scrape
+from core.services.web_scrape import ScrapeService, normalize_url
+from conftest import LocalServer
+
+SCRAPE_DELAY = 0.05
+PER_HOST = 2
+
+
+class FakeFirecrawl(LocalServer):
+    """/v1/scrape that takes SCRAPE_DELAY per page and can fail a URL's first requests."""
+
+    def __init__(self, failures=None):
+        self.scraped = Counter()
+        self.failures = Counter(failures or {})
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+        self.client_ports = set()
+        app = FastAPI()
+
+        @app.post("/v1/scrape")
+        async def scrape(request: Request):
+            body = await request.json()
+            url = body["url"]
+            host = urlsplit(url).hostname
+            self.client_ports.add(request.client.port)
+            self.scraped[url] += 1
+            self.in_flight[host] += 1
+            self.max_in_flight[host] = max(self.max_in_flight[host], self.in_flight[host])
+            await asyncio.sleep(SCRAPE_DELAY)
+            self.in_flight[host] -= 1
+            if self.failures[url]:
+                self.failures[url] -= 1
+                return JSONResponse({"error": "busy"}, status_code=503)
+            # Every page of mirror.example serves the same article
+            path = "/article" if host == "mirror.example" else urlsplit(url).path
+            data = {"markdown": f"# {path}", "metadata": {"title": path}}
+            if "html" in body["formats"]:
+                data["html"] = f"<h1>{path}</h1>"
+            return {"success": True, "data": data}
+
+        super().__init__(app)
+
+
+@pytest_asyncio.fixture
+async def firecrawl():
+    async with FakeFirecrawl(failures={"https://flaky.example/page": 2}) as server:
+        yield server
+
+
+@pytest_asyncio.fixture
+async def service(firecrawl):
+    service = ScrapeService(firecrawl_url=firecrawl.url, firecrawl_api_key="key",
+                            per_host_concurrency=PER_HOST, retry_backoff=0.01)
+    yield service
+    await service.close()
+
+
+@pytest.mark.unit
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.com:443/Docs/?b=2&a=1&utm_source=x#intro") == "https://example.com/Docs?a=1&b=2"
+    assert normalize_url("http://example.com:8080") == "http://example.com:8080/"
+    assert normalize_url("https://example.com/docs/") != normalize_url("http://example.com/docs")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_duplicate_urls_scraped_once_over_pooled_client(service, firecrawl, fake_redis):
+    urls = [f"https://site{n % 3}.example/page-{n}" for n in range(12)]
+    duplicates = [urls[0] + "#top", urls[1].upper().replace("PAGE", "page"), urls[2] + "/?utm_source=x"]
+
+    pages = await asyncio.gather(*(service.scrape(url) for url in urls + duplicates + urls[:3]))
+
+    assert [p["markdown"] for p in pages[:12]] == [f"# /page-{n}" for n in range(12)]
+    assert pages[12:15] == pages[:3] and pages[15:] == pages[:3]
+    # One Firecrawl request per distinct page, on a handful of pooled connections
+    assert sum(firecrawl.scraped.values()) == 12
+    assert len(firecrawl.client_ports) <= 3 * PER_HOST
+    assert max(firecrawl.max_in_flight.values()) == PER_HOST
+
+    # Cached afterwards, also for another instance (i.e. another worker)
+    other = ScrapeService(firecrawl_url=firecrawl.url, firecrawl_api_key="key")
+    assert await other.scrape(urls[5]) == pages[5]
+    assert sum(firecrawl.scraped.values()) == 12
+    # The html variant is cached separately
+    assert (await service.scrape(urls[5], include_html=True))["html"] == "<h1>/page-5</h1>"
+    assert firecrawl.scraped[urls[5]] == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_content_stored_once_and_failed_scrapes_retried(service, firecrawl, fake_redis):
+    mirrors = [f"https://mirror.example/copy-{n}" for n in range(3)]
+    flaky = "https://flaky.example/page"
+
+    pages = await asyncio.gather(*(service.scrape(url) for url in mirrors + [flaky]))
+
+    assert pages[3]["markdown"] == "# /page" and firecrawl.scraped[flaky] == 3
+    content_keys = {k for k in fake_redis.values if k.startswith("web_scrape:content:")}
+    url_keys = {k for k in fake_redis.values if k.startswith("web_scrape:url:")}
+    # Three URLs for the mirrored article, one stored copy of it
+    assert len(url_keys) == 4 and len(content_keys) == 2
+    assert len({fake_redis.values[k] for k in url_keys}) == 2
+
+    firecrawl.failures["https://flaky.example/down"] = 10
+    with pytest.raises(web_scrape.ScrapeError):
+        await service.scrape("https://flaky.example/down")
+    assert firecrawl.scraped["https://flaky.example/down"] == service.retries
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_search_cached_by_normalized_query(fake_redis):
+    calls = []
+
+    class FakeTavily:
+        async def search(self, query, **params):
+            calls.append((query, params))
+            await asyncio.sleep(0.01)
+            if query == "nothing":
+                return {"query": query, "results": [], "answer": ""}
+            return {"query": query, "results": [{"url": "https://example.com"}], "answer": "yes"}
+
+    service = ScrapeService()
+    tavily = FakeTavily()
+    first, concurrent = await asyncio.gather(
+        service.search(tavily, "Latest Python release", max_results=5),
+        service.search(tavily, "latest python  release ", max_results=5),
+    )
+    again = await service.search(tavily, "LATEST python release", max_results=5)
+    other = await service.search(tavily, "Latest Python release", max_results=10)
+
+    assert first == concurrent == again and other["results"]
+    assert calls == [("Latest Python release", {"max_results": 5}), ("Latest Python release", {"max_results": 10})]
+
+    # Empty responses are searched again
+    await service.search(tavily, "nothing", max_results=5)
+    await service.search(tavily, "nothing", max_results=5)
+    assert len(calls) == 4
+
+
+@pytest.mark.unit
+def test_client_of_previous_event_loop_is_closed():
+    service = ScrapeService(firecrawl_url="http://127.0.0.1:9", firecrawl_api_key="key")
+
+    async def open_client():
+        await service._bind_loop()
+        return service._http()
+
+    first = asyncio.run(open_client())
+    second = asyncio.run(open_client())
+    assert second is not first
+    assert first.is_closed and not second.is_closed
+    asyncio.run(second.aclose())
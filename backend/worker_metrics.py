@@ -0,0 +1,29 @@
+import dotenv
+dotenv.load_dotenv()
+
+import os
+import sys
+
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+from core.utils.logger import logger
+
+# Sidecar exporter for the dramatiq workers (core/services/metrics.py): run it
+# in the worker container with the workers' PROMETHEUS_MULTIPROC_DIR; it serves
+# their samples, summed over the worker processes, on METRICS_PORT.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9191"))
+
+
+def main():
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        logger.critical("PROMETHEUS_MULTIPROC_DIR must be set to the directory the workers write metrics to")
+        sys.exit(1)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    _, thread = start_http_server(METRICS_PORT, registry=registry)
+    logger.info(f"Serving worker metrics on :{METRICS_PORT}/metrics")
+    thread.join()
+
+
+if __name__ == "__main__":
+    main()